@@ -0,0 +1,609 @@
+"""
+Evaluate or record many checkpoints of a run in-process.
+
+The environment and the model are only created once (per worker),
+the parameters of each checkpoint are then loaded with ``set_parameters()``.
+The results are saved in the same format as the ``evaluations.npz`` of the ``EvalCallback``:
+
+    python -m rl_zoo3.batch_eval --algo ppo --env CartPole-v1 -f logs/ --n-workers 4
+"""
+
+import argparse
+import glob
+import io
+import json
+import multiprocessing as mp
+import os
+import pickle
+import sys
+from concurrent.futures import ProcessPoolExecutor
+from typing import TYPE_CHECKING, Any, Dict, List, NamedTuple, Optional
+
+import numpy as np
+import yaml
+from huggingface_sb3 import EnvironmentName, ModelName
+
+from rl_zoo3.utils import ALGOS, StoreDict, get_eval_load_kwargs, get_latest_run_id
+
+if TYPE_CHECKING:
+    from rl_zoo3.video_writer import StreamingVideoWriter
+
+# Off-policy algorithms, a dummy replay buffer is enough to evaluate them
+OFF_POLICY_ALGOS = ["qrdqn", "dqn", "ddpg", "sac", "her", "td3", "tqc"]
+
+
+class Checkpoint(NamedTuple):
+    """
+    A saved model to evaluate or record.
+
+    :param name_prefix: Name of the model, used as prefix for the videos
+    :param path: Path to the model zip file
+    :param timesteps: Number of training timesteps (None for the final and the best models)
+    """
+
+    name_prefix: str
+    path: str
+    timesteps: Optional[int] = None
+
+
+def get_checkpoints(
+    log_path: str, env_name: EnvironmentName, algo: str, include_final: bool = True, include_best: bool = True
+) -> List[Checkpoint]:
+    """
+    List the checkpoints (``rl_model_*_steps.zip`` or saved in the ``rl_model_store`` checkpoint store) of a run,
+    sorted by number of timesteps, followed by the final and the best models when present.
+    The names follow the ones of ``get_model_path()``.
+
+    :param log_path: Folder of the run
+    :param env_name: Environment name
+    :param algo: RL Algorithm
+    :param include_final: Add the final model
+    :param include_best: Add the best model
+    :return: The models of the run
+    """
+    model_name = ModelName(algo, env_name)
+    checkpoints = []
+    for path in glob.glob(os.path.join(log_path, "rl_model_*_steps.zip")):
+        # path follow the pattern "rl_model_*_steps.zip", we count from the back to ignore any other _ in the path
+        timesteps = int(path.split("_")[-2])
+        checkpoints.append(Checkpoint(f"checkpoint-{timesteps}-{model_name}", path, timesteps))
+    # Incremental checkpoints (`--checkpoint-store`), the path points to the manifest of the checkpoint
+    for path in glob.glob(os.path.join(log_path, "rl_model_store", "manifests", "rl_model_*_steps.json")):
+        timesteps = int(path.split("_")[-2])
+        checkpoints.append(Checkpoint(f"checkpoint-{timesteps}-{model_name}", path, timesteps))
+    checkpoints.sort(key=lambda checkpoint: checkpoint.timesteps)
+
+    final_model_path = os.path.join(log_path, f"{env_name}.zip")
+    if include_final and os.path.isfile(final_model_path):
+        checkpoints.append(Checkpoint(f"final-model-{model_name}", final_model_path))
+    best_model_path = os.path.join(log_path, "best_model.zip")
+    if include_best and os.path.isfile(best_model_path):
+        checkpoints.append(Checkpoint(f"best-model-{model_name}", best_model_path))
+    return checkpoints
+
+
+class EpisodeStats:
+    """
+    Episode bookkeeping for vectorized environments:
+    the rewards and lengths are accumulated with one entry per env,
+    and the completed episodes are recorded with the index of their env.
+
+    When the number of episodes is given, it is divided as evenly as possible among the envs
+    (same as ``evaluate_policy()``), to avoid biasing the results towards short episodes.
+
+    :param n_envs: Number of environments
+    :param n_eval_episodes: Number of episodes to record, no limit by default
+    :param use_monitor_info: Use the episode reward and length reported by the ``Monitor`` wrapper
+        instead of the accumulated ones (for Atari, where ``done`` is also sent when losing a life
+        and the rewards are clipped)
+    """
+
+    def __init__(self, n_envs: int, n_eval_episodes: Optional[int] = None, use_monitor_info: bool = False) -> None:
+        self.n_envs = n_envs
+        self.use_monitor_info = use_monitor_info
+        self.current_rewards = np.zeros(n_envs)
+        self.current_lengths = np.zeros(n_envs, dtype=np.int64)
+        self.episode_counts = np.zeros(n_envs, dtype=np.int64)
+        self.episode_count_targets: Optional[np.ndarray] = None
+        if n_eval_episodes is not None:
+            self.episode_count_targets = np.array([(n_eval_episodes + i) // n_envs for i in range(n_envs)], dtype=np.int64)
+        self.episode_rewards: List[float] = []
+        self.episode_lengths: List[int] = []
+        self.episode_envs: List[int] = []
+        # NaN when the env does not report success
+        self.episode_successes: List[float] = []
+
+    @property
+    def done(self) -> bool:
+        """
+        Whether the requested number of episodes was recorded.
+        """
+        return self.episode_count_targets is not None and bool((self.episode_counts >= self.episode_count_targets).all())
+
+    def update(self, rewards: np.ndarray, dones: np.ndarray, infos: List[Dict[str, Any]]) -> List[int]:
+        """
+        Accumulate the rewards of a step and record the episodes that ended.
+
+        :param rewards: Rewards of the step
+        :param dones: Episode ends of the step
+        :param infos: Infos of the step
+        :return: Indices of the recorded episodes
+        """
+        self.current_rewards += rewards
+        self.current_lengths += 1
+        recorded = []
+        for env_idx in np.flatnonzero(dones):
+            episode_reward, episode_length = self.current_rewards[env_idx], self.current_lengths[env_idx]
+            self.current_rewards[env_idx] = 0.0
+            self.current_lengths[env_idx] = 0
+            if self.use_monitor_info:
+                # Only the true end of the episode has the Monitor info
+                episode_info = infos[env_idx].get("episode")
+                if episode_info is None:
+                    continue
+                episode_reward, episode_length = episode_info["r"], episode_info["l"]
+            if self.episode_count_targets is not None and (
+                self.episode_counts[env_idx] >= self.episode_count_targets[env_idx]
+            ):
+                continue
+            self.episode_counts[env_idx] += 1
+            self.episode_rewards.append(float(episode_reward))
+            self.episode_lengths.append(int(episode_length))
+            self.episode_envs.append(int(env_idx))
+            is_success = infos[env_idx].get("is_success")
+            self.episode_successes.append(np.nan if is_success is None else float(is_success))
+            recorded.append(len(self.episode_rewards) - 1)
+        return recorded
+
+    def to_dict(self) -> Dict[str, np.ndarray]:
+        """
+        :return: The recorded episodes as arrays
+        """
+        return dict(
+            episode_rewards=np.array(self.episode_rewards, dtype=np.float64),
+            episode_lengths=np.array(self.episode_lengths, dtype=np.int64),
+            episode_envs=np.array(self.episode_envs, dtype=np.int64),
+            episode_successes=np.array(self.episode_successes, dtype=np.float64),
+        )
+
+    def summary(self) -> Dict[str, Any]:
+        """
+        :return: Aggregated statistics, the success rate is None when the env does not report success
+        """
+        episodes = self.to_dict()
+        successes = episodes["episode_successes"][~np.isnan(episodes["episode_successes"])]
+        rewards, lengths = episodes["episode_rewards"], episodes["episode_lengths"]
+        has_episodes = len(rewards) > 0
+        return dict(
+            n_episodes=len(rewards),
+            mean_reward=float(np.mean(rewards)) if has_episodes else None,
+            std_reward=float(np.std(rewards)) if has_episodes else None,
+            mean_length=float(np.mean(lengths)) if has_episodes else None,
+            std_length=float(np.std(lengths)) if has_episodes else None,
+            success_rate=float(np.mean(successes)) if len(successes) > 0 else None,
+            episodes_per_env=np.bincount(episodes["episode_envs"], minlength=self.n_envs).tolist(),
+        )
+
+    def save(self, path: str, **metadata: Any) -> None:
+        """
+        Write the summary and the episodes to a JSON file, or to a numpy archive (``.npz`` extension).
+
+        :param path: Path to the results file
+        :param metadata: Additional information to save (e.g. algo, env id, number of envs)
+        """
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        if path.endswith(".npz"):
+            np.savez(path, **self.to_dict(), summary=json.dumps({**metadata, **self.summary()}))
+            return
+        episodes = {key: value.tolist() for key, value in self.to_dict().items()}
+        # NaN is not valid JSON
+        episodes["episode_successes"] = [None if np.isnan(success) else success for success in self.episode_successes]
+        with open(path, "w") as file_handler:
+            json.dump({**metadata, **self.summary(), "episodes": episodes}, file_handler, indent=2)
+
+
+class CheckpointEvaluator:
+    """
+    Evaluate or record the models of a run using the same environment:
+    the first model is loaded normally, the parameters of the next ones
+    are swapped in place with ``set_parameters()``.
+
+    :param algo: RL Algorithm
+    :param env_name: Environment name
+    :param log_path: Folder of the run (containing the saved hyperparameters)
+    :param n_envs: Number of environments
+    :param seed: Random generator seed, the same seed is used for every model
+    :param deterministic: Use deterministic actions, by default: deterministic except for Atari and MiniGrid
+    :param device: PyTorch device
+    :param norm_reward: Normalize reward if applicable (trained with VecNormalize)
+    :param log_dir: Where to log the episode rewards (``Monitor`` files)
+    :param render_mode: Render mode of the environment, must be "rgb_array" to record videos
+    :param env_kwargs: Optional keyword argument to pass to the env constructor
+    """
+
+    def __init__(
+        self,
+        algo: str,
+        env_name: EnvironmentName,
+        log_path: str,
+        n_envs: int = 1,
+        seed: int = 0,
+        deterministic: Optional[bool] = None,
+        device: str = "auto",
+        norm_reward: bool = False,
+        log_dir: Optional[str] = None,
+        render_mode: Optional[str] = None,
+        env_kwargs: Optional[Dict[str, Any]] = None,
+    ) -> None:
+        from stable_baselines3.common.vec_env import unwrap_vec_normalize
+
+        from rl_zoo3.exp_manager import ExperimentManager
+        from rl_zoo3.import_envs import import_env_packages
+        from rl_zoo3.utils import create_test_env, get_saved_hyperparams
+
+        # Import optional env packages only if needed
+        import_env_packages(env_name.gym_id)
+
+        self.algo = algo
+        self.seed = seed
+        self.device = device
+        self.is_atari = ExperimentManager.is_atari(env_name.gym_id)
+        if deterministic is None:
+            # Deterministic by default except for atari games
+            deterministic = not (ExperimentManager.is_atari(env_name.gym_id) or ExperimentManager.is_minigrid(env_name.gym_id))
+        self.deterministic = deterministic
+
+        stats_path = os.path.join(log_path, env_name)
+        self.hyperparams, maybe_stats_path = get_saved_hyperparams(stats_path, norm_reward=norm_reward, test_mode=True)
+
+        # load env_kwargs if existing
+        loaded_env_kwargs = {}
+        args_path = os.path.join(stats_path, "args.yml")
+        if os.path.isfile(args_path):
+            with open(args_path) as f:
+                loaded_args = yaml.load(f, Loader=yaml.UnsafeLoader)
+                if loaded_args["env_kwargs"] is not None:
+                    loaded_env_kwargs = loaded_args["env_kwargs"]
+        # overwrite with the given arguments
+        loaded_env_kwargs.update(env_kwargs or {})
+        if render_mode is not None:
+            loaded_env_kwargs.update(render_mode=render_mode)
+
+        self.env = create_test_env(
+            env_name.gym_id,
+            n_envs=n_envs,
+            stats_path=maybe_stats_path,
+            seed=seed,
+            log_dir=log_dir,
+            should_render=False,
+            # create_test_env() removes the wrapper keys
+            hyperparams=dict(self.hyperparams),
+            env_kwargs=loaded_env_kwargs,
+        )
+        self.vec_normalize = unwrap_vec_normalize(self.env)
+        # Statistics of the run, used for the checkpoints saved without their own statistics
+        self._base_rms = None
+        if self.vec_normalize is not None:
+            self._base_rms = (self.vec_normalize.obs_rms, self.vec_normalize.ret_rms)
+        self.model = None
+
+    def load(self, checkpoint: Checkpoint) -> None:
+        """
+        Load the parameters of a checkpoint,
+        the model is only created for the first one.
+
+        :param checkpoint: The model to load
+        """
+        from stable_baselines3.common.checkpoint_store import CheckpointStore
+
+        store, model_file = None, checkpoint.path
+        if checkpoint.path.endswith(".json"):
+            # Checkpoint saved in a checkpoint store: ".../rl_model_store/manifests/{name}.json"
+            store = CheckpointStore(os.path.dirname(os.path.dirname(checkpoint.path)))
+            store_name = os.path.basename(checkpoint.path)[: -len(".json")]
+
+        if self.model is None:
+            if store is not None:
+                # The model is created from a regular zip archive (in memory)
+                model_file = io.BytesIO()
+                store.export(store_name, model_file)
+                model_file.seek(0)
+
+            kwargs: Dict[str, Any] = dict(seed=self.seed)
+            if self.algo in OFF_POLICY_ALGOS:
+                kwargs.update(get_eval_load_kwargs(self.hyperparams))
+
+            if "HerReplayBuffer" in self.hyperparams.get("replay_buffer_class", ""):
+                kwargs["env"] = self.env
+
+            # Check if we are running python 3.8+
+            # we need to patch saved model under python 3.6/3.7 to load them
+            custom_objects = {}
+            if sys.version_info.major == 3 and sys.version_info.minor >= 8:
+                custom_objects = {
+                    "learning_rate": 0.0,
+                    "lr_schedule": lambda _: 0.0,
+                    "clip_range": lambda _: 0.0,
+                }
+            # The optimizers are not needed for evaluation
+            self.model = ALGOS[self.algo].load(
+                model_file, custom_objects=custom_objects, device=self.device, load_optimizers=False, **kwargs
+            )
+        elif store is not None:
+            params, _ = store.load_parameters(store_name, device=self.device, load_optimizers=False)
+            self.model.set_parameters(params, device=self.device, load_optimizers=False)
+        else:
+            self.model.set_parameters(checkpoint.path, device=self.device, load_optimizers=False)
+
+        # Use the normalization statistics saved with the checkpoint, if any,
+        # otherwise the ones of the run (a previous checkpoint may have replaced them)
+        vec_normalize_path = os.path.join(
+            os.path.dirname(checkpoint.path), f"rl_model_vecnormalize_{checkpoint.timesteps}_steps.pkl"
+        )
+        saved_vec_normalize = None
+        if store is not None:
+            saved_vec_normalize = store.load_vec_normalize(store_name)
+        elif checkpoint.timesteps is not None and os.path.isfile(vec_normalize_path):
+            with open(vec_normalize_path, "rb") as file_handler:
+                saved_vec_normalize = pickle.load(file_handler)
+        if self.vec_normalize is not None:
+            assert self._base_rms is not None
+            obs_rms, ret_rms = self._base_rms
+            if saved_vec_normalize is not None:
+                obs_rms, ret_rms = saved_vec_normalize.obs_rms, saved_vec_normalize.ret_rms
+            self.vec_normalize.obs_rms = obs_rms
+            self.vec_normalize.ret_rms = ret_rms
+
+    def _reset(self) -> None:
+        """
+        Re-seed the environment and the random generators,
+        so all the models are evaluated on the same episodes.
+        """
+        from stable_baselines3.common.utils import set_random_seed
+
+        set_random_seed(self.seed)
+        self.env.seed(self.seed)
+
+    def evaluate(self, checkpoint: Checkpoint, n_eval_episodes: int = 10) -> Dict[str, Any]:
+        """
+        Evaluate a model for a number of episodes.
+
+        :param checkpoint: The model to evaluate
+        :param n_eval_episodes: Number of episodes
+        :return: The episode rewards and lengths
+        """
+        from stable_baselines3.common.evaluation import evaluate_policy
+
+        self.load(checkpoint)
+        self._reset()
+        episode_rewards, episode_lengths = evaluate_policy(
+            self.model,  # type: ignore[arg-type]
+            self.env,
+            n_eval_episodes=n_eval_episodes,
+            deterministic=self.deterministic,
+            return_episode_rewards=True,
+            warn=False,
+        )
+        return dict(
+            name_prefix=checkpoint.name_prefix,
+            timesteps=checkpoint.timesteps,
+            episode_rewards=episode_rewards,
+            episode_lengths=episode_lengths,
+        )
+
+    def run(
+        self,
+        checkpoint: Checkpoint,
+        n_timesteps: int,
+        video_folder: Optional[str] = None,
+        video_writer: Optional["StreamingVideoWriter"] = None,
+        video_text: Optional[str] = None,
+        episode_stats: Optional[EpisodeStats] = None,
+    ) -> Dict[str, Any]:
+        """
+        Run a model for a number of timesteps, as done by ``enjoy`` (episodes are logged by the ``Monitor``)
+        or by ``record_video`` when a video folder is given.
+
+        :param checkpoint: The model to run
+        :param n_timesteps: Number of timesteps (and length of the video)
+        :param video_folder: Where to save the video of this model, no video is recorded by default
+        :param video_writer: Append the frames to an existing video instead (e.g. to record several models)
+        :param video_text: Text displayed on the frames
+        :param episode_stats: Where to record the completed episodes, a new ``EpisodeStats`` by default
+        :return: The name of the model and the completed episodes (see ``EpisodeStats``),
+            and the path to the video when a video folder is given
+        """
+        from rl_zoo3.video_writer import StreamingVideoWriter, get_render_fps
+
+        if video_folder is not None and video_writer is None:
+            video_path = os.path.join(video_folder, f"{checkpoint.name_prefix}-step-0-to-step-{n_timesteps}.mp4")
+            with StreamingVideoWriter(video_path, fps=get_render_fps(self.env)) as writer:
+                result = self.run(
+                    checkpoint, n_timesteps, video_writer=writer, video_text=video_text, episode_stats=episode_stats
+                )
+            print(f"Saving video to {video_path}")
+            return dict(result, video_path=video_path)
+
+        self.load(checkpoint)
+        self._reset()
+        assert self.model is not None
+        obs = self.env.reset()
+        if video_writer is not None:
+            video_writer.write(self.env.render(), video_text)  # type: ignore[arg-type]
+        lstm_states = None
+        episode_starts = np.ones((self.env.num_envs,), dtype=bool)
+        stats = EpisodeStats(self.env.num_envs, use_monitor_info=self.is_atari) if episode_stats is None else episode_stats
+        for _ in range(n_timesteps):
+            action, lstm_states = self.model.predict(
+                obs,  # type: ignore[arg-type]
+                state=lstm_states,
+                episode_start=episode_starts,
+                deterministic=self.deterministic,
+            )
+            obs, rewards, episode_starts, infos = self.env.step(action)
+            stats.update(rewards, episode_starts, infos)
+            if video_writer is not None:
+                video_writer.write(self.env.render(), video_text)  # type: ignore[arg-type]
+
+        return dict(name_prefix=checkpoint.name_prefix, timesteps=checkpoint.timesteps, **stats.to_dict())
+
+    def close(self) -> None:
+        self.env.close()
+
+
+def _evaluate_checkpoints(
+    evaluator_kwargs: Dict[str, Any],
+    checkpoints: List[Checkpoint],
+    n_eval_episodes: int,
+    n_timesteps: Optional[int],
+    video_folder: Optional[str],
+    num_threads: int,
+) -> List[Dict[str, Any]]:
+    """
+    Worker: create one evaluator and use it for all the given checkpoints
+    (see ``evaluate_checkpoints()`` for the parameters).
+    """
+    if num_threads > 0:
+        import torch as th
+
+        th.set_num_threads(num_threads)
+
+    evaluator = CheckpointEvaluator(**evaluator_kwargs)
+    results = []
+    try:
+        for checkpoint in checkpoints:
+            if n_timesteps is not None:
+                results.append(evaluator.run(checkpoint, n_timesteps, video_folder))
+            else:
+                results.append(evaluator.evaluate(checkpoint, n_eval_episodes))
+    finally:
+        evaluator.close()
+    return results
+
+
+def evaluate_checkpoints(
+    algo: str,
+    env_name: EnvironmentName,
+    log_path: str,
+    checkpoints: List[Checkpoint],
+    n_workers: int = 1,
+    n_eval_episodes: int = 10,
+    n_timesteps: Optional[int] = None,
+    video_folder: Optional[str] = None,
+    num_threads: int = -1,
+    **evaluator_kwargs,
+) -> List[Dict[str, Any]]:
+    """
+    Evaluate (or run for a fixed number of timesteps / record) several models of the same run.
+    The checkpoints are split between ``n_workers`` processes,
+    each of them only creates the environment and the model once.
+
+    :param algo: RL Algorithm
+    :param env_name: Environment name
+    :param log_path: Folder of the run
+    :param checkpoints: Models to evaluate
+    :param n_workers: Number of worker processes, evaluate in the current process when set to 1
+    :param n_eval_episodes: Number of episodes per model (when ``n_timesteps`` is not set)
+    :param n_timesteps: Run each model for a number of timesteps instead of episodes
+    :param video_folder: Record a video of ``n_timesteps`` for each model
+    :param num_threads: Number of threads for PyTorch in each worker (-1 to use default)
+    :param evaluator_kwargs: Additional keyword arguments for the ``CheckpointEvaluator``
+    :return: The results, in the order of the checkpoints
+    """
+    assert video_folder is None or n_timesteps is not None, "n_timesteps must be set to record videos"
+    if video_folder is not None:
+        evaluator_kwargs.update(render_mode="rgb_array")
+    evaluator_kwargs.update(algo=algo, env_name=env_name, log_path=log_path)
+    worker_args = (n_eval_episodes, n_timesteps, video_folder, num_threads)
+
+    n_workers = max(1, min(n_workers, len(checkpoints)))
+    if n_workers == 1:
+        return _evaluate_checkpoints(evaluator_kwargs, checkpoints, *worker_args)
+
+    # Interleave the checkpoints to balance the load (later checkpoints usually have longer episodes)
+    chunks = [checkpoints[worker_idx::n_workers] for worker_idx in range(n_workers)]
+    # Fork is not safe with PyTorch threads
+    with ProcessPoolExecutor(max_workers=n_workers, mp_context=mp.get_context("spawn")) as executor:
+        futures = [executor.submit(_evaluate_checkpoints, evaluator_kwargs, chunk, *worker_args) for chunk in chunks]
+        chunk_results = [future.result() for future in futures]
+
+    results: List[Dict[str, Any]] = [{}] * len(checkpoints)
+    for worker_idx, chunk_result in enumerate(chunk_results):
+        results[worker_idx::n_workers] = chunk_result
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--env", help="Environment ID", type=EnvironmentName, default="CartPole-v1")
+    parser.add_argument("-f", "--folder", help="Log folder", type=str, default="rl-trained-agents")
+    parser.add_argument("--algo", help="RL Algorithm", default="ppo", type=str, required=False, choices=list(ALGOS.keys()))
+    parser.add_argument("--exp-id", help="Experiment ID (default: 0: latest, -1: no exp folder)", default=0, type=int)
+    parser.add_argument("--n-eval-episodes", help="Number of episodes per checkpoint", default=10, type=int)
+    parser.add_argument("--n-envs", help="Number of environments per worker", default=1, type=int)
+    parser.add_argument("--n-workers", help="Number of worker processes", default=1, type=int)
+    parser.add_argument(
+        "--num-threads", help="Number of threads for PyTorch per worker (-1 to use default)", default=1, type=int
+    )
+    parser.add_argument("--deterministic", action="store_true", default=False, help="Use deterministic actions")
+    parser.add_argument("--stochastic", action="store_true", default=False, help="Use stochastic actions")
+    parser.add_argument("--seed", help="Random generator seed", type=int, default=0)
+    parser.add_argument("--device", help="PyTorch device to be use (ex: cpu, cuda...)", default="cpu", type=str)
+    parser.add_argument(
+        "-o", "--output", help="Output file (default: checkpoint_evaluations.npz in the run folder)", type=str
+    )
+    parser.add_argument(
+        "--env-kwargs", type=str, nargs="+", action=StoreDict, help="Optional keyword argument to pass to the env constructor"
+    )
+    args = parser.parse_args()
+
+    env_name: EnvironmentName = args.env
+    if args.exp_id == 0:
+        args.exp_id = get_latest_run_id(os.path.join(args.folder, args.algo), env_name)
+        print(f"Loading latest experiment, id={args.exp_id}")
+    if args.exp_id > 0:
+        log_path = os.path.join(args.folder, args.algo, f"{env_name}_{args.exp_id}")
+    else:
+        log_path = os.path.join(args.folder, args.algo)
+    assert os.path.isdir(log_path), f"The {log_path} folder was not found"
+
+    checkpoints = get_checkpoints(log_path, env_name, args.algo, include_final=False, include_best=False)
+    if len(checkpoints) == 0:
+        raise ValueError(f"No checkpoint found for {args.algo} on {env_name}, path: {log_path}")
+    print(f"Evaluating {len(checkpoints)} checkpoints with {args.n_workers} worker(s)")
+
+    deterministic = None
+    if args.deterministic or args.stochastic:
+        deterministic = not args.stochastic
+
+    results = evaluate_checkpoints(
+        args.algo,
+        env_name,
+        log_path,
+        checkpoints,
+        n_workers=args.n_workers,
+        n_eval_episodes=args.n_eval_episodes,
+        num_threads=args.num_threads,
+        n_envs=args.n_envs,
+        seed=args.seed,
+        deterministic=deterministic,
+        device=args.device,
+        env_kwargs=args.env_kwargs,
+    )
+
+    for result in results:
+        print(
+            f"{result['timesteps']} timesteps: "
+            f"mean reward={np.mean(result['episode_rewards']):.2f} +/- {np.std(result['episode_rewards']):.2f}"
+        )
+
+    # Same format as the EvalCallback
+    output_path = args.output or os.path.join(log_path, "checkpoint_evaluations.npz")
+    np.savez(
+        output_path,
+        timesteps=np.array([result["timesteps"] for result in results]),
+        results=np.array([result["episode_rewards"] for result in results]),
+        ep_lengths=np.array([result["episode_lengths"] for result in results]),
+    )
+    print(f"Saving results to {output_path}")
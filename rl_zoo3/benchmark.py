@@ -1,173 +1,38 @@
+"""
+Evaluate all the trained agents and write the results table (``benchmark.md``).
+
+The models are evaluated in parallel, each one in its own process (with a timeout).
+The results are saved after each evaluation in ``benchmark_results.json``,
+with a key computed from the model files and the evaluation settings:
+models that did not change are not evaluated again and an interrupted benchmark can be resumed.
+
+    python -m rl_zoo3.benchmark --n-workers 4
+"""
+
 import argparse
+import hashlib
 import json
+import multiprocessing as mp
 import os
 import shutil
-import subprocess
-from typing import Dict, List
+import sys
+import time
+import traceback
+from typing import Any, Dict, List, NamedTuple, Optional, Tuple
 
-import numpy as np
 import pandas as pd
 import pytablewriter
 from huggingface_sb3 import EnvironmentName
-from stable_baselines3.common.results_plotter import load_results, ts2xy
 
+from rl_zoo3.batch_eval import Checkpoint, CheckpointEvaluator, EpisodeStats
 from rl_zoo3.load_from_hub import download_from_hub
-from rl_zoo3.utils import get_hf_trained_models, get_latest_run_id, get_saved_hyperparams, get_trained_models
-
-parser = argparse.ArgumentParser()
-parser.add_argument("--log-dir", help="Root log folder", default="rl-trained-agents/", type=str)
-parser.add_argument("--benchmark-dir", help="Benchmark log folder", default="logs/benchmark/", type=str)
-parser.add_argument("-n", "--n-timesteps", help="number of timesteps", default=150000, type=int)
-parser.add_argument("--n-envs", help="number of environments", default=1, type=int)
-parser.add_argument("--verbose", help="Verbose mode (0: no output, 1: INFO)", default=1, type=int)
-parser.add_argument("--seed", help="Random generator seed", type=int, default=0)
-parser.add_argument("--test-mode", action="store_true", default=False, help="Do only one experiment (useful for testing)")
-parser.add_argument("--with-mujoco", action="store_true", default=False, help="Run also MuJoCo envs")
-parser.add_argument("--no-hub", action="store_true", default=False, help="Do not download models from hub")
-parser.add_argument("--num-threads", help="Number of threads for PyTorch", default=2, type=int)
-args = parser.parse_args()
-
-trained_models = get_trained_models(args.log_dir)
-
-if not args.no_hub:
-    trained_models.update(get_hf_trained_models())
-
-n_experiments = len(trained_models)
-results: Dict[str, List] = {
-    "algo": [],
-    "env_id": [],
-    "mean_reward": [],
-    "std_reward": [],
-    "n_timesteps": [],
-    "eval_timesteps": [],
-    "eval_episodes": [],
-}
-
-for idx, trained_model in enumerate(trained_models.keys()):
-    algo, env_id = trained_models[trained_model]
-    n_envs = args.n_envs
-    n_timesteps = args.n_timesteps
-
-    # HER is now a replay buffer class
-    if algo == "her":
-        continue
-
-    if algo in ["dqn", "qrdqn", "ddpg", "sac", "td3", "tqc"]:
-        n_envs = 1
-        n_timesteps *= args.n_envs
-
-    reward_log = os.path.join(args.benchmark_dir, trained_model)
-    arguments = [
-        "-n",
-        str(n_timesteps),
-        "--n-envs",
-        str(n_envs),
-        "-f",
-        args.log_dir,
-        "--algo",
-        algo,
-        "--env",
-        env_id,
-        "--no-render",
-        "--num-threads",
-        str(args.num_threads),
-        "--seed",
-        str(args.seed),
-        "--verbose",
-        "0",
-        "--reward-log",
-        reward_log,
-    ]
-    if args.verbose >= 1:
-        print(f"{idx + 1}/{n_experiments}")
-        print(f"Evaluating {algo} on {env_id}...")
-
-    skip_eval = False
-    if os.path.isdir(reward_log):
-        try:
-            x, y = ts2xy(load_results(reward_log), "timesteps")
-            skip_eval = len(x) > 0
-        except (json.JSONDecodeError, pd.errors.EmptyDataError, TypeError):
-            pass
-
-    # Comment out to benchmark HER robotics env
-    # this requires a mujoco licence
-    if "Fetch" in env_id and not args.with_mujoco:
-        print(f"Skipping mujoco env: {env_id}")
-        if not skip_eval:
-            continue
-
-    if skip_eval:
-        print("Skipping eval...")
-    else:
-        return_code = subprocess.call(["python", "enjoy.py", *arguments])
-        if return_code != 0:
-            print("Error during evaluation, skipping...")
-            continue
-        x, y = ts2xy(load_results(reward_log), "timesteps")
-
-    if len(x) > 0:
-        # Retrieve training timesteps from config
-        exp_id = get_latest_run_id(os.path.join(args.log_dir, algo), env_id)
-        log_path = os.path.join(args.log_dir, algo, f"{env_id}_{exp_id}", env_id)
-        hyperparams, _ = get_saved_hyperparams(log_path)
-        # Model not downloaded
-        if len(hyperparams) == 0:
-            print("Pretrained model not found, trying to download it from sb3 Huggingface hub: https://huggingface.co/sb3")
-            exp_id = 1
-            log_path = os.path.join(args.log_dir, algo, f"{env_id}_{exp_id}", env_id)
-            # Auto-download
-            download_from_hub(
-                algo=algo,
-                env_name=EnvironmentName(env_id),
-                exp_id=exp_id,
-                folder=args.log_dir,
-                organization="sb3",
-                repo_name=None,
-                force=False,
-            )
-            # Try again
-            hyperparams, _ = get_saved_hyperparams(log_path)
-
-        # Hack to format it properly
-        if hyperparams["n_timesteps"] < 1e6:
-            n_training_timesteps = f"{int(hyperparams['n_timesteps'] / 1e3)}k"
-        else:
-            n_training_timesteps = f"{int(hyperparams['n_timesteps'] / 1e6)}M"
-
-        mean_reward = np.mean(y)
-        std_reward = np.std(y)
-        results["algo"].append(algo)
-        results["env_id"].append(env_id)
-        results["mean_reward"].append(mean_reward)
-        results["std_reward"].append(std_reward)
-        results["n_timesteps"].append(n_training_timesteps)
-        results["eval_timesteps"].append(x[-1])
-        results["eval_episodes"].append(len(y))
-        if args.verbose >= 1:
-            print(x[-1], "timesteps")
-            print(len(y), "Episodes")
-            print(f"Mean reward: {mean_reward:.2f} +- {std_reward:.2f}")
-            print()
-    else:
-        print("Not enough timesteps")
-
-    if args.test_mode:
-        break
-
-# Create DataFrame
-results_df = pd.DataFrame(results)
-# Sort results
-results_df = results_df.sort_values(by=["algo", "env_id"])
-# Create links to Huggingface hub
-# links = [f"[{env_id}](https://huggingface.co/sb3/{algo}-{env_id})"
-#         for algo, env_id in zip(results_df["algo"], results_df["env_id"])]
-# results_df["env_id"] = links
+from rl_zoo3.utils import get_hf_trained_models, get_model_path, get_saved_hyperparams, get_trained_models
 
-writer = pytablewriter.MarkdownTableWriter(max_precision=3)
-writer.from_dataframe(results_df)
+RESULTS_FILE = "benchmark_results.json"
+# Columns of the table
+COLUMNS = ["algo", "env_id", "mean_reward", "std_reward", "n_timesteps", "eval_timesteps", "eval_episodes"]
 
-header = """
+HEADER = """
 ## Performance of trained agents
 
 Final performance of the trained agents can be found in the table below.
@@ -189,19 +54,371 @@ and also allow users to have access to pretrained agents.*
 
 """
 
-# change the output stream to a file
-tmp_path = os.path.join(args.benchmark_dir, "benchmark.md")
-with open(tmp_path, "w") as f:
-    f.write(header)
-    writer.stream = f
-    writer.write_table()
-print(f"Results written to: {tmp_path}")
-
-# Update root benchmark file
-if not args.test_mode:
-    shutil.copy(tmp_path, "benchmark.md")
-    print("Results copied to: benchmark.md")
-
-# Alternatively, to dump as csv file:
-# results_df.to_csv(f"{args.benchmark_dir}/benchmark.csv",sep=",", index=False)
-# print("Saved results to {args.benchmark_dir}/benchmark.csv")
+
+class EvalSettings(NamedTuple):
+    """
+    Settings of an evaluation, they are part of the cache key.
+
+    :param n_timesteps: Total number of timesteps (divided among the envs)
+    :param n_envs: Number of environments
+    :param seed: Random generator seed
+    """
+
+    n_timesteps: int
+    n_envs: int
+    seed: int
+
+
+def get_n_cpus() -> int:
+    """
+    :return: Number of cores available to this process
+    """
+    if hasattr(os, "sched_getaffinity"):
+        return len(os.sched_getaffinity(0))
+    return os.cpu_count() or 1
+
+
+def hash_model(model_path: str) -> str:
+    """
+    Hash the files of a model that change the results of the evaluation:
+    the model and, if present, the normalization statistics and the hyperparameters.
+
+    :param model_path: Path to the model zip file
+    :return: The hexadecimal digest
+    """
+    stats_path = os.path.join(os.path.dirname(model_path), os.path.basename(model_path)[: -len(".zip")])
+    hasher = hashlib.sha256()
+    for path in [model_path, os.path.join(stats_path, "vecnormalize.pkl"), os.path.join(stats_path, "config.yml")]:
+        if not os.path.isfile(path):
+            continue
+        hasher.update(os.path.basename(path).encode())
+        with open(path, "rb") as file_handler:
+            for chunk in iter(lambda: file_handler.read(1 << 20), b""):
+                hasher.update(chunk)
+    return hasher.hexdigest()
+
+
+def get_cache_key(model_hash: str, settings: EvalSettings) -> str:
+    """
+    :param model_hash: Hash of the model files (see ``hash_model()``)
+    :param settings: Evaluation settings
+    :return: Key identifying the result of an evaluation
+    """
+    return hashlib.sha256(json.dumps([model_hash, settings._asdict()]).encode()).hexdigest()
+
+
+def find_model(algo: str, env_name: EnvironmentName, log_dir: str, download: bool) -> Tuple[str, str, str]:
+    """
+    Locate the final model of the latest run, and download it from the hub if needed.
+
+    :return: Name prefix of the model, path to the model and path to the run (see ``get_model_path()``)
+    """
+    try:
+        return get_model_path(0, log_dir, algo, env_name)
+    except (AssertionError, ValueError) as e:
+        if not download:
+            raise e
+    print("Pretrained model not found, trying to download it from sb3 Huggingface hub: https://huggingface.co/sb3")
+    download_from_hub(
+        algo=algo,
+        env_name=env_name,
+        exp_id=0,
+        folder=log_dir,
+        organization="sb3",
+        repo_name=None,
+        force=False,
+    )
+    # Try again
+    return get_model_path(0, log_dir, algo, env_name)
+
+
+def format_timesteps(n_timesteps: float) -> str:
+    # Hack to format it properly
+    if n_timesteps < 1e6:
+        return f"{int(n_timesteps / 1e3)}k"
+    return f"{int(n_timesteps / 1e6)}M"
+
+
+def evaluate(
+    algo: str,
+    env_name: EnvironmentName,
+    log_dir: str,
+    reward_log: str,
+    settings: EvalSettings,
+    download: bool = True,
+    num_threads: int = -1,
+) -> Dict[str, Any]:
+    """
+    Run the final model for a total of ``n_timesteps`` on ``n_envs`` envs (as done by ``enjoy``),
+    the episode rewards are logged in ``reward_log`` and the results are saved in ``reward_log/results.json``.
+
+    :param algo: RL Algorithm
+    :param env_name: Environment name
+    :param log_dir: Root log folder
+    :param reward_log: Where to save the results
+    :param settings: Evaluation settings
+    :param download: Download the model from the hub when not found
+    :param num_threads: Number of threads for PyTorch (-1 to use default)
+    :return: The row of the results table, with the cache key
+    """
+    import torch as th
+
+    if num_threads > 0:
+        th.set_num_threads(num_threads)
+
+    name_prefix, model_path, log_path = find_model(algo, env_name, log_dir, download)
+    # Retrieve training timesteps from config
+    hyperparams, _ = get_saved_hyperparams(os.path.join(log_path, env_name))
+
+    evaluator = CheckpointEvaluator(algo, env_name, log_path, n_envs=settings.n_envs, seed=settings.seed, log_dir=reward_log)
+    stats = EpisodeStats(settings.n_envs, use_monitor_info=evaluator.is_atari)
+    try:
+        evaluator.run(Checkpoint(name_prefix, model_path), settings.n_timesteps // settings.n_envs, episode_stats=stats)
+    finally:
+        evaluator.close()
+
+    summary = stats.summary()
+    row = dict(
+        algo=algo,
+        env_id=env_name.gym_id,
+        mean_reward=summary["mean_reward"],
+        std_reward=summary["std_reward"],
+        n_timesteps=format_timesteps(hyperparams["n_timesteps"]) if "n_timesteps" in hyperparams else None,
+        # Timesteps of the completed episodes
+        eval_timesteps=int(sum(stats.episode_lengths)),
+        eval_episodes=summary["n_episodes"],
+        cache_key=get_cache_key(hash_model(model_path), settings),
+    )
+    stats.save(os.path.join(reward_log, "results.json"), **row, n_envs=settings.n_envs, deterministic=evaluator.deterministic)
+    return row
+
+
+def _run_job(evaluate_kwargs: Dict[str, Any], output_path: str) -> None:
+    """
+    Worker process: evaluate a model and write the row of the table to ``output_path``,
+    the output is redirected to ``benchmark.log`` in the folder of the model.
+    """
+    reward_log = evaluate_kwargs["reward_log"]
+    os.makedirs(reward_log, exist_ok=True)
+    with open(os.path.join(reward_log, "benchmark.log"), "w") as log_file:
+        sys.stdout = sys.stderr = log_file
+        try:
+            row = evaluate(**evaluate_kwargs)
+        except Exception:
+            traceback.print_exc()
+            raise
+    with open(output_path, "w") as file_handler:
+        json.dump(row, file_handler)
+
+
+class Job(NamedTuple):
+    """
+    An evaluation running in a worker process.
+    """
+
+    name: str
+    process: mp.Process
+    output_path: str
+    start_time: float
+
+
+def load_results(path: str) -> Dict[str, Dict[str, Any]]:
+    """
+    :param path: Path to the results file
+    :return: The rows of the table (with their cache key), indexed by model name
+    """
+    if not os.path.isfile(path):
+        return {}
+    try:
+        with open(path) as file_handler:
+            return json.load(file_handler)
+    except json.JSONDecodeError:
+        print(f"Invalid results file {path}, starting from scratch")
+        return {}
+
+
+def save_results(results: Dict[str, Dict[str, Any]], benchmark_dir: str) -> str:
+    """
+    Save the results (atomically, so the benchmark can be interrupted at any time) and regenerate the table.
+
+    :param results: Rows of the table, indexed by model name
+    :param benchmark_dir: Benchmark log folder
+    :return: Path to the markdown table
+    """
+    results_path = os.path.join(benchmark_dir, RESULTS_FILE)
+    with open(results_path + ".tmp", "w") as file_handler:
+        json.dump(results, file_handler, indent=2, sort_keys=True)
+    os.replace(results_path + ".tmp", results_path)
+
+    rows = [row for row in results.values() if row["eval_episodes"] > 0]
+    # Sort results
+    results_df = pd.DataFrame(rows, columns=COLUMNS).sort_values(by=["algo", "env_id"])
+    # Create links to Huggingface hub
+    # links = [f"[{env_id}](https://huggingface.co/sb3/{algo}-{env_id})"
+    #         for algo, env_id in zip(results_df["algo"], results_df["env_id"])]
+    # results_df["env_id"] = links
+
+    writer = pytablewriter.MarkdownTableWriter(max_precision=3)
+    writer.from_dataframe(results_df)
+    # change the output stream to a file
+    table_path = os.path.join(benchmark_dir, "benchmark.md")
+    with open(table_path, "w") as f:
+        f.write(HEADER)
+        writer.stream = f
+        writer.write_table()
+    return table_path
+
+
+def run_benchmark(
+    trained_models: Dict[str, Tuple[str, str]],
+    log_dir: str,
+    benchmark_dir: str,
+    settings: EvalSettings,
+    n_workers: int,
+    timeout: Optional[float] = None,
+    download: bool = True,
+    num_threads: int = -1,
+    verbose: int = 1,
+) -> Dict[str, Dict[str, Any]]:
+    """
+    Evaluate the models that are not in the cache, ``n_workers`` at a time.
+    Each evaluation runs in a new process that is killed after ``timeout`` seconds,
+    the results file and the table are updated after each evaluation.
+
+    :param trained_models: Models to evaluate: name -> (algo, env_id)
+    :param log_dir: Root log folder
+    :param benchmark_dir: Benchmark log folder
+    :param settings: Evaluation settings
+    :param n_workers: Number of models evaluated in parallel
+    :param timeout: Maximum time per model (in seconds), no limit by default
+    :param download: Download the models from the hub when not found
+    :param num_threads: Number of threads for PyTorch per worker (-1 to use default)
+    :param verbose: Verbosity level
+    :return: The rows of the table, indexed by model name
+    """
+    os.makedirs(benchmark_dir, exist_ok=True)
+    results = load_results(os.path.join(benchmark_dir, RESULTS_FILE))
+
+    pending = []
+    for name, (algo, env_id) in sorted(trained_models.items()):
+        # Only hash the models available locally, the others are downloaded by the worker
+        try:
+            _, model_path, _ = get_model_path(0, log_dir, algo, EnvironmentName(env_id))
+            cache_key = get_cache_key(hash_model(model_path), settings)
+        except (AssertionError, ValueError):
+            cache_key = None
+        if cache_key is not None and results.get(name, {}).get("cache_key") == cache_key:
+            if verbose >= 1:
+                print(f"Skipping {name}: model and settings did not change")
+            continue
+        pending.append((name, algo, env_id))
+
+    if verbose >= 1:
+        print(f"Evaluating {len(pending)} models with {n_workers} worker(s)")
+
+    # Fork is not safe with PyTorch threads
+    ctx = mp.get_context("spawn")
+    running: List[Job] = []
+    n_done = 0
+    while len(pending) > 0 or len(running) > 0:
+        # Start new jobs
+        while len(pending) > 0 and len(running) < n_workers:
+            name, algo, env_id = pending.pop(0)
+            evaluate_kwargs = dict(
+                algo=algo,
+                env_name=EnvironmentName(env_id),
+                log_dir=log_dir,
+                reward_log=os.path.join(benchmark_dir, name),
+                settings=settings,
+                download=download,
+                num_threads=num_threads,
+            )
+            output_path = os.path.join(benchmark_dir, name, "row.json")
+            if os.path.isfile(output_path):
+                os.remove(output_path)
+            process = ctx.Process(target=_run_job, args=(evaluate_kwargs, output_path), daemon=False)
+            process.start()
+            running.append(Job(name, process, output_path, time.perf_counter()))
+
+        time.sleep(0.1)
+        for job in list(running):
+            elapsed = time.perf_counter() - job.start_time
+            if job.process.is_alive():
+                if timeout is None or elapsed < timeout:
+                    continue
+                job.process.kill()
+                job.process.join()
+                status = f"timeout after {elapsed:.0f}s"
+            elif job.process.exitcode == 0 and os.path.isfile(job.output_path):
+                with open(job.output_path) as file_handler:
+                    row = json.load(file_handler)
+                results[job.name] = row
+                save_results(results, benchmark_dir)
+                status = f"{row['eval_episodes']} episodes"
+                if row["eval_episodes"] > 0:
+                    status += f", mean reward: {row['mean_reward']:.2f} +/- {row['std_reward']:.2f}"
+            else:
+                status = f"error (see {os.path.join(benchmark_dir, job.name, 'benchmark.log')})"
+            running.remove(job)
+            n_done += 1
+            if verbose >= 1:
+                print(f"[{n_done}/{n_done + len(running) + len(pending)}] {job.name}: {status} ({elapsed:.0f}s)")
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--log-dir", help="Root log folder", default="rl-trained-agents/", type=str)
+    parser.add_argument("--benchmark-dir", help="Benchmark log folder", default="logs/benchmark/", type=str)
+    parser.add_argument("-n", "--n-timesteps", help="number of timesteps", default=150000, type=int)
+    parser.add_argument(
+        "--n-envs", help="number of environments (subprocesses), the timesteps are divided among them", default=8, type=int
+    )
+    parser.add_argument(
+        "--n-workers",
+        help="Number of models evaluated in parallel (default: number of cores / number of envs)",
+        type=int,
+    )
+    parser.add_argument("--timeout", help="Maximum evaluation time per model (in seconds)", default=3600, type=float)
+    parser.add_argument("--verbose", help="Verbose mode (0: no output, 1: INFO)", default=1, type=int)
+    parser.add_argument("--seed", help="Random generator seed", type=int, default=0)
+    parser.add_argument("--test-mode", action="store_true", default=False, help="Do only one experiment (useful for testing)")
+    parser.add_argument("--with-mujoco", action="store_true", default=False, help="Run also MuJoCo envs")
+    parser.add_argument("--no-hub", action="store_true", default=False, help="Do not download models from hub")
+    parser.add_argument("--num-threads", help="Number of threads for PyTorch per worker", default=2, type=int)
+    args = parser.parse_args()
+
+    trained_models = get_trained_models(args.log_dir)
+
+    if not args.no_hub:
+        trained_models.update(get_hf_trained_models())
+
+    # HER is now a replay buffer class
+    trained_models = {name: model for name, model in trained_models.items() if model[0] != "her"}
+    # Comment out to benchmark HER robotics env
+    # this requires a mujoco licence
+    if not args.with_mujoco:
+        trained_models = {name: model for name, model in trained_models.items() if "Fetch" not in model[1]}
+
+    if args.test_mode:
+        trained_models = dict(sorted(trained_models.items())[:1])
+
+    n_workers = args.n_workers or max(1, get_n_cpus() // args.n_envs)
+    results = run_benchmark(
+        trained_models,
+        args.log_dir,
+        args.benchmark_dir,
+        EvalSettings(args.n_timesteps, args.n_envs, args.seed),
+        n_workers=n_workers,
+        timeout=args.timeout if args.timeout > 0 else None,
+        download=not args.no_hub,
+        num_threads=args.num_threads,
+        verbose=args.verbose,
+    )
+    table_path = save_results(results, args.benchmark_dir)
+    print(f"Results written to: {table_path}")
+
+    # Update root benchmark file
+    if not args.test_mode:
+        shutil.copy(table_path, "benchmark.md")
+        print("Results copied to: benchmark.md")
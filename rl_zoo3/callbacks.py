@@ -1,17 +1,30 @@
+import io
+import multiprocessing as mp
 import os
+import pathlib
+import queue
+import shutil
+import signal
 import tempfile
 import time
-from copy import deepcopy
-from functools import wraps
-from threading import Thread
-from typing import Optional, Type, Union
+import weakref
+from multiprocessing.context import BaseContext
+from multiprocessing.process import BaseProcess
+from typing import Any, Callable, Dict, List, Optional, Tuple, Type, Union
 
+import numpy as np
 import optuna
-from sb3_contrib import TQC
-from stable_baselines3 import SAC
+import torch as th
+from gymnasium import spaces
+from stable_baselines3.common.buffers import BaseBuffer, ReplayBuffer
 from stable_baselines3.common.callbacks import BaseCallback, EvalCallback
-from stable_baselines3.common.logger import TensorBoardOutputFormat
-from stable_baselines3.common.vec_env import VecEnv
+from stable_baselines3.common.logger import Logger, TensorBoardOutputFormat
+from stable_baselines3.common.monitor import EpisodeLogWriter
+from stable_baselines3.common.off_policy_algorithm import OffPolicyAlgorithm
+from stable_baselines3.common.preprocessing import get_action_dim, get_obs_shape
+from stable_baselines3.common.save_util import load_from_zip_file, recursive_setattr
+from stable_baselines3.common.type_aliases import ReplayBufferSamples
+from stable_baselines3.common.vec_env import VecEnv, VecNormalize
 
 
 class TrialEvalCallback(EvalCallback):
@@ -94,127 +107,603 @@ class SaveVecNormalizeCallback(BaseCallback):
         return True
 
 
-class ParallelTrainCallback(BaseCallback):
+# Indices of the shared counters used by ``ParallelTrainCallback``
+(
+    _WRITE_COUNT,
+    _READ_COUNT,
+    _VERSION,
+    _INGESTED,
+    _SYNC_REQUEST,
+    _SYNC_ACK,
+    _SAVE_REQUEST,
+    _SAVE_ACK,
+    _STOP,
+    _NUM_TIMESTEPS,
+    _SLOT_STAMPS,
+) = range(11)
+_N_COUNTERS = _SLOT_STAMPS + 2
+# Methods of the actor model replaced during parallel training
+_PATCHED_METHODS = ("train", "save", "save_replay_buffer")
+
+
+def _policy_tensors(policy: th.nn.Module) -> List[th.Tensor]:
     """
-    Callback to explore (collect experience) and train (do gradient steps)
-    at the same time using two separate threads.
-    Normally used with off-policy algorithms and `train_freq=(1, "episode")`.
-
-    TODO:
-    - blocking mode: wait for the model to finish updating the policy before collecting new experience
-    at the end of a rollout
-    - force sync mode: stop training to update to the latest policy for collecting
-    new experience
-
-    :param gradient_steps: Number of gradient steps to do before
-      sending the new policy
-    :param verbose: Verbosity level
-    :param sleep_time: Limit the fps in the thread collecting experience.
+    Floating point tensors (parameters and buffers) of a policy, in a deterministic order.
+    The tensors share their storage with the policy, so copying into them updates the policy in place.
     """
+    return [tensor for tensor in policy.state_dict().values() if tensor.is_floating_point()]
 
-    def __init__(self, gradient_steps: int = 100, verbose: int = 0, sleep_time: float = 0.0):
-        super().__init__(verbose)
-        self.batch_size = 0
-        self._model_ready = True
-        self._model: Union[SAC, TQC]
-        self.gradient_steps = gradient_steps
-        self.process: Thread
-        self.model_class: Union[Type[SAC], Type[TQC]]
-        self.sleep_time = sleep_time
 
-    def _init_callback(self) -> None:
-        temp_file = tempfile.TemporaryFile()
+class _ActorLearnerChannel:
+    """
+    Shared memory between the actor (the process collecting experience)
+    and the learner (the process doing the gradient steps).
+
+    - transitions are streamed through a single producer/single consumer ring of ``n_steps`` steps
+      (each step contains one transition per env), the actor only waits when the ring is full
+    - the parameters are published by the learner in a double-buffered slot:
+      it writes to the slot not pointed to by the current version and then bumps the version.
+      A slot stamp (seqlock) allows the actor to detect a slot overwritten while it was reading it.
+    - requests of the actor (sync, save) are counted by the actor and acknowledged
+      in a separate counter by the learner
+
+    No lock is used: each counter has a single writer.
+    """
 
-        # Windows TemporaryFile is not a io Buffer
-        # we save the model in the logs/ folder
-        if os.name == "nt":
-            temp_file = os.path.join("logs", "model_tmp.zip")  # type: ignore[arg-type,assignment]
+    def __init__(
+        self,
+        ctx: BaseContext,
+        n_steps: int,
+        n_envs: int,
+        observation_space: spaces.Space,
+        action_space: spaces.Space,
+        n_params: int,
+    ):
+        obs_shape = get_obs_shape(observation_space)
+        action_dim = get_action_dim(action_space)
+        self.n_steps = n_steps
+        self._specs: Dict[str, Tuple[Tuple[int, ...], np.dtype]] = {
+            "observations": ((n_steps, n_envs, *obs_shape), np.dtype(observation_space.dtype)),  # type: ignore[misc]
+            "next_observations": ((n_steps, n_envs, *obs_shape), np.dtype(observation_space.dtype)),  # type: ignore[misc]
+            "actions": ((n_steps, n_envs, action_dim), np.dtype(action_space.dtype)),
+            "rewards": ((n_steps, n_envs), np.dtype(np.float32)),
+            "dones": ((n_steps, n_envs), np.dtype(np.float32)),
+            "timeouts": ((n_steps, n_envs), np.dtype(np.float32)),
+            "params": ((2, n_params), np.dtype(np.float32)),
+            "counters": ((_N_COUNTERS,), np.dtype(np.int64)),
+            "progress_remaining": ((1,), np.dtype(np.float64)),
+        }
+        self._raw_arrays = {
+            name: ctx.RawArray("b", max(int(np.prod(shape)) * dtype.itemsize, 1))
+            for name, (shape, dtype) in self._specs.items()
+        }
+        self._arrays: Dict[str, np.ndarray] = {}
+        self.progress_remaining[0] = 1.0
+
+    def __getstate__(self) -> Dict[str, Any]:
+        state = self.__dict__.copy()
+        # The numpy views are re-created in the other process
+        state["_arrays"] = {}
+        return state
+
+    def _array(self, name: str) -> np.ndarray:
+        if name not in self._arrays:
+            shape, dtype = self._specs[name]
+            self._arrays[name] = np.frombuffer(self._raw_arrays[name], dtype=dtype, count=int(np.prod(shape))).reshape(shape)
+        return self._arrays[name]
+
+    @property
+    def counters(self) -> np.ndarray:
+        return self._array("counters")
+
+    @property
+    def progress_remaining(self) -> np.ndarray:
+        return self._array("progress_remaining")
+
+    def put(
+        self,
+        obs: np.ndarray,
+        next_obs: np.ndarray,
+        action: np.ndarray,
+        reward: np.ndarray,
+        done: np.ndarray,
+        timeouts: np.ndarray,
+        wait: Callable[[], None],
+    ) -> None:
+        """
+        Write one step of transitions (actor side).
+
+        :param wait: Function called while the ring is full
+        """
+        counters = self.counters
+        write_count = counters[_WRITE_COUNT]
+        while write_count - counters[_READ_COUNT] >= self.n_steps:
+            wait()
+        idx = write_count % self.n_steps
+        self._array("observations")[idx] = obs.reshape(self._specs["observations"][0][1:])
+        self._array("next_observations")[idx] = next_obs.reshape(self._specs["next_observations"][0][1:])
+        self._array("actions")[idx] = action.reshape(self._specs["actions"][0][1:])
+        self._array("rewards")[idx] = reward
+        self._array("dones")[idx] = done
+        self._array("timeouts")[idx] = timeouts
+        # Publish the step only once it is written
+        counters[_WRITE_COUNT] = write_count + 1
+
+    def ingest(self, replay_buffer: ReplayBuffer, on_step: Callable[[], None]) -> int:
+        """
+        Add the pending transitions to the replay buffer (learner side).
+
+        :param on_step: Function called after each step is added
+        :return: The number of steps added
+        """
+        counters = self.counters
+        read_count, write_count = counters[_READ_COUNT], counters[_WRITE_COUNT]
+        for step in range(read_count, write_count):
+            idx = step % self.n_steps
+            infos = [{"TimeLimit.truncated": bool(timeout)} for timeout in self._array("timeouts")[idx]]
+            replay_buffer.add(
+                self._array("observations")[idx],
+                self._array("next_observations")[idx],
+                self._array("actions")[idx],
+                self._array("rewards")[idx],
+                self._array("dones")[idx],
+                infos,
+            )
+            on_step()
+        # Free the slots for the actor
+        counters[_READ_COUNT] = write_count
+        return write_count - read_count
+
+    def publish(self, tensors: List[th.Tensor], ingested: int) -> None:
+        """
+        Publish new parameters (learner side).
+
+        :param tensors: Tensors of the policy (see ``_policy_tensors()``)
+        :param ingested: Number of steps used to train those parameters
+        """
+        counters = self.counters
+        version = counters[_VERSION] + 1
+        slot_idx = version % 2
+        slot = self._array("params")[slot_idx]
+        # Mark the slot as being written
+        counters[_SLOT_STAMPS + slot_idx] = -1
+        offset = 0
+        for tensor in tensors:
+            numel = tensor.numel()
+            slot[offset : offset + numel] = tensor.detach().reshape(-1).cpu().numpy()
+            offset += numel
+        counters[_SLOT_STAMPS + slot_idx] = version
+        counters[_VERSION] = version
+        counters[_INGESTED] = ingested
+
+    def pull(self, tensors: List[th.Tensor], current_version: int) -> int:
+        """
+        Copy the latest published parameters into the tensors, if any (actor side).
+
+        :param tensors: Tensors of the policy (see ``_policy_tensors()``)
+        :param current_version: Version of the parameters currently used
+        :return: The version of the parameters now used
+        """
+        counters = self.counters
+        while True:
+            version = int(counters[_VERSION])
+            if version == current_version:
+                return version
+            slot_idx = version % 2
+            slot = th.from_numpy(self._array("params")[slot_idx])
+            offset = 0
+            with th.no_grad():
+                for tensor in tensors:
+                    numel = tensor.numel()
+                    tensor.copy_(slot[offset : offset + numel].view_as(tensor))
+                    offset += numel
+            # The learner did not write to that slot in the meantime
+            if counters[_SLOT_STAMPS + slot_idx] == version:
+                return version
+
+
+class _SharedReplayBufferWriter(BaseBuffer):
+    """
+    Replaces the replay buffer of the actor: the transitions are streamed
+    to the learner process which owns the actual replay buffer.
 
-        # make mypy happy
-        assert isinstance(self.model, (SAC, TQC)), f"{self.model} is not supported for parallel training"
+    :param channel: Shared memory with the learner
+    :param wait: Function called while the learner is late
+    """
 
-        self.model.save(temp_file)  # type: ignore[arg-type]
+    def __init__(
+        self,
+        channel: _ActorLearnerChannel,
+        observation_space: spaces.Space,
+        action_space: spaces.Space,
+        n_envs: int,
+        wait: Callable[[], None],
+    ):
+        super().__init__(channel.n_steps, observation_space, action_space, device="cpu", n_envs=n_envs)
+        self.channel = channel
+        self.wait = wait
+
+    def add(  # type: ignore[override]
+        self,
+        obs: np.ndarray,
+        next_obs: np.ndarray,
+        action: np.ndarray,
+        reward: np.ndarray,
+        done: np.ndarray,
+        infos: List[Dict[str, Any]],
+    ) -> None:
+        timeouts = np.array([info.get("TimeLimit.truncated", False) for info in infos])
+        self.channel.put(obs, next_obs, action, reward, done, timeouts, self.wait)
+        self.pos = (self.pos + 1) % self.buffer_size
+        self.full = self.full or self.pos == 0
+
+    def __getstate__(self) -> Dict[str, Any]:
+        raise RuntimeError(
+            "The replay buffer is owned by the learner process of ParallelTrainCallback during training, "
+            "use model.save_replay_buffer() to save it"
+        )
 
-        # TODO: add support for other algorithms
-        for model_class in [SAC, TQC]:
-            if isinstance(self.model, model_class):
-                self.model_class = model_class  # type: ignore[assignment]
-                break
+    def _get_samples(self, batch_inds: np.ndarray, env: Optional[VecNormalize] = None) -> ReplayBufferSamples:
+        raise NotImplementedError("The transitions are sampled in the learner process")
 
-        assert self.model_class is not None, f"{self.model} is not supported for parallel training"
-        self._model = self.model_class.load(temp_file)  # type: ignore[arg-type]
 
-        self.batch_size = self._model.batch_size
+def _stop_learner(process: BaseProcess, tmp_dir: str) -> None:
+    """
+    Terminate the learner process if it is still running and remove its temporary files.
+    Also called when the callback is garbage collected or at exit, if the training was interrupted.
+    """
+    if process.is_alive():
+        process.terminate()
+        process.join()
+    shutil.rmtree(tmp_dir, ignore_errors=True)
+
+
+def _run_learner(
+    model_class: Type[OffPolicyAlgorithm],
+    model_path: str,
+    replay_buffer_path: Optional[str],
+    output_path: str,
+    device: Union[th.device, str],
+    channel: _ActorLearnerChannel,
+    log_queue: "mp.Queue[Dict[str, Any]]",
+    save_queue: "mp.Queue[Tuple[str, str]]",
+    gradient_steps: int,
+    train_chunk_size: int,
+) -> None:
+    """
+    Learner process of ``ParallelTrainCallback``: owns the replay buffer,
+    trains on the transitions sent by the actor and publishes the new parameters.
+    """
+    # The actor stops the learner, even when the training is interrupted with Ctrl+C
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    model = model_class.load(model_path, device=device)
+    assert model.replay_buffer is not None
+    if replay_buffer_path is not None:
+        model.load_replay_buffer(replay_buffer_path)
+    # The metrics are sent to the actor process
+    model.set_logger(Logger(folder=None, output_formats=[]))
+    tensors = _policy_tensors(model.policy)
+    counters = channel.counters
+    trained_until = counters[_READ_COUNT]
+
+    while True:
+        # Read the flag first: all the transitions written before it was set are ingested below
+        stop = counters[_STOP]
+        save_request = counters[_SAVE_REQUEST]
+        # ``_on_step()`` updates the target network of DQN
+        channel.ingest(model.replay_buffer, model._on_step)
+        ingested = counters[_READ_COUNT]
+        sync_request = counters[_SYNC_REQUEST]
+        if sync_request > counters[_SYNC_ACK]:
+            channel.publish(tensors, trained_until)
+            counters[_SYNC_ACK] = sync_request
+        # Interim saves of the actor (see ``ParallelTrainCallback._request_save()``)
+        while counters[_SAVE_ACK] < save_request:
+            kind, path = save_queue.get()
+            if kind == "model":
+                model.save(path)
+            else:
+                model.save_replay_buffer(path)
+            counters[_SAVE_ACK] += 1
+        if stop:
+            break
+
+        model.num_timesteps = int(counters[_NUM_TIMESTEPS])
+        # Only train when there are new transitions
+        if ingested == trained_until or model.num_timesteps < model.learning_starts:
+            time.sleep(1e-3)
+            continue
+
+        trained_until = ingested
+        model._current_progress_remaining = float(channel.progress_remaining[0])
+        n_steps = 0
+        # Stop early if the actor requests the latest parameters
+        while n_steps < gradient_steps and counters[_SYNC_REQUEST] == counters[_SYNC_ACK]:
+            chunk_size = min(train_chunk_size, gradient_steps - n_steps)
+            model.train(gradient_steps=chunk_size, batch_size=model.batch_size)
+            n_steps += chunk_size
+        # Pending sync requests are served by this publication
+        sync_request = counters[_SYNC_REQUEST]
+        channel.publish(tensors, trained_until)
+        counters[_SYNC_ACK] = sync_request
+        # The losses are accumulated on the device until then
+        model._record_train_metrics()
+        log_queue.put(dict(model.logger.name_to_value))
+        model.logger.dump()
+
+    # Send back the optimizers state and the replay buffer
+    model.save(os.path.join(output_path, "model.zip"))
+    model.save_replay_buffer(os.path.join(output_path, "replay_buffer.pkl"))
 
-        # Disable train method
-        def patch_train(function):
-            @wraps(function)
-            def wrapper(*args, **kwargs):
-                return
 
-            return wrapper
+class ParallelTrainCallback(BaseCallback):
+    """
+    Callback to explore (collect experience) and train (do gradient steps)
+    at the same time using two separate processes.
+    Normally used with off-policy algorithms (SAC, TQC, TD3, DDPG, DQN, ...) and `train_freq=(1, "episode")`.
 
-        # Add logger for parallel training
-        self._model.set_logger(self.model.logger)
-        self.model.train = patch_train(self.model.train)  # type: ignore[assignment]
+    The learner process owns the replay buffer: the transitions are streamed to it
+    through shared memory and the actor pulls the latest parameters of the policy
+    from a double-buffered shared memory slot at the end of each rollout (no copy of the model
+    or of the replay buffer is made during training).
+    At the end of training, the model (including the optimizers) and the replay buffer
+    of the learner are copied back to the actor.
+    During training, ``model.save()`` first retrieves the state of the learner
+    and ``model.save_replay_buffer()`` is done by the learner (e.g. for ``CheckpointCallback``).
 
-        # Hack: Re-add correct values at save time
-        def patch_save(function):
-            @wraps(function)
-            def wrapper(*args, **kwargs):
-                return self._model.save(*args, **kwargs)
+    .. note::
 
-            return wrapper
+        ``VecNormalize`` statistics are not used by the learner (the transitions are not normalized)
+        and Dict observation spaces (e.g. HER) are not supported.
 
-        self.model.save = patch_save(self.model.save)  # type: ignore[assignment]
+    :param gradient_steps: Number of gradient steps to do before
+      sending the new policy
+    :param verbose: Verbosity level
+    :param sleep_time: Limit the fps in the thread collecting experience.
+    :param blocking: Wait at the end of each rollout for the learner to train on all
+      the transitions collected so far before collecting new experience
+    :param force_sync: At the end of each rollout, ask the learner to stop the current
+      gradient steps and to send the latest policy, the learner checks it every ``sync_chunk_size`` gradient steps.
+    :param sync_chunk_size: Number of gradient steps done before checking a sync request (``force_sync=True``)
+    :param queue_size: Number of steps that can be sent to the learner before the actor waits for it
+    :param start_method: Method used to start the learner process, see ``SubprocVecEnv``.
+        Defaults to 'forkserver' on available platforms, and 'spawn' otherwise.
+    """
 
-    def train(self) -> None:
-        self._model_ready = False
+    def __init__(
+        self,
+        gradient_steps: int = 100,
+        verbose: int = 0,
+        sleep_time: float = 0.0,
+        blocking: bool = False,
+        force_sync: bool = False,
+        sync_chunk_size: int = 10,
+        queue_size: int = 10_000,
+        start_method: Optional[str] = None,
+    ):
+        super().__init__(verbose)
+        self.gradient_steps = gradient_steps
+        self.sleep_time = sleep_time
+        self.blocking = blocking
+        self.force_sync = force_sync
+        self.sync_chunk_size = sync_chunk_size
+        self.queue_size = queue_size
+        self.start_method = start_method
+        self.process: Optional[BaseProcess] = None
+        self._channel: _ActorLearnerChannel
+        self._log_queue: "mp.Queue[Dict[str, Any]]"
+        self._tensors: List[th.Tensor] = []
+        self._version = 0
+        self._tmp_dir = ""
+        self._save_queue: "mp.Queue[Tuple[str, str]]"
+        self._original_save: Optional[Callable[..., None]] = None
+        self._finalizer: Optional[weakref.finalize] = None
 
-        self.process = Thread(target=self._train_thread, daemon=True)
+    def _init_callback(self) -> None:
+        # make mypy happy
+        assert isinstance(self.model, OffPolicyAlgorithm), f"{self.model} is not supported for parallel training"
+        assert self.model.replay_buffer is not None
+        assert not isinstance(
+            self.model.observation_space, spaces.Dict
+        ), "Dict observation spaces are not supported for parallel training"
+
+        start_method = self.start_method
+        if start_method is None:
+            start_method = "forkserver" if "forkserver" in mp.get_all_start_methods() else "spawn"
+        ctx = mp.get_context(start_method)
+
+        self._tmp_dir = tempfile.mkdtemp(prefix="parallel_train_")
+        model_path = os.path.join(self._tmp_dir, "initial_model.zip")
+        self.model.save(model_path)
+        replay_buffer_path = None
+        # Continue training with a previous replay buffer
+        if self.model.replay_buffer.size() > 0:
+            replay_buffer_path = os.path.join(self._tmp_dir, "initial_replay_buffer.pkl")
+            self.model.save_replay_buffer(replay_buffer_path)
+
+        self._tensors = _policy_tensors(self.model.policy)
+        self._channel = _ActorLearnerChannel(
+            ctx,
+            self.queue_size,
+            self.model.n_envs,
+            self.model.observation_space,
+            self.model.action_space,
+            n_params=sum(tensor.numel() for tensor in self._tensors),
+        )
+        self._log_queue = ctx.Queue()
+        self._save_queue = ctx.Queue()
+        self.process = ctx.Process(
+            target=_run_learner,
+            args=(
+                type(self.model),
+                model_path,
+                replay_buffer_path,
+                self._tmp_dir,
+                self.model.device,
+                self._channel,
+                self._log_queue,
+                self._save_queue,
+                self.gradient_steps,
+                self.sync_chunk_size if self.force_sync else self.gradient_steps,
+            ),
+            daemon=True,
+        )
         self.process.start()
+        self._finalizer = weakref.finalize(self, _stop_learner, self.process, self._tmp_dir)
+
+        # The learner owns the replay buffer
+        self.model.replay_buffer = _SharedReplayBufferWriter(  # type: ignore[assignment]
+            self._channel,
+            self.model.observation_space,
+            self.model.action_space,
+            self.model.n_envs,
+            self._wait_for_learner,
+        )
 
-    def _train_thread(self) -> None:
-        self._model.train(gradient_steps=self.gradient_steps, batch_size=self.batch_size)
-        self._model_ready = True
+        # Disable train method
+        def train(*args, **kwargs) -> None:
+            return
+
+        self.model.train = train  # type: ignore[method-assign]
+        # Interim saves use the state of the learner
+        self._original_save = self.model.save
+        self.model.save = self._save  # type: ignore[method-assign]
+        self.model.save_replay_buffer = self._save_replay_buffer  # type: ignore[method-assign]
+
+    def _wait_for_learner(self) -> None:
+        assert self.process is not None
+        if not self.process.is_alive():
+            raise RuntimeError(f"The learner process exited unexpectedly (exit code: {self.process.exitcode})")
+        time.sleep(1e-4)
+
+    def _request_save(self, kind: str, path: str) -> None:
+        """
+        Ask the learner to save its model or its replay buffer and wait for it.
+
+        :param kind: "model" or "replay_buffer"
+        :param path: Where the learner saves it
+        """
+        counters = self._channel.counters
+        self._save_queue.put((kind, path))
+        counters[_SAVE_REQUEST] += 1
+        while counters[_SAVE_ACK] < counters[_SAVE_REQUEST]:
+            self._wait_for_learner()
+
+    def _load_learner_model(self, path: str) -> None:
+        """
+        Copy the parameters, the optimizers state and the number of updates of a model saved by the learner.
+        """
+        data, params, pytorch_variables = load_from_zip_file(path, device=self.model.device)
+        self.model.set_parameters(params, device=self.model.device)  # type: ignore[arg-type]
+        # e.g. the entropy coefficient of SAC
+        for name, variable in (pytorch_variables or {}).items():
+            if variable is not None:
+                recursive_setattr(self.model, f"{name}.data", variable.data)
+        if data is not None:
+            self.model._n_updates = data.get("_n_updates", self.model._n_updates)
+
+    def _save(self, path: Union[str, pathlib.Path, io.BufferedIOBase], exclude: Optional[List[str]] = None, **kwargs) -> None:
+        """
+        Replaces ``model.save()`` during training: the state of the learner is retrieved first.
+        """
+        model_path = os.path.join(self._tmp_dir, "learner_model.zip")
+        self._request_save("model", model_path)
+        self._load_learner_model(model_path)
+        assert self._original_save is not None
+        self._original_save(path, exclude=[*(exclude or []), *_PATCHED_METHODS], **kwargs)
+
+    def _save_replay_buffer(self, path: Union[str, pathlib.Path, io.BufferedIOBase]) -> None:
+        """
+        Replaces ``model.save_replay_buffer()`` during training: the replay buffer is saved by the learner.
+        """
+        if isinstance(path, (str, pathlib.Path)):
+            self._request_save("replay_buffer", str(path))
+            return
+        # File objects cannot be sent to the learner process
+        tmp_path = os.path.join(self._tmp_dir, "learner_replay_buffer.pkl")
+        self._request_save("replay_buffer", tmp_path)
+        with open(tmp_path, "rb") as file_handler:
+            shutil.copyfileobj(file_handler, path)
 
     def _on_step(self) -> bool:
+        counters = self._channel.counters
+        counters[_NUM_TIMESTEPS] = self.num_timesteps
+        self._channel.progress_remaining[0] = self.model._current_progress_remaining
         if self.sleep_time > 0:
             time.sleep(self.sleep_time)
         return True
 
     def _on_rollout_end(self) -> None:
-        # Make mypy happy
-        assert isinstance(self.model, (SAC, TQC))
-
-        if self._model_ready:
-            self._model.replay_buffer = deepcopy(self.model.replay_buffer)
-            self.model.set_parameters(deepcopy(self._model.get_parameters()))  # type: ignore[arg-type]
-            self.model.actor = self.model.policy.actor  # type: ignore[union-attr, attr-defined, assignment]
-            if self.num_timesteps >= self._model.learning_starts:
-                self.train()
-            # Do not wait for the training loop to finish
-            # self.process.join()
+        counters = self._channel.counters
+        if self.force_sync and counters[_VERSION] > 0:
+            counters[_SYNC_REQUEST] += 1
+            while counters[_SYNC_ACK] < counters[_SYNC_REQUEST]:
+                self._wait_for_learner()
+
+        if self.blocking and self.num_timesteps >= self.model.learning_starts:  # type: ignore[attr-defined]
+            # Wait for the learner to train on all the transitions collected so far
+            while counters[_INGESTED] < counters[_WRITE_COUNT]:
+                self._wait_for_learner()
+
+        self._version = self._channel.pull(self._tensors, self._version)
+        self._record_learner_logs()
+
+    def _record_learner_logs(self) -> None:
+        while True:
+            try:
+                learner_logs = self._log_queue.get_nowait()
+            except queue.Empty:
+                break
+            for key, value in learner_logs.items():
+                self.logger.record(key, value)
+        counters = self._channel.counters
+        self.logger.record("parallel/learner_version", self._version)
+        self.logger.record("parallel/pending_steps", int(counters[_WRITE_COUNT] - counters[_READ_COUNT]))
 
     def _on_training_end(self) -> None:
-        # Wait for the thread to terminate
-        if self.process is not None:
-            if self.verbose > 0:
-                print("Waiting for training thread to terminate")
+        if self.process is None:
+            return
+        if self.verbose > 0:
+            print("Waiting for the learner process to terminate")
+        try:
+            self._channel.counters[_STOP] = 1
             self.process.join()
+            if self.process.exitcode != 0:
+                raise RuntimeError(f"The learner process exited unexpectedly (exit code: {self.process.exitcode})")
+            # Retrieve the latest parameters, the optimizers state and the replay buffer
+            self._load_learner_model(os.path.join(self._tmp_dir, "model.zip"))
+            self.model.load_replay_buffer(os.path.join(self._tmp_dir, "replay_buffer.pkl"))  # type: ignore[attr-defined]
+        finally:
+            self.process = None
+            for name in _PATCHED_METHODS:
+                delattr(self.model, name)
+            assert self._finalizer is not None
+            self._finalizer()
 
 
 class RawStatisticsCallback(BaseCallback):
     """
     Callback used for logging raw episode data (return and episode length).
+
+    The episodes can also be written to a compact binary log (see ``EpisodeLogWriter``)
+    that records, for each episode, the timestep, return, length, wall time, env index
+    and which policy generated it (0: ``policy``, 1: ``ent_policy`` when using the dual-policy PPO,
+    -1 when the model has a single policy). Use ``stable_baselines3.common.monitor.load_episode_log()`` to read it.
+
+    :param log_path: Path to the binary episode log (``.monitor.bin`` is appended if needed),
+        if None (default) only tensorboard is used.
+    :param verbose: Verbosity level
     """
 
-    def __init__(self, verbose=0):
+    def __init__(self, log_path: Optional[str] = None, verbose: int = 0):
         super().__init__(verbose)
         # Custom counter to reports stats
         # (and avoid reporting multiple values for the same step)
         self._timesteps_counter = 0
         self._tensorboard_writer = None
+        self.log_path = log_path
+        self._episode_writer: Optional[EpisodeLogWriter] = None
+        self._t_start = 0.0
 
     def _init_callback(self) -> None:
         assert self.logger is not None
@@ -222,11 +711,42 @@ class RawStatisticsCallback(BaseCallback):
         for out_format in self.logger.output_formats:
             if isinstance(out_format, TensorBoardOutputFormat):
                 self._tensorboard_writer = out_format
-        assert self._tensorboard_writer is not None, "You must activate tensorboard logging when using RawStatisticsCallback"
+
+        if self.log_path is not None:
+            self._t_start = time.time()
+            self._episode_writer = EpisodeLogWriter(self.log_path, header={"t_start": self._t_start})
+        else:
+            assert (
+                self._tensorboard_writer is not None
+            ), "You must activate tensorboard logging when using RawStatisticsCallback"
+
+    def _followed_policy(self, env_idx: int) -> int:
+        """
+        :param env_idx: Index of the environment
+        :return: 1 if ``ent_policy`` was followed at the last step of the episode, 0 if ``policy`` was,
+            -1 if the model has no ``ent_policy``
+        """
+        follow_ent_policy = getattr(self.model, "follow_ent_policy", None)
+        if follow_ent_policy is None:
+            return -1
+        return int(follow_ent_policy[env_idx, 0])
 
     def _on_step(self) -> bool:
-        for info in self.locals["infos"]:
+        for env_idx, info in enumerate(self.locals["infos"]):
             if "episode" in info:
+                if self._episode_writer is not None:
+                    self._episode_writer.write_row(
+                        {
+                            "timestep": self.num_timesteps,
+                            "r": info["episode"]["r"],
+                            "l": info["episode"]["l"],
+                            "t": time.time() - self._t_start,
+                            "env_idx": env_idx,
+                            "policy": self._followed_policy(env_idx),
+                        }
+                    )
+                if self._tensorboard_writer is None:
+                    continue
                 logger_dict = {
                     "raw/rollouts/episodic_return": info["episode"]["r"],
                     "raw/rollouts/episodic_length": info["episode"]["l"],
@@ -236,3 +756,7 @@ class RawStatisticsCallback(BaseCallback):
                 self._tensorboard_writer.write(logger_dict, exclude_dict, self._timesteps_counter)
 
         return True
+
+    def _on_training_end(self) -> None:
+        if self._episode_writer is not None:
+            self._episode_writer.close()
@@ -1,25 +1,24 @@
+import importlib
 import sys
 
-from rl_zoo3.enjoy import enjoy
-from rl_zoo3.plots import all_plots, plot_from_file, plot_train
-from rl_zoo3.train import train
-
 
 def main():
     script_name = sys.argv[1]
     # Remove script name
     del sys.argv[1]
-    # Execute known script
+    # Execute known script, only the module of the selected script is imported
     known_scripts = {
-        "train": train,
-        "enjoy": enjoy,
-        "plot_train": plot_train,
-        "plot_from_file": plot_from_file,
-        "all_plots": all_plots,
+        "train": "rl_zoo3.train:train",
+        "enjoy": "rl_zoo3.enjoy:enjoy",
+        "serve": "rl_zoo3.serve:serve",
+        "plot_train": "rl_zoo3.plots.plot_train:plot_train",
+        "plot_from_file": "rl_zoo3.plots.plot_from_file:plot_from_file",
+        "all_plots": "rl_zoo3.plots.all_plots:all_plots",
     }
     if script_name not in known_scripts.keys():
         raise ValueError(f"The script {script_name} is unknown, please use one of {known_scripts.keys()}")
-    known_scripts[script_name]()
+    module_name, function_name = known_scripts[script_name].split(":")
+    getattr(importlib.import_module(module_name), function_name)()
 
 
 if __name__ == "__main__":
@@ -1,7 +1,9 @@
 import argparse
 import importlib
+import itertools
 import os
 import sys
+from typing import Iterable
 
 import numpy as np
 import torch as th
@@ -10,11 +12,12 @@ from huggingface_sb3 import EnvironmentName
 from stable_baselines3.common.callbacks import tqdm
 from stable_baselines3.common.utils import set_random_seed
 
-import rl_zoo3.import_envs  # noqa: F401 pylint: disable=unused-import
 from rl_zoo3 import ALGOS, create_test_env, get_saved_hyperparams
+from rl_zoo3.batch_eval import EpisodeStats
 from rl_zoo3.exp_manager import ExperimentManager
+from rl_zoo3.import_envs import import_env_packages
 from rl_zoo3.load_from_hub import download_from_hub
-from rl_zoo3.utils import StoreDict, get_model_path
+from rl_zoo3.utils import StoreDict, get_eval_load_kwargs, get_model_path
 
 
 def enjoy() -> None:  # noqa: C901
@@ -24,7 +27,18 @@ def enjoy() -> None:  # noqa: C901
     parser.add_argument("--algo", help="RL Algorithm", default="ppo", type=str, required=False, choices=list(ALGOS.keys()))
     parser.add_argument("-n", "--n-timesteps", help="number of timesteps", default=1000, type=int)
     parser.add_argument("--num-threads", help="Number of threads for PyTorch (-1 to use default)", default=-1, type=int)
-    parser.add_argument("--n-envs", help="number of environments", default=1, type=int)
+    parser.add_argument("--n-envs", help="number of environments (subprocesses when greater than 1)", default=1, type=int)
+    parser.add_argument(
+        "--n-eval-episodes",
+        help="Run until this number of episodes is completed (divided among the envs) instead of n-timesteps",
+        default=0,
+        type=int,
+    )
+    parser.add_argument(
+        "--results-file",
+        help="Write the statistics and the episodes to a JSON file (or a numpy archive with a .npz extension)",
+        type=str,
+    )
     parser.add_argument("--exp-id", help="Experiment ID (default: 0: latest, -1: no exp folder)", default=0, type=int)
     parser.add_argument("--verbose", help="Verbose mode (0: no output, 1: INFO)", default=1, type=int)
     parser.add_argument(
@@ -80,6 +94,8 @@ def enjoy() -> None:  # noqa: C901
         importlib.import_module(env_module)
 
     env_name: EnvironmentName = args.env
+    # Import optional env packages only if needed
+    import_env_packages(env_name.gym_id)
     algo = args.algo
     folder = args.folder
 
@@ -123,7 +139,6 @@ def enjoy() -> None:  # noqa: C901
 
     print(f"Loading {model_path}")
 
-    # Off-policy algorithm only support one env for now
     off_policy_algos = ["qrdqn", "dqn", "ddpg", "sac", "her", "td3", "tqc"]
 
     set_random_seed(args.seed)
@@ -166,13 +181,7 @@ def enjoy() -> None:  # noqa: C901
 
     kwargs = dict(seed=args.seed)
     if algo in off_policy_algos:
-        # Dummy buffer size as we don't need memory to enjoy the trained agent
-        kwargs.update(dict(buffer_size=1))
-        # Hack due to breaking change in v1.6
-        # handle_timeout_termination cannot be at the same time
-        # with optimize_memory_usage
-        if "optimize_memory_usage" in hyperparams:
-            kwargs.update(optimize_memory_usage=False)
+        kwargs.update(get_eval_load_kwargs(hyperparams))
 
     # Check if we are running python 3.8+
     # we need to patch saved model under python 3.6/3.7 to load them
@@ -189,22 +198,23 @@ def enjoy() -> None:  # noqa: C901
     if "HerReplayBuffer" in hyperparams.get("replay_buffer_class", ""):
         kwargs["env"] = env
 
-    model = ALGOS[algo].load(model_path, custom_objects=custom_objects, device=args.device, **kwargs)
+    # The optimizers are not needed to enjoy the trained agent
+    model = ALGOS[algo].load(model_path, custom_objects=custom_objects, device=args.device, load_optimizers=False, **kwargs)
     obs = env.reset()
 
     # Deterministic by default except for atari games
     stochastic = args.stochastic or (is_atari or is_minigrid) and not args.deterministic
     deterministic = not stochastic
 
-    episode_reward = 0.0
-    episode_rewards, episode_lengths = [], []
-    ep_len = 0
-    # For HER, monitor success rate
-    successes = []
+    # Per-env episode bookkeeping, for Atari the reward is not the atari score
+    # so we have to get it from the infos dict (Monitor)
+    n_eval_episodes = args.n_eval_episodes if args.n_eval_episodes > 0 else None
+    stats = EpisodeStats(env.num_envs, n_eval_episodes=n_eval_episodes, use_monitor_info=is_atari)
     lstm_states = None
     episode_start = np.ones((env.num_envs,), dtype=bool)
 
-    generator = range(args.n_timesteps)
+    # Run until the requested number of episodes is recorded, otherwise for n_timesteps
+    generator: Iterable[int] = range(args.n_timesteps) if n_eval_episodes is None else itertools.count()
     if args.progress:
         if tqdm is None:
             raise ImportError("Please install tqdm and rich to use the progress bar")
@@ -225,49 +235,43 @@ def enjoy() -> None:  # noqa: C901
             if not args.no_render:
                 env.render("human")
 
-            episode_reward += reward[0]
-            ep_len += 1
-
-            if args.n_envs == 1:
-                # For atari the return reward is not the atari score
-                # so we have to get it from the infos dict
-                if is_atari and infos is not None and args.verbose >= 1:
-                    episode_infos = infos[0].get("episode")
-                    if episode_infos is not None:
-                        print(f"Atari Episode Score: {episode_infos['r']:.2f}")
-                        print("Atari Episode Length", episode_infos["l"])
-
-                if done and not is_atari and args.verbose > 0:
+            for episode_idx in stats.update(reward, done, infos):
+                if args.verbose > 0:
+                    prefix = f"[env {stats.episode_envs[episode_idx]}] " if env.num_envs > 1 else ""
                     # NOTE: for env using VecNormalize, the mean reward
                     # is a normalized reward when `--norm_reward` flag is passed
-                    print(f"Episode Reward: {episode_reward:.2f}")
-                    print("Episode Length", ep_len)
-                    episode_rewards.append(episode_reward)
-                    episode_lengths.append(ep_len)
-                    episode_reward = 0.0
-                    ep_len = 0
-
-                # Reset also when the goal is achieved when using HER
-                if done and infos[0].get("is_success") is not None:
-                    if args.verbose > 1:
-                        print("Success?", infos[0].get("is_success", False))
-
-                    if infos[0].get("is_success") is not None:
-                        successes.append(infos[0].get("is_success", False))
-                        episode_reward, ep_len = 0.0, 0
+                    label = "Atari Episode Score" if is_atari else "Episode Reward"
+                    print(f"{prefix}{label}: {stats.episode_rewards[episode_idx]:.2f}")
+                    print(f"{prefix}Episode Length", stats.episode_lengths[episode_idx])
+                if args.verbose > 1 and not np.isnan(stats.episode_successes[episode_idx]):
+                    print("Success?", bool(stats.episode_successes[episode_idx]))
+
+            if stats.done:
+                break
 
     except KeyboardInterrupt:
         pass
 
-    if args.verbose > 0 and len(successes) > 0:
-        print(f"Success rate: {100 * np.mean(successes):.2f}%")
-
-    if args.verbose > 0 and len(episode_rewards) > 0:
-        print(f"{len(episode_rewards)} Episodes")
-        print(f"Mean reward: {np.mean(episode_rewards):.2f} +/- {np.std(episode_rewards):.2f}")
-
-    if args.verbose > 0 and len(episode_lengths) > 0:
-        print(f"Mean episode length: {np.mean(episode_lengths):.2f} +/- {np.std(episode_lengths):.2f}")
+    summary = stats.summary()
+    if args.verbose > 0 and summary["success_rate"] is not None:
+        print(f"Success rate: {100 * summary['success_rate']:.2f}%")
+
+    if args.verbose > 0 and summary["n_episodes"] > 0:
+        print(f"{summary['n_episodes']} Episodes")
+        print(f"Mean reward: {summary['mean_reward']:.2f} +/- {summary['std_reward']:.2f}")
+        print(f"Mean episode length: {summary['mean_length']:.2f} +/- {summary['std_length']:.2f}")
+
+    if args.results_file is not None:
+        stats.save(
+            args.results_file,
+            algo=algo,
+            env_id=env_name.gym_id,
+            model_path=model_path,
+            n_envs=env.num_envs,
+            deterministic=deterministic,
+            seed=args.seed,
+        )
+        print(f"Results written to {args.results_file}")
 
     env.close()
 
@@ -1,7 +1,10 @@
 import argparse
+import copy
 import importlib
+import inspect
 import os
 import pickle as pkl
+import shutil
 import time
 import warnings
 from collections import OrderedDict
@@ -26,6 +29,9 @@ from sb3_contrib.common.vec_env import AsyncEval
 # For using HER with GoalEnv
 from stable_baselines3 import HerReplayBuffer
 from stable_baselines3.common.base_class import BaseAlgorithm
+
+# For using `replay_buffer_class: DeviceReplayBuffer`, `MemmapReplayBuffer` or `FrameStackReplayBuffer`
+from stable_baselines3.common.buffers import DeviceReplayBuffer, FrameStackReplayBuffer, MemmapReplayBuffer  # noqa: F401
 from stable_baselines3.common.callbacks import BaseCallback, CheckpointCallback, EvalCallback, ProgressBarCallback
 from stable_baselines3.common.env_util import make_vec_env
 from stable_baselines3.common.noise import NormalActionNoise, OrnsteinUhlenbeckActionNoise
@@ -45,11 +51,22 @@ from stable_baselines3.common.vec_env import (
 # For custom activation fn
 from torch import nn as nn
 
-# Register custom envs
-import rl_zoo3.import_envs  # noqa: F401
-from rl_zoo3.callbacks import SaveVecNormalizeCallback, TrialEvalCallback
+from rl_zoo3.callbacks import ParallelTrainCallback, SaveVecNormalizeCallback, TrialEvalCallback
 from rl_zoo3.hyperparams_opt import HYPERPARAMS_SAMPLER
-from rl_zoo3.utils import ALGOS, get_callback_list, get_class_by_name, get_latest_run_id, get_wrapper_class, linear_schedule
+
+# Register custom envs
+from rl_zoo3.import_envs import import_env_packages
+from rl_zoo3.utils import (
+    ALGOS,
+    get_callback_list,
+    get_class_by_name,
+    get_hyperparams_cache_path,
+    get_latest_run_id,
+    get_wrapper_class,
+    linear_schedule,
+    load_cached_hyperparams,
+    save_cached_hyperparams,
+)
 
 
 class ExperimentManager:
@@ -98,9 +115,15 @@ class ExperimentManager:
         device: Union[th.device, str] = "auto",
         config: Optional[str] = None,
         show_progress: bool = False,
+        config_cache_dir: Optional[str] = None,
+        checkpoint_store: bool = False,
+        keep_last_checkpoints: Optional[int] = None,
+        keep_every_checkpoint: Optional[int] = None,
     ):
         super().__init__()
         self.algo = algo
+        # Optional env packages are only imported when the env is not already registered
+        import_env_packages(env_id)
         self.env_name = EnvironmentName(env_id)
         # Custom params
         self.custom_hyperparams = hyperparams
@@ -112,6 +135,8 @@ class ExperimentManager:
             default_path = Path(__file__).parent.parent
 
         self.config = config or str(default_path / f"hyperparams/{self.algo}.yml")
+        # Where to cache the parsed and validated hyperparameters (None to deactivate)
+        self.config_cache_dir = config_cache_dir
         self.env_kwargs: Dict[str, Any] = env_kwargs or {}
         self.n_timesteps = n_timesteps
         self.normalize = False
@@ -133,6 +158,10 @@ class ExperimentManager:
         # Use env-kwargs if eval_env_kwargs was not specified
         self.eval_env_kwargs: Dict[str, Any] = eval_env_kwargs or self.env_kwargs
         self.save_freq = save_freq
+        # Incremental checkpoints and retention policy
+        self.checkpoint_store = checkpoint_store
+        self.keep_last_checkpoints = keep_last_checkpoints
+        self.keep_every_checkpoint = keep_every_checkpoint
         self.eval_freq = eval_freq
         self.n_eval_episodes = n_eval_episodes
         self.n_eval_envs = n_eval_envs
@@ -245,6 +274,10 @@ class ExperimentManager:
             # Clean progress bar
             if len(self.callbacks) > 0:
                 self.callbacks[0].on_training_end()
+            # Stop the learner process and retrieve its state, even when the training was interrupted
+            for callback in self.callbacks:
+                if isinstance(callback, ParallelTrainCallback):
+                    callback.on_training_end()
             # Release resources
             try:
                 assert model.env is not None
@@ -265,6 +298,9 @@ class ExperimentManager:
         if hasattr(model, "save_replay_buffer") and self.save_replay_buffer:
             print("Saving replay buffer")
             model.save_replay_buffer(os.path.join(self.save_path, "replay_buffer.pkl"))
+        elif isinstance(getattr(model, "replay_buffer", None), MemmapReplayBuffer):
+            # Cheap checkpoint: the data is already on disk
+            model.replay_buffer.flush()
 
         if self.normalize:
             # Important: save the running average, for testing the agent we need that normalization
@@ -293,6 +329,37 @@ class ExperimentManager:
     def read_hyperparameters(self) -> Tuple[Dict[str, Any], Dict[str, Any]]:
         print(f"Loading hyperparameters from: {self.config}")
 
+        cache_path = None
+        hyperparams = None
+        if self.config_cache_dir is not None and (self.config.endswith(".yml") or self.config.endswith(".yaml")):
+            cache_path = get_hyperparams_cache_path(
+                self.config_cache_dir, self.config, self.algo, self.env_name.gym_id, self.custom_hyperparams
+            )
+            hyperparams = load_cached_hyperparams(cache_path)
+
+        if hyperparams is None:
+            hyperparams = self._load_hyperparameters()
+            if cache_path is not None:
+                # Only valid hyperparameters are cached
+                self.check_hyperparameters(hyperparams)
+                save_cached_hyperparams(cache_path, hyperparams)
+
+        # Sort hyperparams that will be saved
+        saved_hyperparams = OrderedDict([(key, hyperparams[key]) for key in sorted(hyperparams.keys())])
+
+        # Always print used hyperparameters
+        print("Default hyperparameters for environment (ones being tuned will be overridden):")
+        pprint(saved_hyperparams)
+
+        return hyperparams, saved_hyperparams
+
+    def _load_hyperparameters(self) -> Dict[str, Any]:
+        """
+        Parse the config file and return the hyperparameters for the current environment,
+        including the ones passed via the command line.
+
+        :return: the unprocessed hyperparameters
+        """
         if self.config.endswith(".yml") or self.config.endswith(".yaml"):
             # Load hyperparameters from yaml file
             with open(self.config) as f:
@@ -317,14 +384,38 @@ class ExperimentManager:
         if self.custom_hyperparams is not None:
             # Overwrite hyperparams if needed
             hyperparams.update(self.custom_hyperparams)
-        # Sort hyperparams that will be saved
-        saved_hyperparams = OrderedDict([(key, hyperparams[key]) for key in sorted(hyperparams.keys())])
+        return hyperparams
 
-        # Always print used hyperparameters
-        print("Default hyperparameters for environment (ones being tuned will be overridden):")
-        pprint(saved_hyperparams)
+    def check_hyperparameters(self, hyperparams: Dict[str, Any]) -> None:
+        """
+        Check that the hyperparameters can be pre-processed
+        (schedules, wrappers, callbacks, python strings)
+        and that they are accepted by the algorithm,
+        without creating the environment or the model.
 
-        return hyperparams, saved_hyperparams
+        :param hyperparams: the unprocessed hyperparameters
+        """
+        # Pre-processing modifies the experiment manager, work on a copy
+        exp_manager = copy.copy(self)
+        exp_manager.verbose = 0
+        exp_manager.normalize_kwargs = {}
+        try:
+            processed_hyperparams, _, _, _ = exp_manager._preprocess_hyperparams(copy.deepcopy(hyperparams))
+        except Exception as e:
+            raise ValueError(f"Invalid hyperparameters for {self.algo}-{self.env_name.gym_id}: {e}") from e
+
+        noise_type = processed_hyperparams.pop("noise_type", None)
+        processed_hyperparams.pop("noise_std", None)
+        if noise_type is not None and not any(name in noise_type for name in ["normal", "ornstein-uhlenbeck"]):
+            raise ValueError(f'Unknown noise type "{noise_type}"')
+
+        signature = inspect.signature(ALGOS[self.algo].__init__)
+        # The algorithm may forward extra keyword arguments
+        if any(param.kind == inspect.Parameter.VAR_KEYWORD for param in signature.parameters.values()):
+            return
+        unknown_keys = set(processed_hyperparams.keys()) - set(signature.parameters.keys())
+        if len(unknown_keys) > 0:
+            raise ValueError(f"Unknown hyperparameters for {self.algo}: {sorted(unknown_keys)}")
 
     @staticmethod
     def _preprocess_schedules(hyperparams: Dict[str, Any]) -> Dict[str, Any]:
@@ -408,6 +499,19 @@ class ExperimentManager:
             if kwargs_key in hyperparams.keys() and isinstance(hyperparams[kwargs_key], str):
                 hyperparams[kwargs_key] = eval(hyperparams[kwargs_key])
 
+        # Store the memory-mapped replay buffer with the other files of the run by default,
+        # when continuing training, start from a copy of the one of the pretrained agent
+        # (the pretrained agent is left unchanged)
+        if hyperparams.get("replay_buffer_class") == MemmapReplayBuffer:
+            replay_buffer_kwargs = hyperparams.get("replay_buffer_kwargs") or {}
+            if "storage_dir" not in replay_buffer_kwargs:
+                replay_buffer_kwargs["storage_dir"] = os.path.join(self.save_path, "replay_buffer")
+                pretrained_storage_dir = os.path.join(os.path.dirname(self.trained_agent), "replay_buffer")
+                if self.continue_training and os.path.isdir(pretrained_storage_dir):
+                    print(f"Copying replay buffer from {pretrained_storage_dir}")
+                    shutil.copytree(pretrained_storage_dir, replay_buffer_kwargs["storage_dir"], dirs_exist_ok=True)
+            hyperparams["replay_buffer_kwargs"] = replay_buffer_kwargs
+
         # Preprocess monitor kwargs
         if "monitor_kwargs" in hyperparams.keys():
             self.monitor_kwargs = hyperparams["monitor_kwargs"]
@@ -425,6 +529,12 @@ class ExperimentManager:
             self.frame_stack = hyperparams["frame_stack"]
             del hyperparams["frame_stack"]
 
+        # Frames are de-duplicated using the same number of stacked frames as VecFrameStack
+        if hyperparams.get("replay_buffer_class") == FrameStackReplayBuffer and self.frame_stack is not None:
+            replay_buffer_kwargs = hyperparams.get("replay_buffer_kwargs") or {}
+            replay_buffer_kwargs.setdefault("n_stack", self.frame_stack)
+            hyperparams["replay_buffer_kwargs"] = replay_buffer_kwargs
+
         # import the policy when using a custom policy
         if "policy" in hyperparams and "." in hyperparams["policy"]:
             hyperparams["policy"] = get_class_by_name(hyperparams["policy"])
@@ -497,6 +607,9 @@ class ExperimentManager:
                     save_freq=self.save_freq,
                     save_path=self.save_path,
                     name_prefix="rl_model",
+                    incremental=self.checkpoint_store,
+                    keep_last=self.keep_last_checkpoints,
+                    keep_every=self.keep_every_checkpoint,
                     verbose=1,
                 )
             )
@@ -695,6 +808,9 @@ class ExperimentManager:
                 model, "load_replay_buffer"
             ), "The current model doesn't have a `load_replay_buffer` to load the replay buffer"
             model.load_replay_buffer(replay_buffer_path, truncate_last_traj=self.truncate_last_trajectory)
+        elif isinstance(getattr(model, "replay_buffer", None), MemmapReplayBuffer) and model.replay_buffer.restore():
+            # The data is already on disk, only the metadata is needed
+            print(f"Resuming replay buffer from {model.replay_buffer.storage_dir}")
         return model
 
     def _create_sampler(self, sampler_method: str) -> BaseSampler:
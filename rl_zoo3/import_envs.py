@@ -1,3 +1,4 @@
+import importlib
 from typing import Callable, Optional
 
 import gymnasium as gym
@@ -5,45 +6,46 @@ from gymnasium.envs.registration import register
 
 from rl_zoo3.wrappers import MaskVelocityWrapper
 
-try:
-    import pybullet_envs_gymnasium
-except ImportError:
-    pass
-
-try:
-    import highway_env
-except ImportError:
-    pass
-else:
-    # hotfix for highway_env
-    import numpy as np
-
-    np.float = np.float32  # type: ignore[attr-defined]
-
-try:
-    import custom_envs
-except ImportError:
-    pass
-
-try:
-    import gym_donkeycar
-except ImportError:
-    pass
-
-try:
-    import panda_gym
-except ImportError:
-    pass
-
-try:
-    import rocket_lander_gym
-except ImportError:
-    pass
-
-try:
-    import minigrid
-except ImportError:
-    pass
+# Optional packages that register additional environments,
+# they are only imported when needed (see `import_env_packages()`)
+ENV_PACKAGES = (
+    "pybullet_envs_gymnasium",
+    "highway_env",
+    "custom_envs",
+    "gym_donkeycar",
+    "panda_gym",
+    "rocket_lander_gym",
+    "minigrid",
+)
+
+_imported_env_packages = False
+
+
+def import_env_packages(env_id: Optional[str] = None) -> None:
+    """
+    Import the optional packages that register additional environments (when installed).
+    Importing them is slow, so nothing is done when ``env_id`` is already registered.
+
+    :param env_id: Environment that should be registered,
+        if None, all optional packages are imported.
+    """
+    global _imported_env_packages
+    if _imported_env_packages or (env_id is not None and env_id in gym.envs.registry):
+        return
+
+    for package_name in ENV_PACKAGES:
+        try:
+            importlib.import_module(package_name)
+        except ImportError:
+            continue
+
+        if package_name == "highway_env":
+            # hotfix for highway_env
+            import numpy as np
+
+            np.float = np.float32  # type: ignore[attr-defined]
+
+    _imported_env_packages = True
 
 
 # Register no vel envs
@@ -7,7 +7,7 @@ import os
 import numpy as np
 import seaborn
 from matplotlib import pyplot as plt
-from stable_baselines3.common.monitor import LoadMonitorResultsError, load_results
+from stable_baselines3.common.monitor import LoadMonitorResultsError, load_binary_results, load_results_streaming
 from stable_baselines3.common.results_plotter import X_EPISODES, X_TIMESTEPS, X_WALLTIME, ts2xy, window_func
 
 # Activate seaborn
@@ -25,6 +25,9 @@ def plot_train():
     parser.add_argument("-x", "--x-axis", help="X-axis", choices=["steps", "episodes", "time"], type=str, default="steps")
     parser.add_argument("-y", "--y-axis", help="Y-axis", choices=["success", "reward", "length"], type=str, default="reward")
     parser.add_argument("-w", "--episode-window", help="Rolling window size", type=int, default=100)
+    parser.add_argument(
+        "--no-cache", action="store_true", default=False, help="Do not read/write the binary cache of the monitor files"
+    )
 
     args = parser.parse_args()
 
@@ -67,11 +70,18 @@ def plot_train():
     plt.ylabel(y_label, fontsize=args.fontsize)
     for folder in dirs:
         try:
-            data_frame = load_results(folder)
+            # Only read the columns needed for the plot
+            data_frame = load_results_streaming(
+                folder, columns=(y_axis, "l"), max_timesteps=args.max_timesteps, use_cache=not args.no_cache
+            )
         except LoadMonitorResultsError:
-            continue
-        if args.max_timesteps is not None:
-            data_frame = data_frame[data_frame.l.cumsum() <= args.max_timesteps]
+            # Fallback to binary monitor files
+            try:
+                data_frame = load_binary_results(folder)
+            except LoadMonitorResultsError:
+                continue
+            if args.max_timesteps is not None:
+                data_frame = data_frame[data_frame.l.cumsum() <= args.max_timesteps]
         try:
             y = np.array(data_frame[y_axis])
         except KeyError:
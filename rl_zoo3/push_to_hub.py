@@ -13,16 +13,17 @@ import yaml
 from huggingface_hub import HfApi, Repository
 from huggingface_hub.repocard import metadata_save
 from huggingface_sb3 import EnvironmentName, ModelName, ModelRepoId
-from huggingface_sb3.push_to_hub import _evaluate_agent, _generate_replay, generate_metadata
+from huggingface_sb3.push_to_hub import _evaluate_agent, generate_metadata
 from stable_baselines3.common.base_class import BaseAlgorithm
 from stable_baselines3.common.utils import set_random_seed
 from stable_baselines3.common.vec_env import VecEnv, unwrap_vec_normalize
 from wasabi import Printer
 
-import rl_zoo3.import_envs  # noqa: F401 pylint: disable=unused-import
 from rl_zoo3 import ALGOS, get_saved_hyperparams
 from rl_zoo3.exp_manager import ExperimentManager
-from rl_zoo3.utils import StoreDict, create_test_env, get_model_path
+from rl_zoo3.import_envs import import_env_packages
+from rl_zoo3.utils import StoreDict, create_test_env, get_eval_load_kwargs, get_model_path
+from rl_zoo3.video_writer import StreamingVideoWriter, get_render_fps, record_vec_env
 
 msg = Printer()
 
@@ -244,15 +245,9 @@ def package_to_hub(
 
     # Step 4: Generate a video
     if generate_video:
-        _generate_replay(model, eval_env, video_length, is_deterministic, repo_local_path)
-        # Cleanup files after generation
-        # TODO: upstream to huggingface sb3
-        video_path = Path("test.mp4")
-        if video_path.is_file():
-            video_path.unlink()
-        json_path = list(glob.glob("*.meta.json"))
-        if len(json_path) > 0:
-            Path(json_path[0]).unlink()
+        # Encoded directly in h264 (required by web browsers), no temporary video file
+        with StreamingVideoWriter(str(repo_local_path / "replay.mp4"), fps=get_render_fps(eval_env)) as writer:
+            record_vec_env(model, eval_env, writer, video_length, is_deterministic)
 
     # Step 5: Generate the model card
     generated_model_card, metadata = generate_model_card(
@@ -316,6 +311,8 @@ if __name__ == "__main__":
 
     args = parser.parse_args()
     env_name: EnvironmentName = args.env
+    # Import optional env packages only if needed
+    import_env_packages(env_name.gym_id)
     algo = args.algo
 
     _, model_path, log_path = get_model_path(
@@ -380,14 +377,7 @@ if __name__ == "__main__":
 
     kwargs = dict(seed=args.seed)
     if algo in off_policy_algos:
-        # Dummy buffer size as we don't need memory to enjoy the trained agent
-        kwargs.update(dict(buffer_size=1))
-
-        # Hack due to breaking change in v1.6
-        # handle_timeout_termination cannot be at the same time
-        # with optimize_memory_usage
-        if "optimize_memory_usage" in hyperparams:
-            kwargs.update(optimize_memory_usage=False)
+        kwargs.update(get_eval_load_kwargs(hyperparams))
 
     # Note: we assume that we push models using the same machine (same python version)
     # that trained them, if not, we would need to pass custom object as in enjoy.py
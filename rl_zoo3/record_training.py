@@ -1,13 +1,19 @@
 import argparse
 import os
-import re
 import shutil
-import subprocess
-from copy import deepcopy
+import tempfile
 
 from huggingface_sb3 import EnvironmentName
 
+from rl_zoo3.batch_eval import Checkpoint, CheckpointEvaluator, evaluate_checkpoints, get_checkpoints
 from rl_zoo3.utils import ALGOS, get_latest_run_id
+from rl_zoo3.video_writer import StreamingVideoWriter, get_render_fps, read_video
+
+
+def get_video_text(checkpoint: Checkpoint) -> str:
+    # e.g. "checkpoint 10000", "final model" or "best model"
+    return " ".join(checkpoint.name_prefix.split("-")[:2])
+
 
 if __name__ == "__main__":
     parser = argparse.ArgumentParser()
@@ -21,6 +27,7 @@ if __name__ == "__main__":
     parser.add_argument("-g", "--gif", action="store_true", default=False, help="Convert final video to gif")
     parser.add_argument("--seed", help="Random generator seed", type=int, default=0)
     parser.add_argument("--exp-id", help="Experiment ID (default: 0: latest, -1: no exp folder)", default=0, type=int)
+    parser.add_argument("--n-workers", help="Number of processes recording the checkpoints in parallel", default=1, type=int)
     args = parser.parse_args()
 
     env_name: EnvironmentName = args.env
@@ -49,113 +56,46 @@ if __name__ == "__main__":
     shutil.rmtree(video_folder, ignore_errors=True)
     os.makedirs(video_folder, exist_ok=True)
 
-    # record a video of every model
-    models_dir_entries = [dir_ent.name for dir_ent in os.scandir(log_path) if dir_ent.is_file()]
-    checkpoints_names = list(filter(lambda x: x.startswith("rl_model_"), models_dir_entries))
-    checkpoints = list(map(lambda x: int(re.findall(r"\d+", x)[0]), checkpoints_names))
-    checkpoints.sort()
-
-    args_final_model = [
-        "--env",
-        env_name.gym_id,
-        "--algo",
-        algo,
-        "--exp-id",
-        str(args.exp_id),
-        "-f",
-        folder,
-        "-o",
-        video_folder,
-        "--n-timesteps",
-        str(n_timesteps),
-        "--n-envs",
-        str(n_envs),
-        "--seed",
-        str(seed),
-        # Disable rendering to generate videos faster
-        "--no-render",
-    ]
-    if deterministic is not None:
-        args_final_model.append("--deterministic")
-
-    if os.path.exists(os.path.join(log_path, f"{env_name}.zip")):
-        return_code = subprocess.call(["python", "-m", "rl_zoo3.record_video", *args_final_model])
-        assert return_code == 0, "Failed to record the final model"
-
-    if os.path.exists(os.path.join(log_path, "best_model.zip")):
-        args_best_model = [*args_final_model, "--load-best"]
-        return_code = subprocess.call(["python", "-m", "rl_zoo3.record_video", *args_best_model])
-        assert return_code == 0, "Failed to record the best model"
-
-    args_checkpoint = [*args_final_model, "--load-checkpoint"]
-    args_checkpoint.append("0")
-    for checkpoint in checkpoints:
-        args_checkpoint[-1] = str(checkpoint)
-        return_code = subprocess.call(["python", "-m", "rl_zoo3.record_video", *args_checkpoint])
-        assert return_code == 0, f"Failed to record the {checkpoint} checkpoint model"
-
-    # add text to each video
-    episode_videos_names = [dir_ent.name for dir_ent in os.scandir(video_folder) if dir_ent.name.endswith(".mp4")]
-
-    checkpoints_videos_names = list(filter(lambda x: x.startswith("checkpoint"), episode_videos_names))
-
-    # sort checkpoints by the number of steps
-    def get_number_from_checkpoint_filename(filename: str) -> int:
-        match = re.search("checkpoint-(.*?)-", filename)
-        number = "0"
-        if match is not None:
-            number = match.group(1)
-
-        return int(number)
-
-    if checkpoints_videos_names is not None:
-        checkpoints_videos_names.sort(key=get_number_from_checkpoint_filename)
-
-    final_model_video_name = list(filter(lambda x: x.startswith("final-model"), episode_videos_names))
-    best_model_video_name = list(filter(lambda x: x.startswith("best-model"), episode_videos_names))
-    episode_videos_names = checkpoints_videos_names + final_model_video_name + best_model_video_name
-    episode_videos_path = [os.path.join(video_folder, video) for video in episode_videos_names]
-
-    # the text displayed will be the first two words of the file
-    def get_text_from_video_filename(filename: str) -> str:
-        match = re.search(r"^(\w+)-(\w+)", filename)
-        text = ""
-        if match is not None:
-            text = f"{match.group(1)} {match.group(2)}"
-
-        return text
-
-    episode_videos_names = list(map(get_text_from_video_filename, episode_videos_names))
-
-    # In some cases, ffmpeg needs a tmp file
-    # https://stackoverflow.com/questions/28877049/issue-with-overwriting-file-while-using-ffmpeg-for-converting
-    tmp_videos_path = deepcopy(episode_videos_path)
-    tmp_videos_path = [path_[:-4] + "_with_text" + ".mp4" for path_ in tmp_videos_path]
-
-    for i in range(len(episode_videos_path)):
-        ffmpeg_command_to_add_text = (
-            f'ffmpeg -i {episode_videos_path[i]} -vf drawtext="'
-            f"text='{episode_videos_names[i]}': fontcolor=white: fontsize=24: box=1: boxcolor=black@0.5:"
-            f'boxborderw=5: x=(w-text_w)/2: y=12" -codec:a copy {tmp_videos_path[i]} -y -hide_banner -loglevel error'
-        )
-        os.system(ffmpeg_command_to_add_text)
-
-    # join videos together and convert to gif if needed
-    ffmpeg_text_file = os.path.join(video_folder, "tmp.txt")
-    with open(ffmpeg_text_file, "a") as file:
-        for video_path in tmp_videos_path:
-            file.write(f"file {video_path}\n")
+    checkpoints = get_checkpoints(log_path, env_name, algo)
+    evaluator_kwargs = dict(n_envs=n_envs, seed=seed, deterministic=True if deterministic else None)
+
+    final_video_path = os.path.join(video_folder, "training.mp4")
+    final_gif_path = os.path.join(video_folder, "training.gif") if convert_to_gif else None
+    # Record every model in the same stream, the name of the model is displayed on top of the video
+    if args.n_workers > 1:
+        # The workers record one segment per model (the env is only created once per worker),
+        # the segments are then streamed in order to the final video
+        with tempfile.TemporaryDirectory(dir=video_folder) as segments_folder:
+            results = evaluate_checkpoints(
+                algo,
+                env_name,
+                log_path,
+                checkpoints,
+                n_workers=args.n_workers,
+                n_timesteps=n_timesteps,
+                video_folder=segments_folder,
+                **evaluator_kwargs,
+            )
+            writer = None
+            try:
+                for checkpoint, result in zip(checkpoints, results):
+                    fps, frames = read_video(result["video_path"])
+                    if writer is None:
+                        writer = StreamingVideoWriter(final_video_path, fps=round(fps), gif_path=final_gif_path)
+                    for frame in frames:
+                        writer.write(frame, get_video_text(checkpoint))
+            finally:
+                if writer is not None:
+                    writer.close()
+    else:
+        evaluator = CheckpointEvaluator(algo, env_name, log_path, render_mode="rgb_array", **evaluator_kwargs)
+        try:
+            with StreamingVideoWriter(final_video_path, fps=get_render_fps(evaluator.env), gif_path=final_gif_path) as writer:
+                for checkpoint in checkpoints:
+                    evaluator.run(checkpoint, n_timesteps, video_writer=writer, video_text=get_video_text(checkpoint))
+        finally:
+            evaluator.close()
 
-    final_video_path = os.path.abspath(os.path.join(video_folder, "training.mp4"))
-    os.system(f"ffmpeg -f concat -safe 0 -i {ffmpeg_text_file} -c copy {final_video_path} -hide_banner -loglevel error")
-    os.remove(ffmpeg_text_file)
     print(f"Saving video to {final_video_path}")
-
-    if convert_to_gif:
-        final_gif_path = os.path.abspath(os.path.join(video_folder, "training.gif"))
-        os.system(f"ffmpeg -i {final_video_path} -vf fps=10 {final_gif_path} -hide_banner -loglevel error")
+    if final_gif_path is not None:
         print(f"Saving gif to {final_gif_path}")
-
-    # Remove tmp video files
-    for video_path in tmp_videos_path:
-        os.remove(video_path)
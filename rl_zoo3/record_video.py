@@ -2,14 +2,14 @@ import argparse
 import os
 import sys
 
-import numpy as np
 import yaml
 from huggingface_sb3 import EnvironmentName
 from stable_baselines3.common.utils import set_random_seed
-from stable_baselines3.common.vec_env import VecVideoRecorder
 
 from rl_zoo3.exp_manager import ExperimentManager
-from rl_zoo3.utils import ALGOS, StoreDict, create_test_env, get_model_path, get_saved_hyperparams
+from rl_zoo3.import_envs import import_env_packages
+from rl_zoo3.utils import ALGOS, StoreDict, create_test_env, get_eval_load_kwargs, get_model_path, get_saved_hyperparams
+from rl_zoo3.video_writer import StreamingVideoWriter, get_render_fps, record_vec_env
 
 if __name__ == "__main__":
     parser = argparse.ArgumentParser()
@@ -50,6 +50,8 @@ if __name__ == "__main__":
     args = parser.parse_args()
 
     env_name: EnvironmentName = args.env
+    # Import optional env packages only if needed
+    import_env_packages(env_name.gym_id)
     algo = args.algo
     folder = args.folder
     video_folder = args.output_folder
@@ -106,13 +108,7 @@ if __name__ == "__main__":
 
     kwargs = dict(seed=args.seed)
     if algo in off_policy_algos:
-        # Dummy buffer size as we don't need memory to enjoy the trained agent
-        kwargs.update(dict(buffer_size=1))
-        # Hack due to breaking change in v1.6
-        # handle_timeout_termination cannot be at the same time
-        # with optimize_memory_usage
-        if "optimize_memory_usage" in hyperparams:
-            kwargs.update(optimize_memory_usage=False)
+        kwargs.update(get_eval_load_kwargs(hyperparams))
 
     # Check if we are running python 3.8+
     # we need to patch saved model under python 3.6/3.7 to load them
@@ -128,7 +124,7 @@ if __name__ == "__main__":
 
     print(f"Loading {model_path}")
 
-    model = ALGOS[algo].load(model_path, env=env, custom_objects=custom_objects, **kwargs)
+    model = ALGOS[algo].load(model_path, env=env, custom_objects=custom_objects, load_optimizers=False, **kwargs)
 
     # Deterministic by default except for atari games
     stochastic = args.stochastic or (is_atari or is_minigrid) and not args.deterministic
@@ -137,31 +133,13 @@ if __name__ == "__main__":
     if video_folder is None:
         video_folder = os.path.join(log_path, "videos")
 
-    # Note: apparently it renders by default
-    env = VecVideoRecorder(
-        env,
-        video_folder,
-        record_video_trigger=lambda x: x == 0,
-        video_length=video_length,
-        name_prefix=name_prefix,
-    )
-
-    obs = env.reset()
-    lstm_states = None
-    episode_starts = np.ones((env.num_envs,), dtype=bool)
-    try:
-        for _ in range(video_length):
-            action, lstm_states = model.predict(
-                obs,  # type: ignore[arg-type]
-                state=lstm_states,
-                episode_start=episode_starts,
-                deterministic=deterministic,
-            )
-            if not args.no_render:
-                env.render()
-            obs, _, dones, _ = env.step(action)  # type: ignore[assignment]
-            episode_starts = dones
-    except KeyboardInterrupt:
-        pass
+    video_path = os.path.join(video_folder, f"{name_prefix}-step-0-to-step-{video_length}.mp4")
+    # The frames are encoded while the agent is running
+    with StreamingVideoWriter(video_path, fps=get_render_fps(env)) as writer:
+        try:
+            record_vec_env(model, env, writer, video_length, deterministic)
+        except KeyboardInterrupt:
+            pass
+    print(f"Saving video to {video_path}")
 
     env.close()
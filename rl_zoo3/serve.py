@@ -0,0 +1,439 @@
+"""
+Serve a trained agent over HTTP, with dynamic batching of the concurrent requests.
+
+The requests received while the policy is busy are stacked and answered with a single forward pass,
+the ``VecNormalize`` statistics (if any) are applied on the server:
+
+    python -m rl_zoo3.serve --algo ppo --env CartPole-v1 -f logs/ --export torchscript
+
+    curl -X POST localhost:8000/predict -d '{"observation": [0.0, 0.1, 0.0, -0.1]}'
+
+The observations are sent as JSON (``{"observation": ...}``) or, to avoid the parsing cost,
+as a numpy array (``.npy`` format) with the ``application/x-npy`` content type.
+A batch of observations (with a leading batch dimension) can be sent in one request.
+The answer uses the same format as the request.
+"""
+
+import argparse
+import io
+import json
+import os
+import pickle
+import queue
+import sys
+import threading
+import time
+from concurrent.futures import Future
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import TYPE_CHECKING, Any, Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+import torch as th
+from huggingface_sb3 import EnvironmentName
+
+from rl_zoo3.utils import ALGOS, get_eval_load_kwargs, get_model_path, get_saved_hyperparams
+
+if TYPE_CHECKING:
+    from stable_baselines3.common.base_class import BaseAlgorithm
+    from stable_baselines3.common.vec_env import VecNormalize
+
+NPY_CONTENT_TYPE = "application/x-npy"
+EXPORT_FORMATS = ["torchscript", "onnx"]
+
+# Sentinel to stop the batching thread
+_STOP = None
+
+
+def load_policy(
+    algo: str,
+    env_name: EnvironmentName,
+    folder: str,
+    exp_id: int = 0,
+    load_best: bool = False,
+    load_checkpoint: Optional[int] = None,
+    load_last_checkpoint: bool = False,
+    device: str = "cpu",
+) -> Tuple["BaseAlgorithm", Optional["VecNormalize"], str]:
+    """
+    Load a trained agent and its normalization statistics from the log folder, without creating an environment.
+
+    :param algo: RL Algorithm
+    :param env_name: Environment name
+    :param folder: Log folder
+    :param exp_id: Experiment ID (0: latest, -1: no exp folder)
+    :param load_best: Load the best model instead of the last one
+    :param load_checkpoint: Load a checkpoint (number of timesteps) instead of the last model
+    :param load_last_checkpoint: Load the last checkpoint instead of the last model
+    :param device: PyTorch device
+    :return: The model, the ``VecNormalize`` wrapper (None if the observations are not normalized)
+        and the path of the model
+    """
+    from rl_zoo3.batch_eval import OFF_POLICY_ALGOS
+
+    _, model_path, log_path = get_model_path(
+        exp_id, folder, algo, env_name, load_best, load_checkpoint, load_last_checkpoint  # type: ignore[arg-type]
+    )
+    hyperparams, stats_path = get_saved_hyperparams(os.path.join(log_path, env_name), test_mode=True)
+    kwargs: Dict[str, Any] = {}
+    if algo in OFF_POLICY_ALGOS:
+        kwargs.update(get_eval_load_kwargs(hyperparams))
+    custom_objects = {}
+    if sys.version_info.major == 3 and sys.version_info.minor >= 8:
+        custom_objects = {
+            "learning_rate": 0.0,
+            "lr_schedule": lambda _: 0.0,
+            "clip_range": lambda _: 0.0,
+        }
+    model = ALGOS[algo].load(model_path, custom_objects=custom_objects, device=device, load_optimizers=False, **kwargs)
+
+    vec_normalize = None
+    if stats_path is not None and hyperparams["normalize"]:
+        # The wrapped env is not needed to normalize the observations
+        with open(os.path.join(stats_path, "vecnormalize.pkl"), "rb") as file_handler:
+            vec_normalize = pickle.load(file_handler)
+        if not vec_normalize.norm_obs:
+            vec_normalize = None
+    return model, vec_normalize, model_path
+
+
+def make_predictor(
+    model: "BaseAlgorithm",
+    deterministic: bool = True,
+    export: Optional[str] = None,
+    export_path: Optional[str] = None,
+) -> Callable[[np.ndarray], np.ndarray]:
+    """
+    Create a function that computes the actions for a batch of (normalized) observations.
+
+    :param model: The trained agent
+    :param deterministic: Use deterministic actions
+    :param export: Run the policy with TorchScript (``"torchscript"``) or ONNX Runtime (``"onnx"``)
+        instead of eager PyTorch, only for deterministic actions (see ``stable_baselines3.common.export``)
+    :param export_path: Where to save the exported policy
+    :return: The prediction function
+    """
+    from stable_baselines3.common.export import ExportedPolicy, export_policy
+
+    if export is None:
+        policy = model.policy
+        policy.set_training_mode(False)
+
+        def predict(observation: np.ndarray) -> np.ndarray:
+            return policy.predict(observation, deterministic=deterministic)[0]  # type: ignore[arg-type]
+
+        return predict
+
+    assert export in EXPORT_FORMATS, f"Unknown export format {export}, must be one of {EXPORT_FORMATS}"
+    assert deterministic, "Only deterministic policies can be exported"
+    assert export_path is not None, "A path is required to export the policy"
+    export_policy(model.policy, export_path, export_format=export)
+    exported_policy = ExportedPolicy(export_path, export_format=export)
+
+    def predict_exported(observation: np.ndarray) -> np.ndarray:
+        return exported_policy.predict(observation)[0]
+
+    return predict_exported
+
+
+class PolicyServer:
+    """
+    Answer the prediction requests of several threads with batched forward passes.
+
+    The requests are queued and processed by a background thread:
+    all the requests waiting in the queue (up to ``max_batch_size`` observations) are concatenated
+    and answered with a single call to the policy.
+    Under load, the requests received during a forward pass are therefore batched together,
+    without adding latency when requests arrive one by one.
+
+    :param model: The trained agent (recurrent policies are not supported)
+    :param vec_normalize: Normalize the observations using these statistics
+    :param deterministic: Use deterministic actions
+    :param export: Run the policy with TorchScript (``"torchscript"``) or ONNX Runtime (``"onnx"``)
+    :param export_path: Where to save the exported policy
+    :param max_batch_size: Maximum number of observations per forward pass
+        (a single request with more observations is not split)
+    :param max_delay: Additional time (in seconds) to wait for more requests before a forward pass,
+        trades latency for throughput
+    """
+
+    def __init__(
+        self,
+        model: "BaseAlgorithm",
+        vec_normalize: Optional["VecNormalize"] = None,
+        deterministic: bool = True,
+        export: Optional[str] = None,
+        export_path: Optional[str] = None,
+        max_batch_size: int = 256,
+        max_delay: float = 0.0,
+    ) -> None:
+        from stable_baselines3.common.policies import BasePolicy
+
+        assert isinstance(model.policy, BasePolicy) and "Recurrent" not in type(model.policy).__name__, (
+            "Recurrent policies are not supported"
+        )
+        self.observation_space = model.observation_space
+        self.action_space = model.action_space
+        self.vec_normalize = vec_normalize
+        self.max_batch_size = max_batch_size
+        self.max_delay = max_delay
+        self._predict = make_predictor(model, deterministic, export, export_path)
+        # Number of forward passes and of observations, to monitor the batching
+        self.n_batches = 0
+        self.n_observations = 0
+        self._queue: "queue.Queue[Optional[Tuple[np.ndarray, Future]]]" = queue.Queue()
+        self._closed = False
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def _next_batch(self) -> Optional[List[Tuple[np.ndarray, Future]]]:
+        """
+        Wait for a request and collect the ones that can be batched with it.
+
+        :return: The requests, None when the server is closed
+        """
+        request = self._queue.get()
+        if request is _STOP:
+            return None
+        requests = [request]
+        batch_size = len(request[0])
+        deadline = time.perf_counter() + self.max_delay
+        while batch_size < self.max_batch_size:
+            try:
+                timeout = deadline - time.perf_counter()
+                request = self._queue.get(timeout=timeout) if timeout > 0 else self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if request is _STOP or batch_size + len(request[0]) > self.max_batch_size:
+                # Keep it for the next batch (the order of the requests does not matter)
+                self._queue.put(request)
+                break
+            requests.append(request)
+            batch_size += len(request[0])
+        return requests
+
+    def _run(self) -> None:
+        while True:
+            requests = self._next_batch()
+            if requests is None:
+                break
+            try:
+                observations = np.concatenate([observation for observation, _ in requests])
+                if self.vec_normalize is not None:
+                    observations = self.vec_normalize.normalize_obs(observations)  # type: ignore[assignment]
+                actions = self._predict(observations)
+            except Exception as e:
+                for _, future in requests:
+                    future.set_exception(e)
+                continue
+            self.n_batches += 1
+            self.n_observations += len(observations)
+            start = 0
+            for observation, future in requests:
+                future.set_result(actions[start : start + len(observation)])
+                start += len(observation)
+
+    def predict(self, observation: np.ndarray, timeout: Optional[float] = None) -> np.ndarray:
+        """
+        Get the actions for one observation or a batch of observations (thread-safe).
+
+        :param observation: The (unnormalized) observation, with or without batch dimension
+        :param timeout: Maximum time to wait for the answer (in seconds)
+        :return: The actions, with a batch dimension only if the observation had one
+        """
+        from stable_baselines3.common.preprocessing import is_image_space, maybe_transpose
+        from stable_baselines3.common.utils import is_vectorized_observation
+
+        assert not self._closed, "The policy server is closed"
+        observation = np.asarray(observation)
+        if is_image_space(self.observation_space):
+            # Channel-last images must be transposed to get the shape of the observation space
+            observation = maybe_transpose(observation, self.observation_space)
+        vectorized = is_vectorized_observation(observation, self.observation_space)
+        observation = observation.reshape((-1, *self.observation_space.shape))  # type: ignore[misc]
+        future: Future = Future()
+        self._queue.put((observation, future))
+        actions = future.result(timeout)
+        return actions if vectorized else actions[0]
+
+    def close(self) -> None:
+        """
+        Stop the batching thread once the pending requests are answered.
+        """
+        if self._closed:
+            return
+        self._closed = True
+        self._queue.put(_STOP)
+        self._thread.join()
+
+    def __enter__(self) -> "PolicyServer":
+        return self
+
+    def __exit__(self, *args) -> None:
+        self.close()
+
+
+class _RequestHandler(BaseHTTPRequestHandler):
+    # Keep the connections alive between requests
+    protocol_version = "HTTP/1.1"
+    # Send the (small) answers without delay
+    disable_nagle_algorithm = True
+    server: "PolicyHTTPServer"
+
+    def _send(self, status: int, body: bytes, content_type: str = "application/json") -> None:
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _send_json(self, status: int, content: Dict[str, Any]) -> None:
+        self._send(status, json.dumps(content).encode())
+
+    def do_GET(self) -> None:
+        if self.path != "/health":
+            self._send_json(404, {"error": f"Unknown path {self.path}"})
+            return
+        policy_server = self.server.policy_server
+        self._send_json(
+            200,
+            {
+                "observation_space": repr(policy_server.observation_space),
+                "observation_shape": policy_server.observation_space.shape,
+                "observation_dtype": str(policy_server.observation_space.dtype),
+                "action_space": repr(policy_server.action_space),
+                "n_batches": policy_server.n_batches,
+                "n_observations": policy_server.n_observations,
+            },
+        )
+
+    def do_POST(self) -> None:
+        if self.path != "/predict":
+            self._send_json(404, {"error": f"Unknown path {self.path}"})
+            return
+        use_npy = self.headers.get("Content-Type") == NPY_CONTENT_TYPE
+        body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        try:
+            if use_npy:
+                observation = np.load(io.BytesIO(body), allow_pickle=False)
+            else:
+                observation = np.asarray(
+                    json.loads(body)["observation"], dtype=self.server.policy_server.observation_space.dtype
+                )
+            action = self.server.policy_server.predict(observation)
+        except (ValueError, KeyError, TypeError) as e:
+            self._send_json(400, {"error": str(e)})
+            return
+        except Exception as e:
+            self._send_json(500, {"error": str(e)})
+            return
+        if use_npy:
+            buffer = io.BytesIO()
+            np.save(buffer, action, allow_pickle=False)
+            self._send(200, buffer.getvalue(), NPY_CONTENT_TYPE)
+        else:
+            self._send_json(200, {"action": action.tolist()})
+
+    def log_message(self, format: str, *args: Any) -> None:
+        # Logging every request would slow down the server
+        pass
+
+
+class PolicyHTTPServer(ThreadingHTTPServer):
+    """
+    HTTP server forwarding the requests to a ``PolicyServer``:
+    ``POST /predict`` to get actions and ``GET /health`` to get the spaces and the batching statistics.
+    Each connection is handled in its own thread.
+
+    :param policy_server: The policy server
+    :param host: Address to listen to
+    :param port: Port, 0 to use any free port (see ``server_address``)
+    """
+
+    daemon_threads = True
+
+    def __init__(self, policy_server: PolicyServer, host: str = "127.0.0.1", port: int = 8000) -> None:
+        self.policy_server = policy_server
+        super().__init__((host, port), _RequestHandler)
+
+
+def serve() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--env", help="environment ID", type=EnvironmentName, default="CartPole-v1")
+    parser.add_argument("-f", "--folder", help="Log folder", type=str, default="rl-trained-agents")
+    parser.add_argument("--algo", help="RL Algorithm", default="ppo", type=str, required=False, choices=list(ALGOS.keys()))
+    parser.add_argument("--exp-id", help="Experiment ID (default: 0: latest, -1: no exp folder)", default=0, type=int)
+    parser.add_argument(
+        "--load-best", action="store_true", default=False, help="Load best model instead of last model if available"
+    )
+    parser.add_argument(
+        "--load-checkpoint",
+        type=int,
+        help="Load checkpoint instead of last model if available, "
+        "you must pass the number of timesteps corresponding to it",
+    )
+    parser.add_argument(
+        "--load-last-checkpoint",
+        action="store_true",
+        default=False,
+        help="Load last checkpoint instead of last model if available",
+    )
+    parser.add_argument("--stochastic", action="store_true", default=False, help="Use stochastic actions")
+    parser.add_argument("--device", help="PyTorch device to be use (ex: cpu, cuda...)", default="cpu", type=str)
+    parser.add_argument("--num-threads", help="Number of threads for PyTorch (-1 to use default)", default=-1, type=int)
+    parser.add_argument(
+        "--export",
+        help="Export the policy and run it with TorchScript or ONNX Runtime (saved next to the model)",
+        type=str,
+        choices=EXPORT_FORMATS,
+    )
+    parser.add_argument("--host", help="Address to listen to", default="127.0.0.1", type=str)
+    parser.add_argument("--port", help="Port to listen to", default=8000, type=int)
+    parser.add_argument("--max-batch-size", help="Maximum number of observations per forward pass", default=256, type=int)
+    parser.add_argument(
+        "--max-delay", help="Time to wait for more requests before a forward pass (in ms)", default=0.0, type=float
+    )
+    args = parser.parse_args()
+
+    from rl_zoo3.import_envs import import_env_packages
+
+    env_name: EnvironmentName = args.env
+    # Custom policies and spaces may be defined in the env packages
+    import_env_packages(env_name.gym_id)
+
+    if args.num_threads > 0:
+        th.set_num_threads(args.num_threads)
+
+    model, vec_normalize, model_path = load_policy(
+        args.algo,
+        env_name,
+        args.folder,
+        args.exp_id,
+        args.load_best,
+        args.load_checkpoint,
+        args.load_last_checkpoint,
+        args.device,
+    )
+    export_path = None
+    if args.export is not None:
+        export_path = model_path[: -len(".zip")] + (".pt" if args.export == "torchscript" else ".onnx")
+        print(f"Exporting the policy to {export_path}")
+
+    policy_server = PolicyServer(
+        model,
+        vec_normalize,
+        deterministic=not args.stochastic,
+        export=args.export,
+        export_path=export_path,
+        max_batch_size=args.max_batch_size,
+        max_delay=args.max_delay / 1000,
+    )
+    with policy_server, PolicyHTTPServer(policy_server, args.host, args.port) as http_server:
+        print(f"Serving {model_path} on http://{args.host}:{http_server.server_address[1]}")
+        try:
+            http_server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+
+
+if __name__ == "__main__":
+    serve()
@@ -5,15 +5,8 @@ import os
 import time
 import uuid
 
-import gymnasium as gym
-import numpy as np
-import stable_baselines3 as sb3
-import torch as th
-from stable_baselines3.common.utils import set_random_seed
-
-# Register custom envs
-import rl_zoo3.import_envs  # noqa: F401
-from rl_zoo3.exp_manager import ExperimentManager
+# Note: PyTorch, SB3 and the env packages are only imported after parsing the arguments
+# to have a fast start (e.g. for `--help` or wrong arguments)
 from rl_zoo3.utils import ALGOS, StoreDict
 
 
@@ -49,6 +42,21 @@ def train() -> None:
     parser.add_argument("--eval-episodes", help="Number of episodes to use for evaluation", default=5, type=int)
     parser.add_argument("--n-eval-envs", help="Number of environments for evaluation", default=1, type=int)
     parser.add_argument("--save-freq", help="Save the model every n steps (if negative, no checkpoint)", default=-1, type=int)
+    parser.add_argument(
+        "--checkpoint-store",
+        action="store_true",
+        default=False,
+        help="Save the checkpoints incrementally (base snapshot + compressed deltas) in a background thread",
+    )
+    parser.add_argument(
+        "--keep-last-checkpoints", help="Only keep the n most recent checkpoints (default: keep all)", type=int, default=None
+    )
+    parser.add_argument(
+        "--keep-every-checkpoint",
+        help="Also keep one checkpoint every n checkpoints (with --keep-last-checkpoints)",
+        type=int,
+        default=None,
+    )
     parser.add_argument(
         "--save-replay-buffer", help="Save the replay buffer too (when applicable)", action="store_true", default=False
     )
@@ -137,6 +145,18 @@ def train() -> None:
         help="Custom yaml file or python package from which the hyperparameters will be loaded."
         "We expect that python packages contain a dictionary called 'hyperparams' which contains a key for each environment.",
     )
+    parser.add_argument(
+        "--config-cache",
+        action="store_true",
+        default=False,
+        help="Cache the parsed and validated hyperparameters (in the .config_cache subfolder of the log folder)",
+    )
+    parser.add_argument(
+        "--dry-run",
+        action="store_true",
+        default=False,
+        help="Only read and check the hyperparameters, no environment or model is created",
+    )
     parser.add_argument("-uuid", "--uuid", action="store_true", default=False, help="Ensure that the run has a unique ID")
     parser.add_argument(
         "--track",
@@ -159,11 +179,22 @@ def train() -> None:
 
     args = parser.parse_args()
 
+    import gymnasium as gym
+    import numpy as np
+    import stable_baselines3 as sb3
+    import torch as th
+    from stable_baselines3.common.utils import set_random_seed
+
+    from rl_zoo3.exp_manager import ExperimentManager
+    from rl_zoo3.import_envs import import_env_packages
+
     # Going through custom gym packages to let them register in the global registory
     for env_module in args.gym_packages:
         importlib.import_module(env_module)
 
     env_id = args.env
+    # Import optional env packages only if needed
+    import_env_packages(env_id)
     registered_envs = set(gym.envs.registry.keys())
 
     # If the environment is not found, suggest the closest match
@@ -196,7 +227,7 @@ def train() -> None:
     print("=" * 10, env_id, "=" * 10)
     print(f"Seed: {args.seed}")
 
-    if args.track:
+    if args.track and not args.dry_run:
         try:
             import wandb
         except ImportError as e:
@@ -260,8 +291,18 @@ def train() -> None:
         device=args.device,
         config=args.conf_file,
         show_progress=args.progress,
+        config_cache_dir=os.path.join(args.log_folder, ".config_cache") if args.config_cache else None,
+        checkpoint_store=args.checkpoint_store,
+        keep_last_checkpoints=args.keep_last_checkpoints,
+        keep_every_checkpoint=args.keep_every_checkpoint,
     )
 
+    if args.dry_run:
+        # Raise an error if the hyperparameters are not valid
+        exp_manager.check_hyperparameters(exp_manager.read_hyperparameters()[0])
+        print("Hyperparameters are valid")
+        return
+
     # Prepare experiment and launch hyperparameter optimization if needed
     results = exp_manager.setup_experiment()
     if results is not None:
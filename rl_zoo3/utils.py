@@ -1,42 +1,116 @@
 import argparse
+import functools
 import glob
+import hashlib
 import importlib
 import os
+import pickle
 from copy import deepcopy
-from typing import Any, Callable, Dict, List, Optional, Tuple, Type, Union
+from typing import TYPE_CHECKING, Any, Callable, Dict, Iterator, List, MutableMapping, Optional, Tuple, Type, Union
 
 import gymnasium as gym
-import stable_baselines3 as sb3  # noqa: F401
-import torch as th  # noqa: F401
 import yaml
 from gymnasium import spaces
-from huggingface_hub import HfApi
-from huggingface_sb3 import EnvironmentName, ModelName
-from sb3_contrib import ARS, QRDQN, TQC, TRPO, RecurrentPPO
-from stable_baselines3 import A2C, DDPG, DQN, PPO, SAC, TD3
-from stable_baselines3.common.base_class import BaseAlgorithm
-from stable_baselines3.common.callbacks import BaseCallback
-from stable_baselines3.common.env_util import make_vec_env
-from stable_baselines3.common.sb2_compat.rmsprop_tf_like import RMSpropTFLike  # noqa: F401
-from stable_baselines3.common.vec_env import DummyVecEnv, SubprocVecEnv, VecEnv, VecFrameStack, VecNormalize
-
-# For custom activation fn
-from torch import nn as nn
-
-ALGOS: Dict[str, Type[BaseAlgorithm]] = {
-    "a2c": A2C,
-    "ddpg": DDPG,
-    "dqn": DQN,
-    "ppo": PPO,
-    "sac": SAC,
-    "td3": TD3,
-    # SB3 Contrib,
-    "ars": ARS,
-    "qrdqn": QRDQN,
-    "tqc": TQC,
-    "trpo": TRPO,
-    "ppo_lstm": RecurrentPPO,
-}
+
+if TYPE_CHECKING:
+    from huggingface_sb3 import EnvironmentName
+    from stable_baselines3.common.base_class import BaseAlgorithm
+    from stable_baselines3.common.callbacks import BaseCallback
+    from stable_baselines3.common.vec_env import VecEnv
+
+
+class LazyAlgoDict(MutableMapping[str, Type["BaseAlgorithm"]]):
+    """
+    Dictionary of RL algorithms where each algorithm class
+    is only imported on first access.
+    Values can be classes or strings of the form ``"module:ClassName"``.
+
+    This avoids importing SB3, SB3 Contrib and PyTorch when only the names of
+    the algorithms are needed (for instance to build the command line parser).
+
+    :param algos: Mapping from algorithm name to class or class path
+    """
+
+    def __init__(self, algos: Dict[str, Union[str, Type["BaseAlgorithm"]]]):
+        self._algos = dict(algos)
+
+    def __getitem__(self, key: str) -> Type["BaseAlgorithm"]:
+        algo = self._algos[key]
+        if isinstance(algo, str):
+            module_name, class_name = algo.split(":")
+            algo = getattr(importlib.import_module(module_name), class_name)
+            self._algos[key] = algo
+        return algo
+
+    def __setitem__(self, key: str, value: Union[str, Type["BaseAlgorithm"]]) -> None:
+        self._algos[key] = value  # type: ignore[assignment]
+
+    def __delitem__(self, key: str) -> None:
+        del self._algos[key]
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._algos)
+
+    def __len__(self) -> int:
+        return len(self._algos)
+
+    def __repr__(self) -> str:
+        return f"{self.__class__.__name__}({self._algos})"
+
+
+ALGOS = LazyAlgoDict(
+    {
+        "a2c": "stable_baselines3:A2C",
+        "ddpg": "stable_baselines3:DDPG",
+        "dqn": "stable_baselines3:DQN",
+        "ppo": "stable_baselines3:PPO",
+        "sac": "stable_baselines3:SAC",
+        "td3": "stable_baselines3:TD3",
+        # SB3 Contrib,
+        "ars": "sb3_contrib:ARS",
+        "qrdqn": "sb3_contrib:QRDQN",
+        "tqc": "sb3_contrib:TQC",
+        "trpo": "sb3_contrib:TRPO",
+        "ppo_lstm": "sb3_contrib:RecurrentPPO",
+    }
+)
+
+
+class LazyEvalNamespace(dict):
+    """
+    Namespace used to evaluate python strings passed as hyperparameters
+    (ex: ``policy_kwargs:"dict(activation_fn=nn.ReLU)"``).
+    PyTorch and SB3 are only imported when they are used in the string.
+    """
+
+    lazy_objects: Dict[str, Tuple[str, Optional[str]]] = {
+        "th": ("torch", None),
+        "nn": ("torch", "nn"),
+        "sb3": ("stable_baselines3", None),
+        # For custom optimizer
+        "RMSpropTFLike": ("stable_baselines3.common.sb2_compat.rmsprop_tf_like", "RMSpropTFLike"),
+    }
+
+    def __missing__(self, key: str) -> Any:
+        if key not in self.lazy_objects:
+            raise KeyError(key)
+        module_name, attribute = self.lazy_objects[key]
+        value = importlib.import_module(module_name)
+        if attribute is not None:
+            value = getattr(value, attribute)
+        self[key] = value
+        return value
+
+
+def lazy_eval(expression: str) -> Any:
+    """
+    Evaluate a python string, importing PyTorch and SB3 only if needed.
+
+    :param expression: the python string to evaluate
+    :return: the evaluated object
+    """
+    # Unknown names are looked up in the (lazy) locals first, then in the globals
+    return eval(expression, globals(), LazyEvalNamespace())
 
 
 def flatten_dict_observations(env: gym.Env) -> gym.Env:
@@ -65,12 +139,6 @@ def get_wrapper_class(hyperparams: Dict[str, Any], key: str = "env_wrapper") ->
         with one or multiple gym.Wrapper
     """
 
-    def get_module_name(wrapper_name):
-        return ".".join(wrapper_name.split(".")[:-1])
-
-    def get_class_name(wrapper_name):
-        return wrapper_name.split(".")[-1]
-
     if key in hyperparams.keys():
         wrapper_name = hyperparams.get(key)
 
@@ -98,8 +166,7 @@ def get_wrapper_class(hyperparams: Dict[str, Any], key: str = "env_wrapper") ->
                 kwargs = wrapper_dict[wrapper_name]
             else:
                 kwargs = {}
-            wrapper_module = importlib.import_module(get_module_name(wrapper_name))
-            wrapper_class = getattr(wrapper_module, get_class_name(wrapper_name))
+            wrapper_class = get_class_by_name(wrapper_name)
             wrapper_classes.append(wrapper_class)
             wrapper_kwargs.append(kwargs)
 
@@ -117,11 +184,13 @@ def get_wrapper_class(hyperparams: Dict[str, Any], key: str = "env_wrapper") ->
         return None
 
 
+@functools.lru_cache(maxsize=None)
 def get_class_by_name(name: str) -> Type:
     """
     Imports and returns a class given the name, e.g. passing
     'stable_baselines3.common.callbacks.CheckpointCallback' returns the
     CheckpointCallback class.
+    The result is cached, so the class is only resolved once per process.
 
     :param name:
     :return:
@@ -137,7 +206,7 @@ def get_class_by_name(name: str) -> Type:
     return getattr(module, get_class_name(name))
 
 
-def get_callback_list(hyperparams: Dict[str, Any]) -> List[BaseCallback]:
+def get_callback_list(hyperparams: Dict[str, Any]) -> List["BaseCallback"]:
     """
     Get one or more Callback class specified as a hyper-parameter
     "callback".
@@ -154,7 +223,7 @@ def get_callback_list(hyperparams: Dict[str, Any]) -> List[BaseCallback]:
     :return:
     """
 
-    callbacks: List[BaseCallback] = []
+    callbacks: List["BaseCallback"] = []
 
     if "callback" in hyperparams.keys():
         callback_name = hyperparams.get("callback")
@@ -188,6 +257,93 @@ def get_callback_list(hyperparams: Dict[str, Any]) -> List[BaseCallback]:
     return callbacks
 
 
+def get_hyperparams_cache_path(
+    cache_dir: str, config_path: str, algo: str, env_id: str, custom_hyperparams: Optional[Dict[str, Any]] = None
+) -> str:
+    """
+    Returns the path of the cached hyperparameters for a given config file, algorithm,
+    environment and overwritten hyperparameters (``--hyperparams``).
+    The key contains the path, size and modification time of the config file
+    (the file is not read), so the cache is invalidated as soon as the file changes.
+
+    :param cache_dir: Folder where the cached hyperparameters are stored
+    :param config_path: Path to the yaml config file
+    :param algo: RL algorithm
+    :param env_id: Environment id
+    :param custom_hyperparams: Hyperparameters passed via the command line
+    :return: Path to the cache file
+    """
+    stat = os.stat(config_path)
+    hasher = hashlib.sha256()
+    hasher.update(f"{os.path.abspath(config_path)}:{stat.st_size}:{stat.st_mtime_ns}".encode())
+    hasher.update(f"{algo}:{env_id}".encode())
+    custom_hyperparams = custom_hyperparams or {}
+    hasher.update(repr(sorted(custom_hyperparams.items())).encode())
+    return os.path.join(cache_dir, f"{hasher.hexdigest()}.pkl")
+
+
+def load_cached_hyperparams(cache_path: str) -> Optional[Dict[str, Any]]:
+    """
+    Load hyperparameters previously saved with ``save_cached_hyperparams()``.
+
+    :param cache_path: Path to the cache file
+    :return: The cached hyperparameters, None if not found or invalid
+    """
+    if not os.path.isfile(cache_path):
+        return None
+    try:
+        with open(cache_path, "rb") as file_handler:
+            return pickle.load(file_handler)
+    except (OSError, EOFError, pickle.UnpicklingError, AttributeError, ImportError):
+        # Corrupted cache or class that cannot be found anymore
+        return None
+
+
+def save_cached_hyperparams(cache_path: str, hyperparams: Dict[str, Any]) -> None:
+    """
+    Save hyperparameters to the cache, atomically so that several jobs
+    can share the same cache folder.
+    Hyperparameters that cannot be pickled (ex: lambda functions) are not cached.
+
+    :param cache_path: Path to the cache file
+    :param hyperparams: Hyperparameters to cache
+    """
+    try:
+        data = pickle.dumps(hyperparams)
+    except (pickle.PicklingError, AttributeError, TypeError):
+        return
+    os.makedirs(os.path.dirname(cache_path), exist_ok=True)
+    tmp_path = f"{cache_path}.{os.getpid()}.tmp"
+    with open(tmp_path, "wb") as file_handler:
+        file_handler.write(data)
+    os.replace(tmp_path, cache_path)
+
+
+def get_eval_load_kwargs(hyperparams: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    """
+    Keyword arguments to load an off-policy agent that is only used to predict
+    (enjoy, record, serve, evaluate, ...): a dummy replay buffer is enough.
+    The default replay buffer class is used, as the one used for training
+    may not support a single slot (``FrameStackReplayBuffer``)
+    or would open the files of the run (``MemmapReplayBuffer``).
+    ``HerReplayBuffer`` is kept as it is needed to load the agent.
+
+    :param hyperparams: Saved hyperparameters of the run
+    :return: Keyword arguments for ``load()``
+    """
+    hyperparams = hyperparams or {}
+    # Dummy buffer size as we don't need memory to run the trained agent
+    kwargs: Dict[str, Any] = dict(buffer_size=1)
+    if "HerReplayBuffer" not in str(hyperparams.get("replay_buffer_class", "")):
+        kwargs.update(replay_buffer_class=None, replay_buffer_kwargs={})
+    # Hack due to breaking change in v1.6
+    # handle_timeout_termination cannot be at the same time
+    # with optimize_memory_usage
+    if "optimize_memory_usage" in hyperparams:
+        kwargs.update(optimize_memory_usage=False)
+    return kwargs
+
+
 def create_test_env(
     env_id: str,
     n_envs: int = 1,
@@ -197,7 +353,7 @@ def create_test_env(
     should_render: bool = True,
     hyperparams: Optional[Dict[str, Any]] = None,
     env_kwargs: Optional[Dict[str, Any]] = None,
-) -> VecEnv:
+) -> "VecEnv":
     """
     Create environment for testing a trained agent
 
@@ -211,6 +367,9 @@ def create_test_env(
     :param env_kwargs: Optional keyword argument to pass to the env constructor
     :return:
     """
+    from stable_baselines3.common.env_util import make_vec_env
+    from stable_baselines3.common.vec_env import DummyVecEnv, SubprocVecEnv, VecFrameStack, VecNormalize
+
     # Create the environment and wrap it if necessary
     assert hyperparams is not None
     env_wrapper = get_wrapper_class(hyperparams)
@@ -303,6 +462,8 @@ def get_trained_models(log_folder: str) -> Dict[str, Tuple[str, str]]:
     :param log_folder: Root log folder
     :return: Dict representing the trained agents
     """
+    from huggingface_sb3 import EnvironmentName, ModelName
+
     trained_models = {}
     for algo in os.listdir(log_folder):
         if not os.path.isdir(os.path.join(log_folder, algo)):
@@ -331,6 +492,10 @@ def get_hf_trained_models(organization: str = "sb3", check_filename: bool = Fals
         (this will slow down things as it requires one API call per model)
     :return: Dict representing the trained agents
     """
+    # Only import the hub modules when needed
+    from huggingface_hub import HfApi
+    from huggingface_sb3 import EnvironmentName, ModelName
+
     api = HfApi()
     models = api.list_models(author=organization, cardData=True)
 
@@ -359,7 +524,7 @@ def get_hf_trained_models(organization: str = "sb3", check_filename: bool = Fals
     return trained_models
 
 
-def get_latest_run_id(log_path: str, env_name: EnvironmentName) -> int:
+def get_latest_run_id(log_path: str, env_name: "EnvironmentName") -> int:
     """
     Returns the latest run number for the given log name and log path,
     by finding the greatest number in the directories.
@@ -408,7 +573,7 @@ def get_saved_hyperparams(
         # Load normalization params
         if hyperparams["normalize"]:
             if isinstance(hyperparams["normalize"], str):
-                normalize_kwargs = eval(hyperparams["normalize"])
+                normalize_kwargs = lazy_eval(hyperparams["normalize"])
                 if test_mode:
                     normalize_kwargs["norm_reward"] = norm_reward
             else:
@@ -435,7 +600,7 @@ class StoreDict(argparse.Action):
             key = arguments.split(":")[0]
             value = ":".join(arguments.split(":")[1:])
             # Evaluate the string as python code
-            arg_dict[key] = eval(value)
+            arg_dict[key] = lazy_eval(value)
         setattr(namespace, self.dest, arg_dict)
 
 
@@ -443,11 +608,13 @@ def get_model_path(
     exp_id: int,
     folder: str,
     algo: str,
-    env_name: EnvironmentName,
+    env_name: "EnvironmentName",
     load_best: bool = False,
     load_checkpoint: Optional[str] = None,
     load_last_checkpoint: bool = False,
 ) -> Tuple[str, str, str]:
+    from huggingface_sb3 import ModelName
+
     if exp_id == 0:
         exp_id = get_latest_run_id(os.path.join(folder, algo), env_name)
         print(f"Loading latest experiment, id={exp_id}")
@@ -0,0 +1,245 @@
+"""
+Streaming video encoding: the frames are sent to a background thread
+that adds the overlay text and pipes them directly to ffmpeg (via ``imageio-ffmpeg``, installed with ``moviepy``).
+Each output (mp4 and optional gif) is encoded once, no intermediate video file is written.
+"""
+
+import os
+import queue
+import threading
+from typing import Any, Generator, Iterator, List, Optional, Tuple
+
+import numpy as np
+from stable_baselines3.common.base_class import BaseAlgorithm
+from stable_baselines3.common.vec_env import VecEnv
+
+# Sentinel to stop the encoder thread
+_STOP = None
+
+
+def get_render_fps(env: VecEnv, default: int = 30) -> int:
+    """
+    Retrieve the frame rate from the metadata of the (first) environment.
+
+    :param env: The environment that will be rendered
+    :param default: Frame rate when not specified by the environment
+    :return: The number of frames per second of the video
+    """
+    metadata = env.get_attr("metadata")[0] or {}
+    return int(metadata.get("render_fps") or default)
+
+
+def draw_text(frame: np.ndarray, text: str) -> np.ndarray:
+    """
+    Write a text at the top center of a frame, on a semi-transparent black box
+    (same layout as the ``drawtext`` filter previously used with ffmpeg).
+
+    :param frame: RGB image
+    :param text: Text to display
+    :return: A new image with the text
+    """
+    try:
+        import cv2
+    except ImportError as e:
+        raise ImportError("OpenCV is required to add text to the videos: `pip install opencv-python`") from e
+
+    frame = frame.copy()
+    font, font_scale, thickness, border = cv2.FONT_HERSHEY_SIMPLEX, 0.7, 2, 5
+    (text_width, text_height), baseline = cv2.getTextSize(text, font, font_scale, thickness)
+    x, y = (frame.shape[1] - text_width) // 2, 12
+    top, bottom = max(y - border, 0), min(y + text_height + baseline + border, frame.shape[0])
+    left, right = max(x - border, 0), min(x + text_width + border, frame.shape[1])
+    # Blend a black box with 50% opacity
+    frame[top:bottom, left:right] //= 2
+    cv2.putText(frame, text, (x, y + text_height), font, font_scale, (255, 255, 255), thickness, cv2.LINE_AA)
+    return frame
+
+
+class StreamingVideoWriter:
+    """
+    Encode frames to a video file while they are produced.
+    The frames are put in a bounded queue and encoded by a background thread,
+    so the rendering and the encoding can overlap.
+    Frames with different texts (e.g. one per checkpoint) can be written to the same stream,
+    which replaces the per-clip ``drawtext`` and ``concat`` ffmpeg passes.
+
+    Note: the frames are not copied, they must not be modified after being written.
+
+    :param path: Path to the mp4 file
+    :param fps: Number of frames per second
+    :param gif_path: Also encode a gif from the same stream
+    :param gif_fps: Frame rate of the gif
+    :param max_queue_size: Maximum number of frames waiting to be encoded
+    """
+
+    def __init__(
+        self,
+        path: str,
+        fps: int = 30,
+        gif_path: Optional[str] = None,
+        gif_fps: int = 10,
+        max_queue_size: int = 64,
+    ) -> None:
+        self.path = os.path.abspath(path)
+        self.gif_path = None if gif_path is None else os.path.abspath(gif_path)
+        self.fps = fps
+        self.gif_fps = gif_fps
+        self.n_frames = 0
+        self.frame_size: Optional[Tuple[int, int]] = None
+        self._queue: "queue.Queue[Optional[Tuple[np.ndarray, Optional[str]]]]" = queue.Queue(maxsize=max_queue_size)
+        self._error: Optional[BaseException] = None
+        self._closed = False
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        self._thread = threading.Thread(target=self._encode, daemon=True)
+        self._thread.start()
+
+    def _open_encoders(self, frame_size: Tuple[int, int]) -> List[Generator[Any, np.ndarray, None]]:
+        """
+        Start one ffmpeg process per output.
+
+        :param frame_size: Width and height of the frames
+        :return: The ``imageio_ffmpeg`` frame writers
+        """
+        try:
+            import imageio_ffmpeg
+        except ImportError as e:
+            raise ImportError("imageio-ffmpeg is required to record videos: `pip install moviepy`") from e
+
+        # libx264 + yuv420p for compatibility with web browsers (e.g. on the Hugging Face Hub)
+        # yuv420p requires even dimensions
+        encoders = [
+            imageio_ffmpeg.write_frames(
+                self.path, frame_size, fps=self.fps, codec="libx264", pix_fmt_out="yuv420p", macro_block_size=2
+            )
+        ]
+        if self.gif_path is not None:
+            encoders.append(
+                imageio_ffmpeg.write_frames(
+                    self.gif_path,
+                    frame_size,
+                    fps=self.fps,
+                    codec="gif",
+                    pix_fmt_out="rgb8",
+                    quality=None,
+                    macro_block_size=1,
+                    output_params=["-vf", f"fps={self.gif_fps}"],
+                )
+            )
+        for encoder in encoders:
+            # Start the generator
+            encoder.send(None)
+        return encoders
+
+    def _encode(self) -> None:
+        encoders: List[Generator[Any, np.ndarray, None]] = []
+        try:
+            while True:
+                item = self._queue.get()
+                if item is _STOP:
+                    break
+                frame, text = item
+                if text:
+                    frame = draw_text(frame, text)
+                if len(encoders) == 0:
+                    encoders = self._open_encoders(self.frame_size)  # type: ignore[arg-type]
+                for encoder in encoders:
+                    encoder.send(np.ascontiguousarray(frame))
+        except BaseException as e:
+            self._error = e
+            # Drain the queue so the producer is not blocked
+            while self._queue.get() is not _STOP:
+                pass
+        finally:
+            for encoder in encoders:
+                encoder.close()
+
+    def _check_error(self) -> None:
+        if self._error is not None:
+            raise RuntimeError(f"Error while encoding {self.path}") from self._error
+
+    def write(self, frame: np.ndarray, text: Optional[str] = None) -> None:
+        """
+        Add a frame to the video.
+
+        :param frame: RGB image (height, width, 3) of type uint8
+        :param text: Optional text displayed at the top of the frame
+        """
+        assert not self._closed, "The video writer is closed"
+        self._check_error()
+        frame_size = (frame.shape[1], frame.shape[0])
+        if self.frame_size is None:
+            self.frame_size = frame_size
+        elif frame_size != self.frame_size:
+            raise ValueError(f"All the frames must have the same size, expected {self.frame_size} but got {frame_size}")
+        self._queue.put((frame, text))
+        self.n_frames += 1
+
+    def close(self) -> None:
+        """
+        Wait for the remaining frames to be encoded and close the files.
+        """
+        if self._closed:
+            return
+        self._closed = True
+        self._queue.put(_STOP)
+        self._thread.join()
+        self._check_error()
+
+    def __enter__(self) -> "StreamingVideoWriter":
+        return self
+
+    def __exit__(self, *args) -> None:
+        self.close()
+
+
+def read_video(path: str) -> Tuple[float, Iterator[np.ndarray]]:
+    """
+    Decode a video, e.g. a segment recorded by another process.
+
+    :param path: Path to the video
+    :return: The frame rate and an iterator over the RGB frames (height, width, 3)
+    """
+    try:
+        import imageio_ffmpeg
+    except ImportError as e:
+        raise ImportError("imageio-ffmpeg is required to read videos: `pip install moviepy`") from e
+
+    reader = imageio_ffmpeg.read_frames(path)
+    metadata = next(reader)
+    width, height = metadata["size"]
+    frames = (np.frombuffer(frame, dtype=np.uint8).reshape(height, width, 3) for frame in reader)
+    return metadata["fps"], frames
+
+
+def record_vec_env(
+    model: BaseAlgorithm,
+    env: VecEnv,
+    video_writer: StreamingVideoWriter,
+    n_timesteps: int,
+    deterministic: bool = True,
+    text: Optional[str] = None,
+) -> None:
+    """
+    Run a policy for a number of timesteps and write the rendered frames
+    (the first frame is the one after reset).
+
+    :param model: The agent
+    :param env: Environment created with ``render_mode="rgb_array"``
+    :param video_writer: Where to write the frames
+    :param n_timesteps: Number of steps
+    :param deterministic: Use deterministic actions
+    :param text: Optional text displayed on the frames
+    """
+    obs = env.reset()
+    video_writer.write(env.render(), text)  # type: ignore[arg-type]
+    lstm_states = None
+    episode_starts = np.ones((env.num_envs,), dtype=bool)
+    for _ in range(n_timesteps):
+        action, lstm_states = model.predict(
+            obs,  # type: ignore[arg-type]
+            state=lstm_states,
+            episode_start=episode_starts,
+            deterministic=deterministic,
+        )
+        obs, _, episode_starts, _ = env.step(action)
+        video_writer.write(env.render(), text)  # type: ignore[arg-type]
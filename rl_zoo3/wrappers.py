@@ -4,8 +4,18 @@ import gymnasium as gym
 import numpy as np
 from gymnasium import spaces
 from gymnasium.core import ObsType
-from sb3_contrib.common.wrappers import TimeFeatureWrapper  # noqa: F401 (backward compatibility)
 from stable_baselines3.common.type_aliases import GymResetReturn, GymStepReturn
+from stable_baselines3.common.vec_env.stacked_observations import RingFrameStack
+
+
+def __getattr__(name: str) -> Any:
+    # Backward compatibility: `rl_zoo3.wrappers.TimeFeatureWrapper`,
+    # imported lazily to avoid loading all SB3 Contrib algorithms
+    if name == "TimeFeatureWrapper":
+        from sb3_contrib.common.wrappers import TimeFeatureWrapper
+
+        return TimeFeatureWrapper
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
 
 class TruncatedOnSuccessWrapper(gym.Wrapper):
@@ -159,30 +169,25 @@ class HistoryWrapper(gym.Wrapper[np.ndarray, np.ndarray, np.ndarray, np.ndarray]
         self.low_action, self.high_action = low_action, high_action
         self.low_obs, self.high_obs = low_obs, high_obs
         self.low, self.high = low, high
-        self.obs_history = np.zeros(low_obs.shape, low_obs.dtype)
-        self.action_history = np.zeros(low_action.shape, low_action.dtype)
+        # Circular buffers, to avoid copying the whole history at each step
+        self.obs_history = RingFrameStack(low_obs.shape, horizon, axis=-1, dtype=low_obs.dtype)
+        self.action_history = RingFrameStack(low_action.shape, horizon, axis=-1, dtype=low_action.dtype)
 
     def _create_obs_from_history(self) -> np.ndarray:
-        return np.concatenate((self.obs_history, self.action_history))
+        return np.concatenate((self.obs_history.stacked, self.action_history.stacked))
 
     def reset(self, seed: Optional[int] = None, options: Optional[dict] = None) -> Tuple[np.ndarray, Dict]:
-        # Flush the history
-        self.obs_history[...] = 0
-        self.action_history[...] = 0
         assert options is None, "Options not supported for now"
         obs, info = self.env.reset(seed=seed)
-        self.obs_history[..., -obs.shape[-1] :] = obs
+        # Flush the history
+        self.obs_history.reset(obs)
+        self.action_history.reset(np.zeros_like(self.action_space.low))
         return self._create_obs_from_history(), info
 
     def step(self, action) -> Tuple[np.ndarray, SupportsFloat, bool, bool, Dict]:
         obs, reward, terminated, truncated, info = self.env.step(action)
-        last_ax_size = obs.shape[-1]
-
-        self.obs_history = np.roll(self.obs_history, shift=-last_ax_size, axis=-1)
-        self.obs_history[..., -obs.shape[-1] :] = obs
-
-        self.action_history = np.roll(self.action_history, shift=-action.shape[-1], axis=-1)
-        self.action_history[..., -action.shape[-1] :] = action
+        self.obs_history.push(obs)
+        self.action_history.push(action)
         return self._create_obs_from_history(), reward, terminated, truncated, info
 
 
@@ -224,20 +229,19 @@ class HistoryWrapperObsDict(gym.Wrapper):
         self.low_action, self.high_action = low_action, high_action
         self.low_obs, self.high_obs = low_obs, high_obs
         self.low, self.high = low, high
-        self.obs_history = np.zeros(low_obs.shape, low_obs.dtype)
-        self.action_history = np.zeros(low_action.shape, low_action.dtype)
+        # Circular buffers, to avoid copying the whole history at each step
+        self.obs_history = RingFrameStack(low_obs.shape, horizon, axis=-1, dtype=low_obs.dtype)
+        self.action_history = RingFrameStack(low_action.shape, horizon, axis=-1, dtype=low_action.dtype)
 
     def _create_obs_from_history(self) -> np.ndarray:
-        return np.concatenate((self.obs_history, self.action_history))
+        return np.concatenate((self.obs_history.stacked, self.action_history.stacked))
 
     def reset(self, seed: Optional[int] = None, options: Optional[dict] = None) -> Tuple[Dict[str, np.ndarray], Dict]:
-        # Flush the history
-        self.obs_history[...] = 0
-        self.action_history[...] = 0
         assert options is None, "Options not supported for now"
         obs_dict, info = self.env.reset(seed=seed)
-        obs = obs_dict["observation"]
-        self.obs_history[..., -obs.shape[-1] :] = obs
+        # Flush the history
+        self.obs_history.reset(obs_dict["observation"])
+        self.action_history.reset(np.zeros_like(self.action_space.low))
 
         obs_dict["observation"] = self._create_obs_from_history()
 
@@ -245,14 +249,8 @@ class HistoryWrapperObsDict(gym.Wrapper):
 
     def step(self, action) -> Tuple[Dict[str, np.ndarray], SupportsFloat, bool, bool, Dict]:
         obs_dict, reward, terminated, truncated, info = self.env.step(action)
-        obs = obs_dict["observation"]
-        last_ax_size = obs.shape[-1]
-
-        self.obs_history = np.roll(self.obs_history, shift=-last_ax_size, axis=-1)
-        self.obs_history[..., -obs.shape[-1] :] = obs
-
-        self.action_history = np.roll(self.action_history, shift=-action.shape[-1], axis=-1)
-        self.action_history[..., -action.shape[-1] :] = action
+        self.obs_history.push(obs_dict["observation"])
+        self.action_history.push(action)
 
         obs_dict["observation"] = self._create_obs_from_history()
 
@@ -0,0 +1,113 @@
+"""
+Load test for the policy server (``rl_zoo3.serve``): measure the latency (p50/p99)
+and the throughput for different numbers of observations per request.
+
+Concurrent clients send random observations (with the shape and dtype given by ``GET /health``)
+over persistent connections.
+
+Usage:
+    python -m rl_zoo3.serve --algo ppo --env CartPole-v1 -f rl-trained-agents/ --export torchscript
+    python scripts/benchmark_serve.py --batch-size 1 8 64 --n-clients 8
+"""
+
+import argparse
+import http.client
+import io
+import json
+import threading
+import time
+from typing import Dict, List
+from urllib.parse import urlparse
+
+import numpy as np
+
+from rl_zoo3.serve import NPY_CONTENT_TYPE
+
+
+def run_client(
+    host: str,
+    port: int,
+    observations: np.ndarray,
+    n_requests: int,
+    use_npy: bool,
+    latencies: List[float],
+) -> None:
+    """
+    Send requests over a single connection and record their latencies.
+
+    :param host: Server address
+    :param port: Server port
+    :param observations: The observations sent in each request
+    :param n_requests: Number of requests
+    :param use_npy: Send the observations in the ``.npy`` format instead of JSON
+    :param latencies: Where to append the latency of each request (in seconds)
+    """
+    if use_npy:
+        buffer = io.BytesIO()
+        np.save(buffer, observations, allow_pickle=False)
+        body, content_type = buffer.getvalue(), NPY_CONTENT_TYPE
+    else:
+        body, content_type = json.dumps({"observation": observations.tolist()}).encode(), "application/json"
+    headers = {"Content-Type": content_type}
+
+    connection = http.client.HTTPConnection(host, port)
+    for _ in range(n_requests):
+        start_time = time.perf_counter()
+        connection.request("POST", "/predict", body, headers)
+        response = connection.getresponse()
+        response.read()
+        latencies.append(time.perf_counter() - start_time)
+        assert response.status == 200, response.reason
+    connection.close()
+
+
+def benchmark(host: str, port: int, batch_size: int, n_clients: int, n_requests: int, use_npy: bool) -> Dict[str, float]:
+    """
+    :return: Latency percentiles (in ms) and throughput (observations per second)
+    """
+    connection = http.client.HTTPConnection(host, port)
+    connection.request("GET", "/health")
+    health = json.loads(connection.getresponse().read())
+    connection.close()
+    observations = np.random.uniform(size=(batch_size, *health["observation_shape"])).astype(health["observation_dtype"])
+
+    latencies: List[float] = []
+    threads = [
+        threading.Thread(target=run_client, args=(host, port, observations, n_requests, use_npy, latencies))
+        for _ in range(n_clients)
+    ]
+    start_time = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    total_time = time.perf_counter() - start_time
+
+    p50, p99 = np.percentile(latencies, [50, 99]) * 1000
+    return dict(p50=p50, p99=p99, throughput=len(latencies) * batch_size / total_time)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--url", help="Address of the policy server", default="http://127.0.0.1:8000", type=str)
+    parser.add_argument(
+        "--batch-size", help="Number of observations per request", nargs="+", default=[1, 8, 64], type=int
+    )
+    parser.add_argument("--n-clients", help="Number of concurrent clients", nargs="+", default=[1, 8], type=int)
+    parser.add_argument("--n-requests", help="Number of requests per client", default=1000, type=int)
+    parser.add_argument("--json", action="store_true", default=False, help="Send JSON instead of numpy arrays")
+    args = parser.parse_args()
+
+    url = urlparse(args.url)
+    assert url.hostname is not None and url.port is not None, f"Invalid url {args.url}"
+
+    print(f"{'batch':>6} {'clients':>8} {'p50':>10} {'p99':>10} {'throughput':>14}")
+    for batch_size in args.batch_size:
+        for n_clients in args.n_clients:
+            # Warmup
+            benchmark(url.hostname, url.port, batch_size, n_clients, n_requests=10, use_npy=not args.json)
+            results = benchmark(url.hostname, url.port, batch_size, n_clients, args.n_requests, use_npy=not args.json)
+            print(
+                f"{batch_size:>6} {n_clients:>8} {results['p50']:>8.3f}ms {results['p99']:>8.3f}ms "
+                f"{results['throughput']:>10.0f} obs/s"
+            )
@@ -0,0 +1,54 @@
+"""
+Measure the startup time of the RL Zoo entry points.
+
+Usage:
+    python scripts/benchmark_startup.py --n-runs 5
+"""
+
+import argparse
+import shlex
+import subprocess
+import sys
+import tempfile
+import time
+from typing import List
+
+import numpy as np
+
+
+def time_command(cmd: List[str], n_runs: int) -> np.ndarray:
+    """
+    Run a command several times and return the wall-clock durations.
+
+    :param cmd: Command to run
+    :param n_runs: Number of runs
+    :return: Durations in seconds
+    """
+    durations = []
+    for _ in range(n_runs):
+        start_time = time.perf_counter()
+        subprocess.run(cmd, check=True, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        durations.append(time.perf_counter() - start_time)
+    return np.array(durations)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--n-runs", help="Number of runs per command", default=5, type=int)
+    parser.add_argument("--algo", help="RL Algorithm for the training run", default="ppo", type=str)
+    parser.add_argument("--env", help="Environment ID for the training run", default="CartPole-v1", type=str)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as log_folder:
+        commands = {
+            "train --help": f"{sys.executable} -m rl_zoo3.train --help",
+            "train 1 step": f"{sys.executable} -m rl_zoo3.train --algo {args.algo} --env {args.env} -n 1 "
+            f"--log-folder {log_folder} --eval-freq -1 --save-freq -1",
+        }
+
+        for name, cmd in commands.items():
+            durations = time_command(shlex.split(cmd), args.n_runs)
+            print(
+                f"{name:<15} median: {np.median(durations):.3f}s "
+                f"min: {durations.min():.3f}s max: {durations.max():.3f}s ({args.n_runs} runs)"
+            )
@@ -0,0 +1,111 @@
+"""
+Measure the training throughput (gradient steps per second) of off-policy algorithms
+for different update-to-data (UTD) ratios, with and without ``compile_train``.
+
+The hyperparameters (network architecture, batch size, ...) are taken from the RL Zoo config files.
+``compile_train`` only compiles the gradient steps when training on GPU, on CPU both variants run eagerly.
+
+Usage:
+    python scripts/benchmark_utd.py --algo sac td3 --env Pendulum-v1 HalfCheetah-v4 --utd 1 4 20
+"""
+
+import argparse
+import os
+import time
+from typing import Any, Dict
+
+import gymnasium as gym
+import yaml
+
+from rl_zoo3.utils import ALGOS, lazy_eval
+
+# Hyperparameters that change the cost of a gradient step
+MODEL_KEYS = ("policy", "batch_size", "learning_rate", "gamma", "tau", "policy_kwargs")
+
+
+def load_config(algo: str, env_id: str) -> Dict[str, Any]:
+    """
+    Load the hyperparameters of the RL Zoo that are relevant for the benchmark.
+
+    :param algo: RL Algorithm
+    :param env_id: Environment ID
+    :return: Keyword arguments for the model
+    """
+    config_path = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "hyperparams", f"{algo}.yml")
+    with open(config_path) as file:
+        hyperparams = yaml.safe_load(file).get(env_id, {})
+
+    kwargs = {key: value for key, value in hyperparams.items() if key in MODEL_KEYS}
+    kwargs.setdefault("policy", "MlpPolicy")
+    if isinstance(kwargs.get("policy_kwargs"), str):
+        kwargs["policy_kwargs"] = lazy_eval(kwargs["policy_kwargs"])
+    # Schedules are not relevant here
+    if isinstance(kwargs.get("learning_rate"), str):
+        kwargs["learning_rate"] = float(kwargs["learning_rate"].split("_")[-1])
+    return kwargs
+
+
+def benchmark(
+    algo: str,
+    env_id: str,
+    utd: int,
+    compile_train: bool,
+    n_calls: int,
+    n_warmup_steps: int,
+    device: str,
+) -> float:
+    """
+    :return: Number of gradient steps per second
+    """
+    kwargs = load_config(algo, env_id)
+    policy = kwargs.pop("policy")
+    model = ALGOS[algo](
+        policy,
+        env_id,
+        buffer_size=n_warmup_steps,
+        learning_starts=n_warmup_steps,
+        compile_train=compile_train,
+        device=device,
+        **kwargs,
+    )
+    # Fill the replay buffer with random transitions (no training before learning_starts)
+    model.learn(n_warmup_steps)
+
+    # First call: compilation (when enabled) and memory allocation
+    model.train(gradient_steps=utd, batch_size=model.batch_size)
+    start_time = time.perf_counter()
+    for _ in range(n_calls):
+        model.train(gradient_steps=utd, batch_size=model.batch_size)
+    # Wait for the gradient steps to finish
+    model._record_train_metrics()
+    return n_calls * utd / (time.perf_counter() - start_time)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--algo", help="RL Algorithms", nargs="+", default=["sac", "td3"], type=str)
+    parser.add_argument("--env", help="Environment IDs", nargs="+", default=["Pendulum-v1", "HalfCheetah-v4"], type=str)
+    parser.add_argument(
+        "--utd", help="Update-to-data ratios (gradient steps per call)", nargs="+", default=[1, 4, 20], type=int
+    )
+    parser.add_argument("--n-calls", help="Number of calls to train() per measure", default=100, type=int)
+    parser.add_argument("--n-warmup-steps", help="Number of random transitions in the replay buffer", default=2000, type=int)
+    parser.add_argument("--device", help="PyTorch device to be use (ex: cpu, cuda...)", default="auto", type=str)
+    args = parser.parse_args()
+
+    print(f"{'algo':<6} {'env':<16} {'utd':>4} {'eager':>12} {'compiled':>12} {'speedup':>8}")
+    for env_id in args.env:
+        try:
+            gym.make(env_id).close()
+        except (gym.error.Error, ImportError) as e:
+            print(f"Skipping {env_id}: {e}")
+            continue
+        for algo in args.algo:
+            for utd in args.utd:
+                eager, compiled = (
+                    benchmark(algo, env_id, utd, compile_train, args.n_calls, args.n_warmup_steps, args.device)
+                    for compile_train in (False, True)
+                )
+                print(
+                    f"{algo:<6} {env_id:<16} {utd:>4} {eager:>10.1f}/s {compiled:>10.1f}/s {compiled / eager:>7.2f}x"
+                )
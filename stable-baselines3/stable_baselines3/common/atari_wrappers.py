@@ -1,10 +1,12 @@
-from typing import Dict, SupportsFloat
+from typing import Dict, Optional, SupportsFloat, Tuple
 
 import gymnasium as gym
 import numpy as np
 from gymnasium import spaces
 
 from stable_baselines3.common.type_aliases import AtariResetReturn, AtariStepReturn
+from stable_baselines3.common.vec_env.base_vec_env import VecEnv, VecEnvObs, VecEnvStepReturn, VecEnvWrapper
+from stable_baselines3.common.vec_env.stacked_observations import StackedObservations
 
 try:
     import cv2
@@ -154,15 +156,32 @@ class MaxAndSkipEnv(gym.Wrapper[np.ndarray, int, np.ndarray, int]):
     :param env: Environment to wrap
     :param skip: Number of ``skip``-th frame
         The same action will be taken ``skip`` times.
+    :param max_pool: If False, return the two last observations (stacked on a new first axis)
+        and let ``VecAtariPreprocessing`` do the max-pooling for all envs at once.
     """
 
-    def __init__(self, env: gym.Env, skip: int = 4) -> None:
+    def __init__(self, env: gym.Env, skip: int = 4, max_pool: bool = True) -> None:
         super().__init__(env)
         # most recent raw observations (for max pooling across time steps)
         assert env.observation_space.dtype is not None, "No dtype specified for the observation space"
         assert env.observation_space.shape is not None, "No shape defined for the observation space"
         self._obs_buffer = np.zeros((2, *env.observation_space.shape), dtype=env.observation_space.dtype)
         self._skip = skip
+        self._max_pool = max_pool
+        if not max_pool:
+            self.observation_space = spaces.Box(
+                low=0,
+                high=255,
+                shape=self._obs_buffer.shape,
+                dtype=env.observation_space.dtype,  # type: ignore[arg-type]
+            )
+
+    def reset(self, **kwargs) -> AtariResetReturn:
+        obs, info = self.env.reset(**kwargs)
+        if self._max_pool:
+            return obs, info
+        self._obs_buffer[:] = obs
+        return self._obs_buffer.copy(), info
 
     def step(self, action: int) -> AtariStepReturn:
         """
@@ -186,6 +205,8 @@ class MaxAndSkipEnv(gym.Wrapper[np.ndarray, int, np.ndarray, int]):
                 break
         # Note that the observation on the done=True frame
         # doesn't matter
+        if not self._max_pool:
+            return self._obs_buffer.copy(), total_reward, terminated, truncated, info
         max_frame = self._obs_buffer.max(axis=0)
 
         return max_frame, total_reward, terminated, truncated, info
@@ -276,6 +297,9 @@ class AtariWrapper(gym.Wrapper[np.ndarray, int, np.ndarray, int]):
     :param terminal_on_life_loss: If True, then step() returns done=True whenever a life is lost.
     :param clip_reward: If True (default), the reward is clip to {-1, 0, 1} depending on its sign.
     :param action_repeat_probability: Probability of repeating the last action
+    :param vec_preprocessing: If True, the max-pooling, grayscale and resize are not done by this wrapper
+        but for all envs at once by ``VecAtariPreprocessing``, which must then wrap the vectorized env.
+        ``screen_size`` is ignored in that case.
     """
 
     def __init__(
@@ -287,6 +311,7 @@ class AtariWrapper(gym.Wrapper[np.ndarray, int, np.ndarray, int]):
         terminal_on_life_loss: bool = True,
         clip_reward: bool = True,
         action_repeat_probability: float = 0.0,
+        vec_preprocessing: bool = False,
     ) -> None:
         if action_repeat_probability > 0.0:
             env = StickyActionEnv(env, action_repeat_probability)
@@ -294,13 +319,102 @@ class AtariWrapper(gym.Wrapper[np.ndarray, int, np.ndarray, int]):
             env = NoopResetEnv(env, noop_max=noop_max)
         # frame_skip=1 is the same as no frame-skip (action repeat)
         if frame_skip > 1:
-            env = MaxAndSkipEnv(env, skip=frame_skip)
+            env = MaxAndSkipEnv(env, skip=frame_skip, max_pool=not vec_preprocessing)
         if terminal_on_life_loss:
             env = EpisodicLifeEnv(env)
         if "FIRE" in env.unwrapped.get_action_meanings():  # type: ignore[attr-defined]
             env = FireResetEnv(env)
-        env = WarpFrame(env, width=screen_size, height=screen_size)
+        if not vec_preprocessing:
+            env = WarpFrame(env, width=screen_size, height=screen_size)
         if clip_reward:
             env = ClipRewardEnv(env)
 
         super().__init__(env)
+
+
+class VecAtariPreprocessing(VecEnvWrapper):
+    """
+    Max-pooling of the two last frames, grayscale and resize (see ``MaxAndSkipEnv`` and ``WarpFrame``)
+    for all envs at once, with optional frame-stacking.
+
+    The frames of all the envs are processed as one tall image with a single call to OpenCV,
+    writing into preallocated ``uint8`` buffers, instead of frame by frame in each env.
+    The envs must be wrapped with ``AtariWrapper(env, vec_preprocessing=True)``.
+    As the raw frames are transferred between processes, this is best used with a ``DummyVecEnv``.
+
+    :param venv: Vectorized environment to wrap
+    :param screen_size: Resize Atari frame
+    :param n_stack: Number of frames to stack (no frame-stacking by default)
+    """
+
+    def __init__(self, venv: VecEnv, screen_size: int = 84, n_stack: Optional[int] = None) -> None:
+        assert cv2 is not None, "OpenCV is not installed, you can do `pip install opencv-python`"
+        assert isinstance(venv.observation_space, spaces.Box), f"Expected Box space, got {venv.observation_space}"
+        shape = venv.observation_space.shape
+        assert len(shape) in {3, 4} and shape[-1] == 3, (
+            f"Expected RGB frames, got observations of shape {shape}, "
+            "the envs must be wrapped with `AtariWrapper(env, vec_preprocessing=True)`"
+        )
+        # Two frames per observation when using frame-skip
+        self.max_pool = len(shape) == 4
+        self.screen_size = screen_size
+        self._frame_shape = shape[-3:]
+        self._buffers = self._make_buffers(venv.num_envs)
+
+        observation_space = spaces.Box(low=0, high=255, shape=(screen_size, screen_size, 1), dtype=np.uint8)
+        self.stacked_obs: Optional[StackedObservations] = None
+        if n_stack is not None:
+            self.stacked_obs = StackedObservations(venv.num_envs, n_stack, observation_space, channels_order="last")
+            observation_space = self.stacked_obs.stacked_observation_space  # type: ignore[assignment]
+        super().__init__(venv, observation_space=observation_space)
+
+    def _make_buffers(self, n_frames: int) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """
+        :param n_frames: Number of frames to process at once
+        :return: Buffers for the max-pooled (only used with frame-skip), grayscale and resized frames
+        """
+        height, width, _ = self._frame_shape
+        return (
+            np.zeros((n_frames, *self._frame_shape), dtype=np.uint8),
+            np.zeros((n_frames * height, width), dtype=np.uint8),
+            np.zeros((n_frames * self.screen_size, self.screen_size), dtype=np.uint8),
+        )
+
+    def _preprocess(self, frames: np.ndarray, buffers: Tuple[np.ndarray, np.ndarray, np.ndarray]) -> np.ndarray:
+        """
+        :param frames: Raw frames of shape (n_frames, [2,] height, width, 3)
+        :param buffers: Output buffers (see ``_make_buffers()``)
+        :return: Preprocessed frames of shape (n_frames, screen_size, screen_size, 1),
+            view on the last buffer
+        """
+        pooled, gray, resized = buffers
+        if self.max_pool:
+            np.maximum(frames[:, 0], frames[:, 1], out=pooled)
+        else:
+            pooled = np.ascontiguousarray(frames)
+        n_frames, height, width, _ = pooled.shape
+        # Grayscale is a per-pixel operation and all the frames are resized with the same ratio,
+        # so the area interpolation does not mix pixels of different frames
+        cv2.cvtColor(pooled.reshape(n_frames * height, width, 3), cv2.COLOR_RGB2GRAY, dst=gray)
+        cv2.resize(gray, (self.screen_size, n_frames * self.screen_size), dst=resized, interpolation=cv2.INTER_AREA)
+        return resized.reshape(n_frames, self.screen_size, self.screen_size, 1)
+
+    def step_wait(self) -> VecEnvStepReturn:
+        observations, rewards, dones, infos = self.venv.step_wait()
+        frames = self._preprocess(observations, self._buffers)  # type: ignore[arg-type]
+        for env_idx in np.flatnonzero(dones):
+            if "terminal_observation" in infos[env_idx]:
+                terminal_frame = infos[env_idx]["terminal_observation"][None]
+                infos[env_idx]["terminal_observation"] = self._preprocess(terminal_frame, self._make_buffers(1))[0]
+
+        if self.stacked_obs is None:
+            # The buffers are re-used at the next step
+            return frames.copy(), rewards, dones, infos
+        stacked_frames, infos = self.stacked_obs.update(frames, dones, infos)
+        return stacked_frames, rewards, dones, infos
+
+    def reset(self) -> VecEnvObs:
+        frames = self._preprocess(self.venv.reset(), self._buffers)  # type: ignore[arg-type]
+        if self.stacked_obs is None:
+            return frames.copy()
+        return self.stacked_obs.reset(frames)
@@ -21,7 +21,15 @@ from stable_baselines3.common.monitor import Monitor
 from stable_baselines3.common.noise import ActionNoise
 from stable_baselines3.common.policies import BasePolicy
 from stable_baselines3.common.preprocessing import check_for_nested_spaces, is_image_space, is_image_space_channels_first
-from stable_baselines3.common.save_util import load_from_zip_file, recursive_getattr, recursive_setattr, save_to_zip_file
+from stable_baselines3.common.save_util import (
+    is_tensor_file,
+    load_from_tensor_file,
+    load_from_zip_file,
+    recursive_getattr,
+    recursive_setattr,
+    save_to_tensor_file,
+    save_to_zip_file,
+)
 from stable_baselines3.common.type_aliases import GymEnv, MaybeCallback, Schedule, TensorDict
 from stable_baselines3.common.utils import (
     check_for_correct_spaces,
@@ -572,9 +580,10 @@ class BaseAlgorithm(ABC):
         load_path_or_dict: Union[str, TensorDict],
         exact_match: bool = True,
         device: Union[th.device, str] = "auto",
+        load_optimizers: bool = True,
     ) -> None:
         """
-        Load parameters from a given zip-file or a nested dictionary containing parameters for
+        Load parameters from a given zip-file (or tensor file) or a nested dictionary containing parameters for
         different modules (see ``get_parameters``).
 
         :param load_path_or_iter: Location of the saved data (path or file-like, see ``save``), or a nested
@@ -584,10 +593,17 @@ class BaseAlgorithm(ABC):
             module and each of their parameters, otherwise raises an Exception. If set to False, this
             can be used to update only specific parameters.
         :param device: Device on which the code should run.
+        :param load_optimizers: Whether to load the optimizer states,
+            they can be skipped when the model is only used for prediction.
+            With a tensor file, the optimizer states are then not read at all.
         """
         params = {}
         if isinstance(load_path_or_dict, dict):
             params = load_path_or_dict
+        elif is_tensor_file(load_path_or_dict):
+            _, params, _ = load_from_tensor_file(
+                load_path_or_dict, load_data=False, device=device, load_optimizers=load_optimizers
+            )
         else:
             _, params, _ = load_from_zip_file(load_path_or_dict, device=device)
 
@@ -595,6 +611,10 @@ class BaseAlgorithm(ABC):
         # `_get_torch_save_params` returns [params, other_pytorch_variables].
         # We are only interested in former here.
         objects_needing_update = set(self._get_torch_save_params()[0])
+        if not load_optimizers:
+            objects_needing_update = {
+                name for name in objects_needing_update if not isinstance(recursive_getattr(self, name), th.optim.Optimizer)
+            }
         updated_objects = set()
 
         for name in params:
@@ -608,6 +628,8 @@ class BaseAlgorithm(ABC):
                 raise ValueError(f"Key {name} is an invalid object name.") from e
 
             if isinstance(attr, th.optim.Optimizer):
+                if not load_optimizers:
+                    continue
                 # Optimizers do not support "strict" keyword...
                 # Seems like they will just replace the whole
                 # optimizer state with the given one.
@@ -644,10 +666,11 @@ class BaseAlgorithm(ABC):
         custom_objects: Optional[Dict[str, Any]] = None,
         print_system_info: bool = False,
         force_reset: bool = True,
+        load_optimizers: bool = True,
         **kwargs,
     ) -> SelfBaseAlgorithm:
         """
-        Load the model from a zip-file.
+        Load the model from a zip-file (or a tensor file, see ``save()``).
         Warning: ``load`` re-creates the model from scratch, it does not update it in-place!
         For an in-place load use ``set_parameters`` instead.
 
@@ -667,6 +690,8 @@ class BaseAlgorithm(ABC):
         :param force_reset: Force call to ``reset()`` before training
             to avoid unexpected behavior.
             See https://github.com/DLR-RM/stable-baselines3/issues/597
+        :param load_optimizers: Whether to load the optimizer states,
+            they can be skipped when the model is only used for prediction.
         :param kwargs: extra arguments to change the model when loading
         :return: new model instance with loaded parameters
         """
@@ -674,12 +699,20 @@ class BaseAlgorithm(ABC):
             print("== CURRENT SYSTEM INFO ==")
             get_system_info()
 
-        data, params, pytorch_variables = load_from_zip_file(
-            path,
-            device=device,
-            custom_objects=custom_objects,
-            print_system_info=print_system_info,
-        )
+        if is_tensor_file(path):  # type: ignore[arg-type]
+            data, params, pytorch_variables = load_from_tensor_file(
+                path,  # type: ignore[arg-type]
+                device=device,
+                custom_objects=custom_objects,
+                load_optimizers=load_optimizers,
+            )
+        else:
+            data, params, pytorch_variables = load_from_zip_file(
+                path,
+                device=device,
+                custom_objects=custom_objects,
+                print_system_info=print_system_info,
+            )
 
         assert data is not None, "No data found in the saved file"
         assert params is not None, "No params found in the saved file"
@@ -738,13 +771,13 @@ class BaseAlgorithm(ABC):
 
         try:
             # put state_dicts back in place
-            model.set_parameters(params, exact_match=True, device=device)
+            model.set_parameters(params, exact_match=True, device=device, load_optimizers=load_optimizers)
         except RuntimeError as e:
             # Patch to load Policy saved using SB3 < 1.7.0
             # the error is probably due to old policy being loaded
             # See https://github.com/DLR-RM/stable-baselines3/issues/1233
             if "pi_features_extractor" in str(e) and "Missing key(s) in state_dict" in str(e):
-                model.set_parameters(params, exact_match=False, device=device)
+                model.set_parameters(params, exact_match=False, device=device, load_optimizers=load_optimizers)
                 warnings.warn(
                     "You are probably loading a model saved with SB3 < 1.7.0, "
                     "we deactivated exact_match so you can save the model "
@@ -790,18 +823,15 @@ class BaseAlgorithm(ABC):
             params[name] = attr.state_dict()
         return params
 
-    def save(
+    def _get_save_objects(
         self,
-        path: Union[str, pathlib.Path, io.BufferedIOBase],
         exclude: Optional[Iterable[str]] = None,
         include: Optional[Iterable[str]] = None,
-    ) -> None:
+    ) -> Tuple[Dict[str, Any], Dict[str, Dict], Optional[Dict[str, Any]]]:
         """
-        Save all the attributes of the object and the model parameters in a zip-file.
+        Collect what is saved by ``save()`` (see ``save()`` for the parameters).
 
-        :param path: path to the file where the rl agent should be saved
-        :param exclude: name of parameters that should be excluded in addition to the default ones
-        :param include: name of parameters that might be excluded but should be included anyway
+        :return: Class parameters (non-PyTorch variables), state dicts and other PyTorch variables
         """
         # Copy parameter list so we don't mutate the original dict
         data = self.__dict__.copy()
@@ -837,5 +867,28 @@ class BaseAlgorithm(ABC):
 
         # Build dict of state_dicts
         params_to_save = self.get_parameters()
+        return data, params_to_save, pytorch_variables
+
+    def save(
+        self,
+        path: Union[str, pathlib.Path, io.BufferedIOBase],
+        exclude: Optional[Iterable[str]] = None,
+        include: Optional[Iterable[str]] = None,
+        tensor_file: bool = False,
+    ) -> None:
+        """
+        Save all the attributes of the object and the model parameters in a zip-file.
 
-        save_to_zip_file(path, data=data, params=params_to_save, pytorch_variables=pytorch_variables)
+        :param path: path to the file where the rl agent should be saved
+        :param exclude: name of parameters that should be excluded in addition to the default ones
+        :param include: name of parameters that might be excluded but should be included anyway
+        :param tensor_file: Save the parameters uncompressed in a tensor file instead of a zip-file.
+            The file can be memory-mapped and the parameters loaded lazily,
+            which is faster to load, especially with ``set_parameters()`` or ``load_optimizers=False``.
+        """
+        data, params_to_save, pytorch_variables = self._get_save_objects(exclude, include)
+        if tensor_file:
+            assert isinstance(path, (str, pathlib.Path)), "A tensor file can only be saved to a path"
+            save_to_tensor_file(path, data=data, params=params_to_save, pytorch_variables=pytorch_variables)
+        else:
+            save_to_zip_file(path, data=data, params=params_to_save, pytorch_variables=pytorch_variables)
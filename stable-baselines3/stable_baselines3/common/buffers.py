@@ -1,20 +1,24 @@
+import json
+import os
+import tempfile
 import warnings
 from abc import ABC, abstractmethod
-from typing import Any, Dict, Generator, List, Optional, Tuple, Union
+from typing import Any, Callable, Dict, Generator, Hashable, Iterable, List, Optional, Tuple, TypeVar, Union
 
 import numpy as np
 import torch as th
 from gymnasium import spaces
 
 from stable_baselines3.common.preprocessing import get_action_dim, get_obs_shape
+from stable_baselines3.common.running_mean_std import RunningMeanStd
 from stable_baselines3.common.type_aliases import (
     DictReplayBufferSamples,
     DictRolloutBufferSamples,
     ReplayBufferSamples,
     RolloutBufferSamples,
 )
-from stable_baselines3.common.utils import get_device
-from stable_baselines3.common.vec_env import VecNormalize
+from stable_baselines3.common.utils import StagingBuffer, get_device
+from stable_baselines3.common.vec_env import StackedObservations, VecNormalize
 
 try:
     # Check memory used by replay buffer when possible
@@ -23,6 +27,25 @@ except ImportError:
     psutil = None
 
 
+SamplesT = TypeVar("SamplesT", ReplayBufferSamples, DictReplayBufferSamples)
+
+
+def map_samples(function: Callable[[th.Tensor], th.Tensor], samples: SamplesT) -> SamplesT:
+    """
+    Apply a function to all the tensors of a minibatch (including Dict observations).
+
+    :param function: Function applied to each tensor
+    :param samples: Minibatch
+    :return: A minibatch of the same type
+    """
+    return type(samples)(
+        *(
+            {key: function(value) for key, value in data.items()} if isinstance(data, dict) else function(data)
+            for data in samples
+        )
+    )
+
+
 class BaseBuffer(ABC):
     """
     Base class that represent a buffer (rollout or replay)
@@ -57,6 +80,7 @@ class BaseBuffer(ABC):
         self.full = False
         self.device = get_device(device)
         self.n_envs = n_envs
+        self._staging_buffer = StagingBuffer()
 
     @staticmethod
     def swap_and_flatten(arr: np.ndarray) -> np.ndarray:
@@ -124,7 +148,7 @@ class BaseBuffer(ABC):
         """
         raise NotImplementedError()
 
-    def to_torch(self, array: np.ndarray, copy: bool = True) -> th.Tensor:
+    def to_torch(self, array: np.ndarray, copy: bool = True, key: Hashable = None) -> th.Tensor:
         """
         Convert a numpy array to a PyTorch tensor.
         Note: it copies the data by default
@@ -132,11 +156,32 @@ class BaseBuffer(ABC):
         :param array:
         :param copy: Whether to copy or not the data (may be useful to avoid changing things
             by reference). This argument is inoperative if the device is not the CPU.
+        :param key: Name of the field (ex: ``"observations"``), each field has its own staging memory
         :return:
         """
-        if copy:
-            return th.tensor(array, device=self.device)
-        return th.as_tensor(array, device=self.device)
+        return self.staging_buffer.to_tensor(array, self.device, key=key, copy=copy)
+
+    def _fields_to_torch(self, data: Tuple[np.ndarray, ...], names: Tuple[str, ...]) -> Tuple[th.Tensor, ...]:
+        """
+        Convert the fields of a batch, each field has its own staging memory
+        and the transfers are grouped (the staging memory is only waited for once per batch).
+
+        :param data: The arrays of the batch
+        :param names: Name of each field
+        :return:
+        """
+        with self.staging_buffer.batch():
+            return tuple(self.to_torch(array, key=name) for name, array in zip(names, data))
+
+    @property
+    def staging_buffer(self) -> StagingBuffer:
+        """
+        Host memory reused to transfer the samples to the device.
+        """
+        # Buffers pickled with a previous version do not have one
+        if not hasattr(self, "_staging_buffer"):
+            self._staging_buffer = StagingBuffer()
+        return self._staging_buffer
 
     @staticmethod
     def _normalize_obs(
@@ -303,6 +348,37 @@ class ReplayBuffer(BaseBuffer):
             batch_inds = np.random.randint(0, self.pos, size=batch_size)
         return self._get_samples(batch_inds, env=env)
 
+    def sample_batches(
+        self, n_batches: int, batch_size: int, env: Optional[VecNormalize] = None
+    ) -> Iterable[ReplayBufferSamples]:
+        """
+        Sample one minibatch per gradient step.
+        The minibatches are sampled lazily, buffers that can do better
+        (e.g. ``DeviceReplayBuffer``) sample them all at once.
+
+        :param n_batches: Number of minibatches (usually ``gradient_steps``)
+        :param batch_size: Number of element per minibatch
+        :param env: associated gym VecEnv
+            to normalize the observations/rewards when sampling
+        :return: iterable over the minibatches
+        """
+        for _ in range(n_batches):
+            yield self.sample(batch_size, env=env)
+
+    def sample_block(self, n_batches: int, batch_size: int, env: Optional[VecNormalize] = None) -> ReplayBufferSamples:
+        """
+        Sample all the minibatches at once, stacked in one block:
+        each tensor has a shape [n_batches, batch_size, ...].
+
+        :param n_batches: Number of minibatches (usually ``gradient_steps``)
+        :param batch_size: Number of element per minibatch
+        :param env: associated gym VecEnv
+            to normalize the observations/rewards when sampling
+        :return: the stacked minibatches
+        """
+        samples = self.sample(n_batches * batch_size, env=env)
+        return map_samples(lambda data: data.reshape(n_batches, batch_size, *data.shape[1:]), samples)
+
     def _get_samples(self, batch_inds: np.ndarray, env: Optional[VecNormalize] = None) -> ReplayBufferSamples:
         # Sample randomly the env idx
         env_indices = np.random.randint(0, high=self.n_envs, size=(len(batch_inds),))
@@ -321,7 +397,7 @@ class ReplayBuffer(BaseBuffer):
             (self.dones[batch_inds, env_indices] * (1 - self.timeouts[batch_inds, env_indices])).reshape(-1, 1),
             self._normalize_reward(self.rewards[batch_inds, env_indices].reshape(-1, 1), env),
         )
-        return ReplayBufferSamples(*tuple(map(self.to_torch, data)))
+        return ReplayBufferSamples(*self._fields_to_torch(data, ReplayBufferSamples._fields))
 
     @staticmethod
     def _maybe_cast_dtype(dtype: np.typing.DTypeLike) -> np.typing.DTypeLike:
@@ -339,6 +415,554 @@ class ReplayBuffer(BaseBuffer):
         return dtype
 
 
+class DeviceReplayBuffer(ReplayBuffer):
+    """
+    Replay buffer that stores the transitions as PyTorch tensors
+    directly on the training device (e.g. the GPU).
+    Sampling is done with one index tensor and one gather per stored array,
+    no host to device copy is needed.
+    All the minibatches of a ``train()`` call can be sampled at once with ``sample_batches()``.
+
+    Only non-dict observation spaces are supported.
+    Select it with ``replay_buffer_class=DeviceReplayBuffer``.
+
+    :param buffer_size: Max number of element in the buffer
+    :param observation_space: Observation space
+    :param action_space: Action space
+    :param device: PyTorch device
+    :param n_envs: Number of parallel environments
+    :param optimize_memory_usage: Enable a memory efficient variant
+        of the replay buffer which reduces by almost a factor two the memory used.
+        Cannot be used in combination with handle_timeout_termination.
+    :param handle_timeout_termination: Handle timeout termination (due to timelimit)
+        separately and treat the task as infinite horizon task.
+        https://github.com/DLR-RM/stable-baselines3/issues/284
+    """
+
+    observations: th.Tensor  # type: ignore[assignment]
+    next_observations: th.Tensor  # type: ignore[assignment]
+    actions: th.Tensor  # type: ignore[assignment]
+    rewards: th.Tensor  # type: ignore[assignment]
+    dones: th.Tensor  # type: ignore[assignment]
+    timeouts: th.Tensor  # type: ignore[assignment]
+
+    def __init__(
+        self,
+        buffer_size: int,
+        observation_space: spaces.Space,
+        action_space: spaces.Space,
+        device: Union[th.device, str] = "auto",
+        n_envs: int = 1,
+        optimize_memory_usage: bool = False,
+        handle_timeout_termination: bool = True,
+    ):
+        super(ReplayBuffer, self).__init__(buffer_size, observation_space, action_space, device, n_envs=n_envs)
+        assert not isinstance(self.obs_shape, dict), "DeviceReplayBuffer does not support Dict obs space"
+
+        # Adjust buffer size
+        self.buffer_size = max(buffer_size // n_envs, 1)
+
+        if optimize_memory_usage and handle_timeout_termination:
+            raise ValueError(
+                "DeviceReplayBuffer does not support optimize_memory_usage = True "
+                "and handle_timeout_termination = True simultaneously."
+            )
+        self.optimize_memory_usage = optimize_memory_usage
+        self.handle_timeout_termination = handle_timeout_termination
+
+        def zeros(*shape: int, dtype: np.typing.DTypeLike = np.float32) -> th.Tensor:
+            # Use the PyTorch equivalent of the numpy dtype
+            th_dtype = th.from_numpy(np.zeros(0, dtype=dtype)).dtype
+            return th.zeros((self.buffer_size, self.n_envs, *shape), dtype=th_dtype, device=self.device)
+
+        self.observations = zeros(*self.obs_shape, dtype=observation_space.dtype)
+        if not optimize_memory_usage:
+            # When optimizing memory, `observations` contains also the next observation
+            self.next_observations = zeros(*self.obs_shape, dtype=observation_space.dtype)
+        self.actions = zeros(self.action_dim, dtype=self._maybe_cast_dtype(action_space.dtype))
+        self.rewards = zeros()
+        self.dones = zeros()
+        self.timeouts = zeros()
+
+    def __getstate__(self) -> Dict[str, Any]:
+        # Store the tensors on the CPU so the buffer can be loaded on any device,
+        # they are moved back to `self.device` on first use
+        state = self.__dict__.copy()
+        for key in self._storage_keys():
+            state[key] = state[key].cpu()
+        return state
+
+    def _storage_keys(self) -> List[str]:
+        keys = ["observations", "actions", "rewards", "dones", "timeouts"]
+        if not self.optimize_memory_usage:
+            keys.append("next_observations")
+        return keys
+
+    def _maybe_move_storage(self) -> None:
+        # `self.device` may have been changed (e.g. when loading the buffer on another GPU)
+        device = self.device
+        if device.type == "cuda" and device.index is None:
+            # Tensors always have an index, "cuda" is the current device
+            device = th.device("cuda", th.cuda.current_device())
+        if self.observations.device != device:
+            for key in self._storage_keys():
+                setattr(self, key, getattr(self, key).to(self.device))
+
+    def add(
+        self,
+        obs: np.ndarray,
+        next_obs: np.ndarray,
+        action: np.ndarray,
+        reward: np.ndarray,
+        done: np.ndarray,
+        infos: List[Dict[str, Any]],
+    ) -> None:
+        self._maybe_move_storage()
+        # Reshape needed when using multiple envs with discrete observations
+        # as numpy cannot broadcast (n_discrete,) to (n_discrete, 1)
+        if isinstance(self.observation_space, spaces.Discrete):
+            obs = obs.reshape((self.n_envs, *self.obs_shape))
+            next_obs = next_obs.reshape((self.n_envs, *self.obs_shape))
+
+        # Reshape to handle multi-dim and discrete action spaces, see GH #970 #1392
+        action = action.reshape((self.n_envs, self.action_dim))
+
+        # Writing into the storage copies the data
+        self.observations[self.pos] = self.to_torch(obs, copy=False, key="observations")
+
+        if self.optimize_memory_usage:
+            self.observations[(self.pos + 1) % self.buffer_size] = self.to_torch(next_obs, copy=False, key="next_observations")
+        else:
+            self.next_observations[self.pos] = self.to_torch(next_obs, copy=False, key="next_observations")
+
+        self.actions[self.pos] = self.to_torch(action, copy=False, key="actions")
+        self.rewards[self.pos] = self.to_torch(np.asarray(reward, dtype=np.float32), copy=False, key="rewards")
+        self.dones[self.pos] = self.to_torch(np.asarray(done, dtype=np.float32), copy=False, key="dones")
+
+        if self.handle_timeout_termination:
+            timeouts = np.array([info.get("TimeLimit.truncated", False) for info in infos], dtype=np.float32)
+            self.timeouts[self.pos] = self.to_torch(timeouts, copy=False, key="timeouts")
+
+        self.pos += 1
+        if self.pos == self.buffer_size:
+            self.full = True
+            self.pos = 0
+
+    def sample(self, batch_size: int, env: Optional[VecNormalize] = None) -> ReplayBufferSamples:
+        """
+        Sample elements from the replay buffer.
+
+        :param batch_size: Number of element to sample
+        :param env: associated gym VecEnv
+            to normalize the observations/rewards when sampling
+        :return:
+        """
+        return self.sample_batches(1, batch_size, env=env)[0]
+
+    def sample_batches(
+        self, n_batches: int, batch_size: int, env: Optional[VecNormalize] = None
+    ) -> List[ReplayBufferSamples]:
+        """
+        Sample all the minibatches at once: the indices of the ``n_batches * batch_size``
+        transitions are drawn together and the data is gathered in one go,
+        each minibatch is then a view on the gathered tensors.
+
+        :param n_batches: Number of minibatches (usually ``gradient_steps``)
+        :param batch_size: Number of element per minibatch
+        :param env: associated gym VecEnv
+            to normalize the observations/rewards when sampling
+        :return: the minibatches
+        """
+        self._maybe_move_storage()
+        n_samples = n_batches * batch_size
+        if self.optimize_memory_usage and self.full:
+            # Do not sample the element with index `self.pos` as the transitions is invalid
+            # (we use only one array to store `obs` and `next_obs`)
+            batch_inds = (th.randint(1, self.buffer_size, (n_samples,), device=self.device) + self.pos) % self.buffer_size
+        else:
+            upper_bound = self.buffer_size if self.full else self.pos
+            batch_inds = th.randint(0, upper_bound, (n_samples,), device=self.device)
+        samples = self._get_samples(batch_inds, env=env)
+        return [
+            ReplayBufferSamples(*(data[start : start + batch_size] for data in samples))
+            for start in range(0, n_samples, batch_size)
+        ]
+
+    def _get_samples(  # type: ignore[override]
+        self, batch_inds: th.Tensor, env: Optional[VecNormalize] = None
+    ) -> ReplayBufferSamples:
+        # Sample randomly the env idx
+        env_indices = th.randint(0, self.n_envs, (len(batch_inds),), device=self.device)
+
+        if self.optimize_memory_usage:
+            next_obs = self.observations[(batch_inds + 1) % self.buffer_size, env_indices]
+        else:
+            next_obs = self.next_observations[batch_inds, env_indices]
+
+        return ReplayBufferSamples(
+            observations=self._normalize_obs_tensor(self.observations[batch_inds, env_indices], env),
+            actions=self.actions[batch_inds, env_indices],
+            next_observations=self._normalize_obs_tensor(next_obs, env),
+            # Only use dones that are not due to timeouts
+            # deactivated by default (timeouts is initialized as an array of False)
+            dones=(self.dones[batch_inds, env_indices] * (1 - self.timeouts[batch_inds, env_indices])).reshape(-1, 1),
+            rewards=self._normalize_reward_tensor(self.rewards[batch_inds, env_indices].reshape(-1, 1), env),
+        )
+
+    def _normalize_obs_tensor(self, obs: th.Tensor, env: Optional[VecNormalize] = None) -> th.Tensor:
+        # Same as `VecNormalize.normalize_obs()` but on the device
+        if env is None or not env.norm_obs:
+            return obs
+        assert isinstance(env.obs_rms, RunningMeanStd)
+        mean = th.as_tensor(env.obs_rms.mean, dtype=th.float32, device=self.device)
+        std = th.as_tensor(np.sqrt(env.obs_rms.var + env.epsilon), dtype=th.float32, device=self.device)
+        return th.clamp((obs.float() - mean) / std, -env.clip_obs, env.clip_obs)
+
+    @staticmethod
+    def _normalize_reward_tensor(reward: th.Tensor, env: Optional[VecNormalize] = None) -> th.Tensor:
+        # Same as `VecNormalize.normalize_reward()` but on the device
+        if env is None or not env.norm_reward:
+            return reward
+        std = float(np.sqrt(env.ret_rms.var + env.epsilon))
+        return th.clamp(reward / std, -env.clip_reward, env.clip_reward)
+
+
+class MemmapReplayBuffer(ReplayBuffer):
+    """
+    Replay buffer whose arrays are memory-mapped files (``np.memmap``)
+    so it can be larger than the available RAM: data is paged in and out by the OS on demand.
+
+    Pickling the buffer (e.g. with ``save_replay_buffer()``) only flushes the files
+    and stores the metadata, not the data itself.
+    Existing files in ``storage_dir`` are re-opened instead of being overwritten
+    (an error is raised if their size does not match),
+    and ``restore()`` can be used to resume from the metadata file written by ``flush()``.
+
+    Only non-dict observation spaces are supported.
+    Select it with ``replay_buffer_class=MemmapReplayBuffer``.
+
+    :param buffer_size: Max number of element in the buffer
+    :param observation_space: Observation space
+    :param action_space: Action space
+    :param device: PyTorch device
+    :param n_envs: Number of parallel environments
+    :param optimize_memory_usage: Enable a memory efficient variant
+        of the replay buffer which reduces by almost a factor two the memory used.
+        Cannot be used in combination with handle_timeout_termination.
+    :param handle_timeout_termination: Handle timeout termination (due to timelimit)
+        separately and treat the task as infinite horizon task.
+        https://github.com/DLR-RM/stable-baselines3/issues/284
+    :param storage_dir: Folder where the memory-mapped files are stored,
+        if None, a temporary folder is created (it is not removed automatically).
+    """
+
+    METADATA_FILE = "metadata.json"
+
+    def __init__(
+        self,
+        buffer_size: int,
+        observation_space: spaces.Space,
+        action_space: spaces.Space,
+        device: Union[th.device, str] = "auto",
+        n_envs: int = 1,
+        optimize_memory_usage: bool = False,
+        handle_timeout_termination: bool = True,
+        storage_dir: Optional[str] = None,
+    ):
+        super(ReplayBuffer, self).__init__(buffer_size, observation_space, action_space, device, n_envs=n_envs)
+        assert not isinstance(self.obs_shape, dict), "MemmapReplayBuffer does not support Dict obs space"
+
+        # Adjust buffer size
+        self.buffer_size = max(buffer_size // n_envs, 1)
+
+        if optimize_memory_usage and handle_timeout_termination:
+            raise ValueError(
+                "MemmapReplayBuffer does not support optimize_memory_usage = True "
+                "and handle_timeout_termination = True simultaneously."
+            )
+        self.optimize_memory_usage = optimize_memory_usage
+        self.handle_timeout_termination = handle_timeout_termination
+
+        if storage_dir is None:
+            storage_dir = tempfile.mkdtemp(prefix="sb3_replay_buffer_")
+        self.storage_dir = str(storage_dir)
+        self._open_storage()
+
+    def _array_specs(self) -> Dict[str, Tuple[Tuple[int, ...], np.dtype]]:
+        """
+        :return: shape and dtype of each stored array
+        """
+        shape = (self.buffer_size, self.n_envs)
+        specs = {
+            "observations": ((*shape, *self.obs_shape), np.dtype(self.observation_space.dtype)),
+            "actions": ((*shape, self.action_dim), np.dtype(self._maybe_cast_dtype(self.action_space.dtype))),
+            "rewards": (shape, np.dtype(np.float32)),
+            "dones": (shape, np.dtype(np.float32)),
+            "timeouts": (shape, np.dtype(np.float32)),
+        }
+        if not self.optimize_memory_usage:
+            # When optimizing memory, `observations` contains also the next observation
+            specs["next_observations"] = specs["observations"]
+        return specs
+
+    def _open_storage(self, must_exist: bool = False) -> None:
+        """
+        Open the memory-mapped files, existing files (e.g. when resuming training) are re-opened,
+        never overwritten.
+
+        :param must_exist: Raise an error if a file is missing instead of creating it
+            (the buffer is loaded and its data must already be on disk)
+        """
+        os.makedirs(self.storage_dir, exist_ok=True)
+        # Files created by this call, a restored buffer must not point to new (zero-filled) files
+        self._created_files: List[str] = []
+        for name, (shape, dtype) in self._array_specs().items():
+            path = os.path.join(self.storage_dir, f"{name}.dat")
+            n_bytes = int(np.prod(shape)) * dtype.itemsize
+            if os.path.isfile(path):
+                if os.path.getsize(path) != n_bytes:
+                    raise ValueError(
+                        f"{path} has a different size ({os.path.getsize(path)} bytes instead of {n_bytes}), "
+                        "it was created for a buffer with different shapes, use another `storage_dir`"
+                    )
+                mode = "r+"
+            elif must_exist:
+                raise FileNotFoundError(f"{path} not found, the data of the replay buffer is missing")
+            else:
+                mode = "w+"
+                self._created_files.append(name)
+            setattr(self, name, np.memmap(path, dtype=dtype, mode=mode, shape=shape))
+
+    def flush(self) -> None:
+        """
+        Write the pending changes to disk, together with a metadata file
+        (position in the buffer, shapes and dtypes) used by ``restore()``.
+        """
+        for name in self._array_specs():
+            getattr(self, name).flush()
+
+        metadata = {
+            "pos": self.pos,
+            "full": self.full,
+            "arrays": {name: [list(shape), dtype.str] for name, (shape, dtype) in self._array_specs().items()},
+        }
+        metadata_path = os.path.join(self.storage_dir, self.METADATA_FILE)
+        # Write to a temporary file first, so the metadata is never partially written
+        with open(f"{metadata_path}.tmp", "w") as file_handler:
+            json.dump(metadata, file_handler)
+        os.replace(f"{metadata_path}.tmp", metadata_path)
+
+    def restore(self) -> bool:
+        """
+        Restore the position in the buffer from the metadata file written by ``flush()``.
+
+        :return: True if the buffer was restored, False if no compatible metadata file was found
+        """
+        metadata_path = os.path.join(self.storage_dir, self.METADATA_FILE)
+        if not os.path.isfile(metadata_path):
+            return False
+        if self._created_files:
+            raise FileNotFoundError(
+                f"The data of the replay buffer stored in {self.storage_dir} is missing ({', '.join(self._created_files)})"
+            )
+        with open(metadata_path) as file_handler:
+            metadata = json.load(file_handler)
+        arrays = {name: [list(shape), dtype.str] for name, (shape, dtype) in self._array_specs().items()}
+        if metadata["arrays"] != arrays:
+            warnings.warn(f"The replay buffer stored in {self.storage_dir} has different shapes, it will not be restored")
+            return False
+        self.pos = metadata["pos"]
+        self.full = metadata["full"]
+        return True
+
+    def __getstate__(self) -> Dict[str, Any]:
+        # Only the metadata is pickled, the data stays in the memory-mapped files
+        self.flush()
+        state = self.__dict__.copy()
+        for name in self._array_specs():
+            del state[name]
+        return state
+
+    def __setstate__(self, state: Dict[str, Any]) -> None:
+        self.__dict__.update(state)
+        self._open_storage(must_exist=True)
+
+
+class FrameStackReplayBuffer(ReplayBuffer):
+    """
+    Replay buffer for frame-stacked observations (``VecFrameStack``) that stores each frame only once.
+    Only the newest frame of each observation is kept, the stacks (for the observation and the next observation)
+    are rebuilt at sampling time, using zeros for the frames before the start of an episode (as ``VecFrameStack``).
+    For a stack of 4 frames, this uses 8x less memory than ``ReplayBuffer``.
+
+    Terminal observations are stored separately, so unlike ``ReplayBuffer``,
+    ``optimize_memory_usage`` and ``handle_timeout_termination`` can be used together
+    (the frames are always stored only once, ``optimize_memory_usage`` has no effect).
+
+    :param buffer_size: Max number of element in the buffer
+    :param observation_space: Observation space (of the stacked observations)
+    :param action_space: Action space
+    :param device: PyTorch device
+    :param n_envs: Number of parallel environments
+    :param optimize_memory_usage: Kept for compatibility, frames are always de-duplicated
+    :param handle_timeout_termination: Handle timeout termination (due to timelimit)
+        separately and treat the task as infinite horizon task.
+        https://github.com/DLR-RM/stable-baselines3/issues/284
+    :param n_stack: Number of stacked frames
+    :param channels_order: If "first", frames are stacked on the first dimension, if "last" on the last one.
+        If None, it is detected automatically (see ``VecFrameStack``).
+    """
+
+    def __init__(
+        self,
+        buffer_size: int,
+        observation_space: spaces.Space,
+        action_space: spaces.Space,
+        device: Union[th.device, str] = "auto",
+        n_envs: int = 1,
+        optimize_memory_usage: bool = False,
+        handle_timeout_termination: bool = True,
+        n_stack: int = 4,
+        channels_order: Optional[str] = None,
+    ):
+        super(ReplayBuffer, self).__init__(buffer_size, observation_space, action_space, device, n_envs=n_envs)
+        assert isinstance(observation_space, spaces.Box), "FrameStackReplayBuffer only supports Box obs space"
+
+        # Adjust buffer size
+        self.buffer_size = max(buffer_size // n_envs, 1)
+        assert self.buffer_size > n_stack, "The buffer must be larger than the number of stacked frames"
+
+        self.optimize_memory_usage = optimize_memory_usage
+        self.handle_timeout_termination = handle_timeout_termination
+        self.n_stack = n_stack
+
+        # Stacking axis of one observation (without the batch dimension)
+        _, _, _, self.stack_axis = StackedObservations.compute_stacking(n_stack, observation_space, channels_order)
+        frame_shape = list(self.obs_shape)
+        assert frame_shape[self.stack_axis] % n_stack == 0, f"Cannot split {self.obs_shape} into {n_stack} frames"
+        frame_shape[self.stack_axis] //= n_stack
+        self.frame_shape = tuple(frame_shape)
+
+        # Newest frame of each observation, the next observation is at the next index
+        # unless the episode ended
+        self.frames = np.zeros((self.buffer_size, self.n_envs, *self.frame_shape), dtype=observation_space.dtype)
+        self.episode_starts = np.zeros((self.buffer_size, self.n_envs), dtype=bool)
+        # Newest frame of the terminal observations, indexed by (buffer index, env index)
+        self.terminal_frames: Dict[Tuple[int, int], np.ndarray] = {}
+        self._next_is_episode_start = np.ones(self.n_envs, dtype=bool)
+
+        self.actions = np.zeros(
+            (self.buffer_size, self.n_envs, self.action_dim), dtype=self._maybe_cast_dtype(action_space.dtype)
+        )
+        self.rewards = np.zeros((self.buffer_size, self.n_envs), dtype=np.float32)
+        self.dones = np.zeros((self.buffer_size, self.n_envs), dtype=np.float32)
+        self.timeouts = np.zeros((self.buffer_size, self.n_envs), dtype=np.float32)
+
+    def _newest_frame(self, obs: np.ndarray) -> np.ndarray:
+        n_channels = self.frame_shape[self.stack_axis]
+        if self.stack_axis == 0:
+            return obs[:, -n_channels:]
+        return obs[..., -n_channels:]
+
+    def _stack(self, frames: np.ndarray) -> np.ndarray:
+        """
+        :param frames: frames from the oldest to the newest, shape (batch_size, n_stack, *frame_shape)
+        :return: stacked observations, shape (batch_size, *obs_shape)
+        """
+        if self.stack_axis != 0:
+            # Put the stack dimension just before the channels
+            frames = np.moveaxis(frames, 1, -2)
+        return frames.reshape((len(frames), *self.obs_shape))
+
+    def add(
+        self,
+        obs: np.ndarray,
+        next_obs: np.ndarray,
+        action: np.ndarray,
+        reward: np.ndarray,
+        done: np.ndarray,
+        infos: List[Dict[str, Any]],
+    ) -> None:
+        # Reshape to handle multi-dim and discrete action spaces, see GH #970 #1392
+        action = action.reshape((self.n_envs, self.action_dim))
+
+        # Forget the terminal frames that are overwritten
+        for env_idx in range(self.n_envs):
+            self.terminal_frames.pop((self.pos, env_idx), None)
+
+        self.frames[self.pos] = self._newest_frame(obs)
+        self.episode_starts[self.pos] = self._next_is_episode_start
+
+        next_frames = self._newest_frame(next_obs)
+        next_pos = (self.pos + 1) % self.buffer_size
+        for env_idx in range(self.n_envs):
+            if done[env_idx]:
+                # The next stored frame will be the one of the reset observation
+                self.terminal_frames[(self.pos, env_idx)] = np.array(next_frames[env_idx])
+            else:
+                self.frames[next_pos, env_idx] = next_frames[env_idx]
+        self._next_is_episode_start = np.array(done, dtype=bool)
+
+        self.actions[self.pos] = np.array(action)
+        self.rewards[self.pos] = np.array(reward)
+        self.dones[self.pos] = np.array(done)
+
+        if self.handle_timeout_termination:
+            self.timeouts[self.pos] = np.array([info.get("TimeLimit.truncated", False) for info in infos])
+
+        self.pos += 1
+        if self.pos == self.buffer_size:
+            self.full = True
+            self.pos = 0
+
+    def sample(self, batch_size: int, env: Optional[VecNormalize] = None) -> ReplayBufferSamples:
+        """
+        Sample elements from the replay buffer.
+        When the buffer is full, the transitions that have at least one frame overwritten
+        (at index ``self.pos`` and the ``n_stack - 1`` next ones) are not sampled.
+
+        :param batch_size: Number of element to sample
+        :param env: associated gym VecEnv
+            to normalize the observations/rewards when sampling
+        :return:
+        """
+        if self.full:
+            batch_inds = (np.random.randint(self.n_stack, self.buffer_size, size=batch_size) + self.pos) % self.buffer_size
+        else:
+            batch_inds = np.random.randint(0, self.pos, size=batch_size)
+        return self._get_samples(batch_inds, env=env)
+
+    def _get_samples(self, batch_inds: np.ndarray, env: Optional[VecNormalize] = None) -> ReplayBufferSamples:
+        # Sample randomly the env idx
+        env_indices = np.random.randint(0, high=self.n_envs, size=(len(batch_inds),))
+
+        # Indices of the stacked frames, from the oldest to the newest
+        stack_inds = (batch_inds[:, None] + np.arange(-self.n_stack + 1, 1)) % self.buffer_size
+        frames = self.frames[stack_inds, env_indices[:, None]]
+        # Frames before the start of the episode are zeros (as in VecFrameStack)
+        episode_starts = self.episode_starts[stack_inds, env_indices[:, None]]
+        before_start = np.zeros_like(episode_starts)
+        before_start[:, :-1] = np.logical_or.accumulate(episode_starts[:, :0:-1], axis=1)[:, ::-1]
+        frames[before_start] = 0
+
+        # The next observation is the observation shifted by one frame
+        next_frames = self.frames[(batch_inds + 1) % self.buffer_size, env_indices]
+        for idx in np.flatnonzero(self.dones[batch_inds, env_indices]):
+            next_frames[idx] = self.terminal_frames.get((int(batch_inds[idx]), int(env_indices[idx])), next_frames[idx])
+        next_frames = np.concatenate((frames[:, 1:], next_frames[:, None]), axis=1)
+
+        data = (
+            self._normalize_obs(self._stack(frames), env),
+            self.actions[batch_inds, env_indices, :],
+            self._normalize_obs(self._stack(next_frames), env),
+            # Only use dones that are not due to timeouts
+            # deactivated by default (timeouts is initialized as an array of False)
+            (self.dones[batch_inds, env_indices] * (1 - self.timeouts[batch_inds, env_indices])).reshape(-1, 1),
+            self._normalize_reward(self.rewards[batch_inds, env_indices].reshape(-1, 1), env),
+        )
+        return ReplayBufferSamples(*self._fields_to_torch(data, ReplayBufferSamples._fields))
+
+
 class RolloutBuffer(BaseBuffer):
     """
     Rollout buffer used in on-policy algorithms like A2C/PPO.
@@ -517,7 +1141,7 @@ class RolloutBuffer(BaseBuffer):
             self.advantages[batch_inds].flatten(),
             self.returns[batch_inds].flatten(),
         )
-        return RolloutBufferSamples(*tuple(map(self.to_torch, data)))
+        return RolloutBufferSamples(*self._fields_to_torch(data, RolloutBufferSamples._fields))
 
 
 class DictReplayBuffer(ReplayBuffer):
@@ -675,21 +1299,24 @@ class DictReplayBuffer(ReplayBuffer):
 
         assert isinstance(obs_, dict)
         assert isinstance(next_obs_, dict)
-        # Convert to torch tensor
-        observations = {key: self.to_torch(obs) for key, obs in obs_.items()}
-        next_observations = {key: self.to_torch(obs) for key, obs in next_obs_.items()}
-
-        return DictReplayBufferSamples(
-            observations=observations,
-            actions=self.to_torch(self.actions[batch_inds, env_indices]),
-            next_observations=next_observations,
-            # Only use dones that are not due to timeouts
-            # deactivated by default (timeouts is initialized as an array of False)
-            dones=self.to_torch(self.dones[batch_inds, env_indices] * (1 - self.timeouts[batch_inds, env_indices])).reshape(
-                -1, 1
-            ),
-            rewards=self.to_torch(self._normalize_reward(self.rewards[batch_inds, env_indices].reshape(-1, 1), env)),
-        )
+        # Convert to torch tensor, one transfer per field, grouped in a single batch
+        with self.staging_buffer.batch():
+            observations = {key: self.to_torch(obs, key=("observations", key)) for key, obs in obs_.items()}
+            next_observations = {key: self.to_torch(obs, key=("next_observations", key)) for key, obs in next_obs_.items()}
+
+            return DictReplayBufferSamples(
+                observations=observations,
+                actions=self.to_torch(self.actions[batch_inds, env_indices], key="actions"),
+                next_observations=next_observations,
+                # Only use dones that are not due to timeouts
+                # deactivated by default (timeouts is initialized as an array of False)
+                dones=self.to_torch(
+                    self.dones[batch_inds, env_indices] * (1 - self.timeouts[batch_inds, env_indices]), key="dones"
+                ).reshape(-1, 1),
+                rewards=self.to_torch(
+                    self._normalize_reward(self.rewards[batch_inds, env_indices].reshape(-1, 1), env), key="rewards"
+                ),
+            )
 
 
 class DictRolloutBuffer(RolloutBuffer):
@@ -829,11 +1456,15 @@ class DictRolloutBuffer(RolloutBuffer):
         batch_inds: np.ndarray,
         env: Optional[VecNormalize] = None,
     ) -> DictRolloutBufferSamples:
-        return DictRolloutBufferSamples(
-            observations={key: self.to_torch(obs[batch_inds]) for (key, obs) in self.observations.items()},
-            actions=self.to_torch(self.actions[batch_inds]),
-            old_values=self.to_torch(self.values[batch_inds].flatten()),
-            old_log_prob=self.to_torch(self.log_probs[batch_inds].flatten()),
-            advantages=self.to_torch(self.advantages[batch_inds].flatten()),
-            returns=self.to_torch(self.returns[batch_inds].flatten()),
-        )
+        # One transfer per field, grouped in a single batch
+        with self.staging_buffer.batch():
+            return DictRolloutBufferSamples(
+                observations={
+                    key: self.to_torch(obs[batch_inds], key=("observations", key)) for (key, obs) in self.observations.items()
+                },
+                actions=self.to_torch(self.actions[batch_inds], key="actions"),
+                old_values=self.to_torch(self.values[batch_inds].flatten(), key="old_values"),
+                old_log_prob=self.to_torch(self.log_probs[batch_inds].flatten(), key="old_log_prob"),
+                advantages=self.to_torch(self.advantages[batch_inds].flatten(), key="advantages"),
+                returns=self.to_torch(self.returns[batch_inds].flatten(), key="returns"),
+            )
@@ -20,6 +20,7 @@ except ImportError:
     tqdm = None
 
 
+from stable_baselines3.common.checkpoint_store import CheckpointStore, should_keep_checkpoint
 from stable_baselines3.common.evaluation import evaluate_policy
 from stable_baselines3.common.vec_env import DummyVecEnv, VecEnv, sync_envs_normalization
 
@@ -257,6 +258,11 @@ class CheckpointCallback(BaseCallback):
     :param name_prefix: Common prefix to the saved models
     :param save_replay_buffer: Save the model replay buffer
     :param save_vecnormalize: Save the ``VecNormalize`` statistics
+    :param incremental: Save the model (and the ``VecNormalize`` statistics) in a ``CheckpointStore``
+        (in the ``{name_prefix}_store`` folder): a base snapshot followed by compressed deltas,
+        written in a background thread.
+    :param keep_last: Only keep the ``keep_last`` most recent checkpoints (by default, all the checkpoints are kept)
+    :param keep_every: Also keep one checkpoint every ``keep_every`` checkpoints when ``keep_last`` is set
     :param verbose: Verbosity level: 0 for no output, 2 for indicating when saving model checkpoint
     """
 
@@ -267,6 +273,9 @@ class CheckpointCallback(BaseCallback):
         name_prefix: str = "rl_model",
         save_replay_buffer: bool = False,
         save_vecnormalize: bool = False,
+        incremental: bool = False,
+        keep_last: Optional[int] = None,
+        keep_every: Optional[int] = None,
         verbose: int = 0,
     ):
         super().__init__(verbose)
@@ -275,11 +284,23 @@ class CheckpointCallback(BaseCallback):
         self.name_prefix = name_prefix
         self.save_replay_buffer = save_replay_buffer
         self.save_vecnormalize = save_vecnormalize
+        self.incremental = incremental
+        self.keep_last = keep_last
+        self.keep_every = keep_every
+        self.store: Optional[CheckpointStore] = None
+        # Timesteps of the checkpoints saved by this callback (for the retention policy)
+        self.saved_timesteps: List[int] = []
 
     def _init_callback(self) -> None:
         # Create folder if needed
         if self.save_path is not None:
             os.makedirs(self.save_path, exist_ok=True)
+        if self.incremental and self.store is None:
+            self.store = CheckpointStore(
+                os.path.join(self.save_path, f"{self.name_prefix}_store"),
+                keep_last=self.keep_last,
+                keep_every=self.keep_every,
+            )
 
     def _checkpoint_path(self, checkpoint_type: str = "", extension: str = "") -> str:
         """
@@ -292,12 +313,30 @@ class CheckpointCallback(BaseCallback):
         """
         return os.path.join(self.save_path, f"{self.name_prefix}_{checkpoint_type}{self.num_timesteps}_steps.{extension}")
 
+    def _remove_checkpoint(self, num_timesteps: int) -> None:
+        """
+        Remove the files of a checkpoint (model, replay buffer and ``VecNormalize`` statistics).
+
+        :param num_timesteps: Timesteps of the checkpoint
+        """
+        for checkpoint_type, extension in [("", "zip"), ("replay_buffer_", "pkl"), ("vecnormalize_", "pkl")]:
+            path = os.path.join(self.save_path, f"{self.name_prefix}_{checkpoint_type}{num_timesteps}_steps.{extension}")
+            if os.path.isfile(path):
+                os.remove(path)
+
     def _on_step(self) -> bool:
         if self.n_calls % self.save_freq == 0:
-            model_path = self._checkpoint_path(extension="zip")
-            self.model.save(model_path)
-            if self.verbose >= 2:
-                print(f"Saving model checkpoint to {model_path}")
+            if self.store is not None:
+                vec_normalize = self.model.get_vec_normalize_env() if self.save_vecnormalize else None
+                # Only the copy of the parameters happens here, the checkpoint is written in the background
+                self.store.save(self.model, f"{self.name_prefix}_{self.num_timesteps}_steps", vec_normalize=vec_normalize)
+                if self.verbose >= 2:
+                    print(f"Saving model checkpoint to {self.store.path}")
+            else:
+                model_path = self._checkpoint_path(extension="zip")
+                self.model.save(model_path)
+                if self.verbose >= 2:
+                    print(f"Saving model checkpoint to {model_path}")
 
             if self.save_replay_buffer and hasattr(self.model, "replay_buffer") and self.model.replay_buffer is not None:
                 # If model has a replay buffer, save it too
@@ -306,15 +345,28 @@ class CheckpointCallback(BaseCallback):
                 if self.verbose > 1:
                     print(f"Saving model replay buffer checkpoint to {replay_buffer_path}")
 
-            if self.save_vecnormalize and self.model.get_vec_normalize_env() is not None:
+            if self.save_vecnormalize and self.store is None and self.model.get_vec_normalize_env() is not None:
                 # Save the VecNormalize statistics
                 vec_normalize_path = self._checkpoint_path("vecnormalize_", extension="pkl")
                 self.model.get_vec_normalize_env().save(vec_normalize_path)  # type: ignore[union-attr]
                 if self.verbose >= 2:
                     print(f"Saving model VecNormalize to {vec_normalize_path}")
 
+            self.saved_timesteps.append(self.num_timesteps)
+            # Retention policy: the only checkpoint that may be removed is the one leaving the `keep_last` window
+            # (the checkpoint store applies the same policy to the models it contains)
+            index = len(self.saved_timesteps) - 1 - (self.keep_last or 0)
+            if self.keep_last is not None and index >= 0:
+                if not should_keep_checkpoint(index, len(self.saved_timesteps) - 1, self.keep_last, self.keep_every):
+                    self._remove_checkpoint(self.saved_timesteps[index])
+
         return True
 
+    def _on_training_end(self) -> None:
+        if self.store is not None:
+            # Make sure all the checkpoints are written
+            self.store.wait()
+
 
 class ConvertCallback(BaseCallback):
     """
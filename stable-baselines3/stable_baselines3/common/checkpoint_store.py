@@ -0,0 +1,423 @@
+"""
+Incremental checkpoint storage: a base snapshot followed by compressed deltas,
+stored in content-addressed blobs so identical data is only written once.
+"""
+
+import hashlib
+import io
+import json
+import math
+import os
+import pickle
+import queue
+import threading
+import zipfile
+import zlib
+from typing import TYPE_CHECKING, Any, Dict, List, NamedTuple, Optional, Tuple, Union
+
+import numpy as np
+import torch as th
+
+import stable_baselines3 as sb3
+from stable_baselines3.common.save_util import data_to_json
+from stable_baselines3.common.type_aliases import TensorDict
+from stable_baselines3.common.utils import get_device, get_system_info
+
+if TYPE_CHECKING:
+    from stable_baselines3.common.base_class import BaseAlgorithm
+    from stable_baselines3.common.vec_env import VecNormalize
+
+CHECKPOINT_STORE_VERSION = 1
+
+
+class _TensorRef(NamedTuple):
+    """
+    Placeholder for a tensor in the structure of a state dict.
+    """
+
+    key: str
+
+
+class _Snapshot(NamedTuple):
+    """
+    Copy of the state of a model, taken in the training thread and written by the background thread.
+    """
+
+    name: str
+    num_timesteps: int
+    data: str
+    # name -> (structure with tensor references, tensors, is an optimizer state)
+    entries: Dict[str, Tuple[Any, Dict[str, th.Tensor], bool]]
+    vec_normalize: Optional[bytes]
+
+
+def should_keep_checkpoint(index: int, last_index: int, keep_last: Optional[int], keep_every: Optional[int]) -> bool:
+    """
+    Retention policy: keep the last ``keep_last`` checkpoints plus every ``keep_every``-th checkpoint.
+
+    :param index: Index of the checkpoint (0 for the first one saved)
+    :param last_index: Index of the most recent checkpoint
+    :param keep_last: Number of most recent checkpoints to keep, keep all the checkpoints when None
+    :param keep_every: Also keep one checkpoint every ``keep_every`` checkpoints
+    :return: Whether to keep the checkpoint
+    """
+    if keep_last is None:
+        return True
+    return index > last_index - keep_last or (keep_every is not None and (index + 1) % keep_every == 0)
+
+
+def _flatten(obj: Any, prefix: str, tensors: Dict[str, th.Tensor]) -> Any:
+    """
+    Replace the tensors of a (nested) state dict with references
+    and put a cpu copy of them in ``tensors``.
+    """
+    if isinstance(obj, th.Tensor):
+        tensors[prefix] = obj.detach().to("cpu", copy=True).contiguous()
+        return _TensorRef(prefix)
+    if isinstance(obj, dict):
+        return obj.__class__((key, _flatten(value, f"{prefix}/{key}", tensors)) for key, value in obj.items())
+    if isinstance(obj, (list, tuple)):
+        return obj.__class__(_flatten(value, f"{prefix}/{idx}", tensors) for idx, value in enumerate(obj))
+    return obj
+
+
+def _unflatten(obj: Any, tensors: Dict[str, th.Tensor]) -> Any:
+    if isinstance(obj, _TensorRef):
+        return tensors[obj.key]
+    if isinstance(obj, dict):
+        return obj.__class__((key, _unflatten(value, tensors)) for key, value in obj.items())
+    if isinstance(obj, (list, tuple)):
+        return obj.__class__(_unflatten(value, tensors) for value in obj)
+    return obj
+
+
+def _shuffle(raw: np.ndarray, itemsize: int) -> bytes:
+    """
+    Group the bytes by position in the elements (all the first bytes, then all the second bytes, ...):
+    the sign/exponent bytes of the deltas are mostly zeros and compress much better together.
+    """
+    return raw.reshape(-1, itemsize).T.tobytes()
+
+
+def _unshuffle(payload: bytes, itemsize: int) -> np.ndarray:
+    return np.frombuffer(payload, dtype=np.uint8).reshape(itemsize, -1).T.reshape(-1)
+
+
+class CheckpointStore:
+    """
+    Store successive checkpoints of a model incrementally.
+
+    Every ``base_every`` checkpoints, a full snapshot (base) is written.
+    For the other checkpoints, each tensor is stored as the bitwise difference (XOR) with the same tensor in the base,
+    which is mostly made of zero bits as the parameters change slowly between checkpoints.
+    All the data is compressed and stored in content-addressed blobs,
+    so identical data (e.g. unchanged tensors, structure of the state dicts) is only written once.
+
+    The state of the model is copied to cpu in the training thread,
+    the encoding and the writing happen in a background thread (when ``async_write=True``).
+    Old checkpoints are removed according to the retention policy (see ``should_keep_checkpoint()``).
+
+    The checkpoints can be loaded with ``load_parameters()`` or exported to a regular zip-file with ``export()``.
+
+    :param path: Folder of the store
+    :param base_every: Write a full snapshot every ``base_every`` checkpoints
+    :param keep_last: Number of most recent checkpoints to keep, keep all the checkpoints when None
+    :param keep_every: Also keep one checkpoint every ``keep_every`` checkpoints
+    :param compression_level: zlib compression level
+    :param async_write: Write the checkpoints in a background thread
+    :param max_pending: Maximum number of snapshots waiting to be written (``save()`` blocks when reached)
+    """
+
+    def __init__(
+        self,
+        path: str,
+        base_every: int = 10,
+        keep_last: Optional[int] = None,
+        keep_every: Optional[int] = None,
+        compression_level: int = 6,
+        async_write: bool = True,
+        max_pending: int = 2,
+    ) -> None:
+        assert base_every > 0, "`base_every` must be positive"
+        self.path = path
+        self.blobs_path = os.path.join(path, "blobs")
+        self.manifests_path = os.path.join(path, "manifests")
+        os.makedirs(self.blobs_path, exist_ok=True)
+        os.makedirs(self.manifests_path, exist_ok=True)
+        self.base_every = base_every
+        self.keep_last = keep_last
+        self.keep_every = keep_every
+        self.compression_level = compression_level
+        self.async_write = async_write
+
+        # Base tensors: (entry name, tensor key) -> (blob hash, raw bytes, dtype)
+        self._base: Dict[Tuple[str, str], Tuple[str, np.ndarray, str]] = {}
+        self._n_since_base = 0
+        manifests = [self.read_manifest(name) for name in self.names()]
+        self._next_index = max((manifest["index"] for manifest in manifests), default=-1) + 1
+
+        self._queue: "queue.Queue[Optional[_Snapshot]]" = queue.Queue(maxsize=max_pending)
+        self._thread: Optional[threading.Thread] = None
+        self._error: Optional[BaseException] = None
+
+    def names(self) -> List[str]:
+        """
+        :return: Names of the stored checkpoints, in the order they were saved
+        """
+        names = [file_name[: -len(".json")] for file_name in os.listdir(self.manifests_path) if file_name.endswith(".json")]
+        return sorted(names, key=lambda name: self.read_manifest(name)["index"])
+
+    def read_manifest(self, name: str) -> Dict[str, Any]:
+        with open(os.path.join(self.manifests_path, f"{name}.json")) as file_handler:
+            return json.load(file_handler)
+
+    def save(self, model: "BaseAlgorithm", name: str, vec_normalize: Optional["VecNormalize"] = None) -> None:
+        """
+        Copy the state of the model and queue it to be written.
+
+        :param model: The model to save (same content as ``model.save()``)
+        :param name: Name of the checkpoint
+        :param vec_normalize: Optional ``VecNormalize`` wrapper to save with the model
+        """
+        self._check_error()
+        data, params, pytorch_variables = model._get_save_objects()
+        objects: Dict[str, Any] = dict(params)
+        if pytorch_variables is not None:
+            objects["pytorch_variables"] = pytorch_variables
+
+        entries = {}
+        for entry_name, obj in objects.items():
+            tensors: Dict[str, th.Tensor] = {}
+            structure = _flatten(obj, "", tensors)
+            is_optimizer = isinstance(obj, dict) and "param_groups" in obj
+            entries[entry_name] = (structure, tensors, is_optimizer)
+
+        snapshot = _Snapshot(
+            name=name,
+            num_timesteps=model.num_timesteps,
+            # Serialized in this thread as the model attributes keep changing during training
+            data=data_to_json(data),
+            entries=entries,
+            vec_normalize=None if vec_normalize is None else pickle.dumps(vec_normalize, protocol=pickle.HIGHEST_PROTOCOL),
+        )
+
+        if not self.async_write:
+            self._write(snapshot)
+            return
+
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, daemon=True)
+            self._thread.start()
+        self._queue.put(snapshot)
+
+    def _run(self) -> None:
+        while True:
+            snapshot = self._queue.get()
+            try:
+                if snapshot is None:
+                    return
+                if self._error is None:
+                    self._write(snapshot)
+            except BaseException as e:
+                self._error = e
+            finally:
+                self._queue.task_done()
+
+    def _check_error(self) -> None:
+        if self._error is not None:
+            raise RuntimeError(f"Error while writing a checkpoint to {self.path}") from self._error
+
+    def wait(self) -> None:
+        """
+        Wait for the pending checkpoints to be written.
+        """
+        if self._thread is not None:
+            self._queue.join()
+        self._check_error()
+
+    def close(self) -> None:
+        """
+        Write the pending checkpoints and stop the background thread.
+        """
+        if self._thread is not None:
+            self._queue.put(None)
+            self._thread.join()
+            self._thread = None
+        self._check_error()
+
+    def _blob_path(self, blob_hash: str) -> str:
+        return os.path.join(self.blobs_path, blob_hash[:2], blob_hash)
+
+    def _write_blob(self, payload: bytes) -> str:
+        """
+        Write compressed data, if not already stored.
+
+        :param payload: Uncompressed data
+        :return: Hash of the data
+        """
+        blob_hash = hashlib.blake2b(payload, digest_size=16).hexdigest()
+        blob_path = self._blob_path(blob_hash)
+        if not os.path.isfile(blob_path):
+            os.makedirs(os.path.dirname(blob_path), exist_ok=True)
+            tmp_path = f"{blob_path}.tmp"
+            with open(tmp_path, "wb") as file_handler:
+                file_handler.write(zlib.compress(payload, self.compression_level))
+            os.replace(tmp_path, blob_path)
+        return blob_hash
+
+    def _read_blob(self, blob_hash: str) -> bytes:
+        with open(self._blob_path(blob_hash), "rb") as file_handler:
+            return zlib.decompress(file_handler.read())
+
+    def _write(self, snapshot: _Snapshot) -> None:
+        new_base = len(self._base) == 0 or self._n_since_base >= self.base_every
+        if new_base:
+            self._base = {}
+            self._n_since_base = 0
+        self._n_since_base += 1
+
+        entries = {}
+        for entry_name, (structure, tensors, is_optimizer) in snapshot.entries.items():
+            tensors_info = {}
+            for key, tensor in tensors.items():
+                itemsize = tensor.element_size()
+                dtype = str(tensor.dtype).replace("torch.", "")
+                # Byte view of the tensor (also works for dtypes not supported by numpy, like bfloat16)
+                raw = tensor.reshape(-1).view(th.uint8).numpy()
+                base = self._base.get((entry_name, key))
+                if new_base or base is None or base[1].shape != raw.shape or base[2] != dtype:
+                    blob_hash = self._write_blob(_shuffle(raw, itemsize))
+                    base_hash = None
+                    if new_base:
+                        self._base[(entry_name, key)] = (blob_hash, raw, dtype)
+                else:
+                    base_hash, base_raw, _ = base
+                    blob_hash = self._write_blob(_shuffle(np.bitwise_xor(raw, base_raw), itemsize))
+                tensors_info[key] = dict(
+                    dtype=dtype,
+                    shape=list(tensor.shape),
+                    blob=blob_hash,
+                    base=base_hash,
+                )
+            entries[entry_name] = dict(
+                structure=self._write_blob(pickle.dumps(structure, protocol=pickle.HIGHEST_PROTOCOL)),
+                optimizer=is_optimizer,
+                tensors=tensors_info,
+            )
+
+        manifest = dict(
+            format_version=CHECKPOINT_STORE_VERSION,
+            sb3_version=sb3.__version__,
+            index=self._next_index,
+            num_timesteps=snapshot.num_timesteps,
+            data=self._write_blob(snapshot.data.encode()),
+            vec_normalize=None if snapshot.vec_normalize is None else self._write_blob(snapshot.vec_normalize),
+            entries=entries,
+        )
+        self._next_index += 1
+        manifest_path = os.path.join(self.manifests_path, f"{snapshot.name}.json")
+        with open(f"{manifest_path}.tmp", "w") as file_handler:
+            json.dump(manifest, file_handler)
+        os.replace(f"{manifest_path}.tmp", manifest_path)
+
+        self._apply_retention()
+
+    def _apply_retention(self) -> None:
+        if self.keep_last is None:
+            return
+        manifests = {name: self.read_manifest(name) for name in self.names()}
+        last_index = max(manifest["index"] for manifest in manifests.values())
+        removed = False
+        for name, manifest in list(manifests.items()):
+            if not should_keep_checkpoint(manifest["index"], last_index, self.keep_last, self.keep_every):
+                os.remove(os.path.join(self.manifests_path, f"{name}.json"))
+                del manifests[name]
+                removed = True
+        if removed:
+            self._remove_unused_blobs(manifests.values())
+
+    def _remove_unused_blobs(self, manifests: Any) -> None:
+        """
+        Remove the blobs that are not referenced by the remaining checkpoints.
+        """
+        used_blobs = set()
+        for manifest in manifests:
+            used_blobs.update((manifest["data"], manifest["vec_normalize"]))
+            for entry in manifest["entries"].values():
+                used_blobs.add(entry["structure"])
+                for tensor_info in entry["tensors"].values():
+                    used_blobs.update((tensor_info["blob"], tensor_info["base"]))
+        # The base of the next checkpoints must be kept too
+        used_blobs.update(blob_hash for blob_hash, _, _ in self._base.values())
+
+        for folder in os.listdir(self.blobs_path):
+            for blob_hash in os.listdir(os.path.join(self.blobs_path, folder)):
+                if blob_hash not in used_blobs:
+                    os.remove(os.path.join(self.blobs_path, folder, blob_hash))
+
+    def _read_tensor(self, tensor_info: Dict[str, Any], device: th.device) -> th.Tensor:
+        dtype = getattr(th, tensor_info["dtype"])
+        itemsize = th.empty((), dtype=dtype).element_size()
+        raw = _unshuffle(self._read_blob(tensor_info["blob"]), itemsize)
+        if tensor_info["base"] is not None:
+            raw = np.bitwise_xor(raw, _unshuffle(self._read_blob(tensor_info["base"]), itemsize))
+        if raw.size == 0:
+            return th.empty(tensor_info["shape"], dtype=dtype, device=device)
+        tensor = th.frombuffer(bytearray(raw.tobytes()), dtype=dtype, count=math.prod(tensor_info["shape"]))
+        return tensor.view(tensor_info["shape"]).to(device)
+
+    def load_parameters(
+        self, name: str, device: Union[th.device, str] = "cpu", load_optimizers: bool = True
+    ) -> Tuple[TensorDict, Optional[TensorDict]]:
+        """
+        Load the parameters of a checkpoint, without deserializing the class parameters.
+        They can then be passed to ``model.set_parameters()``.
+
+        :param name: Name of the checkpoint
+        :param device: Device on which the tensors should be loaded
+        :param load_optimizers: Whether to load the optimizer states
+        :return: State dicts (aka "params") and dict of PyTorch variables
+        """
+        device = get_device(device)
+        params = {}
+        pytorch_variables = None
+        for entry_name, entry in self.read_manifest(name)["entries"].items():
+            if entry["optimizer"] and not load_optimizers:
+                continue
+            tensors = {key: self._read_tensor(tensor_info, device) for key, tensor_info in entry["tensors"].items()}
+            obj = _unflatten(pickle.loads(self._read_blob(entry["structure"])), tensors)
+            if entry_name == "pytorch_variables":
+                pytorch_variables = obj
+            else:
+                params[entry_name] = obj
+        return params, pytorch_variables
+
+    def load_vec_normalize(self, name: str) -> Optional["VecNormalize"]:
+        """
+        :param name: Name of the checkpoint
+        :return: The ``VecNormalize`` saved with the checkpoint (without env), if any
+        """
+        blob_hash = self.read_manifest(name)["vec_normalize"]
+        if blob_hash is None:
+            return None
+        return pickle.loads(self._read_blob(blob_hash))
+
+    def export(self, name: str, path: Union[str, io.BufferedIOBase]) -> None:
+        """
+        Write a checkpoint as a regular zip-file, that can be loaded with ``model.load()``.
+
+        :param name: Name of the checkpoint
+        :param path: Path or file-like object
+        """
+        manifest = self.read_manifest(name)
+        params, pytorch_variables = self.load_parameters(name)
+        with zipfile.ZipFile(path, mode="w") as archive:
+            archive.writestr("data", self._read_blob(manifest["data"]).decode())
+            if pytorch_variables is not None:
+                with archive.open("pytorch_variables.pth", mode="w", force_zip64=True) as pytorch_variables_file:
+                    th.save(pytorch_variables, pytorch_variables_file)
+            for file_name, dict_ in params.items():
+                with archive.open(file_name + ".pth", mode="w", force_zip64=True) as param_file:
+                    th.save(dict_, param_file)
+            archive.writestr("_stable_baselines3_version", manifest["sb3_version"])
+            archive.writestr("system_info.txt", get_system_info(print_info=False)[1])
@@ -1,5 +1,6 @@
 """Probability distributions."""
 
+import math
 from abc import ABC, abstractmethod
 from typing import Any, Dict, List, Optional, Tuple, TypeVar, Union
 
@@ -21,6 +22,9 @@ SelfMultiCategoricalDistribution = TypeVar("SelfMultiCategoricalDistribution", b
 SelfBernoulliDistribution = TypeVar("SelfBernoulliDistribution", bound="BernoulliDistribution")
 SelfStateDependentNoiseDistribution = TypeVar("SelfStateDependentNoiseDistribution", bound="StateDependentNoiseDistribution")
 
+# Constant term of the log likelihood of a Gaussian
+LOG_SQRT_2PI = 0.5 * math.log(2 * math.pi)
+
 
 class Distribution(ABC):
     """Abstract base class for distributions."""
@@ -126,14 +130,36 @@ class DiagGaussianDistribution(Distribution):
     """
     Gaussian distribution with diagonal covariance matrix, for continuous actions.
 
+    The log likelihood, entropy and samples are computed in closed form from the parameters,
+    no ``torch.distributions.Normal`` is created (except when accessing ``distribution``).
+
     :param action_dim:  Dimension of the action space.
     """
 
+    mean_actions: Optional[th.Tensor]
+    log_std: Optional[th.Tensor]
+    action_std: Optional[th.Tensor]
+
     def __init__(self, action_dim: int):
         super().__init__()
         self.action_dim = action_dim
         self.mean_actions = None
         self.log_std = None
+        self.action_std = None
+
+    @property
+    def distribution(self) -> Optional[Normal]:  # type: ignore[override]
+        """
+        PyTorch distribution with the current parameters, only created on demand (e.g. by ``kl_divergence()``).
+        """
+        if self.mean_actions is None:
+            return None
+        return Normal(self.mean_actions, self.action_std, validate_args=False)
+
+    @distribution.setter
+    def distribution(self, value: None) -> None:
+        # Only reset in ``Distribution.__init__()``, the distribution is defined by its parameters
+        assert value is None, "Use `proba_distribution()` to set the parameters of the distribution"
 
     def proba_distribution_net(self, latent_dim: int, log_std_init: float = 0.0) -> Tuple[nn.Module, nn.Parameter]:
         """
@@ -160,8 +186,10 @@ class DiagGaussianDistribution(Distribution):
         :param log_std:
         :return:
         """
-        action_std = th.ones_like(mean_actions) * log_std.exp()
-        self.distribution = Normal(mean_actions, action_std)
+        self.mean_actions = mean_actions
+        # Broadcast (view, no copy) the log std to the shape of the mean
+        self.log_std = log_std.expand_as(mean_actions)
+        self.action_std = self.log_std.exp()
         return self
 
     def log_prob(self, actions: th.Tensor) -> th.Tensor:
@@ -172,18 +200,22 @@ class DiagGaussianDistribution(Distribution):
         :param actions:
         :return:
         """
-        log_prob = self.distribution.log_prob(actions)
+        assert self.mean_actions is not None and self.action_std is not None, "You must first call `proba_distribution()`"
+        log_prob = -0.5 * ((actions - self.mean_actions) / self.action_std) ** 2 - self.log_std - LOG_SQRT_2PI
         return sum_independent_dims(log_prob)
 
     def entropy(self) -> Optional[th.Tensor]:
-        return sum_independent_dims(self.distribution.entropy())
+        assert self.log_std is not None, "You must first call `proba_distribution()`"
+        return sum_independent_dims(0.5 + LOG_SQRT_2PI + self.log_std)
 
     def sample(self) -> th.Tensor:
+        assert self.mean_actions is not None and self.action_std is not None, "You must first call `proba_distribution()`"
         # Reparametrization trick to pass gradients
-        return self.distribution.rsample()
+        return self.mean_actions + self.action_std * th.randn_like(self.mean_actions)
 
     def mode(self) -> th.Tensor:
-        return self.distribution.mean
+        assert self.mean_actions is not None, "You must first call `proba_distribution()`"
+        return self.mean_actions
 
     def actions_from_params(self, mean_actions: th.Tensor, log_std: th.Tensor, deterministic: bool = False) -> th.Tensor:
         # Update the proba distribution
@@ -264,12 +296,32 @@ class CategoricalDistribution(Distribution):
     """
     Categorical distribution for discrete actions.
 
+    The log likelihood, entropy and samples are computed from the normalized logits,
+    no ``torch.distributions.Categorical`` is created (except when accessing ``distribution``).
+
     :param action_dim: Number of discrete actions
     """
 
+    logits: Optional[th.Tensor]
+
     def __init__(self, action_dim: int):
         super().__init__()
         self.action_dim = action_dim
+        self.logits = None
+
+    @property
+    def distribution(self) -> Optional[Categorical]:  # type: ignore[override]
+        """
+        PyTorch distribution with the current parameters, only created on demand (e.g. by ``kl_divergence()``).
+        """
+        if self.logits is None:
+            return None
+        return Categorical(logits=self.logits, validate_args=False)
+
+    @distribution.setter
+    def distribution(self, value: None) -> None:
+        # Only reset in ``Distribution.__init__()``, the distribution is defined by its parameters
+        assert value is None, "Use `proba_distribution()` to set the parameters of the distribution"
 
     def proba_distribution_net(self, latent_dim: int) -> nn.Module:
         """
@@ -285,20 +337,25 @@ class CategoricalDistribution(Distribution):
         return action_logits
 
     def proba_distribution(self: SelfCategoricalDistribution, action_logits: th.Tensor) -> SelfCategoricalDistribution:
-        self.distribution = Categorical(logits=action_logits)
+        # Normalized logits (log probabilities)
+        self.logits = action_logits - action_logits.logsumexp(dim=-1, keepdim=True)
         return self
 
     def log_prob(self, actions: th.Tensor) -> th.Tensor:
-        return self.distribution.log_prob(actions)
+        assert self.logits is not None, "You must first call `proba_distribution()`"
+        return self.logits.gather(-1, actions.long().unsqueeze(-1)).squeeze(-1)
 
     def entropy(self) -> th.Tensor:
-        return self.distribution.entropy()
+        assert self.logits is not None, "You must first call `proba_distribution()`"
+        return -(self.logits.exp() * self.logits).sum(dim=-1)
 
     def sample(self) -> th.Tensor:
-        return self.distribution.sample()
+        assert self.logits is not None, "You must first call `proba_distribution()`"
+        return th.multinomial(self.logits.exp(), 1).squeeze(-1)
 
     def mode(self) -> th.Tensor:
-        return th.argmax(self.distribution.probs, dim=1)
+        assert self.logits is not None, "You must first call `proba_distribution()`"
+        return th.argmax(self.logits, dim=-1)
 
     def actions_from_params(self, action_logits: th.Tensor, deterministic: bool = False) -> th.Tensor:
         # Update the proba distribution
@@ -315,12 +372,41 @@ class MultiCategoricalDistribution(Distribution):
     """
     MultiCategorical distribution for multi discrete actions.
 
+    The logits of all the sub-spaces are stored in a single (batch_size, n_sub_spaces, max_action_dim) tensor,
+    padded with the lowest float value for sub-spaces with fewer actions (their probability is zero),
+    so all the sub-spaces are processed at once, without per-dimension ``torch.distributions.Categorical``.
+
     :param action_dims: List of sizes of discrete action spaces
     """
 
+    logits: Optional[th.Tensor]
+
     def __init__(self, action_dims: List[int]):
         super().__init__()
         self.action_dims = action_dims
+        self.logits = None
+        self.max_action_dim = int(max(action_dims))
+        # Valid entries of the padded logits
+        self._logits_mask = th.arange(self.max_action_dim)[None] < th.as_tensor([int(dim) for dim in action_dims])[:, None]
+        self._is_padded = not bool(self._logits_mask.all())
+
+    @property
+    def distribution(self) -> Optional[List[Categorical]]:  # type: ignore[override]
+        """
+        PyTorch distributions (one per sub-space) with the current parameters,
+        only created on demand (e.g. by ``kl_divergence()``).
+        """
+        if self.logits is None:
+            return None
+        return [
+            Categorical(logits=self.logits[:, i, :action_dim], validate_args=False)
+            for i, action_dim in enumerate(self.action_dims)
+        ]
+
+    @distribution.setter
+    def distribution(self, value: None) -> None:
+        # Only reset in ``Distribution.__init__()``, the distribution is defined by its parameters
+        assert value is None, "Use `proba_distribution()` to set the parameters of the distribution"
 
     def proba_distribution_net(self, latent_dim: int) -> nn.Module:
         """
@@ -339,23 +425,36 @@ class MultiCategoricalDistribution(Distribution):
     def proba_distribution(
         self: SelfMultiCategoricalDistribution, action_logits: th.Tensor
     ) -> SelfMultiCategoricalDistribution:
-        self.distribution = [Categorical(logits=split) for split in th.split(action_logits, list(self.action_dims), dim=1)]
+        logits_shape = (-1, len(self.action_dims), self.max_action_dim)
+        if self._is_padded:
+            if self._logits_mask.device != action_logits.device:
+                self._logits_mask = self._logits_mask.to(action_logits.device)
+            padded_logits = action_logits.new_full((len(action_logits), *logits_shape[1:]), th.finfo(action_logits.dtype).min)
+            # The mask is broadcasted along the batch dimension, the logits are filled in order
+            logits = padded_logits.masked_scatter(self._logits_mask, action_logits)
+        else:
+            logits = action_logits.reshape(logits_shape)
+        # Normalized logits (log probabilities)
+        self.logits = logits - logits.logsumexp(dim=-1, keepdim=True)
         return self
 
     def log_prob(self, actions: th.Tensor) -> th.Tensor:
-        # Extract each discrete action and compute log prob for their respective distributions
-        return th.stack(
-            [dist.log_prob(action) for dist, action in zip(self.distribution, th.unbind(actions, dim=1))], dim=1
-        ).sum(dim=1)
+        assert self.logits is not None, "You must first call `proba_distribution()`"
+        # Log prob of each discrete action, summed over the sub-spaces
+        return self.logits.gather(-1, actions.long().unsqueeze(-1)).squeeze(-1).sum(dim=1)
 
     def entropy(self) -> th.Tensor:
-        return th.stack([dist.entropy() for dist in self.distribution], dim=1).sum(dim=1)
+        assert self.logits is not None, "You must first call `proba_distribution()`"
+        # The padded entries have zero probability and do not contribute to the entropy
+        return -(self.logits.exp() * self.logits).sum(dim=(1, 2))
 
     def sample(self) -> th.Tensor:
-        return th.stack([dist.sample() for dist in self.distribution], dim=1)
+        assert self.logits is not None, "You must first call `proba_distribution()`"
+        return th.multinomial(self.logits.exp().reshape(-1, self.max_action_dim), 1).reshape(self.logits.shape[:2])
 
     def mode(self) -> th.Tensor:
-        return th.stack([th.argmax(dist.probs, dim=1) for dist in self.distribution], dim=1)
+        assert self.logits is not None, "You must first call `proba_distribution()`"
+        return th.argmax(self.logits, dim=-1)
 
     def actions_from_params(self, action_logits: th.Tensor, deterministic: bool = False) -> th.Tensor:
         # Update the proba distribution
@@ -0,0 +1,262 @@
+"""
+Export the deterministic actor of a policy to a single TorchScript or ONNX graph,
+and run it without the rest of Stable-Baselines3 (no model to load, no distribution object).
+"""
+
+import base64
+import os
+import pathlib
+import pickle
+from typing import Any, Dict, Optional, Tuple, Union
+
+import numpy as np
+import torch as th
+from gymnasium import spaces
+from torch import nn
+
+from stable_baselines3.common.distributions import (
+    BernoulliDistribution,
+    CategoricalDistribution,
+    DiagGaussianDistribution,
+    Distribution,
+    MultiCategoricalDistribution,
+    SquashedDiagGaussianDistribution,
+    StateDependentNoiseDistribution,
+)
+from stable_baselines3.common.policies import ActorCriticPolicy, BaseModel, BasePolicy
+from stable_baselines3.common.preprocessing import is_image_space, maybe_transpose
+from stable_baselines3.common.utils import is_vectorized_observation
+
+EXPORT_FORMATS = ("torchscript", "onnx")
+# Name of the file (TorchScript) or of the metadata entry (ONNX) containing the spaces
+_SPACES_KEY = "sb3_spaces"
+
+
+def deterministic_actions(action_dist: Distribution, action_params: th.Tensor) -> th.Tensor:
+    """
+    Compute the most likely actions directly from the parameters of the action distribution,
+    without creating the underlying ``torch.distributions`` objects (equivalent to ``mode()``).
+
+    :param action_dist: The action distribution of the policy
+    :param action_params: Output of the action head: the mean actions for continuous actions,
+        the logits otherwise
+    :return: The deterministic actions
+    """
+    if isinstance(action_dist, SquashedDiagGaussianDistribution):
+        return th.tanh(action_params)
+    elif isinstance(action_dist, DiagGaussianDistribution):
+        return action_params
+    elif isinstance(action_dist, StateDependentNoiseDistribution):
+        return action_params if action_dist.bijector is None else action_dist.bijector.forward(action_params)
+    elif isinstance(action_dist, CategoricalDistribution):
+        return th.argmax(action_params, dim=1)
+    elif isinstance(action_dist, MultiCategoricalDistribution):
+        return th.stack(
+            [th.argmax(logits, dim=1) for logits in th.split(action_params, list(action_dist.action_dims), dim=1)], dim=1
+        )
+    elif isinstance(action_dist, BernoulliDistribution):
+        # Same as rounding the probabilities
+        return (action_params > 0).to(action_params.dtype)
+    raise ValueError(f"Unsupported action distribution {type(action_dist).__name__}")
+
+
+class DeterministicActor(nn.Module):
+    """
+    Deterministic forward pass of a policy, from the observation to the action sent to the environment:
+    preprocessing, features extractor, actor network, action head
+    and unscaling/clipping of the actions (as done by ``predict()``).
+
+    Actor-critic policies (A2C, PPO) and SAC-like actors compute the action from the output of the action head,
+    other policies (TD3, DQN) use their ``_predict()`` method which is already deterministic.
+
+    :param policy: The policy to export (recurrent policies are not supported)
+    """
+
+    def __init__(self, policy: BasePolicy) -> None:
+        super().__init__()
+        # Recurrent policies (sb3-contrib) need the hidden states as input
+        assert not hasattr(policy, "lstm_actor"), "Recurrent policies are not supported"
+        self.policy = policy
+        self.action_shape = policy.action_space.shape
+        self.is_box = isinstance(policy.action_space, spaces.Box)
+        self.squash_output = self.is_box and policy.squash_output
+        if self.is_box:
+            self.register_buffer("low", th.as_tensor(policy.action_space.low, dtype=th.float32))
+            self.register_buffer("high", th.as_tensor(policy.action_space.high, dtype=th.float32))
+
+    def forward(self, observation: th.Tensor) -> th.Tensor:
+        policy = self.policy
+        if isinstance(policy, ActorCriticPolicy):
+            features = BaseModel.extract_features(policy, observation, policy.pi_features_extractor)
+            latent_pi = policy.mlp_extractor.forward_actor(features)
+            actions = deterministic_actions(policy.action_dist, policy.action_net(latent_pi))
+        elif hasattr(policy, "actor") and hasattr(policy.actor, "get_action_dist_params"):
+            # SAC (and TQC) actor, the actions are squashed
+            mean_actions, _, _ = policy.actor.get_action_dist_params(observation)
+            actions = deterministic_actions(policy.actor.action_dist, mean_actions)
+        else:
+            actions = policy._predict(observation, deterministic=True)
+
+        if self.is_box:
+            if self.squash_output:
+                # Rescale to proper domain, same as `policy.unscale_action()`
+                actions = self.low + 0.5 * (actions + 1.0) * (self.high - self.low)
+            else:
+                actions = th.minimum(th.maximum(actions, self.low), self.high)
+        return actions.reshape((-1, *self.action_shape))
+
+
+def _get_format(path: Union[str, pathlib.Path], export_format: Optional[str]) -> str:
+    if export_format is None:
+        export_format = "onnx" if str(path).endswith(".onnx") else "torchscript"
+    assert export_format in EXPORT_FORMATS, f"Unknown export format {export_format}, must be one of {EXPORT_FORMATS}"
+    return export_format
+
+
+def export_policy(
+    policy: BasePolicy,
+    path: Union[str, pathlib.Path],
+    export_format: Optional[str] = None,
+    opset_version: Optional[int] = None,
+) -> None:
+    """
+    Export the deterministic actor of a policy (see ``DeterministicActor``) to a single graph.
+    The TorchScript module is traced, frozen and optimized for inference.
+    The observation and action spaces are saved with the graph, use ``ExportedPolicy`` to run it.
+
+    Example:
+
+    .. code-block:: python
+
+        export_policy(model.policy, "policy.pt")
+        policy = ExportedPolicy("policy.pt")
+        action, _ = policy.predict(obs)
+
+    :param policy: The policy to export
+    :param path: Where to save the graph
+    :param export_format: ``"torchscript"`` or ``"onnx"`` (requires the ``onnx`` package),
+        by default, ONNX is used for paths ending with ``.onnx``
+    :param opset_version: ONNX opset version, by default the one of PyTorch
+    """
+    export_format = _get_format(path, export_format)
+    assert not isinstance(policy.observation_space, spaces.Dict), "Dict observations are not supported for export"
+
+    policy.set_training_mode(False)
+    device = policy.device
+    # The actor is exported on cpu
+    actor = DeterministicActor(policy).to("cpu").eval()
+    dummy_input = th.as_tensor(np.array(policy.observation_space.sample())[None])
+    spaces_data = base64.b64encode(
+        pickle.dumps(dict(observation_space=policy.observation_space, action_space=policy.action_space))
+    ).decode()
+
+    try:
+        if export_format == "torchscript":
+            with th.no_grad():
+                traced_module = th.jit.freeze(th.jit.trace(actor, dummy_input))
+            traced_module = th.jit.optimize_for_inference(traced_module)
+            th.jit.save(traced_module, str(path), _extra_files={_SPACES_KEY: spaces_data})
+            return
+
+        try:
+            import onnx
+        except ImportError as e:
+            raise ImportError("The onnx package is required to export to ONNX: `pip install onnx`") from e
+
+        th.onnx.export(
+            actor,
+            dummy_input,
+            str(path),
+            input_names=["observation"],
+            output_names=["action"],
+            dynamic_axes={"observation": {0: "batch"}, "action": {0: "batch"}},
+            opset_version=opset_version,
+        )
+        onnx_model = onnx.load(str(path))
+        onnx.helper.set_model_props(onnx_model, {_SPACES_KEY: spaces_data})
+        onnx.save(onnx_model, str(path))
+    finally:
+        # Move the policy back to its device
+        policy.to(device)
+
+
+class ExportedPolicy:
+    """
+    Lightweight runtime for a policy exported with ``export_policy()``,
+    with the same ``predict()`` interface as the Stable-Baselines3 policies.
+    The observations are converted without copy when possible,
+    a call with a single observation of a small MLP policy takes a few tens of microseconds on cpu.
+
+    For the lowest latency, limit the number of threads (``th.set_num_threads(1)``,
+    ``session_options.intra_op_num_threads = 1`` for ONNX Runtime).
+
+    :param path: Path to the exported graph
+    :param export_format: ``"torchscript"`` or ``"onnx"`` (requires ``onnxruntime``),
+        by default, ONNX is used for paths ending with ``.onnx``
+    :param session_options: Options of the ONNX Runtime session
+    """
+
+    def __init__(
+        self,
+        path: Union[str, pathlib.Path],
+        export_format: Optional[str] = None,
+        session_options: Optional[Any] = None,
+    ) -> None:
+        self.export_format = _get_format(path, export_format)
+        assert os.path.isfile(path), f"{path} not found"
+
+        if self.export_format == "torchscript":
+            extra_files: Dict[str, Any] = {_SPACES_KEY: ""}
+            self._module = th.jit.load(str(path), map_location="cpu", _extra_files=extra_files)
+            spaces_data = extra_files[_SPACES_KEY]
+        else:
+            try:
+                import onnxruntime as ort
+            except ImportError as e:
+                raise ImportError("ONNX Runtime is required to run ONNX policies: `pip install onnxruntime`") from e
+
+            self._session = ort.InferenceSession(str(path), session_options, providers=["CPUExecutionProvider"])
+            spaces_data = self._session.get_modelmeta().custom_metadata_map[_SPACES_KEY]
+
+        saved_spaces = pickle.loads(base64.b64decode(spaces_data))
+        self.observation_space: spaces.Space = saved_spaces["observation_space"]
+        self.action_space: spaces.Space = saved_spaces["action_space"]
+        self._is_image = is_image_space(self.observation_space)
+        # Same dtype as the input used for the export
+        self._obs_dtype = np.array(self.observation_space.sample()).dtype
+
+        # The first calls of TorchScript modules are slower (profiling and optimization)
+        for _ in range(3):
+            self._forward(np.array(self.observation_space.sample())[None])
+
+    def _forward(self, observation: np.ndarray) -> np.ndarray:
+        if self.export_format == "torchscript":
+            with th.inference_mode():
+                return self._module(th.from_numpy(observation)).numpy()
+        return self._session.run(None, {"observation": observation})[0]
+
+    def predict(
+        self,
+        observation: np.ndarray,
+        state: Optional[Tuple[np.ndarray, ...]] = None,
+        episode_start: Optional[np.ndarray] = None,
+        deterministic: bool = True,
+    ) -> Tuple[np.ndarray, Optional[Tuple[np.ndarray, ...]]]:
+        """
+        Get the policy action from an observation.
+
+        :param observation: the input observation (with or without batch dimension)
+        :param state: The last hidden states, returned unchanged (the exported policies are not recurrent)
+        :param episode_start: Unused, for compatibility with the policies
+        :param deterministic: Only deterministic actions are exported
+        :return: the model's action and the (unchanged) state
+        """
+        assert deterministic, "Exported policies only predict deterministic actions"
+        observation = np.ascontiguousarray(observation, dtype=self._obs_dtype)
+        if self._is_image:
+            observation = np.ascontiguousarray(maybe_transpose(observation, self.observation_space))
+        vectorized = is_vectorized_observation(observation, self.observation_space)
+        actions = self._forward(observation.reshape((-1, *self.observation_space.shape)))  # type: ignore[misc]
+        if not vectorized:
+            actions = actions.squeeze(axis=0)
+        return actions, state
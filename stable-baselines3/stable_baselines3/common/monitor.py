@@ -1,13 +1,24 @@
-__all__ = ["Monitor", "ResultsWriter", "get_monitor_files", "load_results"]
+__all__ = [
+    "EPISODE_RECORD_DTYPE",
+    "EpisodeLogWriter",
+    "Monitor",
+    "ResultsWriter",
+    "get_monitor_files",
+    "load_binary_results",
+    "load_episode_log",
+    "load_results",
+    "load_results_streaming",
+]
 
 import csv
 import json
 import os
 import time
 from glob import glob
-from typing import Any, Dict, List, Optional, SupportsFloat, Tuple, Union
+from typing import Any, Dict, Iterable, List, Optional, SupportsFloat, Tuple, Union
 
 import gymnasium as gym
+import numpy as np
 import pandas
 from gymnasium.core import ActType, ObsType
 
@@ -24,9 +35,12 @@ class Monitor(gym.Wrapper[ObsType, ActType, ObsType, ActType]):
     :param info_keywords: extra information to log, from the information return of env.step()
     :param override_existing: appends to file if ``filename`` exists, otherwise
         override existing files (default)
+    :param binary_log: write the episode statistics to a compact binary file (``*monitor.bin``)
+        instead of a csv file, see ``EpisodeLogWriter``. ``reset_keywords`` and ``info_keywords`` are not saved in that case.
     """
 
     EXT = "monitor.csv"
+    BINARY_EXT = "monitor.bin"
 
     def __init__(
         self,
@@ -36,18 +50,23 @@ class Monitor(gym.Wrapper[ObsType, ActType, ObsType, ActType]):
         reset_keywords: Tuple[str, ...] = (),
         info_keywords: Tuple[str, ...] = (),
         override_existing: bool = True,
+        binary_log: bool = False,
     ):
         super().__init__(env=env)
         self.t_start = time.time()
-        self.results_writer = None
+        self.results_writer: Optional[Union[ResultsWriter, EpisodeLogWriter]] = None
         if filename is not None:
             env_id = env.spec.id if env.spec is not None else None
-            self.results_writer = ResultsWriter(
-                filename,
-                header={"t_start": self.t_start, "env_id": str(env_id)},
-                extra_keys=reset_keywords + info_keywords,
-                override_existing=override_existing,
-            )
+            header = {"t_start": self.t_start, "env_id": str(env_id)}
+            if binary_log:
+                self.results_writer = EpisodeLogWriter(filename, header=header, override_existing=override_existing)
+            else:
+                self.results_writer = ResultsWriter(
+                    filename,
+                    header=header,
+                    extra_keys=reset_keywords + info_keywords,
+                    override_existing=override_existing,
+                )
 
         self.reset_keywords = reset_keywords
         self.info_keywords = info_keywords
@@ -104,7 +123,9 @@ class Monitor(gym.Wrapper[ObsType, ActType, ObsType, ActType]):
             self.episode_lengths.append(ep_len)
             self.episode_times.append(time.time() - self.t_start)
             ep_info.update(self.current_reset_info)
-            if self.results_writer:
+            if isinstance(self.results_writer, EpisodeLogWriter):
+                self.results_writer.write_row({**ep_info, "timestep": self.total_steps + 1})
+            elif self.results_writer:
                 self.results_writer.write_row(ep_info)
             info["episode"] = ep_info
         self.total_steps += 1
@@ -217,14 +238,158 @@ class ResultsWriter:
         self.file_handler.close()
 
 
-def get_monitor_files(path: str) -> List[str]:
+# Fixed-width record used by the binary episode log:
+# timestep at the end of the episode, episodic return, episode length, wall time (relative to ``t_start``),
+# index of the environment and policy that generated the episode (-1 when unknown)
+EPISODE_RECORD_DTYPE = np.dtype(
+    [
+        ("timestep", "<i8"),
+        ("r", "<f8"),
+        ("l", "<i8"),
+        ("t", "<f8"),
+        ("env_idx", "<i4"),
+        ("policy", "i1"),
+    ]
+)
+_EPISODE_LOG_MAGIC = b"SB3EPLOG"
+_EPISODE_LOG_VERSION = 1
+
+
+class EpisodeLogWriter:
+    """
+    Write episode statistics to a compact binary file
+    made of a small json header followed by fixed-width records (see ``EPISODE_RECORD_DTYPE``).
+    Records are buffered and appended to the file in chunks,
+    the file can be memory-mapped with ``load_episode_log()``.
+
+    :param filename: the location to save a log file. When it does not end in
+        the string ``"monitor.bin"``, this suffix will be appended to it
+    :param header: the header dictionary object of the saved file
+    :param override_existing: appends to file if ``filename`` exists, otherwise
+        override existing files (default)
+    :param chunk_size: number of episodes to buffer before writing them to the disk
+    """
+
+    def __init__(
+        self,
+        filename: str = "",
+        header: Optional[Dict[str, Union[float, str]]] = None,
+        override_existing: bool = True,
+        chunk_size: int = 64,
+    ):
+        if header is None:
+            header = {}
+        if not filename.endswith(Monitor.BINARY_EXT):
+            if os.path.isdir(filename):
+                filename = os.path.join(filename, Monitor.BINARY_EXT)
+            else:
+                filename = filename + "." + Monitor.BINARY_EXT
+        self.filename = os.path.realpath(filename)
+        # Create (if any) missing filename directories
+        os.makedirs(os.path.dirname(self.filename), exist_ok=True)
+        write_header = override_existing or not os.path.isfile(self.filename)
+        self.file_handler = open(self.filename, "wb" if override_existing else "ab")
+        if write_header:
+            header_bytes = json.dumps({**header, "version": _EPISODE_LOG_VERSION}).encode()
+            self.file_handler.write(_EPISODE_LOG_MAGIC)
+            self.file_handler.write(np.array(len(header_bytes), dtype="<u4").tobytes())
+            self.file_handler.write(header_bytes)
+            self.file_handler.flush()
+        self.buffer = np.zeros(chunk_size, dtype=EPISODE_RECORD_DTYPE)
+        self.n_buffered = 0
+
+    def write_row(self, epinfo: Dict[str, float]) -> None:
+        """
+        Add one episode to the binary log file.
+
+        :param epinfo: the information on episodic return, length, and time,
+            and optionally on the current timestep, the environment index and the policy used
+        """
+        record = self.buffer[self.n_buffered]
+        record["timestep"] = epinfo.get("timestep", -1)
+        record["r"] = epinfo["r"]
+        record["l"] = epinfo["l"]
+        record["t"] = epinfo["t"]
+        record["env_idx"] = epinfo.get("env_idx", -1)
+        record["policy"] = epinfo.get("policy", -1)
+        self.n_buffered += 1
+        if self.n_buffered == len(self.buffer):
+            self.flush()
+
+    def flush(self) -> None:
+        """
+        Write the buffered episodes to the disk.
+        """
+        if self.n_buffered > 0:
+            self.file_handler.write(self.buffer[: self.n_buffered].tobytes())
+            self.file_handler.flush()
+            self.n_buffered = 0
+
+    def close(self) -> None:
+        """
+        Write the remaining episodes and close the file handler
+        """
+        if not self.file_handler.closed:
+            self.flush()
+            self.file_handler.close()
+
+
+def get_monitor_files(path: str, binary: bool = False) -> List[str]:
     """
     get all the monitor files in the given path
 
     :param path: the logging folder
+    :param binary: look for binary monitor files (``*monitor.bin``) instead of csv ones
     :return: the log files
     """
-    return glob(os.path.join(path, "*" + Monitor.EXT))
+    return glob(os.path.join(path, "*" + (Monitor.BINARY_EXT if binary else Monitor.EXT)))
+
+
+def load_episode_log(file_name: str) -> Tuple[Dict[str, Any], np.ndarray]:
+    """
+    Load a binary episode log written by ``EpisodeLogWriter``.
+    The records are memory-mapped, episodes that were not flushed yet are not included.
+
+    :param file_name: path to the binary log file
+    :return: the header and the records (structured array with ``EPISODE_RECORD_DTYPE``)
+    """
+    with open(file_name, "rb") as file_handler:
+        magic = file_handler.read(len(_EPISODE_LOG_MAGIC))
+        if magic != _EPISODE_LOG_MAGIC:
+            raise LoadMonitorResultsError(f"{file_name} is not a binary episode log")
+        header_size = int(np.frombuffer(file_handler.read(4), dtype="<u4")[0])
+        header = json.loads(file_handler.read(header_size))
+    offset = len(_EPISODE_LOG_MAGIC) + 4 + header_size
+    # Ignore partially written records
+    n_records = (os.path.getsize(file_name) - offset) // EPISODE_RECORD_DTYPE.itemsize
+    if n_records == 0:
+        return header, np.zeros(0, dtype=EPISODE_RECORD_DTYPE)
+    return header, np.memmap(file_name, dtype=EPISODE_RECORD_DTYPE, mode="r", offset=offset, shape=(n_records,))
+
+
+def load_binary_results(path: str) -> pandas.DataFrame:
+    """
+    Load all binary Monitor logs from a given directory path matching ``*monitor.bin``.
+    This is the equivalent of ``load_results()`` for ``Monitor(..., binary_log=True)``.
+
+    :param path: the directory path containing the log file(s)
+    :return: the logged data
+    """
+    monitor_files = get_monitor_files(path, binary=True)
+    if len(monitor_files) == 0:
+        raise LoadMonitorResultsError(f"No monitor files of the form *{Monitor.BINARY_EXT} found in {path}")
+    data_frames, t_starts = [], []
+    for file_name in monitor_files:
+        header, records = load_episode_log(file_name)
+        data_frame = pandas.DataFrame({key: np.array(records[key]) for key in EPISODE_RECORD_DTYPE.names})
+        data_frame["t"] += header["t_start"]
+        t_starts.append(header["t_start"])
+        data_frames.append(data_frame)
+    data_frame = pandas.concat(data_frames)
+    data_frame.sort_values("t", inplace=True, kind="stable")
+    data_frame.reset_index(drop=True, inplace=True)
+    data_frame["t"] -= min(t_starts)
+    return data_frame
 
 
 def load_results(path: str) -> pandas.DataFrame:
@@ -252,3 +417,185 @@ def load_results(path: str) -> pandas.DataFrame:
     data_frame.reset_index(inplace=True)
     data_frame["t"] -= min(header["t_start"] for header in headers)
     return data_frame
+
+
+def _get_cache_path(file_name: str) -> str:
+    """
+    :param file_name: path to a monitor file
+    :return: path to the binary sidecar caching its content
+    """
+    return file_name + ".npz"
+
+
+def _load_monitor_cache(file_name: str, columns: Iterable[str]) -> Optional[Tuple[float, Dict[str, np.ndarray]]]:
+    """
+    Load the cached columns of a monitor file.
+    The cache is only valid as long as the monitor file did not grow.
+
+    :param file_name: path to the monitor file
+    :param columns: columns that must be present in the cache
+    :return: ``t_start`` and the cached columns, None if the cache is missing or stale
+    """
+    cache_path = _get_cache_path(file_name)
+    if not os.path.isfile(cache_path):
+        return None
+    try:
+        with np.load(cache_path, allow_pickle=False) as cache:
+            if int(cache["csv_size"]) != os.path.getsize(file_name):
+                return None
+            t_start = float(cache["t_start"])
+            # Requested columns that were not logged in the monitor file
+            absent = set(cache["absent"].tolist())
+            cached_columns = {key[len("col_") :]: cache[key] for key in cache.files if key.startswith("col_")}
+    except (OSError, ValueError, KeyError):
+        # Corrupted or incompatible cache, it will be rebuilt
+        return None
+    if not set(columns).issubset(set(cached_columns.keys()) | absent):
+        return None
+    return t_start, cached_columns
+
+
+def _save_monitor_cache(
+    file_name: str, csv_size: int, t_start: float, data_frame: pandas.DataFrame, absent: List[str]
+) -> None:
+    """
+    Write the binary sidecar of a monitor file (only numerical columns are cached).
+
+    :param file_name: path to the monitor file
+    :param csv_size: size of the monitor file when it was parsed
+    :param t_start: start time stored in the monitor header
+    :param data_frame: parsed content of the monitor file
+    :param absent: requested columns that are not present in the monitor file
+    """
+    arrays = {}
+    for column in data_frame.columns:
+        values = data_frame[column].to_numpy()
+        if values.dtype == object:
+            # Non-numerical columns cannot be stored without pickle
+            return
+        arrays[f"col_{column}"] = values
+    cache_path = _get_cache_path(file_name)
+    tmp_path = f"{cache_path}.{os.getpid()}.tmp"
+    try:
+        with open(tmp_path, "wb") as file_handler:
+            np.savez(
+                file_handler,
+                csv_size=np.array(csv_size),
+                t_start=np.array(t_start),
+                absent=np.array(absent, dtype=str),
+                **arrays,
+            )
+        # Atomic replace, other processes may read the cache concurrently
+        os.replace(tmp_path, cache_path)
+    except OSError:
+        # Read-only log folder: skip caching
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+
+def _read_monitor_file(
+    file_name: str,
+    columns: List[str],
+    max_timesteps: Optional[int] = None,
+    use_cache: bool = True,
+    chunk_size: int = 10_000,
+) -> Tuple[float, pandas.DataFrame]:
+    """
+    Read the requested columns of one monitor file,
+    stopping after the episode where the cumulative episode length exceeds ``max_timesteps``.
+
+    :param file_name: path to the monitor file
+    :param columns: columns to read, columns missing from the file are skipped
+    :param max_timesteps: stop reading once the number of timesteps in this file exceeds this value
+    :param use_cache: whether to use (and create) the binary sidecar
+    :param chunk_size: number of rows parsed at once
+    :return: ``t_start`` from the header and the (possibly truncated) data
+    """
+    if use_cache:
+        cached = _load_monitor_cache(file_name, columns)
+        if cached is not None:
+            t_start, cached_columns = cached
+            data_frame = pandas.DataFrame({key: cached_columns[key] for key in columns if key in cached_columns})
+            if max_timesteps is not None:
+                data_frame = data_frame[data_frame.l.cumsum() - data_frame.l <= max_timesteps].reset_index(drop=True)
+            return t_start, data_frame
+
+    csv_size = os.path.getsize(file_name)
+    wanted = set(columns)
+    chunks = []
+    n_timesteps = 0
+    complete = True
+    with open(file_name) as file_handler:
+        first_line = file_handler.readline()
+        assert first_line[0] == "#"
+        t_start = json.loads(first_line[1:])["t_start"]
+        reader = pandas.read_csv(file_handler, index_col=None, usecols=lambda column: column in wanted, chunksize=chunk_size)
+        for chunk in reader:
+            if max_timesteps is not None and len(chunk) > 0:
+                cumulative_length = n_timesteps + chunk.l.cumsum()
+                if cumulative_length.iloc[-1] > max_timesteps:
+                    # Keep the episode crossing the limit, so that the filtering
+                    # on the merged data is the same as with a full read
+                    chunks.append(chunk[cumulative_length - chunk.l <= max_timesteps])
+                    complete = False
+                    break
+                n_timesteps = int(cumulative_length.iloc[-1])
+            chunks.append(chunk)
+
+    if len(chunks) > 0:
+        data_frame = pandas.concat(chunks)
+    else:
+        # No episode logged yet
+        data_frame = pandas.DataFrame({key: np.zeros(0) for key in columns})
+    data_frame.reset_index(drop=True, inplace=True)
+    # Only a complete read can be cached
+    if use_cache and complete:
+        absent = [column for column in columns if column not in data_frame.columns]
+        _save_monitor_cache(file_name, csv_size, t_start, data_frame, absent)
+    return t_start, data_frame
+
+
+def load_results_streaming(
+    path: str,
+    columns: Iterable[str] = ("r", "l", "t"),
+    max_timesteps: Optional[int] = None,
+    use_cache: bool = True,
+) -> pandas.DataFrame:
+    """
+    Load Monitor logs from a given directory path matching ``*monitor.csv``,
+    reading only the requested columns.
+
+    Each monitor file is parsed in chunks and reading stops as soon as
+    it contains more than ``max_timesteps`` timesteps.
+    Unless ``use_cache=False``, the parsed columns are stored in a binary sidecar
+    (``*monitor.csv.npz``) that is reused as long as the monitor file does not grow.
+
+    :param path: the directory path containing the log file(s)
+    :param columns: columns to load, ``"t"`` (and ``"l"`` when ``max_timesteps`` is passed)
+        are always loaded. Columns that are not logged are ignored.
+    :param max_timesteps: only keep the episodes before this number of timesteps
+        (``data_frame.l.cumsum() <= max_timesteps``)
+    :param use_cache: whether to use the binary sidecar files
+    :return: the logged data, sorted by time
+    """
+    monitor_files = get_monitor_files(path)
+    if len(monitor_files) == 0:
+        raise LoadMonitorResultsError(f"No monitor files of the form *{Monitor.EXT} found in {path}")
+
+    columns = list(dict.fromkeys(["t", *columns]))
+    if max_timesteps is not None and "l" not in columns:
+        columns.append("l")
+
+    data_frames, t_starts = [], []
+    for file_name in monitor_files:
+        t_start, data_frame = _read_monitor_file(file_name, columns, max_timesteps, use_cache)
+        data_frame["t"] += t_start
+        t_starts.append(t_start)
+        data_frames.append(data_frame)
+    data_frame = pandas.concat(data_frames)
+    data_frame.sort_values("t", inplace=True, kind="stable")
+    data_frame.reset_index(drop=True, inplace=True)
+    data_frame["t"] -= min(t_starts)
+    if max_timesteps is not None:
+        data_frame = data_frame[data_frame.l.cumsum() <= max_timesteps]
+    return data_frame
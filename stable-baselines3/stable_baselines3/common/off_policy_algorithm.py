@@ -4,19 +4,27 @@ import sys
 import time
 import warnings
 from copy import deepcopy
-from typing import Any, Dict, List, Optional, Tuple, Type, TypeVar, Union
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple, Type, TypeVar, Union
 
 import numpy as np
 import torch as th
 from gymnasium import spaces
 
 from stable_baselines3.common.base_class import BaseAlgorithm
-from stable_baselines3.common.buffers import DictReplayBuffer, ReplayBuffer
+from stable_baselines3.common.buffers import DictReplayBuffer, ReplayBuffer, map_samples
 from stable_baselines3.common.callbacks import BaseCallback
 from stable_baselines3.common.noise import ActionNoise, VectorizedActionNoise
 from stable_baselines3.common.policies import BasePolicy
 from stable_baselines3.common.save_util import load_from_pkl, save_to_pkl
-from stable_baselines3.common.type_aliases import GymEnv, MaybeCallback, RolloutReturn, Schedule, TrainFreq, TrainFrequencyUnit
+from stable_baselines3.common.type_aliases import (
+    GymEnv,
+    MaybeCallback,
+    ReplayBufferSamples,
+    RolloutReturn,
+    Schedule,
+    TrainFreq,
+    TrainFrequencyUnit,
+)
 from stable_baselines3.common.utils import safe_mean, should_collect_more_steps
 from stable_baselines3.common.vec_env import VecEnv
 from stable_baselines3.her.her_replay_buffer import HerReplayBuffer
@@ -51,6 +59,10 @@ class OffPolicyAlgorithm(BaseAlgorithm):
     :param optimize_memory_usage: Enable a memory efficient variant of the replay buffer
         at a cost of more complexity.
         See https://github.com/DLR-RM/stable-baselines3/issues/37#issuecomment-637501195
+    :param compile_train: Sample all the minibatches of a ``train()`` call as one stacked block
+        and compile the gradient step with ``torch.compile`` (and CUDA graphs) when training on GPU
+        (one step at a time: the loop over the gradient steps is not compiled).
+        On CPU, the gradient steps run eagerly. Useful with a high update-to-data ratio (``gradient_steps``).
     :param policy_kwargs: Additional arguments to be passed to the policy on creation
     :param stats_window_size: Window size for the rollout logging, specifying the number of episodes to average
         the reported success rate, mean episode length, and mean reward over
@@ -93,6 +105,7 @@ class OffPolicyAlgorithm(BaseAlgorithm):
         replay_buffer_class: Optional[Type[ReplayBuffer]] = None,
         replay_buffer_kwargs: Optional[Dict[str, Any]] = None,
         optimize_memory_usage: bool = False,
+        compile_train: bool = False,
         policy_kwargs: Optional[Dict[str, Any]] = None,
         stats_window_size: int = 100,
         tensorboard_log: Optional[str] = None,
@@ -131,10 +144,16 @@ class OffPolicyAlgorithm(BaseAlgorithm):
         self.gradient_steps = gradient_steps
         self.action_noise = action_noise
         self.optimize_memory_usage = optimize_memory_usage
+        self.compile_train = compile_train
+        # Created lazily, see _get_train_step()
+        self._compiled_train_step: Optional[Callable[..., Dict[str, th.Tensor]]] = None
         self.replay_buffer: Optional[ReplayBuffer] = None
         self.replay_buffer_class = replay_buffer_class
         self.replay_buffer_kwargs = replay_buffer_kwargs or {}
         self._episode_storage = None
+        # Training metrics accumulated on the device: name -> (sum, count),
+        # they are only transferred to the CPU when the logs are dumped
+        self._train_metrics: Dict[str, Tuple[th.Tensor, int]] = {}
 
         # Save train freq parameter, will be converted later to TrainFreq object
         self.train_freq = train_freq
@@ -145,6 +164,80 @@ class OffPolicyAlgorithm(BaseAlgorithm):
         # For gSDE only
         self.use_sde_at_warmup = use_sde_at_warmup
 
+    def _excluded_save_params(self) -> List[str]:
+        return super()._excluded_save_params() + ["_train_metrics", "_compiled_train_step"]  # noqa: RUF005
+
+    def _train_step(self, replay_data: ReplayBufferSamples, **kwargs) -> Dict[str, th.Tensor]:
+        """
+        Do one gradient step (used by ``train()``).
+
+        :param replay_data: Minibatch
+        :return: The training metrics of this step (e.g. losses), as tensors
+        """
+        raise NotImplementedError()
+
+    def _get_train_step(self) -> Callable[..., Dict[str, th.Tensor]]:
+        """
+        Only a single gradient step is compiled, ``train()`` still loops over the gradient steps in Python.
+        The backward pass and the optimizer step inside ``_train_step()`` cause graph breaks,
+        so the step is split into several compiled graphs rather than one fused graph.
+
+        :return: The gradient step function, compiled when ``compile_train=True`` and training on GPU
+        """
+        if self._compiled_train_step is None:
+            if self.compile_train and self.device.type == "cuda" and hasattr(th, "compile"):
+                # "reduce-overhead" uses CUDA graphs to reduce the cost of launching the kernels
+                self._compiled_train_step = th.compile(self._train_step, mode="reduce-overhead")
+            else:
+                # Eager fallback (e.g. on CPU)
+                self._compiled_train_step = self._train_step
+        return self._compiled_train_step
+
+    def _sample_train_batches(self, gradient_steps: int, batch_size: int) -> Iterable[ReplayBufferSamples]:
+        """
+        Sample the minibatches of a ``train()`` call.
+        With ``compile_train=True``, all the minibatches are sampled as one stacked block
+        of shape [gradient_steps, batch_size, ...] and each minibatch is a view on it.
+
+        :param gradient_steps: Number of minibatches
+        :param batch_size: Size of each minibatch
+        :return: The minibatches
+        """
+        assert self.replay_buffer is not None
+        if not self.compile_train:
+            return self.replay_buffer.sample_batches(gradient_steps, batch_size, env=self._vec_normalize_env)
+        block = self.replay_buffer.sample_block(gradient_steps, batch_size, env=self._vec_normalize_env)
+        return (map_samples(lambda data, step=step: data[step], block) for step in range(gradient_steps))
+
+    def _accumulate_train_metric(self, key: str, value: th.Tensor) -> None:
+        """
+        Accumulate a training metric (e.g. a loss) without synchronizing with the device.
+        The mean since the last dump is recorded by ``_record_train_metrics()``.
+
+        :param key: Name of the metric in the logger
+        :param value: Scalar tensor
+        """
+        value = value.detach().reshape(())
+        if key in self._train_metrics:
+            total, count = self._train_metrics[key]
+            total.add_(value)
+            self._train_metrics[key] = (total, count + 1)
+        else:
+            self._train_metrics[key] = (value.clone(), 1)
+
+    def _record_train_metrics(self) -> None:
+        """
+        Record the mean of the accumulated training metrics,
+        with a single transfer from the device.
+        """
+        if len(self._train_metrics) == 0:
+            return
+        keys = list(self._train_metrics.keys())
+        means = th.stack([total.float() / count for total, count in self._train_metrics.values()]).cpu().numpy()
+        for key, mean in zip(keys, means):
+            self.logger.record(key, float(mean))
+        self._train_metrics = {}
+
     def _convert_train_freq(self) -> None:
         """
         Convert `train_freq` parameter (int or tuple)
@@ -410,6 +503,7 @@ class OffPolicyAlgorithm(BaseAlgorithm):
         """
         Write log.
         """
+        self._record_train_metrics()
         assert self.ep_info_buffer is not None
         assert self.ep_success_buffer is not None
 
@@ -424,6 +518,10 @@ class OffPolicyAlgorithm(BaseAlgorithm):
         self.logger.record("time/total_timesteps", self.num_timesteps, exclude="tensorboard")
         if self.use_sde:
             self.logger.record("train/std", (self.actor.get_std()).mean().item())
+        if self.replay_buffer is not None:
+            staging_buffer = self.replay_buffer.staging_buffer
+            self.logger.record("staging/buffer_allocations", staging_buffer.n_allocations, exclude="tensorboard")
+            self.logger.record("staging/buffer_transfers", staging_buffer.n_transfers, exclude="tensorboard")
 
         if len(self.ep_success_buffer) > 0:
             self.logger.record("rollout/success_rate", safe_mean(self.ep_success_buffer))
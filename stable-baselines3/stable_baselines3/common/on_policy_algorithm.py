@@ -11,11 +11,14 @@ from stable_baselines3.common.buffers import DictRolloutBuffer, RolloutBuffer
 from stable_baselines3.common.callbacks import BaseCallback
 from stable_baselines3.common.policies import ActorCriticPolicy
 from stable_baselines3.common.type_aliases import GymEnv, MaybeCallback, Schedule
-from stable_baselines3.common.utils import obs_as_tensor, safe_mean
+from stable_baselines3.common.utils import StagingBuffer, obs_as_tensor, safe_mean
 from stable_baselines3.common.vec_env import VecEnv
 
 SelfOnPolicyAlgorithm = TypeVar("SelfOnPolicyAlgorithm", bound="OnPolicyAlgorithm")
 
+# Features extractor of ``ent_policy``: its own, or the one of ``policy`` (jointly trained or frozen for ``ent_policy``)
+ENT_FEATURES_EXTRACTOR_MODES = ("separate", "shared", "frozen")
+
 
 class OnPolicyAlgorithm(BaseAlgorithm):
     """
@@ -52,6 +55,11 @@ class OnPolicyAlgorithm(BaseAlgorithm):
         Setting it to auto, the code will be run on the GPU if possible.
     :param _init_setup_model: Whether or not to build the network at the creation of the instance
     :param supported_action_spaces: The action spaces supported by the algorithm.
+    :param ent_features_extractor: Whether ``ent_policy`` has its own features extractor (``"separate"``)
+        or uses the one of ``policy``: trained by the losses of both policies (``"shared"``)
+        or only by the loss of ``policy`` (``"frozen"``).
+        When shared, the features are computed once per batch of observations for both policies,
+        the mlp extractor, action and value heads stay separate.
     """
 
     rollout_buffer: RolloutBuffer
@@ -83,6 +91,7 @@ class OnPolicyAlgorithm(BaseAlgorithm):
         supported_action_spaces: Optional[Tuple[Type[spaces.Space], ...]] = None,
         ppo_mode: str = "opt",
         switch_to_ent_prob: float = 0.005,
+        ent_features_extractor: str = "separate",
     ):
         super().__init__(
             policy=policy,
@@ -114,6 +123,10 @@ class OnPolicyAlgorithm(BaseAlgorithm):
         self.switch_to_ent_prob = switch_to_ent_prob
         if self.ppo_mode == "noent":
             self.ent_coef = 0.0
+        assert (
+            ent_features_extractor in ENT_FEATURES_EXTRACTOR_MODES
+        ), f"Unknown ent_features_extractor {ent_features_extractor}, must be one of {ENT_FEATURES_EXTRACTOR_MODES}"
+        self.ent_features_extractor = ent_features_extractor
 
         if _init_setup_model:
             self._setup_model()
@@ -148,6 +161,8 @@ class OnPolicyAlgorithm(BaseAlgorithm):
             self.observation_space, self.action_space, self.lr_schedule, use_sde=self.use_sde, **self.policy_kwargs
         )
         self.ent_policy = self.ent_policy.to(self.device)
+        if self.ent_features_extractor != "separate":
+            self._share_ent_features_extractor()
 
         # if ppo_mode in ["noent", "opt"] then running ppo ignoring ent_policy
         # if ppo_mode == "dbl", then rollouts will use ent_policy
@@ -156,6 +171,29 @@ class OnPolicyAlgorithm(BaseAlgorithm):
         if self.ppo_mode == "dbl":
             self.follow_ent_policy = np.ones((self.env.num_envs,1), dtype=np.int8)
 
+        # Host memory reused to move the observations to the device at each step
+        self._obs_staging_buffer = StagingBuffer()
+
+    def _share_ent_features_extractor(self) -> None:
+        """
+        Replace the features extractor(s) of ``ent_policy`` by the ones of ``policy``
+        and re-create the optimizer of ``ent_policy`` without the shared parameters,
+        they are only updated by the optimizer of ``policy``
+        (with the gradients of both losses when ``ent_features_extractor == "shared"``).
+        """
+        self.ent_policy.features_extractor = self.policy.features_extractor
+        self.ent_policy.pi_features_extractor = self.policy.pi_features_extractor
+        self.ent_policy.vf_features_extractor = self.policy.vf_features_extractor
+        shared_params = {
+            id(param)
+            for extractor in (self.policy.pi_features_extractor, self.policy.vf_features_extractor)
+            for param in extractor.parameters()
+        }
+        self.ent_policy.optimizer = self.ent_policy.optimizer_class(
+            [param for param in self.ent_policy.parameters() if id(param) not in shared_params],
+            lr=self.lr_schedule(1),
+            **self.ent_policy.optimizer_kwargs,
+        )
 
     def collect_rollouts(
         self,
@@ -199,9 +237,15 @@ class OnPolicyAlgorithm(BaseAlgorithm):
 
             with th.no_grad():
                 # Convert to pytorch tensor or to TensorDict
-                obs_tensor = obs_as_tensor(self._last_obs, self.device)
-                actions, values, log_probs = self.policy(obs_tensor)
-                ent_actions, ent_values, ent_log_probs = self.ent_policy(obs_tensor)
+                obs_tensor = obs_as_tensor(self._last_obs, self.device, self._obs_staging_buffer)
+                if self.ent_features_extractor == "separate":
+                    actions, values, log_probs = self.policy(obs_tensor)
+                    ent_actions, ent_values, ent_log_probs = self.ent_policy(obs_tensor)
+                else:
+                    # Both policies use the same features
+                    features = self.policy.extract_features(obs_tensor)
+                    actions, values, log_probs = self.policy.forward_from_features(features)
+                    ent_actions, ent_values, ent_log_probs = self.ent_policy.forward_from_features(features)
             actions = actions.cpu().numpy()
             ent_actions = ent_actions.cpu().numpy()
 
@@ -269,7 +313,7 @@ class OnPolicyAlgorithm(BaseAlgorithm):
                     and infos[idx].get("terminal_observation") is not None
                     and infos[idx].get("TimeLimit.truncated", False)
                 ):
-                    terminal_obs = self.policy.obs_to_tensor(infos[idx]["terminal_observation"])[0]
+                    terminal_obs = self.policy.obs_to_tensor(infos[idx]["terminal_observation"], self._obs_staging_buffer)[0]
                     with th.no_grad():
                         terminal_value = self.policy.predict_values(terminal_obs)[0]  # type: ignore[arg-type]
                     rewards[idx] += self.gamma * terminal_value
@@ -291,8 +335,9 @@ class OnPolicyAlgorithm(BaseAlgorithm):
         # end of collecting rollouts
         with th.no_grad():
             # Compute value for the last timestep
-            values = self.policy.predict_values(obs_as_tensor(new_obs, self.device))  # type: ignore[arg-type]
-            ent_values = self.ent_policy.predict_values(obs_as_tensor(new_obs, self.device))  # type: ignore[arg-type]
+            new_obs_tensor = obs_as_tensor(new_obs, self.device, self._obs_staging_buffer)  # type: ignore[arg-type]
+            values = self.policy.predict_values(new_obs_tensor)  # type: ignore[arg-type]
+            ent_values = self.ent_policy.predict_values(new_obs_tensor)  # type: ignore[arg-type]
         
         follow_ent_policy_tensor = th.from_numpy(self.follow_ent_policy)
         follow_ent_policy_tensor = follow_ent_policy_tensor.to(self.device)
@@ -357,6 +402,7 @@ class OnPolicyAlgorithm(BaseAlgorithm):
                 self.logger.record("time/fps", fps)
                 self.logger.record("time/time_elapsed", int(time_elapsed), exclude="tensorboard")
                 self.logger.record("time/total_timesteps", self.num_timesteps, exclude="tensorboard")
+                self._record_staging_stats()
                 self.logger.dump(step=self.num_timesteps)
 
             self.train()
@@ -365,6 +411,18 @@ class OnPolicyAlgorithm(BaseAlgorithm):
 
         return self
 
+    def _record_staging_stats(self) -> None:
+        """
+        Log the number of host allocations and transfers done
+        to move observations and minibatches to the device.
+        """
+        for name, staging_buffer in [("obs", self._obs_staging_buffer), ("buffer", self.rollout_buffer.staging_buffer)]:
+            self.logger.record(f"staging/{name}_allocations", staging_buffer.n_allocations, exclude="tensorboard")
+            self.logger.record(f"staging/{name}_transfers", staging_buffer.n_transfers, exclude="tensorboard")
+
+    def _excluded_save_params(self) -> List[str]:
+        return [*super()._excluded_save_params(), "_obs_staging_buffer"]
+
     def _get_torch_save_params(self) -> Tuple[List[str], List[str]]:
         state_dicts = ["policy", "policy.optimizer"]
 
@@ -25,13 +25,14 @@ from stable_baselines3.common.preprocessing import get_action_dim, is_image_spac
 from stable_baselines3.common.torch_layers import (
     BaseFeaturesExtractor,
     CombinedExtractor,
+    EnsembleMlp,
     FlattenExtractor,
     MlpExtractor,
     NatureCNN,
     create_mlp,
 )
 from stable_baselines3.common.type_aliases import PyTorchObs, Schedule
-from stable_baselines3.common.utils import get_device, is_vectorized_observation, obs_as_tensor
+from stable_baselines3.common.utils import StagingBuffer, get_device, is_vectorized_observation, obs_as_tensor
 
 SelfBaseModel = TypeVar("SelfBaseModel", bound="BaseModel")
 
@@ -231,12 +232,15 @@ class BaseModel(nn.Module):
             )
         return vectorized_env
 
-    def obs_to_tensor(self, observation: Union[np.ndarray, Dict[str, np.ndarray]]) -> Tuple[PyTorchObs, bool]:
+    def obs_to_tensor(
+        self, observation: Union[np.ndarray, Dict[str, np.ndarray]], staging_buffer: Optional[StagingBuffer] = None
+    ) -> Tuple[PyTorchObs, bool]:
         """
         Convert an input observation to a PyTorch tensor that can be fed to a model.
         Includes sugar-coating to handle different observations (e.g. normalizing images).
 
         :param observation: the input observation
+        :param staging_buffer: If provided, reuse its (pinned) host memory for the transfer
         :return: The observation as PyTorch tensor
             and whether the observation is vectorized or not
         """
@@ -271,7 +275,7 @@ class BaseModel(nn.Module):
             # Add batch dimension if needed
             observation = observation.reshape((-1, *self.observation_space.shape))  # type: ignore[misc]
 
-        obs_tensor = obs_as_tensor(observation, self.device)
+        obs_tensor = obs_as_tensor(observation, self.device, staging_buffer)
         return obs_tensor, vectorized_env
 
 
@@ -641,12 +645,32 @@ class ActorCriticPolicy(BasePolicy):
         """
         # Preprocess the observation if needed
         features = self.extract_features(obs)
+        return self.forward_from_features(features, deterministic=deterministic)
+
+    def _get_latent(self, features: Union[th.Tensor, Tuple[th.Tensor, th.Tensor]]) -> Tuple[th.Tensor, th.Tensor]:
+        """
+        Get the latent codes of the actor and of the critic.
+
+        :param features: Output of ``extract_features()``
+        :return: latent_pi, latent_vf
+        """
         if self.share_features_extractor:
-            latent_pi, latent_vf = self.mlp_extractor(features)
-        else:
-            pi_features, vf_features = features
-            latent_pi = self.mlp_extractor.forward_actor(pi_features)
-            latent_vf = self.mlp_extractor.forward_critic(vf_features)
+            return self.mlp_extractor(features)
+        pi_features, vf_features = features
+        return self.mlp_extractor.forward_actor(pi_features), self.mlp_extractor.forward_critic(vf_features)
+
+    def forward_from_features(
+        self, features: Union[th.Tensor, Tuple[th.Tensor, th.Tensor]], deterministic: bool = False
+    ) -> Tuple[th.Tensor, th.Tensor, th.Tensor]:
+        """
+        Same as ``forward()`` but with features already extracted from the observation,
+        so they can be computed once for several policies sharing a features extractor.
+
+        :param features: Output of ``extract_features()``
+        :param deterministic: Whether to sample or use deterministic actions
+        :return: action, value and log probability of the action
+        """
+        latent_pi, latent_vf = self._get_latent(features)
         # Evaluate the values for the given observations
         values = self.value_net(latent_vf)
         distribution = self._get_action_dist_from_latent(latent_pi)
@@ -726,12 +750,20 @@ class ActorCriticPolicy(BasePolicy):
         """
         # Preprocess the observation if needed
         features = self.extract_features(obs)
-        if self.share_features_extractor:
-            latent_pi, latent_vf = self.mlp_extractor(features)
-        else:
-            pi_features, vf_features = features
-            latent_pi = self.mlp_extractor.forward_actor(pi_features)
-            latent_vf = self.mlp_extractor.forward_critic(vf_features)
+        return self.evaluate_actions_from_features(features, actions)
+
+    def evaluate_actions_from_features(
+        self, features: Union[th.Tensor, Tuple[th.Tensor, th.Tensor]], actions: th.Tensor
+    ) -> Tuple[th.Tensor, th.Tensor, Optional[th.Tensor]]:
+        """
+        Same as ``evaluate_actions()`` but with features already extracted from the observations.
+
+        :param features: Output of ``extract_features()``
+        :param actions: Actions
+        :return: estimated value, log likelihood of taking those actions
+            and entropy of the action distribution.
+        """
+        latent_pi, latent_vf = self._get_latent(features)
         distribution = self._get_action_dist_from_latent(latent_pi)
         log_prob = distribution.log_prob(actions)
         values = self.value_net(latent_vf)
@@ -932,6 +964,8 @@ class ContinuousCritic(BaseModel):
     :param n_critics: Number of critic networks to create.
     :param share_features_extractor: Whether the features extractor is shared or not
         between the actor and the critic (this saves computation time)
+    :param ensemble_critics: Whether to evaluate all the critic networks as one batched network
+        (see ``EnsembleMlp``), this is faster but the parameters are not stored per network.
     """
 
     features_extractor: BaseFeaturesExtractor
@@ -947,6 +981,7 @@ class ContinuousCritic(BaseModel):
         normalize_images: bool = True,
         n_critics: int = 2,
         share_features_extractor: bool = True,
+        ensemble_critics: bool = False,
     ):
         super().__init__(
             observation_space,
@@ -959,14 +994,20 @@ class ContinuousCritic(BaseModel):
 
         self.share_features_extractor = share_features_extractor
         self.n_critics = n_critics
+        self.ensemble_critics = ensemble_critics
         self.q_networks: List[nn.Module] = []
-        for idx in range(n_critics):
-            q_net_list = create_mlp(features_dim + action_dim, 1, net_arch, activation_fn)
-            q_net = nn.Sequential(*q_net_list)
-            self.add_module(f"qf{idx}", q_net)
-            self.q_networks.append(q_net)
+        if ensemble_critics:
+            self.qf_ensemble = EnsembleMlp(n_critics, features_dim + action_dim, 1, net_arch, activation_fn)
+        else:
+            for idx in range(n_critics):
+                q_net_list = create_mlp(features_dim + action_dim, 1, net_arch, activation_fn)
+                q_net = nn.Sequential(*q_net_list)
+                self.add_module(f"qf{idx}", q_net)
+                self.q_networks.append(q_net)
 
     def forward(self, obs: th.Tensor, actions: th.Tensor) -> Tuple[th.Tensor, ...]:
+        if self.ensemble_critics:
+            return tuple(self.q_values(obs, actions).split(1, dim=1))
         # Learn the features extractor using the policy loss only
         # when the features_extractor is shared with the actor
         with th.set_grad_enabled(not self.share_features_extractor):
@@ -974,6 +1015,21 @@ class ContinuousCritic(BaseModel):
         qvalue_input = th.cat([features, actions], dim=1)
         return tuple(q_net(qvalue_input) for q_net in self.q_networks)
 
+    def q_values(self, obs: th.Tensor, actions: th.Tensor) -> th.Tensor:
+        """
+        Predict the Q-values of all the critic networks.
+
+        :param obs:
+        :param actions:
+        :return: Q-values, of shape (batch_size, n_critics)
+        """
+        if not self.ensemble_critics:
+            return th.cat(self(obs, actions), dim=1)
+        with th.set_grad_enabled(not self.share_features_extractor):
+            features = self.extract_features(obs, self.features_extractor)
+        # (n_critics, batch_size, 1) -> (batch_size, n_critics)
+        return self.qf_ensemble(th.cat([features, actions], dim=1)).squeeze(-1).T
+
     def q1_forward(self, obs: th.Tensor, actions: th.Tensor) -> th.Tensor:
         """
         Only predict the Q-value using the first network.
@@ -982,4 +1038,6 @@ class ContinuousCritic(BaseModel):
         """
         with th.no_grad():
             features = self.extract_features(obs, self.features_extractor)
+        if self.ensemble_critics:
+            return self.qf_ensemble(th.cat([features, actions], dim=1), member=0)
         return self.q_networks[0](th.cat([features, actions], dim=1))
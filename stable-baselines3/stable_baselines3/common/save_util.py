@@ -6,12 +6,16 @@ import base64
 import functools
 import io
 import json
+import math
+import mmap
 import os
 import pathlib
 import pickle
+import struct
 import warnings
 import zipfile
-from typing import Any, Dict, Optional, Tuple, Union
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Tuple, Union
 
 import cloudpickle
 import torch as th
@@ -462,3 +466,220 @@ def load_from_zip_file(
         if isinstance(load_path, (str, pathlib.Path)):
             file.close()
     return data, params, pytorch_variables
+
+
+# Tensor file: uncompressed and aligned tensors that can be memory-mapped,
+# described by a JSON manifest (similar to the safetensors format)
+TENSOR_FILE_MAGIC = b"SB3TENS\x00"
+TENSOR_FILE_VERSION = 1
+# Alignment (in bytes) of the header and of each tensor
+TENSOR_FILE_ALIGNMENT = 64
+# Fixed size part of the header: magic + length of the manifest
+_TENSOR_FILE_PREFIX = struct.Struct(f"<{len(TENSOR_FILE_MAGIC)}sQ")
+
+
+def _is_flat_tensor_dict(dict_: Optional[Dict[str, Any]]) -> bool:
+    return dict_ is not None and all(isinstance(value, th.Tensor) for value in dict_.values())
+
+
+def is_tensor_file(path: Union[str, pathlib.Path, io.BufferedIOBase]) -> bool:
+    """
+    Check if a file was saved with ``save_to_tensor_file()`` (and not as a zip archive).
+
+    :param path: Path to the file
+    :return: True if the file starts with the tensor file header
+    """
+    if not isinstance(path, (str, pathlib.Path)) or not os.path.isfile(path):
+        return False
+    with open(path, "rb") as file_handler:
+        return file_handler.read(len(TENSOR_FILE_MAGIC)) == TENSOR_FILE_MAGIC
+
+
+def save_to_tensor_file(
+    save_path: Union[str, pathlib.Path],
+    data: Optional[Dict[str, Any]] = None,
+    params: Optional[Dict[str, Any]] = None,
+    pytorch_variables: Optional[Dict[str, Any]] = None,
+) -> None:
+    """
+    Save model data to a tensor file.
+    Unlike the zip archive, the tensors are stored uncompressed and aligned
+    so they can be memory-mapped and loaded lazily (see ``TensorFile``).
+    State dicts that are not only made of tensors (optimizers) are stored with ``th.save()``.
+
+    :param save_path: Where to store the model.
+    :param data: Class parameters being stored (non-PyTorch variables)
+    :param params: Model parameters being stored expected to contain an entry for every
+                   state_dict with its name and the state_dict.
+    :param pytorch_variables: Other PyTorch variables expected to contain name and value of the variable.
+    """
+    entries = dict(params or {})
+    if pytorch_variables is not None:
+        entries["pytorch_variables"] = pytorch_variables
+
+    # Collect the bytes to write and compute their offsets (relative to the data section)
+    blobs = []
+    offset = 0
+    manifest_entries: Dict[str, Any] = {}
+    for name, dict_ in entries.items():
+        if _is_flat_tensor_dict(dict_):
+            tensors = {}
+            for key, tensor in dict_.items():
+                tensor = tensor.detach().cpu().contiguous()
+                # Byte view of the tensor (also works for dtypes not supported by numpy, like bfloat16)
+                buffer = tensor.reshape(-1).view(th.uint8).numpy()
+                tensors[key] = dict(
+                    dtype=str(tensor.dtype).replace("torch.", ""),
+                    shape=list(tensor.shape),
+                    offsets=[offset, offset + buffer.nbytes],
+                )
+                blobs.append((offset, buffer))
+                offset += -(-buffer.nbytes // TENSOR_FILE_ALIGNMENT) * TENSOR_FILE_ALIGNMENT
+            manifest_entries[name] = dict(kind="tensors", tensors=tensors)
+        else:
+            buffer_io = io.BytesIO()
+            th.save(dict_, buffer_io)
+            buffer = buffer_io.getbuffer()
+            manifest_entries[name] = dict(
+                kind="torch",
+                # Optimizer states are not needed for prediction
+                optimizer=isinstance(dict_, dict) and "param_groups" in dict_,
+                offsets=[offset, offset + buffer.nbytes],
+            )
+            blobs.append((offset, buffer))
+            offset += -(-buffer.nbytes // TENSOR_FILE_ALIGNMENT) * TENSOR_FILE_ALIGNMENT
+
+    manifest = dict(
+        format_version=TENSOR_FILE_VERSION,
+        sb3_version=sb3.__version__,
+        # Class parameters, same serialization as in the zip archive
+        data=None if data is None else data_to_json(data),
+        entries=manifest_entries,
+    )
+    header = json.dumps(manifest).encode()
+    # Pad the header so the data section is aligned
+    header_size = _TENSOR_FILE_PREFIX.size + len(header)
+    header += b" " * (-header_size % TENSOR_FILE_ALIGNMENT)
+
+    save_path = pathlib.Path(save_path)
+    save_path.parent.mkdir(exist_ok=True, parents=True)
+    with open(save_path, "wb") as file_handler:
+        file_handler.write(_TENSOR_FILE_PREFIX.pack(TENSOR_FILE_MAGIC, len(header)))
+        file_handler.write(header)
+        data_start = file_handler.tell()
+        for blob_offset, buffer in blobs:
+            # Padding
+            file_handler.seek(data_start + blob_offset)
+            file_handler.write(buffer)
+        # Make sure the file size matches the padded offsets
+        file_handler.truncate(data_start + offset)
+
+
+class TensorFile:
+    """
+    Read a file saved with ``save_to_tensor_file()``.
+    Only the manifest is read when opening the file, the file is then memory-mapped:
+    the tensors are created without copy (on cpu) and read from disk only when used,
+    so loading only some of the entries (e.g. only the policy) is cheap.
+
+    :param path: Path to the file
+    """
+
+    def __init__(self, path: Union[str, pathlib.Path]) -> None:
+        with open(path, "rb") as file_handler:
+            magic, header_length = _TENSOR_FILE_PREFIX.unpack(file_handler.read(_TENSOR_FILE_PREFIX.size))
+            if magic != TENSOR_FILE_MAGIC:
+                raise ValueError(f"Error: the file {path} is not a tensor file")
+            manifest = json.loads(file_handler.read(header_length).decode())
+            # Copy-on-write mapping: the tensors are writable without modifying the file
+            self._mmap = mmap.mmap(file_handler.fileno(), 0, access=mmap.ACCESS_COPY)
+
+        if manifest["format_version"] > TENSOR_FILE_VERSION:
+            raise ValueError(f"Unsupported tensor file version {manifest['format_version']}, please upgrade SB3")
+        self.path = path
+        self.manifest = manifest
+        self.data_start = _TENSOR_FILE_PREFIX.size + header_length
+
+    @property
+    def sb3_version(self) -> str:
+        return self.manifest["sb3_version"]
+
+    def names(self, include_optimizers: bool = True) -> List[str]:
+        """
+        :param include_optimizers: Whether to include the optimizer states
+        :return: Names of the stored state dicts (and "pytorch_variables")
+        """
+        return [
+            name
+            for name, entry in self.manifest["entries"].items()
+            if include_optimizers or not entry.get("optimizer", False)
+        ]
+
+    def load_data(self, custom_objects: Optional[Dict[str, Any]] = None) -> Optional[Dict[str, Any]]:
+        """
+        Deserialize the class parameters.
+
+        :param custom_objects: Dictionary of objects to replace upon loading (see ``json_to_data()``)
+        :return: Class parameters
+        """
+        if self.manifest["data"] is None:
+            return None
+        return json_to_data(self.manifest["data"], custom_objects=custom_objects)
+
+    def _get_tensor(self, tensor_info: Dict[str, Any], device: th.device) -> th.Tensor:
+        dtype = getattr(th, tensor_info["dtype"])
+        begin, end = tensor_info["offsets"]
+        if begin == end:
+            # th.frombuffer() does not support empty buffers
+            return th.empty(tensor_info["shape"], dtype=dtype, device=device)
+        tensor = th.frombuffer(self._mmap, dtype=dtype, count=math.prod(tensor_info["shape"]), offset=self.data_start + begin)
+        return tensor.view(tensor_info["shape"]).to(device)
+
+    def load(self, name: str, device: Union[th.device, str] = "cpu") -> Any:
+        """
+        Load one entry.
+
+        :param name: Name of the state dict (or "pytorch_variables")
+        :param device: Device on which the tensors should be loaded
+        :return: The state dict (or the dict of PyTorch variables)
+        """
+        device = get_device(device)
+        entry = self.manifest["entries"][name]
+        if entry["kind"] == "tensors":
+            return OrderedDict(
+                (key, self._get_tensor(tensor_info, device)) for key, tensor_info in entry["tensors"].items()
+            )
+        begin, end = entry["offsets"]
+        start = self.data_start + begin
+        return th.load(io.BytesIO(self._mmap[start : self.data_start + end]), map_location=device)
+
+
+def load_from_tensor_file(
+    load_path: Union[str, pathlib.Path],
+    load_data: bool = True,
+    custom_objects: Optional[Dict[str, Any]] = None,
+    device: Union[th.device, str] = "auto",
+    load_optimizers: bool = True,
+) -> Tuple[Optional[Dict[str, Any]], TensorDict, Optional[TensorDict]]:
+    """
+    Load model data from a tensor file, same outputs as ``load_from_zip_file()``.
+    The class parameters (``data``) are only deserialized (with cloudpickle) when ``load_data=True``.
+
+    :param load_path: Where to load the model from
+    :param load_data: Whether we should load and return data (class parameters).
+    :param custom_objects: Dictionary of objects to replace upon loading (see ``load_from_zip_file()``)
+    :param device: Device on which the code should run.
+    :param load_optimizers: Whether to load the optimizer states, not needed for prediction
+    :return: Class parameters, model state_dicts (aka "params", dict of state_dict)
+        and dict of pytorch variables
+    """
+    tensor_file = TensorFile(load_path)
+    data = tensor_file.load_data(custom_objects) if load_data else None
+    params = {}
+    pytorch_variables = None
+    for name in tensor_file.names(include_optimizers=load_optimizers):
+        if name == "pytorch_variables":
+            pytorch_variables = tensor_file.load(name, device)
+        else:
+            params[name] = tensor_file.load(name, device)
+    return data, params, pytorch_variables
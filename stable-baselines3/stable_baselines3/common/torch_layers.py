@@ -1,4 +1,5 @@
-from typing import Dict, List, Tuple, Type, Union
+import math
+from typing import Dict, List, Optional, Tuple, Type, Union
 
 import gymnasium as gym
 import torch as th
@@ -148,6 +149,91 @@ def create_mlp(
     return modules
 
 
+class EnsembleLinear(nn.Module):
+    """
+    ``n_members`` independent linear layers evaluated with one batched matrix multiplication.
+    Each member is initialized like ``nn.Linear``.
+
+    :param n_members: Number of members of the ensemble
+    :param in_features: Size of each input sample
+    :param out_features: Size of each output sample
+    """
+
+    def __init__(self, n_members: int, in_features: int, out_features: int):
+        super().__init__()
+        self.n_members = n_members
+        self.in_features = in_features
+        self.out_features = out_features
+        self.weight = nn.Parameter(th.empty(n_members, in_features, out_features))
+        self.bias = nn.Parameter(th.empty(n_members, 1, out_features))
+        self.reset_parameters()
+
+    def reset_parameters(self) -> None:
+        # Same distribution as the default init of nn.Linear
+        bound = 1 / math.sqrt(self.in_features) if self.in_features > 0 else 0
+        nn.init.uniform_(self.weight, -bound, bound)
+        nn.init.uniform_(self.bias, -bound, bound)
+
+    def forward(self, x: th.Tensor, member: Optional[int] = None) -> th.Tensor:
+        """
+        :param x: Input of shape (n_members, batch_size, in_features)
+            or (batch_size, in_features) when ``member`` is given
+        :param member: Only evaluate this member of the ensemble
+        :return: Output of shape (n_members, batch_size, out_features)
+            or (batch_size, out_features) when ``member`` is given
+        """
+        if member is not None:
+            return th.addmm(self.bias[member], x, self.weight[member])
+        return th.baddbmm(self.bias, x, self.weight)
+
+    def extra_repr(self) -> str:
+        return f"n_members={self.n_members}, in_features={self.in_features}, out_features={self.out_features}"
+
+
+class EnsembleMlp(nn.Module):
+    """
+    Ensemble of ``n_members`` MLPs with the same architecture (see ``create_mlp()``),
+    evaluated in one pass using batched matrix multiplications.
+
+    :param n_members: Number of MLPs
+    :param input_dim: Dimension of the input vector
+    :param output_dim: Dimension of the output of each MLP
+    :param net_arch: Architecture of the neural net
+    :param activation_fn: The activation function to use after each layer.
+    """
+
+    def __init__(
+        self,
+        n_members: int,
+        input_dim: int,
+        output_dim: int,
+        net_arch: List[int],
+        activation_fn: Type[nn.Module] = nn.ReLU,
+    ):
+        super().__init__()
+        self.n_members = n_members
+        layer_dims = [input_dim, *net_arch, output_dim]
+        self.layers = nn.ModuleList(
+            [EnsembleLinear(n_members, in_dim, out_dim) for in_dim, out_dim in zip(layer_dims[:-1], layer_dims[1:])]
+        )
+        self.activation = activation_fn()
+
+    def forward(self, x: th.Tensor, member: Optional[int] = None) -> th.Tensor:
+        """
+        :param x: Input of shape (batch_size, input_dim), shared by all members
+        :param member: Only evaluate this member of the ensemble
+        :return: Output of shape (n_members, batch_size, output_dim)
+            or (batch_size, output_dim) when ``member`` is given
+        """
+        if member is None:
+            x = x.unsqueeze(0).expand(self.n_members, *x.shape)
+        for idx, layer in enumerate(self.layers):
+            x = layer(x, member)
+            if idx < len(self.layers) - 1:
+                x = self.activation(x)
+        return x
+
+
 class MlpExtractor(nn.Module):
     """
     Constructs an MLP that receives the output from a previous features extractor (i.e. a CNN) or directly
@@ -4,8 +4,9 @@ import platform
 import random
 import re
 from collections import deque
+from contextlib import contextmanager
 from itertools import zip_longest
-from typing import Dict, Iterable, List, Optional, Tuple, Union
+from typing import Dict, Hashable, Iterable, Iterator, List, Optional, Set, Tuple, Union
 
 import cloudpickle
 import gymnasium as gym
@@ -466,19 +467,149 @@ def polyak_update(
     """
     with th.no_grad():
         # zip does not raise an exception if length of parameters does not match.
-        for param, target_param in zip_strict(params, target_params):
-            target_param.data.mul_(1 - tau)
-            th.add(target_param.data, param.data, alpha=tau, out=target_param.data)
+        pairs = [(param.data, target_param.data) for param, target_param in zip_strict(params, target_params)]
+        if len(pairs) == 0:
+            return
+        source_tensors, target_tensors = (list(tensors) for tensors in zip(*pairs))
+        if all(tensor.is_floating_point() for tensor in target_tensors):
+            # Update all the parameters with a few batched kernels instead of two per parameter
+            th._foreach_mul_(target_tensors, 1 - tau)
+            th._foreach_add_(target_tensors, source_tensors, alpha=tau)
+        else:
+            for param, target_param in pairs:
+                target_param.mul_(1 - tau)
+                th.add(target_param, param, alpha=tau, out=target_param)
+
+
+class StagingBuffer:
+    """
+    Reusable host memory to move numpy arrays (observations, minibatches) to a PyTorch device
+    without allocating new host tensors at every call.
+
+    On CPU, arrays are wrapped with ``th.from_numpy()`` (no copy) when possible.
+    On CUDA, arrays are copied into a pinned host tensor, allocated once per key, shape and dtype
+    and reused across calls, before being copied to the device with ``non_blocking=True``.
+
+    The transfers of the fields of a batch can be grouped with ``batch()``:
+    the staging memory is then waited for once per batch, instead of before each copy.
+
+    The number of host allocations and of transfers are kept in ``n_allocations``
+    and ``n_transfers`` (they are reported in the logs).
+    """
+
+    def __init__(self) -> None:
+        self.n_allocations = 0
+        self.n_transfers = 0
+        self._pinned_buffers: Dict[Tuple[Hashable, Tuple[int, ...], th.dtype], Tuple[th.Tensor, "th.cuda.Event"]] = {}
+        # Event recorded after the last copy, and keys used in the current batch (None outside of a batch)
+        self._last_copy_done: Optional["th.cuda.Event"] = None
+        self._batch_keys: Optional[Set[Tuple[Hashable, Tuple[int, ...], th.dtype]]] = None
+
+    def __getstate__(self) -> Dict:
+        # Pinned memory and CUDA events cannot be pickled, they are re-allocated when needed
+        state = self.__dict__.copy()
+        state["_pinned_buffers"] = {}
+        state["_last_copy_done"] = None
+        state["_batch_keys"] = None
+        return state
+
+    @contextmanager
+    def batch(self) -> Iterator[None]:
+        """
+        Group the transfers of a batch (one per field, each with its own key):
+        the copies of the previous transfers are waited for once, at the start of the batch,
+        and the copies of the batch are then issued without waiting.
+        """
+        if self._last_copy_done is not None:
+            self._last_copy_done.synchronize()
+        self._batch_keys = set()
+        try:
+            yield
+        finally:
+            self._batch_keys = None
+
+    def to_tensor(self, array: np.ndarray, device: th.device, key: Hashable = None, copy: bool = False) -> th.Tensor:
+        """
+        Convert a numpy array to a PyTorch tensor on the given device.
+
+        :param array:
+        :param device: PyTorch device
+        :param key: Name of the array (ex: observation key), arrays with the same key,
+            shape and dtype share the same staging memory
+        :param copy: Whether to copy the data when the device is the CPU
+            (otherwise the tensor shares its memory with the numpy array)
+        :return: PyTorch tensor on the desired device
+        """
+        self.n_transfers += 1
+        array = np.asarray(array)
+        try:
+            host_tensor = th.from_numpy(array)
+        except (TypeError, ValueError):
+            # Negative strides or dtype not supported by from_numpy
+            self.n_allocations += 1
+            host_tensor = th.as_tensor(np.ascontiguousarray(array))
+
+        if device.type == "cpu":
+            if copy:
+                self.n_allocations += 1
+                return host_tensor.clone()
+            return host_tensor
+
+        if device.type != "cuda":
+            # Pinned memory is only available with CUDA
+            return host_tensor.to(device)
+
+        buffer_key = (key, tuple(host_tensor.shape), host_tensor.dtype)
+        if buffer_key not in self._pinned_buffers:
+            self.n_allocations += 1
+            pinned_tensor = th.empty(host_tensor.shape, dtype=host_tensor.dtype, pin_memory=True)
+            self._pinned_buffers[buffer_key] = (pinned_tensor, th.cuda.Event())
+        pinned_tensor, copy_done = self._pinned_buffers[buffer_key]
+        # The previous asynchronous copy must be done before overwriting the staging memory,
+        # in a batch, it was already waited for at the start of the batch (unless the key is used twice)
+        if self._batch_keys is None or buffer_key in self._batch_keys:
+            copy_done.synchronize()
+        if self._batch_keys is not None:
+            self._batch_keys.add(buffer_key)
+        pinned_tensor.copy_(host_tensor)
+        device_tensor = pinned_tensor.to(device, non_blocking=True)
+        copy_done.record()
+        self._last_copy_done = copy_done
+        return device_tensor
+
+    def obs_to_tensor(
+        self, obs: Union[np.ndarray, Dict[str, np.ndarray]], device: th.device
+    ) -> Union[th.Tensor, TensorDict]:
+        """
+        Moves the observation to the given device.
+
+        :param obs:
+        :param device: PyTorch device
+        :return: PyTorch tensor of the observation on a desired device.
+        """
+        if isinstance(obs, np.ndarray):
+            return self.to_tensor(obs, device)
+        elif isinstance(obs, dict):
+            return {key: self.to_tensor(_obs, device, key=key) for (key, _obs) in obs.items()}
+        else:
+            raise Exception(f"Unrecognized type of observation {type(obs)}")
 
 
-def obs_as_tensor(obs: Union[np.ndarray, Dict[str, np.ndarray]], device: th.device) -> Union[th.Tensor, TensorDict]:
+def obs_as_tensor(
+    obs: Union[np.ndarray, Dict[str, np.ndarray]],
+    device: th.device,
+    staging_buffer: Optional[StagingBuffer] = None,
+) -> Union[th.Tensor, TensorDict]:
     """
     Moves the observation to the given device.
 
     :param obs:
     :param device: PyTorch device
+    :param staging_buffer: If provided, reuse its (pinned) host memory for the transfer
     :return: PyTorch tensor of the observation on a desired device.
     """
+    if staging_buffer is not None:
+        return staging_buffer.obs_to_tensor(obs, device)
     if isinstance(obs, np.ndarray):
         return th.as_tensor(obs, device=device)
     elif isinstance(obs, dict):
@@ -9,6 +9,107 @@ from stable_baselines3.common.preprocessing import is_image_space, is_image_spac
 TObs = TypeVar("TObs", np.ndarray, Dict[str, np.ndarray])
 
 
+class RingFrameStack:
+    """
+    Circular buffer keeping the last ``n_stack`` frames, concatenated along ``axis``.
+
+    The frames are stored in a buffer three times as long as the stack and the stacked frames
+    are a view on ``n_stack`` consecutive frames of this buffer.
+    A new frame is written right after the current view, which then moves by one frame (no ``np.roll``).
+    When the view reaches the end of the buffer, the ``n_stack - 1`` most recent frames
+    are copied back to the beginning (once every ``2 * n_stack`` updates).
+
+    The frames of the previous view are never overwritten by an update,
+    so the previously returned stacked frames stay valid after one update (but not after two).
+
+    :param stacked_shape: Shape of the stacked frames (including the batch dimension if any)
+    :param n_stack: Number of frames to stack
+    :param axis: Axis along which the frames are concatenated
+    :param dtype: Data type of the frames
+    """
+
+    def __init__(self, stacked_shape: Tuple[int, ...], n_stack: int, axis: int, dtype: Any) -> None:
+        self.n_stack = n_stack
+        self.axis = axis % len(stacked_shape)
+        self.frame_size = stacked_shape[self.axis] // n_stack
+        buffer_shape = list(stacked_shape)
+        buffer_shape[self.axis] *= 3
+        self.buffer = np.zeros(buffer_shape, dtype=dtype)
+        # Index of the oldest frame of the current and of the previous view
+        self.head = 0
+        self.previous_head = -n_stack
+
+    def _index(self, start: int, stop: int, batch_indices: Optional[np.ndarray] = None) -> Tuple[Any, ...]:
+        """
+        :param start: Index of the first frame
+        :param stop: Index of the last frame (excluded)
+        :param batch_indices: Only select those elements of the first dimension
+        :return: Index of the frames in the buffer
+        """
+        index: List[Any] = [slice(None)] * self.buffer.ndim
+        index[self.axis] = slice(start * self.frame_size, stop * self.frame_size)
+        if batch_indices is not None:
+            index[0] = batch_indices
+        return tuple(index)
+
+    @property
+    def stacked(self) -> np.ndarray:
+        """
+        :return: The last ``n_stack`` frames (view on the buffer), from the oldest to the most recent
+        """
+        return self.buffer[self._index(self.head, self.head + self.n_stack)]
+
+    @property
+    def history(self) -> np.ndarray:
+        """
+        :return: The ``n_stack - 1`` frames before the most recent one (view on the buffer)
+        """
+        return self.buffer[self._index(self.head, self.head + self.n_stack - 1)]
+
+    def reset(self, frame: np.ndarray) -> np.ndarray:
+        """
+        Clear the stack and add a first frame.
+
+        :param frame: First frame
+        :return: The stacked frames
+        """
+        self.head, self.previous_head = 0, -self.n_stack
+        self.buffer[self._index(0, self.n_stack - 1)] = 0
+        self.buffer[self._index(self.n_stack - 1, self.n_stack)] = frame
+        return self.stacked
+
+    def push(self, frame: np.ndarray) -> np.ndarray:
+        """
+        Add a new frame and drop the oldest one.
+
+        :param frame: New frame
+        :return: The stacked frames
+        """
+        self.previous_head = self.head
+        if self.head + self.n_stack == 3 * self.n_stack:
+            # Move the most recent frames to the beginning of the buffer
+            self.buffer[self._index(0, self.n_stack - 1)] = self.buffer[self._index(self.head + 1, self.head + self.n_stack)]
+            self.head = 0
+        else:
+            self.head += 1
+        self.buffer[self._index(self.head + self.n_stack - 1, self.head + self.n_stack)] = frame
+        return self.stacked
+
+    def clear_history(self, batch_indices: np.ndarray) -> None:
+        """
+        Zero all but the most recent frame for some elements of the batch (first dimension).
+
+        :param batch_indices: Indices of the elements to clear
+        """
+        if abs(self.head - self.previous_head) < self.n_stack:
+            # The current view shares frames with the previous one,
+            # move it to a disjoint part of the buffer before modifying it
+            target = 0 if self.previous_head >= self.n_stack else self.previous_head + self.n_stack
+            self.buffer[self._index(target, target + self.n_stack)] = self.stacked
+            self.head = target
+        self.buffer[self._index(self.head, self.head + self.n_stack - 1, batch_indices)] = 0
+
+
 class StackedObservations(Generic[TObs]):
     """
     Frame stacking wrapper for data.
@@ -57,12 +158,21 @@ class StackedObservations(Generic[TObs]):
                 high=high,
                 dtype=observation_space.dtype,  # type: ignore[arg-type]
             )
-            self.stacked_obs = np.zeros((num_envs, *self.stacked_shape), dtype=observation_space.dtype)
+            self.frames = RingFrameStack(
+                (num_envs, *self.stacked_shape), n_stack, self.stack_dimension, observation_space.dtype  # type: ignore[arg-type]
+            )
         else:
             raise TypeError(
                 f"StackedObservations only supports Box and Dict as observation spaces. {observation_space} was provided."
             )
 
+    @property
+    def stacked_obs(self) -> np.ndarray:
+        """
+        :return: The current stacked observations (view on the frame buffer)
+        """
+        return self.frames.stacked
+
     @staticmethod
     def compute_stacking(
         n_stack: int, observation_space: spaces.Box, channels_order: Optional[str] = None
@@ -108,12 +218,8 @@ class StackedObservations(Generic[TObs]):
         if isinstance(observation, dict):
             return {key: self.sub_stacked_observations[key].reset(obs) for key, obs in observation.items()}
 
-        self.stacked_obs[...] = 0
-        if self.channels_first:
-            self.stacked_obs[:, -observation.shape[self.stack_dimension] :, ...] = observation
-        else:
-            self.stacked_obs[..., -observation.shape[self.stack_dimension] :] = observation
-        return self.stacked_obs
+        # The frame buffer is modified by the next updates, the observations may be kept by the user
+        return self.frames.reset(observation).copy()
 
     def update(
         self,
@@ -153,24 +259,18 @@ class StackedObservations(Generic[TObs]):
                         infos[env_idx]["terminal_observation"][key] = stacked_infos[key][env_idx]["terminal_observation"]
             return stacked_obs, infos
 
-        shift = -observations.shape[self.stack_dimension]
-        self.stacked_obs = np.roll(self.stacked_obs, shift, axis=self.stack_dimension)
-        for env_idx, done in enumerate(dones):
-            if done:
+        self.frames.push(observations)
+        done_indices = np.flatnonzero(dones)
+        if len(done_indices) > 0:
+            history = self.frames.history
+            for env_idx in done_indices:
                 if "terminal_observation" in infos[env_idx]:
                     old_terminal = infos[env_idx]["terminal_observation"]
-                    if self.channels_first:
-                        previous_stack = self.stacked_obs[env_idx, :shift, ...]
-                    else:
-                        previous_stack = self.stacked_obs[env_idx, ..., :shift]
-
-                    new_terminal = np.concatenate((previous_stack, old_terminal), axis=self.repeat_axis)
+                    new_terminal = np.concatenate((history[env_idx], old_terminal), axis=self.repeat_axis)
                     infos[env_idx]["terminal_observation"] = new_terminal
                 else:
                     warnings.warn("VecFrameStack wrapping a VecEnv without terminal_observation info")
-                self.stacked_obs[env_idx] = 0
-        if self.channels_first:
-            self.stacked_obs[:, shift:, ...] = observations
-        else:
-            self.stacked_obs[..., shift:] = observations
-        return self.stacked_obs, infos
+            # The new episodes start with an empty history
+            self.frames.clear_history(done_indices)
+        # Still cheaper than ``np.roll``: only the stacked frames are copied, not the whole buffer
+        return self.frames.stacked.copy(), infos
@@ -1,7 +1,7 @@
 import inspect
 import pickle
 from copy import deepcopy
-from typing import Any, Dict, List, Optional, Union
+from typing import Any, Dict, List, Optional, Tuple, Union
 
 import numpy as np
 from gymnasium import spaces
@@ -27,6 +27,10 @@ class VecNormalize(VecEnvWrapper):
     :param epsilon: To avoid division by zero
     :param norm_obs_keys: Which keys from observation dict to normalize.
         If not specified, all keys will be normalized.
+    :param fast_normalize: Normalize the observations directly in float32,
+        with ``mean`` and ``1 / sqrt(var + epsilon)`` only recomputed after an update of the statistics.
+        The result can differ from the default (float64) normalization by the float32 precision.
+        Note: the observations that are not normalized are no longer copied.
     """
 
     obs_spaces: Dict[str, spaces.Space]
@@ -43,6 +47,7 @@ class VecNormalize(VecEnvWrapper):
         gamma: float = 0.99,
         epsilon: float = 1e-8,
         norm_obs_keys: Optional[List[str]] = None,
+        fast_normalize: bool = False,
     ):
         VecEnvWrapper.__init__(self, venv)
 
@@ -96,6 +101,9 @@ class VecNormalize(VecEnvWrapper):
         self.norm_obs = norm_obs
         self.norm_reward = norm_reward
         self.old_reward = np.array([])
+        self.fast_normalize = fast_normalize
+        # Float32 statistics used by the fast normalization, see `_get_obs_scale()`
+        self._obs_scale: Dict[str, Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]] = {}
 
     def _sanity_checks(self) -> None:
         """
@@ -136,6 +144,7 @@ class VecNormalize(VecEnvWrapper):
         del state["class_attributes"]
         # these attributes depend on the above and so we would prefer not to pickle
         del state["returns"]
+        del state["_obs_scale"]
         return state
 
     def __setstate__(self, state: Dict[str, Any]) -> None:
@@ -148,7 +157,9 @@ class VecNormalize(VecEnvWrapper):
         # Backward compatibility
         if "norm_obs_keys" not in state and isinstance(state["observation_space"], spaces.Dict):
             state["norm_obs_keys"] = list(state["observation_space"].spaces.keys())
+        state.setdefault("fast_normalize", False)
         self.__dict__.update(state)
+        self._obs_scale = {}
         assert "venv" not in state
         self.venv = None  # type: ignore[assignment]
 
@@ -211,13 +222,38 @@ class VecNormalize(VecEnvWrapper):
         self.returns = self.returns * self.gamma + reward
         self.ret_rms.update(self.returns)
 
-    def _normalize_obs(self, obs: np.ndarray, obs_rms: RunningMeanStd) -> np.ndarray:
+    def _get_obs_scale(self, obs_rms: RunningMeanStd, key: str) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Helper to get the float32 mean and inverse standard deviation of the observations.
+        They are cached and only recomputed when the statistics changed
+        (``RunningMeanStd`` creates new arrays at each update).
+
+        :param obs_rms: associated statistics
+        :param key: observation key (empty string when not using a dict observation space)
+        :return: mean and ``1 / sqrt(var + epsilon)``
+        """
+        cached = self._obs_scale.get(key)
+        if cached is None or cached[0] is not obs_rms.mean or cached[1] is not obs_rms.var:
+            mean = obs_rms.mean.astype(np.float32)
+            inv_std = (1.0 / np.sqrt(obs_rms.var + self.epsilon)).astype(np.float32)
+            # Keep a reference to the statistics to detect their update
+            cached = self._obs_scale[key] = (obs_rms.mean, obs_rms.var, mean, inv_std)
+        return cached[2], cached[3]
+
+    def _normalize_obs(self, obs: np.ndarray, obs_rms: RunningMeanStd, key: str = "") -> np.ndarray:
         """
         Helper to normalize observation.
         :param obs:
         :param obs_rms: associated statistics
+        :param key: observation key, used by the fast normalization
         :return: normalized observation
         """
+        if self.fast_normalize:
+            mean, inv_std = self._get_obs_scale(obs_rms, key)
+            # Only one float32 array is allocated, the other operations are done in place
+            normalized_obs = np.subtract(obs, mean, dtype=np.float32)
+            normalized_obs *= inv_std
+            return np.clip(normalized_obs, -self.clip_obs, self.clip_obs, out=normalized_obs)
         return np.clip((obs - obs_rms.mean) / np.sqrt(obs_rms.var + self.epsilon), -self.clip_obs, self.clip_obs)
 
     def _unnormalize_obs(self, obs: np.ndarray, obs_rms: RunningMeanStd) -> np.ndarray:
@@ -234,17 +270,21 @@ class VecNormalize(VecEnvWrapper):
         Normalize observations using this VecNormalize's observations statistics.
         Calling this method does not update statistics.
         """
-        # Avoid modifying by reference the original object
-        obs_ = deepcopy(obs)
+        # Avoid modifying by reference the original object,
+        # the fast normalization always creates new arrays so a shallow copy is enough
+        if self.fast_normalize:
+            obs_ = dict(obs) if isinstance(obs, dict) else obs
+        else:
+            obs_ = deepcopy(obs)
         if self.norm_obs:
             if isinstance(obs, dict) and isinstance(self.obs_rms, dict):
                 assert self.norm_obs_keys is not None
                 # Only normalize the specified keys
                 for key in self.norm_obs_keys:
-                    obs_[key] = self._normalize_obs(obs[key], self.obs_rms[key]).astype(np.float32)
+                    obs_[key] = self._normalize_obs(obs[key], self.obs_rms[key], key).astype(np.float32, copy=False)
             else:
                 assert isinstance(self.obs_rms, RunningMeanStd)
-                obs_ = self._normalize_obs(obs, self.obs_rms).astype(np.float32)
+                obs_ = self._normalize_obs(obs, self.obs_rms).astype(np.float32, copy=False)
         return obs_
 
     def normalize_reward(self, reward: np.ndarray) -> np.ndarray:
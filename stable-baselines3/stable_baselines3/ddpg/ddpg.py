@@ -44,6 +44,10 @@ class DDPG(TD3):
     :param optimize_memory_usage: Enable a memory efficient variant of the replay buffer
         at a cost of more complexity.
         See https://github.com/DLR-RM/stable-baselines3/issues/37#issuecomment-637501195
+    :param compile_train: Sample all the minibatches of a ``train()`` call as one stacked block
+        and compile the gradient step with ``torch.compile`` (and CUDA graphs) when training on GPU
+        (one step at a time: the loop over the gradient steps is not compiled).
+        On CPU, the gradient steps run eagerly. Useful with a high update-to-data ratio (``gradient_steps``).
     :param policy_kwargs: additional arguments to be passed to the policy on creation
     :param verbose: Verbosity level: 0 for no output, 1 for info messages (such as device or wrappers used), 2 for
         debug messages
@@ -69,6 +73,7 @@ class DDPG(TD3):
         replay_buffer_class: Optional[Type[ReplayBuffer]] = None,
         replay_buffer_kwargs: Optional[Dict[str, Any]] = None,
         optimize_memory_usage: bool = False,
+        compile_train: bool = False,
         tensorboard_log: Optional[str] = None,
         policy_kwargs: Optional[Dict[str, Any]] = None,
         verbose: int = 0,
@@ -96,6 +101,7 @@ class DDPG(TD3):
             device=device,
             seed=seed,
             optimize_memory_usage=optimize_memory_usage,
+            compile_train=compile_train,
             # Remove all tricks from TD3 to obtain DDPG:
             # we still need to specify target_policy_noise > 0 to avoid errors
             policy_delay=1,
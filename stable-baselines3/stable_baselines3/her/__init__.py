@@ -1,4 +1,4 @@
 from stable_baselines3.her.goal_selection_strategy import GoalSelectionStrategy
-from stable_baselines3.her.her_replay_buffer import HerReplayBuffer
+from stable_baselines3.her.her_replay_buffer import HerReplayBuffer, register_compute_reward
 
-__all__ = ["GoalSelectionStrategy", "HerReplayBuffer"]
+__all__ = ["GoalSelectionStrategy", "HerReplayBuffer", "register_compute_reward"]
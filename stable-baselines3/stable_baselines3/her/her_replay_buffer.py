@@ -1,6 +1,6 @@
 import copy
 import warnings
-from typing import Any, Dict, List, Optional, Union
+from typing import Any, Callable, Dict, List, Optional, Union
 
 import numpy as np
 import torch as th
@@ -11,6 +11,36 @@ from stable_baselines3.common.type_aliases import DictReplayBufferSamples
 from stable_baselines3.common.vec_env import VecEnv, VecNormalize
 from stable_baselines3.her.goal_selection_strategy import KEY_TO_GOAL_STRATEGY, GoalSelectionStrategy
 
+# Signature of ``GoalEnv.compute_reward()``: (achieved_goal, desired_goal, infos) -> rewards
+ComputeRewardFn = Callable[[np.ndarray, np.ndarray, Any], np.ndarray]
+
+# Vectorized reward functions, usually keyed by env id
+_COMPUTE_REWARD_FNS: Dict[str, ComputeRewardFn] = {}
+
+
+def register_compute_reward(name: str, compute_reward_fn: ComputeRewardFn) -> None:
+    """
+    Register a vectorized reward function to relabel virtual transitions
+    in the learner process, without calling ``compute_reward()`` through the VecEnv.
+
+    :param name: Name of the reward function, if it is the env id,
+        ``HerReplayBuffer`` will pick it automatically
+    :param compute_reward_fn: Function with the same signature as ``GoalEnv.compute_reward()``,
+        it must accept a batch of goals and return a batch of rewards.
+        It should be defined at the module level so the replay buffer can be pickled.
+    """
+    _COMPUTE_REWARD_FNS[name] = compute_reward_fn
+
+
+def get_compute_reward(name: str) -> Optional[ComputeRewardFn]:
+    """
+    Retrieve a reward function registered with ``register_compute_reward()``.
+
+    :param name: Name of the reward function (usually the env id)
+    :return: The reward function or None if nothing was registered under that name
+    """
+    return _COMPUTE_REWARD_FNS.get(name)
+
 
 class HerReplayBuffer(DictReplayBuffer):
     """
@@ -43,6 +73,10 @@ class HerReplayBuffer(DictReplayBuffer):
         ``compute_reward()`` method.
         Please note that the copy may cause a slowdown.
         False by default.
+    :param compute_reward_fn: Vectorized reward function used to relabel virtual transitions
+        in the learner process, or the name it was registered with (see ``register_compute_reward()``).
+        By default, the function registered for the env id is used if any,
+        otherwise ``compute_reward()`` is called through the VecEnv (which is slow with ``SubprocVecEnv``).
     """
 
     env: Optional[VecEnv]
@@ -60,6 +94,7 @@ class HerReplayBuffer(DictReplayBuffer):
         n_sampled_goal: int = 4,
         goal_selection_strategy: Union[GoalSelectionStrategy, str] = "future",
         copy_info_dict: bool = False,
+        compute_reward_fn: Optional[Union[str, ComputeRewardFn]] = None,
     ):
         super().__init__(
             buffer_size,
@@ -72,6 +107,10 @@ class HerReplayBuffer(DictReplayBuffer):
         )
         self.env = env
         self.copy_info_dict = copy_info_dict
+        self.compute_reward_fn = compute_reward_fn
+        # Resolved lazily (the env id is only known once the env is set)
+        self._compute_reward: Optional[ComputeRewardFn] = None
+        self._compute_reward_resolved = False
 
         # convert goal_selection_strategy into GoalSelectionStrategy if string
         if isinstance(goal_selection_strategy, str):
@@ -97,6 +136,13 @@ class HerReplayBuffer(DictReplayBuffer):
         self.ep_start = np.zeros((self.buffer_size, self.n_envs), dtype=np.int64)
         self.ep_length = np.zeros((self.buffer_size, self.n_envs), dtype=np.int64)
         self._current_ep_start = np.zeros(self.n_envs, dtype=np.int64)
+        # Index of the valid transitions (the ones with ep_length > 0), updated incrementally
+        # when an episode ends or is overwritten so sampling does not scan the whole buffer.
+        # The first ``_n_valid`` entries of ``_valid_indices`` are the flat indices of valid transitions
+        # and ``_valid_positions`` maps a flat index to its position in ``_valid_indices`` (-1 if not valid)
+        self._valid_indices = np.zeros(self.buffer_size * self.n_envs, dtype=np.int64)
+        self._valid_positions = np.full(self.buffer_size * self.n_envs, -1, dtype=np.int64)
+        self._n_valid = 0
 
     def __getstate__(self) -> Dict[str, Any]:
         """
@@ -107,6 +153,9 @@ class HerReplayBuffer(DictReplayBuffer):
         state = self.__dict__.copy()
         # these attributes are not pickleable
         del state["env"]
+        # may be a lambda, resolved again after loading
+        state["_compute_reward"] = None
+        state["_compute_reward_resolved"] = False
         return state
 
     def __setstate__(self, state: Dict[str, Any]) -> None:
@@ -120,6 +169,12 @@ class HerReplayBuffer(DictReplayBuffer):
         self.__dict__.update(state)
         assert "env" not in state
         self.env = None
+        # Backward compatibility: buffers saved without the valid transition index
+        if "_valid_indices" not in state:
+            self.compute_reward_fn = None
+            self._compute_reward = None
+            self._compute_reward_resolved = False
+            self._rebuild_valid_index()
 
     def set_env(self, env: VecEnv) -> None:
         """
@@ -131,6 +186,77 @@ class HerReplayBuffer(DictReplayBuffer):
             raise ValueError("Trying to set env of already initialized environment.")
 
         self.env = env
+        self._compute_reward_resolved = False
+
+    def _rebuild_valid_index(self) -> None:
+        """
+        Recompute the index of valid transitions from scratch.
+        """
+        self._valid_indices = np.zeros(self.buffer_size * self.n_envs, dtype=np.int64)
+        self._valid_positions = np.full(self.buffer_size * self.n_envs, -1, dtype=np.int64)
+        self._n_valid = 0
+        self._add_valid(np.flatnonzero(self.ep_length > 0))
+
+    def _add_valid(self, flat_indices: np.ndarray) -> None:
+        """
+        Mark transitions as valid (they can be sampled).
+
+        :param flat_indices: Flat indices (``batch_idx * n_envs + env_idx``) of the transitions
+        """
+        flat_indices = np.unique(flat_indices)
+        flat_indices = flat_indices[self._valid_positions[flat_indices] < 0]
+        new_n_valid = self._n_valid + len(flat_indices)
+        self._valid_indices[self._n_valid : new_n_valid] = flat_indices
+        self._valid_positions[flat_indices] = np.arange(self._n_valid, new_n_valid)
+        self._n_valid = new_n_valid
+
+    def _remove_valid(self, flat_indices: np.ndarray) -> None:
+        """
+        Mark transitions as invalid (they cannot be sampled anymore).
+        The last valid entries are moved into the holes to keep the index contiguous.
+
+        :param flat_indices: Flat indices (``batch_idx * n_envs + env_idx``) of the transitions
+        """
+        flat_indices = np.unique(flat_indices)
+        flat_indices = flat_indices[self._valid_positions[flat_indices] >= 0]
+        if len(flat_indices) == 0:
+            return
+        removed_positions = self._valid_positions[flat_indices]
+        self._valid_positions[flat_indices] = -1
+        new_n_valid = self._n_valid - len(flat_indices)
+        # Valid transitions stored after the new end of the index fill the holes left before it
+        tail = self._valid_indices[new_n_valid : self._n_valid]
+        tail = tail[self._valid_positions[tail] >= 0]
+        holes = removed_positions[removed_positions < new_n_valid]
+        self._valid_indices[holes] = tail
+        self._valid_positions[tail] = holes
+        self._n_valid = new_n_valid
+
+    def _get_compute_reward(self) -> Optional[ComputeRewardFn]:
+        """
+        Resolve the vectorized reward function, if any.
+
+        :return: The reward function or None to fall back to ``env.env_method("compute_reward", ...)``
+        """
+        if self._compute_reward_resolved:
+            return self._compute_reward
+
+        if callable(self.compute_reward_fn):
+            self._compute_reward = self.compute_reward_fn
+        elif isinstance(self.compute_reward_fn, str):
+            self._compute_reward = get_compute_reward(self.compute_reward_fn)
+            if self._compute_reward is None:
+                raise ValueError(
+                    f"No reward function registered under the name '{self.compute_reward_fn}', "
+                    f"registered names: {list(_COMPUTE_REWARD_FNS.keys())}"
+                )
+        elif self.env is not None and len(_COMPUTE_REWARD_FNS) > 0:
+            # Look for a reward function registered for the env id (only done once)
+            spec = self.env.get_attr("spec", indices=[0])[0]
+            if spec is not None:
+                self._compute_reward = get_compute_reward(spec.id)
+        self._compute_reward_resolved = True
+        return self._compute_reward
 
     def add(  # type: ignore[override]
         self,
@@ -152,6 +278,7 @@ class HerReplayBuffer(DictReplayBuffer):
                 episode_end = episode_start + episode_length
                 episode_indices = np.arange(self.pos, episode_end) % self.buffer_size
                 self.ep_length[episode_indices, env_idx] = 0
+                self._remove_valid(episode_indices * self.n_envs + env_idx)
 
         # Update episode start
         self.ep_start[self.pos] = self._current_ep_start.copy()
@@ -180,6 +307,7 @@ class HerReplayBuffer(DictReplayBuffer):
             episode_end += self.buffer_size
         episode_indices = np.arange(episode_start, episode_end) % self.buffer_size
         self.ep_length[episode_indices, env_idx] = episode_end - episode_start
+        self._add_valid(episode_indices * self.n_envs + env_idx)
         # Update the current episode start
         self._current_ep_start[env_idx] = self.pos
 
@@ -192,27 +320,21 @@ class HerReplayBuffer(DictReplayBuffer):
         :return: Samples
         """
         # When the buffer is full, we rewrite on old episodes. We don't want to
-        # sample incomplete episode transitions, so we have to eliminate some indexes.
-        is_valid = self.ep_length > 0
-        if not np.any(is_valid):
+        # sample incomplete episode transitions, so we only sample transitions with ep_length > 0.
+        # Those are tracked incrementally in self._valid_indices (see _add_valid() and _remove_valid()).
+        if self._n_valid == 0:
             raise RuntimeError(
                 "Unable to sample before the end of the first episode. We recommend choosing a value "
                 "for learning_starts that is greater than the maximum number of timesteps in the environment."
             )
-        # Get the indices of valid transitions
-        # Example:
-        # if is_valid = [[True, False, False], [True, False, True]],
-        # is_valid has shape (buffer_size=2, n_envs=3)
-        # then valid_indices = [0, 3, 5]
-        # they correspond to is_valid[0, 0], is_valid[1, 0] and is_valid[1, 2]
-        # or in numpy format ([rows], [columns]): (array([0, 1, 1]), array([0, 0, 2]))
-        # Those indices are obtained back using np.unravel_index(valid_indices, is_valid.shape)
-        valid_indices = np.flatnonzero(is_valid)
+        # The valid indices are flat indices of the (buffer_size, n_envs) arrays
+        # Example: with n_envs=3, the valid indices [0, 3, 5]
+        # correspond to ep_length[0, 0], ep_length[1, 0] and ep_length[1, 2]
         # Sample valid transitions that will constitute the minibatch of size batch_size
-        sampled_indices = np.random.choice(valid_indices, size=batch_size, replace=True)
+        sampled_indices = self._valid_indices[np.random.randint(0, self._n_valid, size=batch_size)]
         # Unravel the indexes, i.e. recover the batch and env indices.
         # Example: if sampled_indices = [0, 3, 5], then batch_indices = [0, 1, 1] and env_indices = [0, 0, 2]
-        batch_indices, env_indices = np.unravel_index(sampled_indices, is_valid.shape)
+        batch_indices, env_indices = np.divmod(sampled_indices, self.n_envs)
 
         # Split the indexes between real and virtual transitions.
         nb_virtual = int(self.her_ratio * batch_size)
@@ -245,6 +367,28 @@ class HerReplayBuffer(DictReplayBuffer):
             rewards=rewards,
         )
 
+    def sample_block(  # type: ignore[override]
+        self, n_batches: int, batch_size: int, env: Optional[VecNormalize] = None
+    ) -> DictReplayBufferSamples:
+        """
+        Sample all the minibatches at once, stacked in one block (see ``ReplayBuffer.sample_block()``).
+        Each minibatch is sampled separately to keep the ratio of virtual transitions in each of them.
+
+        :param n_batches: Number of minibatches (usually ``gradient_steps``)
+        :param batch_size: Number of element per minibatch
+        :param env: Associated VecEnv to normalize the observations/rewards when sampling
+        :return: the stacked minibatches
+        """
+        batches = [self.sample(batch_size, env=env) for _ in range(n_batches)]
+        keys = self.observations.keys()
+        return DictReplayBufferSamples(
+            observations={key: th.stack([batch.observations[key] for batch in batches]) for key in keys},
+            actions=th.stack([batch.actions for batch in batches]),
+            next_observations={key: th.stack([batch.next_observations[key] for batch in batches]) for key in keys},
+            dones=th.stack([batch.dones for batch in batches]),
+            rewards=th.stack([batch.rewards for batch in batches]),
+        )
+
     def _get_real_samples(
         self,
         batch_indices: np.ndarray,
@@ -268,21 +412,27 @@ class HerReplayBuffer(DictReplayBuffer):
 
         assert isinstance(obs_, dict)
         assert isinstance(next_obs_, dict)
-        # Convert to torch tensor
-        observations = {key: self.to_torch(obs) for key, obs in obs_.items()}
-        next_observations = {key: self.to_torch(obs) for key, obs in next_obs_.items()}
-
-        return DictReplayBufferSamples(
-            observations=observations,
-            actions=self.to_torch(self.actions[batch_indices, env_indices]),
-            next_observations=next_observations,
-            # Only use dones that are not due to timeouts
-            # deactivated by default (timeouts is initialized as an array of False)
-            dones=self.to_torch(
-                self.dones[batch_indices, env_indices] * (1 - self.timeouts[batch_indices, env_indices])
-            ).reshape(-1, 1),
-            rewards=self.to_torch(self._normalize_reward(self.rewards[batch_indices, env_indices].reshape(-1, 1), env)),
-        )
+        # Convert to torch tensor, one transfer per field, grouped in a single batch
+        with self.staging_buffer.batch():
+            observations = {key: self.to_torch(obs, key=("real_observations", key)) for key, obs in obs_.items()}
+            next_observations = {
+                key: self.to_torch(obs, key=("real_next_observations", key)) for key, obs in next_obs_.items()
+            }
+
+            return DictReplayBufferSamples(
+                observations=observations,
+                actions=self.to_torch(self.actions[batch_indices, env_indices], key="real_actions"),
+                next_observations=next_observations,
+                # Only use dones that are not due to timeouts
+                # deactivated by default (timeouts is initialized as an array of False)
+                dones=self.to_torch(
+                    self.dones[batch_indices, env_indices] * (1 - self.timeouts[batch_indices, env_indices]),
+                    key="real_dones",
+                ).reshape(-1, 1),
+                rewards=self.to_torch(
+                    self._normalize_reward(self.rewards[batch_indices, env_indices].reshape(-1, 1), env), key="real_rewards"
+                ),
+            )
 
     def _get_virtual_samples(
         self,
@@ -313,44 +463,55 @@ class HerReplayBuffer(DictReplayBuffer):
         # The desired goal for the next observation must be the same as the previous one
         next_obs["desired_goal"] = new_goals
 
-        assert (
-            self.env is not None
-        ), "You must initialize HerReplayBuffer with a VecEnv so it can compute rewards for virtual transitions"
         # Compute new reward
-        rewards = self.env.env_method(
-            "compute_reward",
-            # the new state depends on the previous state and action
-            # s_{t+1} = f(s_t, a_t)
-            # so the next achieved_goal depends also on the previous state and action
-            # because we are in a GoalEnv:
-            # r_t = reward(s_t, a_t) = reward(next_achieved_goal, desired_goal)
-            # therefore we have to use next_obs["achieved_goal"] and not obs["achieved_goal"]
-            next_obs["achieved_goal"],
-            # here we use the new desired goal
-            obs["desired_goal"],
-            infos,
-            # we use the method of the first environment assuming that all environments are identical.
-            indices=[0],
-        )
-        rewards = rewards[0].astype(np.float32)  # env_method returns a list containing one element
+        # the new state depends on the previous state and action
+        # s_{t+1} = f(s_t, a_t)
+        # so the next achieved_goal depends also on the previous state and action
+        # because we are in a GoalEnv:
+        # r_t = reward(s_t, a_t) = reward(next_achieved_goal, desired_goal)
+        # therefore we have to use next_obs["achieved_goal"] and not obs["achieved_goal"]
+        # (and here we use the new desired goal)
+        compute_reward = self._get_compute_reward()
+        if compute_reward is not None:
+            # Vectorized reward computed in the learner process
+            rewards = np.asarray(compute_reward(next_obs["achieved_goal"], obs["desired_goal"], infos), dtype=np.float32)
+        else:
+            assert (
+                self.env is not None
+            ), "You must initialize HerReplayBuffer with a VecEnv so it can compute rewards for virtual transitions"
+            rewards = self.env.env_method(
+                "compute_reward",
+                next_obs["achieved_goal"],
+                obs["desired_goal"],
+                infos,
+                # we use the method of the first environment assuming that all environments are identical.
+                indices=[0],
+            )
+            rewards = rewards[0].astype(np.float32)  # env_method returns a list containing one element
         obs = self._normalize_obs(obs, env)  # type: ignore[assignment]
         next_obs = self._normalize_obs(next_obs, env)  # type: ignore[assignment]
 
-        # Convert to torch tensor
-        observations = {key: self.to_torch(obs) for key, obs in obs.items()}
-        next_observations = {key: self.to_torch(obs) for key, obs in next_obs.items()}
-
-        return DictReplayBufferSamples(
-            observations=observations,
-            actions=self.to_torch(self.actions[batch_indices, env_indices]),
-            next_observations=next_observations,
-            # Only use dones that are not due to timeouts
-            # deactivated by default (timeouts is initialized as an array of False)
-            dones=self.to_torch(
-                self.dones[batch_indices, env_indices] * (1 - self.timeouts[batch_indices, env_indices])
-            ).reshape(-1, 1),
-            rewards=self.to_torch(self._normalize_reward(rewards.reshape(-1, 1), env)),  # type: ignore[attr-defined]
-        )
+        # Convert to torch tensor, one transfer per field, grouped in a single batch
+        with self.staging_buffer.batch():
+            observations = {key: self.to_torch(obs, key=("virtual_observations", key)) for key, obs in obs.items()}
+            next_observations = {
+                key: self.to_torch(obs, key=("virtual_next_observations", key)) for key, obs in next_obs.items()
+            }
+
+            return DictReplayBufferSamples(
+                observations=observations,
+                actions=self.to_torch(self.actions[batch_indices, env_indices], key="virtual_actions"),
+                next_observations=next_observations,
+                # Only use dones that are not due to timeouts
+                # deactivated by default (timeouts is initialized as an array of False)
+                dones=self.to_torch(
+                    self.dones[batch_indices, env_indices] * (1 - self.timeouts[batch_indices, env_indices]),
+                    key="virtual_dones",
+                ).reshape(-1, 1),
+                rewards=self.to_torch(
+                    self._normalize_reward(rewards.reshape(-1, 1), env), key="virtual_rewards"  # type: ignore[attr-defined]
+                ),
+            )
 
     def _sample_goals(self, batch_indices: np.ndarray, env_indices: np.ndarray) -> np.ndarray:
         """
@@ -38,6 +38,10 @@ def compute_model_grad_norm(params):
         grad_norm += th.norm(param.grad) ** 2
     return float(th.sqrt(grad_norm))
 
+# helper to get the parameters updated by optimizers
+def optimizer_params(*optimizers):
+    return [param for optimizer in optimizers for group in optimizer.param_groups for param in group["params"]]
+
 
 class PPO(OnPolicyAlgorithm):
     """
@@ -93,6 +97,9 @@ class PPO(OnPolicyAlgorithm):
     :param device: Device (cpu, cuda, ...) on which the code should be run.
         Setting it to auto, the code will be run on the GPU if possible.
     :param _init_setup_model: Whether or not to build the network at the creation of the instance
+    :param ent_features_extractor: Features extractor of ``ent_policy``: its own (``"separate"``)
+        or the one of ``policy``, trained by the losses of both policies (``"shared"``)
+        or only by the loss of ``policy`` (``"frozen"``). When shared, the features of each minibatch are computed once.
     """
 
     policy_aliases: ClassVar[Dict[str, Type[BasePolicy]]] = {
@@ -131,6 +138,7 @@ class PPO(OnPolicyAlgorithm):
         _init_setup_model: bool = True,
         ppo_mode: str = "opt",
         switch_to_ent_prob: float = 0.005,
+        ent_features_extractor: str = "separate",
     ):
         super().__init__(
             policy,
@@ -161,6 +169,7 @@ class PPO(OnPolicyAlgorithm):
             ),
             ppo_mode=ppo_mode,
             switch_to_ent_prob=switch_to_ent_prob,
+            ent_features_extractor=ent_features_extractor,
         )
 
         # Keep track of number of gradient steps
@@ -264,6 +273,14 @@ class PPO(OnPolicyAlgorithm):
                 policies_to_update = [self.policy]
                 if self.ppo_mode in ["dbl", "dbltrn"]:
                     policies_to_update.append(self.ent_policy)
+                features = None
+                if self.ent_features_extractor != "separate":
+                    # Shared features extractor: the features are computed once for both policies
+                    features = self.policy.extract_features(rollout_data.observations)
+                # With a jointly trained features extractor, the loss of ent_policy also backpropagates through it:
+                # the update of policy is done after the backward pass of ent_policy
+                joint_features = self.ent_features_extractor == "shared" and len(policies_to_update) > 1
+                pending_optimizer = None
                 for i, p in enumerate(policies_to_update):
                     actions = rollout_data.actions
                     if isinstance(self.action_space, spaces.Discrete):
@@ -274,7 +291,16 @@ class PPO(OnPolicyAlgorithm):
                     if self.use_sde:
                         p.reset_noise(self.batch_size)
 
-                    values, log_prob, entropy = p.evaluate_actions(rollout_data.observations, actions)
+                    if features is None:
+                        values, log_prob, entropy = p.evaluate_actions(rollout_data.observations, actions)
+                    elif p is self.ent_policy and self.ent_features_extractor == "frozen":
+                        # No gradient from the loss of ent_policy to the features extractor
+                        frozen_features = (
+                            features.detach() if isinstance(features, th.Tensor) else tuple(f.detach() for f in features)
+                        )
+                        values, log_prob, entropy = p.evaluate_actions_from_features(frozen_features, actions)
+                    else:
+                        values, log_prob, entropy = p.evaluate_actions_from_features(features, actions)
                     values = values.flatten()
                     # Normalize advantage
                     advantages = rollout_data.advantages
@@ -342,13 +368,22 @@ class PPO(OnPolicyAlgorithm):
 
                     # Optimization step
                     p.optimizer.zero_grad()
-                    loss[i].backward()
+                    loss[i].backward(retain_graph=joint_features and i == 0)
                     # Grad norms pre clipping
                     actor_pre_clip_grad_norm = compute_model_grad_norm(p.mlp_extractor.policy_net.parameters())
                     critic_pre_clip_grad_norm = compute_model_grad_norm(p.mlp_extractor.value_net.parameters())
-                    # Clip grad norm
-                    th.nn.utils.clip_grad_norm_(p.parameters(), self.max_grad_norm)
-                    p.optimizer.step()
+                    if joint_features and i == 0:
+                        # Clipped and applied after the backward pass of ent_policy,
+                        # once the gradients of both losses are accumulated in the shared features extractor
+                        pending_optimizer = p.optimizer
+                    else:
+                        # Clip grad norm (of the parameters updated by the optimizers that are stepped now,
+                        # a shared features extractor is only part of the optimizer of policy)
+                        optimizers = [p.optimizer] if pending_optimizer is None else [pending_optimizer, p.optimizer]
+                        th.nn.utils.clip_grad_norm_(optimizer_params(*optimizers), self.max_grad_norm)
+                        for optimizer in optimizers:
+                            optimizer.step()
+                        pending_optimizer = None
 
                     # Update debug wandb logging variables
                     self.num_gradient_steps += 1
@@ -422,6 +457,10 @@ class PPO(OnPolicyAlgorithm):
                         if i == 1:
                             self.grad_steps_since_last_debug_log = 0
 
+                if pending_optimizer is not None:
+                    # Early stop before the update of ent_policy: only the gradients of policy
+                    th.nn.utils.clip_grad_norm_(optimizer_params(pending_optimizer), self.max_grad_norm)
+                    pending_optimizer.step()
 
             self._n_updates += 1
             if not continue_training:
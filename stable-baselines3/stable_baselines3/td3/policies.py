@@ -104,6 +104,8 @@ class TD3Policy(BasePolicy):
     :param n_critics: Number of critic networks to create.
     :param share_features_extractor: Whether to share or not the features extractor
         between the actor and the critic (this saves computation time)
+    :param ensemble_critics: Whether to evaluate all the critic networks as one batched network
+        (faster, in particular on GPU)
     """
 
     actor: Actor
@@ -125,6 +127,7 @@ class TD3Policy(BasePolicy):
         optimizer_kwargs: Optional[Dict[str, Any]] = None,
         n_critics: int = 2,
         share_features_extractor: bool = False,
+        ensemble_critics: bool = False,
     ):
         super().__init__(
             observation_space,
@@ -162,6 +165,7 @@ class TD3Policy(BasePolicy):
                 "n_critics": n_critics,
                 "net_arch": critic_arch,
                 "share_features_extractor": share_features_extractor,
+                "ensemble_critics": ensemble_critics,
             }
         )
 
@@ -215,6 +219,7 @@ class TD3Policy(BasePolicy):
                 net_arch=self.net_arch,
                 activation_fn=self.net_args["activation_fn"],
                 n_critics=self.critic_kwargs["n_critics"],
+                ensemble_critics=self.critic_kwargs["ensemble_critics"],
                 lr_schedule=self._dummy_schedule,  # dummy lr schedule, not needed for loading policy alone
                 optimizer_class=self.optimizer_class,
                 optimizer_kwargs=self.optimizer_kwargs,
@@ -278,6 +283,8 @@ class CnnPolicy(TD3Policy):
     :param n_critics: Number of critic networks to create.
     :param share_features_extractor: Whether to share or not the features extractor
         between the actor and the critic (this saves computation time)
+    :param ensemble_critics: Whether to evaluate all the critic networks as one batched network
+        (faster, in particular on GPU)
     """
 
     def __init__(
@@ -294,6 +301,7 @@ class CnnPolicy(TD3Policy):
         optimizer_kwargs: Optional[Dict[str, Any]] = None,
         n_critics: int = 2,
         share_features_extractor: bool = False,
+        ensemble_critics: bool = False,
     ):
         super().__init__(
             observation_space,
@@ -308,6 +316,7 @@ class CnnPolicy(TD3Policy):
             optimizer_kwargs,
             n_critics,
             share_features_extractor,
+            ensemble_critics,
         )
 
 
@@ -332,6 +341,8 @@ class MultiInputPolicy(TD3Policy):
     :param n_critics: Number of critic networks to create.
     :param share_features_extractor: Whether to share or not the features extractor
         between the actor and the critic (this saves computation time)
+    :param ensemble_critics: Whether to evaluate all the critic networks as one batched network
+        (faster, in particular on GPU)
     """
 
     def __init__(
@@ -348,6 +359,7 @@ class MultiInputPolicy(TD3Policy):
         optimizer_kwargs: Optional[Dict[str, Any]] = None,
         n_critics: int = 2,
         share_features_extractor: bool = False,
+        ensemble_critics: bool = False,
     ):
         super().__init__(
             observation_space,
@@ -362,4 +374,5 @@ class MultiInputPolicy(TD3Policy):
             optimizer_kwargs,
             n_critics,
             share_features_extractor,
+            ensemble_critics,
         )
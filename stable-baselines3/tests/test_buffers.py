@@ -4,13 +4,22 @@ import pytest
 import torch as th
 from gymnasium import spaces
 
-from stable_baselines3 import A2C
-from stable_baselines3.common.buffers import DictReplayBuffer, DictRolloutBuffer, ReplayBuffer, RolloutBuffer
+from stable_baselines3 import A2C, DQN, SAC, TD3
+from stable_baselines3.common.buffers import (
+    DeviceReplayBuffer,
+    DictReplayBuffer,
+    DictRolloutBuffer,
+    FrameStackReplayBuffer,
+    MemmapReplayBuffer,
+    ReplayBuffer,
+    RolloutBuffer,
+)
 from stable_baselines3.common.env_checker import check_env
 from stable_baselines3.common.env_util import make_vec_env
+from stable_baselines3.common.save_util import load_from_pkl, save_to_pkl
 from stable_baselines3.common.type_aliases import DictReplayBufferSamples, ReplayBufferSamples
 from stable_baselines3.common.utils import get_device
-from stable_baselines3.common.vec_env import VecNormalize
+from stable_baselines3.common.vec_env import VecFrameStack, VecNormalize
 
 
 class DummyEnv(gym.Env):
@@ -78,9 +87,9 @@ def test_env(env_cls):
     check_env(env_cls(), warn=False, skip_render_check=True)
 
 
-@pytest.mark.parametrize("replay_buffer_cls", [ReplayBuffer, DictReplayBuffer])
+@pytest.mark.parametrize("replay_buffer_cls", [ReplayBuffer, DictReplayBuffer, DeviceReplayBuffer])
 def test_replay_buffer_normalization(replay_buffer_cls):
-    env = {ReplayBuffer: DummyEnv, DictReplayBuffer: DummyDictEnv}[replay_buffer_cls]
+    env = {ReplayBuffer: DummyEnv, DictReplayBuffer: DummyDictEnv, DeviceReplayBuffer: DummyEnv}[replay_buffer_cls]
     env = make_vec_env(env)
     env = VecNormalize(env)
 
@@ -106,10 +115,12 @@ def test_replay_buffer_normalization(replay_buffer_cls):
         elif isinstance(sample, ReplayBufferSamples):
             assert th.allclose(observations.mean(0), th.zeros(1), atol=1)
     # Test reward normalization
-    assert np.allclose(sample.rewards.mean(0), np.zeros(1), atol=1)
+    assert th.allclose(sample.rewards.mean(0), th.zeros(1), atol=1)
 
 
-@pytest.mark.parametrize("replay_buffer_cls", [DictReplayBuffer, DictRolloutBuffer, ReplayBuffer, RolloutBuffer])
+@pytest.mark.parametrize(
+    "replay_buffer_cls", [DictReplayBuffer, DictRolloutBuffer, ReplayBuffer, RolloutBuffer, DeviceReplayBuffer]
+)
 @pytest.mark.parametrize("device", ["cpu", "cuda", "auto"])
 def test_device_buffer(replay_buffer_cls, device):
     if device == "cuda" and not th.cuda.is_available():
@@ -120,6 +131,7 @@ def test_device_buffer(replay_buffer_cls, device):
         DictRolloutBuffer: DummyDictEnv,
         ReplayBuffer: DummyEnv,
         DictReplayBuffer: DummyDictEnv,
+        DeviceReplayBuffer: DummyEnv,
     }[replay_buffer_cls]
     env = make_vec_env(env)
 
@@ -140,7 +152,7 @@ def test_device_buffer(replay_buffer_cls, device):
     # Get data from the buffer
     if replay_buffer_cls in [RolloutBuffer, DictRolloutBuffer]:
         data = buffer.get(50)
-    elif replay_buffer_cls in [ReplayBuffer, DictReplayBuffer]:
+    elif replay_buffer_cls in [ReplayBuffer, DictReplayBuffer, DeviceReplayBuffer]:
         data = buffer.sample(50)
 
     # Check that all data are on the desired device
@@ -153,6 +165,197 @@ def test_device_buffer(replay_buffer_cls, device):
             assert value.device.type == desired_device
 
 
+@pytest.mark.parametrize("optimize_memory_usage", [False, True])
+def test_device_replay_buffer_sample_batches(optimize_memory_usage):
+    env = make_vec_env(DummyEnv, n_envs=2)
+    buffer = DeviceReplayBuffer(
+        20,
+        env.observation_space,
+        env.action_space,
+        device="cpu",
+        n_envs=2,
+        optimize_memory_usage=optimize_memory_usage,
+        handle_timeout_termination=not optimize_memory_usage,
+    )
+
+    obs = env.reset()
+    # Fill the buffer more than once
+    for _ in range(15):
+        action = np.array([env.action_space.sample() for _ in range(2)])
+        next_obs, reward, done, info = env.step(action)
+        buffer.add(obs, next_obs, action, reward, done, info)
+        obs = next_obs
+
+    batches = buffer.sample_batches(4, 8)
+    assert len(batches) == 4
+    for batch in batches:
+        assert batch.observations.shape == (8, *env.observation_space.shape)
+        assert batch.actions.shape == (8, *env.action_space.shape)
+        assert batch.rewards.shape == batch.dones.shape == (8, 1)
+        # DummyEnv observations cycle from 1 to 5
+        assert th.allclose(batch.next_observations, batch.observations % 5 + 1)
+
+
+def test_device_replay_buffer_move_storage():
+    if th.cuda.device_count() < 2:
+        pytest.skip("At least two GPUs are needed")
+
+    env = make_vec_env(DummyEnv, n_envs=2)
+    buffer = DeviceReplayBuffer(20, env.observation_space, env.action_space, device="cuda:0", n_envs=2)
+    obs = env.reset()
+    action = np.array([env.action_space.sample() for _ in range(2)])
+    next_obs, reward, done, info = env.step(action)
+    buffer.add(obs, next_obs, action, reward, done, info)
+    # Same device type but another GPU, e.g. when loading the buffer
+    buffer.device = th.device("cuda:1")
+    batch = buffer.sample(2)
+    assert buffer.observations.device == batch.observations.device == th.device("cuda:1")
+
+
+@pytest.mark.parametrize("replay_buffer_cls", [ReplayBuffer, DeviceReplayBuffer, DictReplayBuffer])
+def test_sample_block(replay_buffer_cls):
+    env = make_vec_env(DummyDictEnv if replay_buffer_cls == DictReplayBuffer else DummyEnv, n_envs=2)
+    buffer = replay_buffer_cls(20, env.observation_space, env.action_space, device="cpu", n_envs=2)
+
+    obs = env.reset()
+    for _ in range(15):
+        action = np.array([env.action_space.sample() for _ in range(2)])
+        next_obs, reward, done, info = env.step(action)
+        buffer.add(obs, next_obs, action, reward, done, info)
+        obs = next_obs
+
+    block = buffer.sample_block(4, 8)
+    assert block.actions.shape == (4, 8, buffer.action_dim)
+    assert block.rewards.shape == block.dones.shape == (4, 8, 1)
+    if isinstance(block.observations, dict):
+        for key, space in env.observation_space.spaces.items():
+            assert block.observations[key].shape == (4, 8, *space.shape)
+    else:
+        assert block.observations.shape == (4, 8, *env.observation_space.shape)
+        # DummyEnv observations cycle from 1 to 5
+        assert th.allclose(block.next_observations, block.observations % 5 + 1)
+
+
+@pytest.mark.parametrize("model_class", [SAC, TD3, DQN])
+def test_device_replay_buffer_training(model_class, tmp_path):
+    env_id = "CartPole-v1" if model_class == DQN else "Pendulum-v1"
+    model = model_class(
+        "MlpPolicy",
+        env_id,
+        replay_buffer_class=DeviceReplayBuffer,
+        learning_starts=50,
+        gradient_steps=4,
+        policy_kwargs=dict(net_arch=[32]),
+    )
+    model.learn(200)
+    model.save_replay_buffer(tmp_path / "replay_buffer.pkl")
+    model.load_replay_buffer(tmp_path / "replay_buffer.pkl")
+    assert isinstance(model.replay_buffer, DeviceReplayBuffer)
+    assert model.replay_buffer.size() > 0
+    model.learn(100, reset_num_timesteps=False)
+
+
+def test_memmap_replay_buffer(tmp_path):
+    env = make_vec_env(DummyEnv)
+    storage_dir = tmp_path / "storage"
+    buffer = MemmapReplayBuffer(100, env.observation_space, env.action_space, device="cpu", storage_dir=storage_dir)
+    assert isinstance(buffer.observations, np.memmap)
+
+    obs = env.reset()
+    for _ in range(30):
+        action = env.action_space.sample()
+        next_obs, reward, done, info = env.step(action)
+        buffer.add(obs, next_obs, action, reward, done, info)
+        obs = next_obs
+
+    sample = buffer.sample(10)
+    assert sample.observations.shape == (10, 1)
+    assert th.allclose(sample.next_observations, sample.observations % 5 + 1)
+
+    # Only the metadata is pickled
+    save_to_pkl(tmp_path / "replay_buffer.pkl", buffer)
+    assert (tmp_path / "replay_buffer.pkl").stat().st_size < buffer.observations.nbytes
+    loaded_buffer = load_from_pkl(tmp_path / "replay_buffer.pkl")
+    assert loaded_buffer.pos == 30
+    assert np.allclose(loaded_buffer.observations, buffer.observations)
+
+    # A new buffer re-uses the files and can be restored from the metadata
+    new_buffer = MemmapReplayBuffer(100, env.observation_space, env.action_space, device="cpu", storage_dir=storage_dir)
+    assert new_buffer.pos == 0
+    assert new_buffer.restore()
+    assert new_buffer.pos == 30
+    assert np.allclose(new_buffer.rewards, buffer.rewards)
+
+    # Different shapes: the existing files are not overwritten
+    with pytest.raises(ValueError, match="different size"):
+        MemmapReplayBuffer(50, env.observation_space, env.action_space, device="cpu", storage_dir=storage_dir)
+
+    # Missing data: the buffer is not restored over new (zero-filled) files
+    (storage_dir / "rewards.dat").unlink()
+    with pytest.raises(FileNotFoundError):
+        load_from_pkl(tmp_path / "replay_buffer.pkl")
+    new_buffer = MemmapReplayBuffer(100, env.observation_space, env.action_space, device="cpu", storage_dir=storage_dir)
+    with pytest.raises(FileNotFoundError):
+        new_buffer.restore()
+
+
+class CounterEnv(gym.Env):
+    """
+    Observations count the steps, episodes have different lengths.
+    """
+
+    def __init__(self, max_steps: int = 7):
+        self.observation_space = spaces.Box(0, 100, (2,))
+        self.action_space = spaces.Box(-1, 1, (1,))
+        self.max_steps = max_steps
+        self._t = 0
+
+    def reset(self, *, seed=None, options=None):
+        self._t = 1
+        return np.full(2, self._t, dtype=np.float32), {}
+
+    def step(self, action):
+        self._t += 1
+        terminated = self._t >= self.max_steps
+        return np.full(2, self._t, dtype=np.float32), float(self._t), terminated, False, {}
+
+
+@pytest.mark.parametrize("n_stack", [1, 3])
+def test_frame_stack_replay_buffer(n_stack):
+    env = VecFrameStack(make_vec_env(CounterEnv, n_envs=2, env_kwargs=dict(max_steps=5)), n_stack=n_stack)
+    kwargs = dict(device="cpu", n_envs=2)
+    buffer = ReplayBuffer(100, env.observation_space, env.action_space, **kwargs)
+    frame_stack_buffer = FrameStackReplayBuffer(100, env.observation_space, env.action_space, n_stack=n_stack, **kwargs)
+    assert frame_stack_buffer.frames.nbytes * 2 * n_stack == buffer.observations.nbytes + buffer.next_observations.nbytes
+
+    obs = env.reset()
+    for _ in range(40):
+        action = np.array([env.action_space.sample() for _ in range(2)])
+        new_obs, reward, done, infos = env.step(action)
+        # Same as `OffPolicyAlgorithm._store_transition()`
+        next_obs = new_obs.copy()
+        for idx, info in enumerate(infos):
+            if done[idx]:
+                next_obs[idx] = info["terminal_observation"]
+        for replay_buffer in [buffer, frame_stack_buffer]:
+            replay_buffer.add(obs, next_obs, action, reward, done, infos)
+        obs = new_obs
+
+    np.random.seed(0)
+    expected = buffer.sample(64)
+    np.random.seed(0)
+    sample = frame_stack_buffer.sample(64)
+    for expected_value, value in zip(expected, sample):
+        assert th.allclose(expected_value, value)
+
+    # Overwrite the whole buffer
+    for _ in range(200):
+        frame_stack_buffer.add(obs, obs, action, reward, np.zeros(2), [{}, {}])
+    assert frame_stack_buffer.full
+    sample = frame_stack_buffer.sample(64)
+    assert th.allclose(sample.next_observations, sample.observations)
+
+
 def test_custom_rollout_buffer():
     A2C("MlpPolicy", "Pendulum-v1", rollout_buffer_class=RolloutBuffer, rollout_buffer_kwargs=dict())
 
@@ -264,3 +264,48 @@ def test_checkpoint_additional_info(tmp_path):
     model = DQN.load(checkpoint_dir / "rl_model_200_steps.zip")
     model.load_replay_buffer(checkpoint_dir / "rl_model_replay_buffer_200_steps.pkl")
     VecNormalize.load(checkpoint_dir / "rl_model_vecnormalize_200_steps.pkl", dummy_vec_env)
+
+
+@pytest.mark.parametrize("incremental", [False, True])
+def test_checkpoint_retention(tmp_path, incremental):
+    checkpoint_dir = tmp_path / "checkpoints"
+    checkpoint_callback = CheckpointCallback(
+        save_freq=100,
+        save_path=checkpoint_dir,
+        incremental=incremental,
+        keep_last=2,
+        keep_every=3,
+    )
+    model = SAC("MlpPolicy", "Pendulum-v1", learning_starts=100, policy_kwargs=dict(net_arch=[32]), seed=0)
+    model.learn(700, callback=checkpoint_callback)
+
+    # Last 2 checkpoints plus every 3rd
+    expected_timesteps = [300, 600, 700]
+    if not incremental:
+        saved_files = sorted(os.listdir(checkpoint_dir))
+        assert saved_files == sorted(f"rl_model_{timesteps}_steps.zip" for timesteps in expected_timesteps)
+        return
+
+    store = checkpoint_callback.store
+    assert store is not None
+    assert store.names() == [f"rl_model_{timesteps}_steps" for timesteps in expected_timesteps]
+    # Only the checkpoints are written in the folder
+    assert os.listdir(checkpoint_dir) == ["rl_model_store"]
+
+    # The model is trained after the last checkpoint
+    store.save(model, "final_model")
+    store.wait()
+    params = model.get_parameters()
+    loaded_params, pytorch_variables = store.load_parameters("final_model")
+    assert set(loaded_params) == set(params)
+    for key, tensor in params["policy"].items():
+        assert th.allclose(tensor, loaded_params["policy"][key])
+    assert th.allclose(model.log_ent_coef, pytorch_variables["log_ent_coef"])
+    # Optimizers can be skipped
+    policy_params, _ = store.load_parameters("rl_model_600_steps", load_optimizers=False)
+    assert set(policy_params) == {"policy"}
+    model.set_parameters(policy_params, load_optimizers=False)
+
+    # Regular zip export
+    store.export("rl_model_300_steps", str(tmp_path / "rl_model_300_steps.zip"))
+    SAC.load(tmp_path / "rl_model_300_steps.zip")
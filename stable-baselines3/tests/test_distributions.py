@@ -230,3 +230,57 @@ def test_kl_divergence(dist_type):
         )
 
         assert th.allclose(full_kl_div, ad_hoc_kl)
+
+
+@pytest.mark.parametrize(
+    "dist, n_params",
+    [
+        (DiagGaussianDistribution(N_ACTIONS), N_ACTIONS),
+        (SquashedDiagGaussianDistribution(N_ACTIONS), N_ACTIONS),
+        (CategoricalDistribution(N_ACTIONS), N_ACTIONS),
+        (MultiCategoricalDistribution([2, 2]), 4),
+        # Sub-spaces of different sizes (padded logits)
+        (MultiCategoricalDistribution([2, 5, 3]), 10),
+    ],
+)
+def test_closed_form_distributions(dist, n_params):
+    # The closed-form log prob, entropy and mode must match the PyTorch distributions
+    set_random_seed(3)
+    batch_size = 16
+    params = th.randn(batch_size, n_params)
+    if isinstance(dist, DiagGaussianDistribution):
+        log_std = th.randn(N_ACTIONS)
+        dist = dist.proba_distribution(params, log_std)
+        reference = th.distributions.Normal(params, th.ones_like(params) * log_std.exp())
+        actions = reference.sample()
+        if isinstance(dist, SquashedDiagGaussianDistribution):
+            squashed_actions = th.tanh(actions)
+            # Squash correction
+            log_prob = reference.log_prob(actions).sum(dim=1) - th.sum(th.log(1 - squashed_actions**2 + dist.epsilon), dim=1)
+            assert th.allclose(dist.log_prob(squashed_actions, actions), log_prob)
+            assert th.allclose(dist.mode(), th.tanh(params))
+            assert dist.entropy() is None
+            actions = squashed_actions
+        else:
+            assert th.allclose(dist.log_prob(actions), reference.log_prob(actions).sum(dim=1))
+            assert th.allclose(dist.entropy(), reference.entropy().sum(dim=1))
+            assert th.equal(dist.mode(), params)
+    else:
+        action_dims = [N_ACTIONS] if isinstance(dist, CategoricalDistribution) else dist.action_dims
+        references = [th.distributions.Categorical(logits=split) for split in th.split(params, action_dims, dim=1)]
+        actions = th.stack([reference.sample() for reference in references], dim=1)
+        if isinstance(dist, CategoricalDistribution):
+            actions = actions.squeeze(dim=1)
+        dist = dist.proba_distribution(params)
+        log_prob = th.stack(
+            [reference.log_prob(action) for reference, action in zip(references, actions.reshape(batch_size, -1).T)], dim=1
+        ).sum(dim=1)
+        assert th.allclose(dist.log_prob(actions), log_prob)
+        assert th.allclose(dist.entropy(), th.stack([reference.entropy() for reference in references], dim=1).sum(dim=1))
+        mode = th.stack([th.argmax(reference.probs, dim=1) for reference in references], dim=1)
+        assert th.equal(dist.mode().reshape(batch_size, -1), mode)
+
+    # Samples have the correct shape and are in the support of the distribution
+    sample = dist.sample()
+    assert sample.shape == actions.shape
+    assert th.isfinite(dist.log_prob(sample)).all()
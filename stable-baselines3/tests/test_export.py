@@ -0,0 +1,69 @@
+import numpy as np
+import pytest
+from gymnasium import spaces
+
+from stable_baselines3 import A2C, DQN, PPO, SAC, TD3
+from stable_baselines3.common.envs import IdentityEnv, IdentityEnvBox, IdentityEnvMultiBinary, IdentityEnvMultiDiscrete
+from stable_baselines3.common.export import ExportedPolicy, export_policy
+
+
+@pytest.mark.parametrize(
+    "model_class,env",
+    [
+        (PPO, "Pendulum-v1"),
+        (PPO, IdentityEnv(10)),
+        (A2C, IdentityEnvMultiDiscrete(3)),
+        (A2C, IdentityEnvMultiBinary(3)),
+        (SAC, "Pendulum-v1"),
+        (TD3, IdentityEnvBox(low=-2.0, high=1.0)),
+        (DQN, "CartPole-v1"),
+    ],
+)
+@pytest.mark.parametrize("use_sde", [False, True])
+def test_export_policy(tmp_path, model_class, env, use_sde):
+    kwargs = dict(policy_kwargs=dict(net_arch=[32]))
+    if use_sde:
+        if model_class not in [PPO, SAC] or not isinstance(env, str):
+            pytest.skip("gSDE is only for continuous actions")
+        kwargs.update(use_sde=True)
+    model = model_class("MlpPolicy", env, **kwargs)
+    # Make the deterministic actions different from zero
+    for param in model.policy.parameters():
+        param.data.normal_()
+
+    path = tmp_path / "policy.pt"
+    export_policy(model.policy, path)
+    policy = ExportedPolicy(path)
+    assert policy.observation_space == model.observation_space
+    assert policy.action_space == model.action_space
+
+    observations = np.array([model.observation_space.sample() for _ in range(8)])
+    expected_actions, _ = model.predict(observations, deterministic=True)
+    actions, state = policy.predict(observations)
+    assert state is None
+    assert actions.shape == expected_actions.shape
+    assert actions.dtype == expected_actions.dtype
+    assert np.allclose(actions, expected_actions, atol=1e-5)
+    # Single observation
+    action, _ = policy.predict(observations[0])
+    assert np.allclose(action, expected_actions[0], atol=1e-5)
+
+    if isinstance(model.action_space, spaces.Box):
+        assert np.all(actions >= model.action_space.low) and np.all(actions <= model.action_space.high)
+
+
+def test_export_onnx(tmp_path):
+    pytest.importorskip("onnx")
+    pytest.importorskip("onnxruntime")
+
+    model = SAC("MlpPolicy", "Pendulum-v1", policy_kwargs=dict(net_arch=[32]))
+    path = tmp_path / "policy.onnx"
+    export_policy(model.policy, path)
+    policy = ExportedPolicy(path)
+
+    observations = np.array([model.observation_space.sample() for _ in range(8)])
+    expected_actions, _ = model.predict(observations, deterministic=True)
+    actions, _ = policy.predict(observations)
+    assert np.allclose(actions, expected_actions, atol=1e-5)
+    action, _ = policy.predict(observations[0])
+    assert np.allclose(action, expected_actions[0], atol=1e-5)
@@ -14,6 +14,7 @@ from stable_baselines3.common.evaluation import evaluate_policy
 from stable_baselines3.common.monitor import Monitor
 from stable_baselines3.common.noise import NormalActionNoise
 from stable_baselines3.common.vec_env import SubprocVecEnv
+from stable_baselines3.her import register_compute_reward
 from stable_baselines3.her.goal_selection_strategy import GoalSelectionStrategy
 
 
@@ -468,3 +469,84 @@ def test_performance_her(n_bits):
 
     # 90% training success
     assert np.mean(model.ep_success_buffer) > 0.90
+
+
+def bit_flipping_compute_reward(achieved_goal, desired_goal, _info):
+    # Same as BitFlippingEnv.compute_reward() for vector observations
+    distance = np.linalg.norm(achieved_goal - desired_goal, axis=-1)
+    return -(distance > 0).astype(np.float32)
+
+
+@pytest.mark.parametrize("n_envs", [1, 3])
+def test_her_valid_index(n_envs):
+    """
+    The incrementally updated index of valid transitions must match ep_length > 0,
+    including when the buffer is full and old episodes are overwritten.
+    """
+    n_bits = 4
+    venv = make_vec_env(lambda: BitFlippingEnv(n_bits=n_bits, continuous=True), n_envs)
+
+    replay_buffer = HerReplayBuffer(
+        buffer_size=23,
+        observation_space=venv.observation_space,
+        action_space=venv.action_space,
+        env=venv,
+        n_envs=n_envs,
+        compute_reward_fn=bit_flipping_compute_reward,
+    )
+
+    observations = venv.reset()
+    for _ in range(100):
+        actions = np.random.rand(n_envs, n_bits)
+        next_observations, rewards, dones, infos = venv.step(actions)
+        replay_buffer.add(observations, next_observations, actions, rewards, dones, infos)
+        observations = next_observations
+
+        valid_indices = replay_buffer._valid_indices[: replay_buffer._n_valid]
+        assert np.array_equal(np.sort(valid_indices), np.flatnonzero(replay_buffer.ep_length > 0))
+        assert np.all(replay_buffer._valid_positions[valid_indices] == np.arange(replay_buffer._n_valid))
+        if replay_buffer._n_valid > 0:
+            samples = replay_buffer.sample(32)
+            # Rewards from the vectorized function match the ones of the env
+            expected_rewards = bit_flipping_compute_reward(
+                samples.next_observations["achieved_goal"].numpy(), samples.observations["desired_goal"].numpy(), None
+            )
+            assert np.allclose(samples.rewards.numpy().flatten(), expected_rewards)
+
+    # The index is rebuilt when loading a buffer saved without it
+    state = replay_buffer.__getstate__()
+    del state["_valid_indices"]
+    loaded_buffer = HerReplayBuffer.__new__(HerReplayBuffer)
+    loaded_buffer.__setstate__(state)
+    assert np.array_equal(
+        np.sort(loaded_buffer._valid_indices[: loaded_buffer._n_valid]), np.flatnonzero(replay_buffer.ep_length > 0)
+    )
+
+
+def test_her_registered_compute_reward():
+    n_bits = 4
+    register_compute_reward("BitFlippingTest-v0", bit_flipping_compute_reward)
+    env = BitFlippingEnv(n_bits=n_bits, continuous=True)
+
+    model = SAC(
+        "MultiInputPolicy",
+        env,
+        replay_buffer_class=HerReplayBuffer,
+        replay_buffer_kwargs=dict(compute_reward_fn="BitFlippingTest-v0"),
+        learning_starts=100,
+        train_freq=4,
+        policy_kwargs=dict(net_arch=[64]),
+    )
+    # Fallback must not be used
+    model.get_env().env_method = None
+    model.learn(200)
+    assert model.replay_buffer._compute_reward is bit_flipping_compute_reward
+
+    with pytest.raises(ValueError, match="No reward function registered"):
+        SAC(
+            "MultiInputPolicy",
+            env,
+            replay_buffer_class=HerReplayBuffer,
+            replay_buffer_kwargs=dict(compute_reward_fn="not-registered"),
+            learning_starts=100,
+        ).learn(200)
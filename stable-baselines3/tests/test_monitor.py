@@ -3,9 +3,19 @@ import os
 import uuid
 
 import gymnasium as gym
+import numpy as np
 import pandas
 
-from stable_baselines3.common.monitor import Monitor, get_monitor_files, load_results
+from stable_baselines3.common.monitor import (
+    EPISODE_RECORD_DTYPE,
+    EpisodeLogWriter,
+    Monitor,
+    get_monitor_files,
+    load_binary_results,
+    load_episode_log,
+    load_results,
+    load_results_streaming,
+)
 
 
 def test_monitor(tmp_path):
@@ -109,3 +119,96 @@ def test_monitor_load_results(tmp_path):
 
     os.remove(monitor_file1)
     os.remove(monitor_file2)
+
+
+def test_monitor_load_results_streaming(tmp_path):
+    """
+    test load_results_streaming against load_results, with and without the binary cache
+    """
+    tmp_path = str(tmp_path)
+
+    def run_monitor(monitor_file, n_steps, override_existing=True):
+        env = gym.make("CartPole-v1")
+        env.reset(seed=0)
+        monitor_env = Monitor(env, monitor_file, override_existing=override_existing)
+        monitor_env.reset()
+        for _ in range(n_steps):
+            _, _, terminated, truncated, _ = monitor_env.step(monitor_env.action_space.sample())
+            if terminated or truncated:
+                monitor_env.reset()
+        monitor_env.close()
+
+    monitor_file1 = os.path.join(tmp_path, f"stable_baselines-test-{uuid.uuid4()}.monitor.csv")
+    monitor_file2 = os.path.join(tmp_path, f"stable_baselines-test-{uuid.uuid4()}.monitor.csv")
+    run_monitor(monitor_file1, 1000)
+    run_monitor(monitor_file2, 1000)
+
+    reference = load_results(tmp_path)
+    for use_cache in [False, True, True]:
+        data_frame = load_results_streaming(tmp_path, columns=("r", "l", "is_success"), use_cache=use_cache)
+        # Missing columns are skipped
+        assert set(data_frame.columns) == {"r", "l", "t"}
+        for key in ["r", "l", "t"]:
+            assert np.allclose(data_frame[key], reference[key])
+    # The binary cache does not match the monitor file pattern
+    assert len(get_monitor_files(tmp_path)) == 2
+    assert os.path.isfile(monitor_file1 + ".npz")
+
+    # Column projection and time filtering
+    max_timesteps = 500
+    data_frame = load_results_streaming(tmp_path, columns=("r",), max_timesteps=max_timesteps)
+    expected = reference[reference.l.cumsum() <= max_timesteps]
+    assert set(data_frame.columns) == {"r", "l", "t"}
+    assert len(data_frame) == len(expected)
+    assert np.allclose(data_frame.r, expected.r)
+
+    # The cache is invalidated when the monitor file grows
+    run_monitor(monitor_file1, 1000, override_existing=False)
+    reference = load_results(tmp_path)
+    data_frame = load_results_streaming(tmp_path)
+    assert len(data_frame) == len(reference)
+    assert np.allclose(data_frame.r, reference.r)
+
+
+def test_monitor_binary_log(tmp_path):
+    """
+    test the binary episode log against the csv monitor file
+    """
+    tmp_path = str(tmp_path)
+    env = gym.make("CartPole-v1")
+    env.reset(seed=0)
+    monitor_file = os.path.join(tmp_path, "0")
+    monitor_env = Monitor(env, monitor_file, binary_log=True)
+    assert len(get_monitor_files(tmp_path, binary=True)) == 1
+    assert len(get_monitor_files(tmp_path)) == 0
+
+    monitor_env.reset()
+    for _ in range(1000):
+        _, _, terminated, truncated, _ = monitor_env.step(monitor_env.action_space.sample())
+        if terminated or truncated:
+            monitor_env.reset()
+    monitor_env.close()
+
+    header, records = load_episode_log(monitor_file + "." + Monitor.BINARY_EXT)
+    assert header["env_id"] == "CartPole-v1"
+    assert records.dtype == EPISODE_RECORD_DTYPE
+    assert np.allclose(records["r"], monitor_env.get_episode_rewards())
+    assert np.all(records["l"] == monitor_env.get_episode_lengths())
+    assert np.all(records["timestep"] == np.cumsum(monitor_env.get_episode_lengths()))
+    assert np.all(records["policy"] == -1)
+
+    data_frame = load_binary_results(tmp_path)
+    assert len(data_frame) == len(monitor_env.get_episode_rewards())
+    assert {"r", "l", "t", "timestep", "env_idx", "policy"} == set(data_frame.columns)
+
+    # Append mode and chunked writes
+    writer = EpisodeLogWriter(monitor_file, override_existing=False, chunk_size=2)
+    for idx in range(3):
+        writer.write_row({"r": 1.0, "l": 10, "t": 0.0, "env_idx": idx, "policy": idx % 2})
+    # Only full chunks were written so far
+    _, records_after = load_episode_log(writer.filename)
+    assert len(records_after) == len(records) + 2
+    writer.close()
+    _, records_after = load_episode_log(writer.filename)
+    assert len(records_after) == len(records) + 3
+    assert np.all(records_after["policy"][-3:] == [0, 1, 0])
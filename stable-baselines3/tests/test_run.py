@@ -1,10 +1,12 @@
 import gymnasium as gym
 import numpy as np
 import pytest
+import torch as th
 
 from stable_baselines3 import A2C, DDPG, DQN, PPO, SAC, TD3
 from stable_baselines3.common.env_util import make_vec_env
 from stable_baselines3.common.noise import NormalActionNoise, OrnsteinUhlenbeckActionNoise
+from stable_baselines3.common.torch_layers import BaseFeaturesExtractor
 
 normal_action_noise = NormalActionNoise(np.zeros(1), 0.1 * np.ones(1))
 
@@ -100,6 +102,55 @@ def test_n_critics(n_critics):
     model.learn(total_timesteps=200)
 
 
+@pytest.mark.parametrize("model_class", [SAC, TD3])
+@pytest.mark.parametrize("n_critics", [1, 3])
+def test_ensemble_critics(tmp_path, model_class, n_critics):
+    model = model_class(
+        "MlpPolicy",
+        "Pendulum-v1",
+        policy_kwargs=dict(net_arch=[64, 64], n_critics=n_critics, ensemble_critics=True),
+        learning_starts=100,
+        buffer_size=10000,
+        verbose=1,
+    )
+    model.learn(total_timesteps=200)
+    # The losses are accumulated on the device and recorded when dumping the logs
+    assert "train/critic_loss" in model._train_metrics
+    model._record_train_metrics()
+    assert len(model._train_metrics) == 0
+    assert "train/critic_loss" in model.logger.name_to_value
+
+    observations = th.rand(8, 3)
+    actions = th.rand(8, 1)
+    q_values = model.critic.q_values(observations, actions)
+    assert q_values.shape == (8, n_critics)
+    assert th.allclose(th.cat(model.critic(observations, actions), dim=1), q_values)
+    assert th.allclose(model.critic.q1_forward(observations, actions), q_values[:, :1])
+
+    model.save(tmp_path / "ensemble.zip")
+    model = model_class.load(tmp_path / "ensemble.zip")
+    assert model.critic.ensemble_critics
+    assert th.allclose(model.critic.q_values(observations, actions), q_values)
+
+
+@pytest.mark.parametrize("model_class", [SAC, TD3, DQN])
+def test_compile_train(model_class):
+    # On CPU, the gradient steps are not compiled but the minibatches are sampled as one block
+    model = model_class(
+        "MlpPolicy",
+        "CartPole-v1" if model_class == DQN else "Pendulum-v1",
+        policy_kwargs=dict(net_arch=[64]),
+        learning_starts=100,
+        gradient_steps=4,
+        buffer_size=1000,
+        compile_train=True,
+        device="cpu",
+    )
+    model.learn(total_timesteps=200)
+    assert model._get_train_step() == model._train_step
+    assert model._n_updates > 0
+
+
 def test_dqn():
     model = DQN(
         "MlpPolicy",
@@ -234,3 +285,53 @@ def test_ppo_warnings():
     loss = model.logger.name_to_value["train/loss"]
     assert loss > 0
     assert not np.isnan(loss)  # check not nan (since nan does not equal nan)
+
+
+class LinearFeaturesExtractor(BaseFeaturesExtractor):
+    """Features extractor with parameters, to check the parameters shared between policies."""
+
+    def __init__(self, observation_space: gym.spaces.Box, features_dim: int = 8):
+        super().__init__(observation_space, features_dim)
+        self.linear = th.nn.Linear(observation_space.shape[0], features_dim)
+
+    def forward(self, observations: th.Tensor) -> th.Tensor:
+        return th.relu(self.linear(observations))
+
+
+@pytest.mark.parametrize("ent_features_extractor", ["shared", "frozen"])
+@pytest.mark.parametrize("share_features_extractor", [True, False])
+def test_ppo_shared_ent_features_extractor(ent_features_extractor, share_features_extractor):
+    model = PPO(
+        "MlpPolicy",
+        "Pendulum-v1",
+        n_steps=64,
+        batch_size=32,
+        n_epochs=2,
+        seed=0,
+        policy_kwargs=dict(
+            net_arch=[16],
+            features_extractor_class=LinearFeaturesExtractor,
+            share_features_extractor=share_features_extractor,
+        ),
+        ppo_mode="dbltrn",
+        ent_features_extractor=ent_features_extractor,
+    )
+    policy, ent_policy = model.policy, model.ent_policy
+    # Same features extractor, separate mlp extractor and heads
+    assert ent_policy.pi_features_extractor is policy.pi_features_extractor
+    assert ent_policy.vf_features_extractor is policy.vf_features_extractor
+    assert ent_policy.mlp_extractor is not policy.mlp_extractor
+    assert ent_policy.action_net is not policy.action_net
+    # The shared parameters are only updated by the optimizer of the policy
+    ent_params = {id(param) for group in ent_policy.optimizer.param_groups for param in group["params"]}
+    assert not any(id(param) in ent_params for param in policy.features_extractor.parameters())
+    assert {id(param) for param in ent_policy.mlp_extractor.parameters()} <= ent_params
+    features_params = th.nn.utils.parameters_to_vector(policy.features_extractor.parameters()).detach().clone()
+    model.learn(128)
+    # Trained by the loss of the policy in both cases
+    assert not th.allclose(features_params, th.nn.utils.parameters_to_vector(policy.features_extractor.parameters()))
+
+
+def test_ppo_ent_features_extractor_fail():
+    with pytest.raises(AssertionError):
+        PPO("MlpPolicy", "Pendulum-v1", ent_features_extractor="unknown")
@@ -18,7 +18,7 @@ from stable_baselines3 import A2C, DDPG, DQN, PPO, SAC, TD3
 from stable_baselines3.common.base_class import BaseAlgorithm
 from stable_baselines3.common.env_util import make_vec_env
 from stable_baselines3.common.envs import FakeImageEnv, IdentityEnv, IdentityEnvBox
-from stable_baselines3.common.save_util import load_from_pkl, open_path, save_to_pkl
+from stable_baselines3.common.save_util import TensorFile, is_tensor_file, load_from_pkl, open_path, save_to_pkl
 from stable_baselines3.common.utils import get_device
 from stable_baselines3.common.vec_env import DummyVecEnv
 
@@ -783,3 +783,50 @@ def test_no_resource_warning(tmp_path):
         fp.seek(0)
         model.load_replay_buffer(fp)
         assert not fp.closed
+
+
+@pytest.mark.parametrize("model_class", [PPO, SAC])
+def test_save_load_tensor_file(tmp_path, model_class):
+    kwargs = dict(n_steps=64) if model_class == PPO else dict(learning_starts=50)
+    env = DummyVecEnv([lambda: select_env(model_class)])
+    model = model_class("MlpPolicy", env, policy_kwargs=dict(net_arch=[16]), **kwargs)
+    model.learn(200)
+    observations = np.concatenate([env.step([env.action_space.sample()])[0] for _ in range(10)], axis=0)
+    selected_actions, _ = model.predict(observations, deterministic=True)
+    params = deepcopy(model.get_parameters())
+
+    save_path = tmp_path / "model.sb3t"
+    model.save(save_path, tensor_file=True)
+    assert is_tensor_file(save_path)
+    assert not is_tensor_file(tmp_path / "missing.sb3t")
+    # Only the optimizers are pickled
+    tensor_file = TensorFile(save_path)
+    assert set(tensor_file.names()) - set(tensor_file.names(include_optimizers=False)) == {
+        name for name in params if "optimizer" in name
+    }
+
+    # Full load
+    model = model_class.load(save_path, env=env)
+    new_params = model.get_parameters()
+    for object_name in params:
+        if "optim" in object_name:
+            continue
+        for key in params[object_name]:
+            assert th.allclose(params[object_name][key], new_params[object_name][key])
+    new_selected_actions, _ = model.predict(observations, deterministic=True)
+    assert np.allclose(selected_actions, new_selected_actions, 1e-4)
+    model.learn(200)
+
+    # Policy only, the optimizers are skipped
+    model = model_class.load(save_path, load_optimizers=False)
+    new_selected_actions, _ = model.predict(observations, deterministic=True)
+    assert np.allclose(selected_actions, new_selected_actions, 1e-4)
+
+    model = model_class("MlpPolicy", env, policy_kwargs=dict(net_arch=[16]), **kwargs)
+    with pytest.raises(ValueError):
+        model.set_parameters(
+            {name: state_dict for name, state_dict in params.items() if "optimizer" not in name}, exact_match=True
+        )
+    model.set_parameters(str(save_path), load_optimizers=False)
+    new_selected_actions, _ = model.predict(observations, deterministic=True)
+    assert np.allclose(selected_actions, new_selected_actions, 1e-4)
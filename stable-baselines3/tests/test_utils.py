@@ -9,12 +9,13 @@ from gymnasium import spaces
 
 import stable_baselines3 as sb3
 from stable_baselines3 import A2C
-from stable_baselines3.common.atari_wrappers import MaxAndSkipEnv
+from stable_baselines3.common.atari_wrappers import MaxAndSkipEnv, VecAtariPreprocessing
 from stable_baselines3.common.env_util import is_wrapped, make_atari_env, make_vec_env, unwrap_wrapper
 from stable_baselines3.common.evaluation import evaluate_policy
 from stable_baselines3.common.monitor import Monitor
 from stable_baselines3.common.noise import OrnsteinUhlenbeckActionNoise, VectorizedActionNoise
 from stable_baselines3.common.utils import (
+    StagingBuffer,
     check_shape_equal,
     get_parameters_by_name,
     get_system_info,
@@ -107,6 +108,39 @@ def test_make_atari_env(
         assert np.max(np.abs(reward)) < 1.0
 
 
+@pytest.mark.parametrize("frame_skip", [1, 4])
+def test_vec_atari_preprocessing(frame_skip):
+    n_envs, screen_size = 2, 60
+    wrapper_kwargs = dict(frame_skip=frame_skip, screen_size=screen_size, noop_max=0)
+    venv = make_atari_env("BreakoutNoFrameskip-v4", n_envs=n_envs, seed=0, wrapper_kwargs=wrapper_kwargs)
+    vec_preprocessing_venv = VecAtariPreprocessing(
+        make_atari_env(
+            "BreakoutNoFrameskip-v4", n_envs=n_envs, seed=0, wrapper_kwargs=dict(vec_preprocessing=True, **wrapper_kwargs)
+        ),
+        screen_size=screen_size,
+    )
+    assert vec_preprocessing_venv.observation_space == venv.observation_space
+
+    # Same results as the per-env preprocessing, up to the rounding of the interpolation
+    obs, vec_obs = venv.reset(), vec_preprocessing_venv.reset()
+    assert np.allclose(obs, vec_obs, atol=1)
+    for _ in range(20):
+        actions = [venv.action_space.sample() for _ in range(n_envs)]
+        obs, _, _, _ = venv.step(actions)
+        new_vec_obs, _, _, _ = vec_preprocessing_venv.step(actions)
+        assert new_vec_obs is not vec_obs
+        vec_obs = new_vec_obs
+        assert vec_obs.dtype == np.uint8
+        assert np.allclose(obs, vec_obs, atol=1)
+
+    n_stack = 4
+    stacked_venv = VecAtariPreprocessing(
+        make_atari_env("BreakoutNoFrameskip-v4", n_envs=n_envs, seed=0, wrapper_kwargs=dict(vec_preprocessing=True)),
+        n_stack=n_stack,
+    )
+    assert stacked_venv.reset().shape == (n_envs, 84, 84, n_stack)
+
+
 def test_vec_env_kwargs():
     env = make_vec_env("MountainCarContinuous-v0", n_envs=1, seed=0, env_kwargs={"goal_velocity": 0.11})
     assert env.get_attr("goal_velocity")[0] == 0.11
@@ -405,6 +439,19 @@ def test_polyak():
     assert th.allclose(param1, target1)
     assert th.allclose(param2, target2)
 
+    # Several parameters (batched update), including non floating point ones
+    params = [th.rand(3, 2), th.rand(4), th.ones(2, dtype=th.long)]
+    target_params = [th.rand(3, 2), th.rand(4), th.zeros(2, dtype=th.long)]
+    expected = [tau * param + (1 - tau) * target_param for param, target_param in zip(params[:2], target_params[:2])]
+    polyak_update(params[:2], target_params[:2], tau)
+    for target_param, expected_param in zip(target_params, expected):
+        assert th.allclose(target_param, expected_param)
+    polyak_update(params[2:], target_params[2:], 1.0)
+    assert th.equal(target_params[2], params[2])
+
+    with pytest.raises(ValueError):
+        polyak_update(params, target_params[:1], tau)
+
 
 def test_zip_strict():
     # Iterables with different lengths
@@ -590,3 +637,46 @@ def test_check_shape_equal():
     space2 = spaces.Dict({"key1": spaces.Box(low=-1, high=2, shape=(3, 3)), "key2": spaces.Box(low=-1, high=2, shape=(2, 2))})
     with pytest.raises(AssertionError):
         check_shape_equal(space1, space2)
+
+
+@pytest.mark.parametrize("device", ["cpu", "cuda"])
+def test_staging_buffer(device):
+    if device == "cuda" and not th.cuda.is_available():
+        pytest.skip("CUDA not available")
+    device = th.device(device)
+    staging_buffer = StagingBuffer()
+    obs = {"img": np.random.randint(0, 255, size=(4, 3, 8, 8), dtype=np.uint8), "vec": np.random.rand(4, 2)}
+
+    for _ in range(3):
+        obs_tensor = staging_buffer.obs_to_tensor(obs, device)
+        for key in obs.keys():
+            assert obs_tensor[key].device.type == device.type
+            assert obs_tensor[key].dtype == th.as_tensor(obs[key]).dtype
+            assert np.allclose(obs_tensor[key].cpu().numpy(), obs[key])
+
+    assert staging_buffer.n_transfers == 6
+    if device.type == "cpu":
+        # Zero-copy
+        assert staging_buffer.n_allocations == 0
+        assert np.shares_memory(obs_tensor["vec"].numpy(), obs["vec"])
+        copied_tensor = staging_buffer.to_tensor(obs["vec"], device, copy=True)
+        assert not np.shares_memory(copied_tensor.numpy(), obs["vec"])
+    else:
+        # One pinned buffer per key
+        assert staging_buffer.n_allocations == 2
+
+    # Negative strides are not supported by th.from_numpy()
+    reversed_obs = obs["vec"][::-1]
+    assert np.allclose(staging_buffer.to_tensor(reversed_obs, device).cpu().numpy(), reversed_obs)
+
+    # Fields with the same shape transferred in one batch: one staging memory per field
+    n_allocations = staging_buffer.n_allocations
+    arrays = [np.random.rand(4, 2) for _ in range(3)]
+    with staging_buffer.batch():
+        tensors = [staging_buffer.to_tensor(array, device, key=f"field_{i}") for i, array in enumerate(arrays)]
+        # Same key twice in a batch: the staging memory is reused only after the first copy
+        tensors.append(staging_buffer.to_tensor(arrays[0] + 1, device, key="field_0"))
+    for tensor, array in zip(tensors, [*arrays, arrays[0] + 1]):
+        assert np.allclose(tensor.cpu().numpy(), array)
+    if device.type == "cuda":
+        assert staging_buffer.n_allocations == n_allocations + 3
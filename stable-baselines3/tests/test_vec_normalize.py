@@ -492,3 +492,32 @@ def test_non_dict_obs_keys():
 
     # Test dict obs with norm_obs set to False
     _make_warmstart(lambda: DummyMixedDictEnv(), norm_obs=False)
+
+
+@pytest.mark.parametrize("make_gym_env", [make_env, make_dict_env, make_image_env])
+def test_fast_normalize(tmp_path, make_gym_env):
+    venv = _make_warmstart(make_gym_env, clip_obs=0.5)
+    fast_venv = _make_warmstart(make_gym_env, clip_obs=0.5, fast_normalize=True)
+    # Use the same statistics
+    sync_envs_normalization(venv, fast_venv)
+
+    for _ in range(3):
+        obs, _, _, _ = fast_venv.step([fast_venv.action_space.sample()])
+        original_obs = fast_venv.get_original_obs()
+        if isinstance(obs, dict):
+            for key in obs.keys():
+                assert obs[key].dtype == np.float32
+        else:
+            assert obs.dtype == np.float32
+        # The statistics were updated, the cached values must be too
+        assert allclose(obs, fast_venv.normalize_obs(original_obs))
+        sync_envs_normalization(fast_venv, venv)
+        assert allclose(venv.normalize_obs(original_obs), obs)
+        # The original observations must not be modified
+        assert allclose(original_obs, fast_venv.get_original_obs())
+
+    path = tmp_path / "vec_normalize"
+    fast_venv.save(path)
+    deserialized = VecNormalize.load(path, venv=fast_venv.venv)
+    assert deserialized.fast_normalize
+    assert allclose(deserialized.normalize_obs(original_obs), fast_venv.normalize_obs(original_obs))
@@ -312,3 +312,40 @@ def test_episode_termination_dict():
         true_stacked_obs_env2 = np.concatenate((zeros, zeros, zeros, observations_3[key][1]), axis)
         true_stacked_obs = np.stack((true_stacked_obs_env1, true_stacked_obs_env2))
         assert np.array_equal(true_stacked_obs, stacked_obs[key])
+
+
+def test_ring_buffer_matches_roll():
+    space = spaces.Box(0, 255, (H, W, C), dtype=np.uint8)
+    stacked_observations = StackedObservations(NUM_ENVS, N_STACK, space, channels_order="last")
+    observations = np.stack([space.sample() for _ in range(NUM_ENVS)])
+    stacked_obs = stacked_observations.reset(observations)
+    expected = np.zeros((NUM_ENVS, H, W, N_STACK * C), dtype=np.uint8)
+    expected[..., -C:] = observations
+    kept_observations = [(stacked_obs, expected.copy())]
+
+    # Several times the length of the internal buffer, with episode terminations
+    for step in range(10 * N_STACK):
+        observations = np.stack([space.sample() for _ in range(NUM_ENVS)])
+        dones = np.array([step % 7 == 6, step % 5 == 4])
+        infos = [{"terminal_observation": space.sample()} if done else {} for done in dones]
+        terminal_observations = [info.get("terminal_observation") for info in infos]
+        stacked_obs, infos = stacked_observations.update(observations, dones, infos)
+
+        expected = np.roll(expected, -C, axis=-1)
+        for env_idx in np.flatnonzero(dones):
+            new_terminal = np.concatenate((expected[env_idx, ..., :-C], terminal_observations[env_idx]), axis=-1)
+            assert np.array_equal(infos[env_idx]["terminal_observation"], new_terminal)
+            expected[env_idx] = 0
+        expected[..., -C:] = observations
+
+        assert np.array_equal(stacked_obs, expected)
+        kept_observations.append((stacked_obs, expected.copy()))
+
+    # The returned observations are not modified by the next updates
+    for stacked_obs, expected in kept_observations:
+        assert np.array_equal(stacked_obs, expected)
+
+    # Nor by a reset
+    stacked_obs, expected = kept_observations[-1]
+    stacked_observations.reset(np.stack([space.sample() for _ in range(NUM_ENVS)]))
+    assert np.array_equal(stacked_obs, expected)
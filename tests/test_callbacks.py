@@ -13,3 +13,52 @@ def test_raw_stat_callback(tmp_path):
     )
     return_code = subprocess.call(shlex.split(cmd))
     _assert_eq(return_code, 0)
+
+
+def test_raw_stat_callback_binary_log(tmp_path):
+    log_path = tmp_path / "raw_stats"
+    cmd = (
+        f"python train.py -n 400 --algo ppo --env CartPole-v1 --log-folder {tmp_path} "
+        f"-params n_steps:64 ppo_mode:\"'dbltrn'\" "
+        f"callback:\"[{{'rl_zoo3.callbacks.RawStatisticsCallback': {{'log_path': '{log_path}'}}}}]\""
+    )
+    return_code = subprocess.call(shlex.split(cmd))
+    _assert_eq(return_code, 0)
+
+    from stable_baselines3.common.monitor import load_episode_log
+
+    _, records = load_episode_log(f"{log_path}.monitor.bin")
+    assert len(records) > 0
+    assert set(records["policy"].tolist()).issubset({0, 1})
+
+    # Single policy
+    cmd = (
+        f"python train.py -n 400 --algo a2c --env CartPole-v1 --log-folder {tmp_path} -params "
+        f"callback:\"[{{'rl_zoo3.callbacks.RawStatisticsCallback': {{'log_path': '{log_path}_a2c'}}}}]\""
+    )
+    return_code = subprocess.call(shlex.split(cmd))
+    _assert_eq(return_code, 0)
+    _, records = load_episode_log(f"{log_path}_a2c.monitor.bin")
+    assert len(records) > 0
+    assert set(records["policy"].tolist()) == {-1}
+
+
+def test_parallel_train_checkpoint(tmp_path):
+    from stable_baselines3 import SAC
+    from stable_baselines3.common.buffers import ReplayBuffer
+    from stable_baselines3.common.callbacks import CheckpointCallback
+
+    from rl_zoo3.callbacks import ParallelTrainCallback
+
+    model = SAC("MlpPolicy", "Pendulum-v1", learning_starts=100, train_freq=100)
+    checkpoint_callback = CheckpointCallback(save_freq=300, save_path=str(tmp_path), save_replay_buffer=True)
+    model.learn(600, callback=[ParallelTrainCallback(gradient_steps=10, blocking=True), checkpoint_callback])
+
+    # The checkpoint is saved with the state of the learner
+    checkpoint = SAC.load(tmp_path / "rl_model_300_steps.zip")
+    assert checkpoint._n_updates > 0
+    checkpoint.load_replay_buffer(tmp_path / "rl_model_replay_buffer_300_steps.pkl")
+    assert checkpoint.replay_buffer.size() > 0
+    # The model is restored at the end of training
+    assert isinstance(model.replay_buffer, ReplayBuffer)
+    assert not {"train", "save", "save_replay_buffer"} & set(vars(model))
@@ -1,3 +1,4 @@
+import json
 import os
 import shlex
 import subprocess
@@ -52,10 +53,28 @@ def test_trained_agents(trained_model):
 
 
 def test_benchmark(tmp_path):
-    cmd = f"python -m rl_zoo3.benchmark -n {N_STEPS} --benchmark-dir {tmp_path} --test-mode --no-hub"
+    # Train a model so the benchmark always has one to evaluate
+    log_dir = tmp_path / "logs"
+    cmd = f"python train.py --algo a2c --env CartPole-v1 -n 1000 -f {log_dir}"
     return_code = subprocess.call(shlex.split(cmd))
     _assert_eq(return_code, 0)
 
+    benchmark_dir = tmp_path / "benchmark"
+    cmd = (
+        f"python -m rl_zoo3.benchmark -n {N_STEPS} --log-dir {log_dir} --benchmark-dir {benchmark_dir} "
+        "--test-mode --no-hub --n-envs 2"
+    )
+    return_code = subprocess.call(shlex.split(cmd))
+    _assert_eq(return_code, 0)
+    assert os.path.isfile(benchmark_dir / "benchmark.md")
+
+    with open(benchmark_dir / "benchmark_results.json") as file_handler:
+        results = json.load(file_handler)
+    _assert_eq(len(results), 1)
+    # The model did not change, it is not evaluated again
+    output = subprocess.check_output(shlex.split(cmd), text=True)
+    assert "did not change" in output
+
 
 def test_load(tmp_path):
     algo, env_id = "a2c", "CartPole-v1"
@@ -83,6 +102,40 @@ def test_load(tmp_path):
     return_code = subprocess.call(shlex.split(base_cmd + "--load-last-checkpoint"))
     _assert_eq(return_code, 0)
 
+    # Vectorized evaluation (subprocesses) with a results file
+    results_file = tmp_path / "results.json"
+    return_code = subprocess.call(
+        shlex.split(base_cmd + f"--n-envs 2 --n-eval-episodes 4 --results-file {results_file} --verbose 0")
+    )
+    _assert_eq(return_code, 0)
+    with open(results_file) as file_handler:
+        results = json.load(file_handler)
+    _assert_eq(results["n_episodes"], 4)
+    _assert_eq(results["episodes_per_env"], [2, 2])
+    _assert_eq(len(results["episodes"]["episode_rewards"]), 4)
+
+    # Evaluate all checkpoints
+    cmd = f"python -m rl_zoo3.batch_eval --algo {algo} --env {env_id} -f {tmp_path} --n-eval-episodes 2 --n-workers 2"
+    return_code = subprocess.call(shlex.split(cmd))
+    _assert_eq(return_code, 0)
+    assert os.path.isfile(tmp_path / algo / f"{env_id}_1" / "checkpoint_evaluations.npz")
+
+
+@pytest.mark.parametrize("replay_buffer_class", ["MemmapReplayBuffer", "FrameStackReplayBuffer"])
+def test_enjoy_replay_buffer_class(tmp_path, replay_buffer_class):
+    algo, env_id = "dqn", "CartPole-v1"
+    cmd = (
+        f"python train.py --algo {algo} --env {env_id} -n 500 -f {tmp_path} "
+        f"-params buffer_size:1000 learning_starts:100 frame_stack:4 replay_buffer_class:\"'{replay_buffer_class}'\""
+    )
+    return_code = subprocess.call(shlex.split(cmd))
+    _assert_eq(return_code, 0)
+
+    # The agent is loaded with a dummy replay buffer
+    cmd = f"python enjoy.py --algo {algo} --env {env_id} -n {N_STEPS} -f {tmp_path} --no-render"
+    return_code = subprocess.call(shlex.split(cmd))
+    _assert_eq(return_code, 0)
+
 
 def test_record_video(tmp_path):
     # Skip if no X-Server
@@ -98,7 +151,8 @@ def test_record_video(tmp_path):
     assert os.stat(video_path).st_size != 0, "Recorded video is empty"
 
 
-def test_record_training(tmp_path):
+@pytest.mark.parametrize("n_workers", [1, 2])
+def test_record_training(tmp_path, n_workers):
     videos_tmp_path = tmp_path / "videos"
     algo, env_id = "ppo", "CartPole-v1"
 
@@ -113,7 +167,7 @@ def test_record_training(tmp_path):
     cmd = (
         f"python -m rl_zoo3.record_training -n 100 --algo {algo} --env {env_id} "
         f"--f {tmp_path} "
-        f"--gif -o {videos_tmp_path}"
+        f"--gif -o {videos_tmp_path} --n-workers {n_workers}"
     )
     return_code = subprocess.call(shlex.split(cmd))
     _assert_eq(return_code, 0)
@@ -123,3 +177,47 @@ def test_record_training(tmp_path):
     # File is not empty
     assert os.stat(mp4_path).st_size != 0, "Recorded mp4 video is empty"
     assert os.stat(gif_path).st_size != 0, "Converted gif video is empty"
+
+
+@pytest.mark.parametrize("export", [None, "torchscript"])
+def test_serve(tmp_path, export):
+    import http.client
+    import io
+    import threading
+    from concurrent.futures import ThreadPoolExecutor
+
+    import numpy as np
+    from stable_baselines3 import SAC
+
+    from rl_zoo3.serve import NPY_CONTENT_TYPE, PolicyHTTPServer, PolicyServer
+
+    model = SAC("MlpPolicy", "Pendulum-v1", policy_kwargs=dict(net_arch=[32]))
+    observations = np.array([model.observation_space.sample() for _ in range(16)])
+    expected_actions, _ = model.predict(observations, deterministic=True)
+
+    policy_server = PolicyServer(model, export=export, export_path=str(tmp_path / "policy.pt"), max_batch_size=8)
+    with policy_server, PolicyHTTPServer(policy_server, port=0) as http_server:
+        # Concurrent requests with and without batch dimension
+        with ThreadPoolExecutor(8) as executor:
+            actions = np.array(list(executor.map(policy_server.predict, observations)))
+        assert np.allclose(actions, expected_actions, atol=1e-5)
+        assert np.allclose(policy_server.predict(observations), expected_actions, atol=1e-5)
+        assert policy_server.n_observations == 32
+
+        threading.Thread(target=http_server.serve_forever, daemon=True).start()
+        connection = http.client.HTTPConnection("127.0.0.1", http_server.server_address[1])
+        connection.request("POST", "/predict", json.dumps({"observation": observations[0].tolist()}))
+        action = json.loads(connection.getresponse().read())["action"]
+        assert np.allclose(action, expected_actions[0], atol=1e-5)
+
+        buffer = io.BytesIO()
+        np.save(buffer, observations)
+        connection.request("POST", "/predict", buffer.getvalue(), {"Content-Type": NPY_CONTENT_TYPE})
+        actions = np.load(io.BytesIO(connection.getresponse().read()))
+        assert np.allclose(actions, expected_actions, atol=1e-5)
+
+        connection.request("POST", "/predict", json.dumps({"obs": []}))
+        response = connection.getresponse()
+        response.read()
+        assert response.status == 400
+        http_server.shutdown()
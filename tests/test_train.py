@@ -1,6 +1,7 @@
 import os
 import shlex
 import subprocess
+import sys
 
 import pytest
 
@@ -79,6 +80,23 @@ def test_parallel_train(tmp_path):
     _assert_eq(return_code, 0)
 
 
+@pytest.mark.parametrize(
+    "algo,env_id,callback_kwargs",
+    [
+        ("td3", "Pendulum-v1", "dict(blocking=True)"),
+        ("dqn", "CartPole-v1", "dict(force_sync=True,sync_chunk_size=2)"),
+    ],
+)
+def test_parallel_train_modes(tmp_path, algo, env_id, callback_kwargs):
+    cmd = (
+        f"python train.py -n 1000 --algo {algo} --env {env_id} --log-folder {tmp_path} "
+        "-params learning_starts:100 train_freq:100 "
+        f"callback:\"[{{'rl_zoo3.callbacks.ParallelTrainCallback':{callback_kwargs}}}]\""
+    )
+    return_code = subprocess.call(shlex.split(cmd))
+    _assert_eq(return_code, 0)
+
+
 def test_custom_yaml(tmp_path):
     cmd = (
         f"python train.py -n {N_STEPS} --algo ppo --env CartPole-v1 --log-folder {tmp_path} "
@@ -116,3 +134,45 @@ def test_gym_packages(tmp_path):
     )
     return_code = subprocess.call(shlex.split(cmd), env=env_variables)
     _assert_eq(return_code, 0)
+
+
+def test_fast_start():
+    # Listing the algorithms should not import PyTorch, SB3 or the hub modules
+    cmd = (
+        "import sys; from rl_zoo3.utils import ALGOS; assert 'ppo' in ALGOS; "
+        "assert not {'torch', 'stable_baselines3', 'sb3_contrib', 'huggingface_hub'} & set(sys.modules)"
+    )
+    return_code = subprocess.call([sys.executable, "-c", cmd])
+    _assert_eq(return_code, 0)
+
+    return_code = subprocess.call([sys.executable, "-m", "rl_zoo3.train", "--help"], stdout=subprocess.DEVNULL)
+    _assert_eq(return_code, 0)
+
+
+def test_dry_run(tmp_path):
+    cmd = f"python train.py --algo ppo --env CartPole-v1 --log-folder {tmp_path} --dry-run"
+    return_code = subprocess.call(shlex.split(cmd))
+    _assert_eq(return_code, 0)
+    # The cache is opt-in
+    assert not (tmp_path / ".config_cache").exists()
+    return_code = subprocess.call(shlex.split(cmd + " --config-cache"))
+    _assert_eq(return_code, 0)
+    # Valid hyperparameters are cached
+    assert len(list((tmp_path / ".config_cache").glob("*.pkl"))) == 1
+    # Same config file, other algorithm
+    config_path = tmp_path / "config.yml"
+    config_path.write_text("CartPole-v1:\n  policy: 'MlpPolicy'\n  n_timesteps: 1000\n")
+    for algo in ["ppo", "a2c"]:
+        cmd_algo = f"python train.py --algo {algo} --env CartPole-v1 --log-folder {tmp_path} --dry-run --config-cache"
+        return_code = subprocess.call(shlex.split(f"{cmd_algo} --conf-file {config_path}"))
+        _assert_eq(return_code, 0)
+    assert len(list((tmp_path / ".config_cache").glob("*.pkl"))) == 3
+    # Nothing else is created
+    assert not (tmp_path / "ppo").is_dir()
+
+    # Unknown hyperparameter
+    return_code = subprocess.call(shlex.split(cmd + " -params not_a_param:1"))
+    assert return_code != 0
+    # Invalid schedule
+    return_code = subprocess.call(shlex.split(cmd + " -params learning_rate:'\"lin\"'"))
+    assert return_code != 0
@@ -1,4 +1,5 @@
 import gymnasium as gym
+import numpy as np
 import pytest
 from stable_baselines3 import A2C
 from stable_baselines3.common.env_checker import check_env
@@ -18,6 +19,20 @@ def test_wrappers():
     check_env(env)
 
 
+def test_history_wrapper_kept_observations():
+    env = HistoryWrapper(gym.make("Pendulum-v1"), horizon=2)
+    obs, _ = env.reset(seed=0)
+    kept_observations = [(obs, obs.copy())]
+    # Several times the length of the internal buffers
+    for _ in range(20):
+        obs, _, _, _, _ = env.step(env.action_space.sample())
+        kept_observations.append((obs, obs.copy()))
+    obs, _ = env.reset()
+    # The returned observations are not modified by the next steps or resets
+    for obs, expected in kept_observations:
+        assert np.array_equal(obs, expected)
+
+
 @pytest.mark.parametrize(
     "env_wrapper",
     [